@@ -20,8 +20,8 @@ variables required in that part of the Neural Network. The `__call__` function
 on the object is used to connect that Module into the Graph, and this may be
 called repeatedly with sharing automatically taking place.
 
-Everything public should be imported by this top level `__init__.py` so that the
-library can be used as follows:
+Everything public should be listed in `_PUBLIC_NAMES` in this top level
+`__init__.py` so that the library can be used as follows:
 
 ```
 import sonnet as snt
@@ -34,99 +34,129 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import importlib
 import sys
+import types
+
+# Public names of the `snt` namespace, grouped by the module defining them.
+# Modules are only imported when one of their names is first accessed.
+_PUBLIC_NAMES = {
+    "sonnet.python": ("custom_getters",),
+    "sonnet.python.modules": ("experimental", "nets"),
+    "sonnet.python.modules.attention": ("AttentiveRead",),
+    "sonnet.python.modules.base": ("AbstractModule", "Module", "Transposable"),
+    "sonnet.python.modules.base_errors": (
+        "DifferentGraphError", "Error", "IncompatibleShapeError",
+        "ModuleInfoError", "NotConnectedError", "NotInitializedError",
+        "NotSupportedError", "ParentNotBuiltError", "UnderspecifiedError",
+    ),
+    "sonnet.python.modules.base_info": ("SONNET_COLLECTION_NAME",),
+    "sonnet.python.modules.basic": (
+        "AddBias", "BatchApply", "BatchFlatten", "BatchReshape",
+        "EnsembleLinear", "FlattenTrailingDimensions", "Linear",
+        "merge_leading_dims", "MergeDims", "SelectInput", "SliceByDim",
+        "split_leading_dim", "TileByDim", "TrainableVariable",
+    ),
+    "sonnet.python.modules.basic_rnn": ("DeepRNN", "ModelRNN", "VanillaRNN"),
+    "sonnet.python.modules.batch_norm": ("BatchNorm",),
+    "sonnet.python.modules.batch_norm_folding": ("fold_batch_norm",),
+    "sonnet.python.modules.batch_norm_v2": ("BatchNormV2",),
+    "sonnet.python.modules.block_sparse": (
+        "block_sparsify", "BlockSparseLinear", "polynomial_sparsity_schedule",
+    ),
+    "sonnet.python.modules.clip_gradient": ("clip_gradient",),
+    "sonnet.python.modules.conv": (
+        "CausalConv1D", "CausalConv1DCore", "Conv1D", "Conv1DTranspose",
+        "Conv2D", "Conv2DTranspose", "Conv3D", "Conv3DTranspose",
+        "DepthwiseConv2D", "InPlaneConv2D", "SAME", "SeparableConv1D",
+        "SeparableConv2D", "VALID",
+    ),
+    "sonnet.python.modules.embed": ("Embed",),
+    "sonnet.python.modules.gated_rnn": (
+        "BatchNormLSTM", "Conv1DLSTM", "Conv2DLSTM", "GRU",
+        "highway_core_with_recurrent_dropout", "HighwayCore", "LSTM",
+        "lstm_with_recurrent_dropout", "lstm_with_zoneout", "LSTMState",
+    ),
+    "sonnet.python.modules.graph_cache": ("graph_cache_key", "GraphCache"),
+    "sonnet.python.modules.inference_export": (
+        "benchmark_inference_graph", "export_inference_graph", "InferenceGraph",
+    ),
+    "sonnet.python.modules.layer_norm": ("GroupNorm", "LayerNorm"),
+    "sonnet.python.modules.low_rank": ("factorize_low_rank", "LowRankReport"),
+    "sonnet.python.modules.module_report": (
+        "format_module_report", "log_module_report", "module_report",
+        "module_report_to_json", "ModuleReport",
+    ),
+    "sonnet.python.modules.pondering_rnn": ("ACTCore",),
+    "sonnet.python.modules.quantization": (
+        "quantization_report", "QuantizationReport", "quantize_int8",
+        "QuantizedConv2D", "QuantizedLinear",
+    ),
+    "sonnet.python.modules.recompute": (
+        "checkpoint_every", "checkpointed_dynamic_rnn", "Recompute",
+    ),
+    "sonnet.python.modules.relational_memory": ("RelationalMemory",),
+    "sonnet.python.modules.replication": ("average_gradients", "replicate"),
+    "sonnet.python.modules.residual": (
+        "Residual", "ResidualCore", "SkipConnectionCore",
+    ),
+    "sonnet.python.modules.rnn_core": (
+        "length_aware_dynamic_rnn", "RNNCore", "trainable_initial_state",
+        "TrainableInitialState", "TruncatedBPTTUnroll",
+    ),
+    "sonnet.python.modules.scale_gradient": ("scale_gradient",),
+    "sonnet.python.modules.sequential": ("Sequential",),
+    "sonnet.python.modules.spatial_transformer": (
+        "AffineGridWarper", "AffineWarpConstraints", "BilinearSampler",
+        "GridWarper",
+    ),
+    "sonnet.python.modules.util": (
+        "check_initializers", "check_partitioners", "check_regularizers",
+        "custom_getter_router", "format_shards", "format_variable_map",
+        "format_variables", "get_normalized_variable_map", "get_saver",
+        "get_variables_in_module", "get_variables_in_scope",
+        "has_variable_scope", "log_variables", "reuse_variables",
+        "summarize_shards", "summarize_variables", "variable_map_items",
+    ),
+    "sonnet.python.ops": ("nest",),
+    "sonnet.python.ops.initializers": ("restore_initializer",),
+}
+
+_NAME_TO_MODULE = {name: module_name
+                   for module_name, names in _PUBLIC_NAMES.items()
+                   for name in names}
+
+
+class _LazyModule(types.ModuleType):
+  """Module type resolving the public `snt` names on first access."""
+
+  def __getattr__(self, name):
+    # Only called when `name` is not yet an attribute of the module.
+    module_name = _NAME_TO_MODULE.get(name)
+    if module_name is None:
+      raise AttributeError("module 'sonnet' has no attribute '{}'".format(name))
+
+    module = importlib.import_module(module_name)
+    try:
+      value = getattr(module, name)
+    except AttributeError:
+      # `name` is a submodule which has not been imported yet.
+      value = importlib.import_module("{}.{}".format(module_name, name))
+
+    setattr(self, name, value)
+    return value
+
+  def __dir__(self):
+    return sorted(set(self.__dict__) | set(_NAME_TO_MODULE))
 
-from sonnet.python import custom_getters
-from sonnet.python.modules import experimental
-from sonnet.python.modules import nets
-from sonnet.python.modules.attention import AttentiveRead
-from sonnet.python.modules.base import AbstractModule
-from sonnet.python.modules.base import Module
-from sonnet.python.modules.base import Transposable
-from sonnet.python.modules.base_errors import DifferentGraphError
-from sonnet.python.modules.base_errors import Error
-from sonnet.python.modules.base_errors import IncompatibleShapeError
-from sonnet.python.modules.base_errors import ModuleInfoError
-from sonnet.python.modules.base_errors import NotConnectedError
-from sonnet.python.modules.base_errors import NotInitializedError
-from sonnet.python.modules.base_errors import NotSupportedError
-from sonnet.python.modules.base_errors import ParentNotBuiltError
-from sonnet.python.modules.base_errors import UnderspecifiedError
-from sonnet.python.modules.base_info import SONNET_COLLECTION_NAME
-from sonnet.python.modules.basic import AddBias
-from sonnet.python.modules.basic import BatchApply
-from sonnet.python.modules.basic import BatchFlatten
-from sonnet.python.modules.basic import BatchReshape
-from sonnet.python.modules.basic import FlattenTrailingDimensions
-from sonnet.python.modules.basic import Linear
-from sonnet.python.modules.basic import merge_leading_dims
-from sonnet.python.modules.basic import MergeDims
-from sonnet.python.modules.basic import SelectInput
-from sonnet.python.modules.basic import SliceByDim
-from sonnet.python.modules.basic import split_leading_dim
-from sonnet.python.modules.basic import TileByDim
-from sonnet.python.modules.basic import TrainableVariable
-from sonnet.python.modules.basic_rnn import DeepRNN
-from sonnet.python.modules.basic_rnn import ModelRNN
-from sonnet.python.modules.basic_rnn import VanillaRNN
-from sonnet.python.modules.batch_norm import BatchNorm
-from sonnet.python.modules.batch_norm_v2 import BatchNormV2
-from sonnet.python.modules.clip_gradient import clip_gradient
-from sonnet.python.modules.conv import CausalConv1D
-from sonnet.python.modules.conv import Conv1D
-from sonnet.python.modules.conv import Conv1DTranspose
-from sonnet.python.modules.conv import Conv2D
-from sonnet.python.modules.conv import Conv2DTranspose
-from sonnet.python.modules.conv import Conv3D
-from sonnet.python.modules.conv import Conv3DTranspose
-from sonnet.python.modules.conv import DepthwiseConv2D
-from sonnet.python.modules.conv import InPlaneConv2D
-from sonnet.python.modules.conv import SAME
-from sonnet.python.modules.conv import SeparableConv1D
-from sonnet.python.modules.conv import SeparableConv2D
-from sonnet.python.modules.conv import VALID
-from sonnet.python.modules.embed import Embed
-from sonnet.python.modules.gated_rnn import BatchNormLSTM
-from sonnet.python.modules.gated_rnn import Conv1DLSTM
-from sonnet.python.modules.gated_rnn import Conv2DLSTM
-from sonnet.python.modules.gated_rnn import GRU
-from sonnet.python.modules.gated_rnn import highway_core_with_recurrent_dropout
-from sonnet.python.modules.gated_rnn import HighwayCore
-from sonnet.python.modules.gated_rnn import LSTM
-from sonnet.python.modules.gated_rnn import lstm_with_recurrent_dropout
-from sonnet.python.modules.gated_rnn import lstm_with_zoneout
-from sonnet.python.modules.gated_rnn import LSTMState
-from sonnet.python.modules.layer_norm import LayerNorm
-from sonnet.python.modules.pondering_rnn import ACTCore
-from sonnet.python.modules.relational_memory import RelationalMemory
-from sonnet.python.modules.residual import Residual
-from sonnet.python.modules.residual import ResidualCore
-from sonnet.python.modules.residual import SkipConnectionCore
-from sonnet.python.modules.rnn_core import RNNCore
-from sonnet.python.modules.rnn_core import trainable_initial_state
-from sonnet.python.modules.rnn_core import TrainableInitialState
-from sonnet.python.modules.scale_gradient import scale_gradient
-from sonnet.python.modules.sequential import Sequential
-from sonnet.python.modules.spatial_transformer import AffineGridWarper
-from sonnet.python.modules.spatial_transformer import AffineWarpConstraints
-from sonnet.python.modules.spatial_transformer import GridWarper
-from sonnet.python.modules.util import check_initializers
-from sonnet.python.modules.util import check_partitioners
-from sonnet.python.modules.util import check_regularizers
-from sonnet.python.modules.util import custom_getter_router
-from sonnet.python.modules.util import format_variable_map
-from sonnet.python.modules.util import format_variables
-from sonnet.python.modules.util import get_normalized_variable_map
-from sonnet.python.modules.util import get_saver
-from sonnet.python.modules.util import get_variables_in_module
-from sonnet.python.modules.util import get_variables_in_scope
-from sonnet.python.modules.util import has_variable_scope
-from sonnet.python.modules.util import log_variables
-from sonnet.python.modules.util import reuse_variables
-from sonnet.python.modules.util import summarize_variables
-from sonnet.python.modules.util import variable_map_items
-from sonnet.python.ops import nest
-from sonnet.python.ops.initializers import restore_initializer
 
 __version__ = '1.23'
 
+_lazy_module = _LazyModule(__name__, __doc__)
+_lazy_module.__dict__.update(
+    (key, value) for key, value in globals().items()
+    if key != "_lazy_module")
+# Python 2 clears the globals of a module when it is garbage collected, which
+# would break the methods of `_LazyModule`.
+_lazy_module._eager_module = sys.modules[__name__]  # pylint: disable=protected-access
+sys.modules[__name__] = _lazy_module
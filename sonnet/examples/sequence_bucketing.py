@@ -0,0 +1,148 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Length-bucketed batching of variable length sequences.
+
+Padding every batch to the length of the longest sequence in the dataset wastes
+most of the computation when lengths vary widely. Grouping sequences of similar
+length into buckets and padding each batch only to the longest sequence in its
+bucket keeps the padding small. The lengths returned alongside each batch can
+be passed to `snt.length_aware_dynamic_rnn` so that the remaining padding is
+skipped as well.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import bisect
+
+# Dependency imports
+import numpy as np
+
+
+def split_on_token(token_ids, delimiter_id):
+  """Splits a flat list of token ids into sequences ending in `delimiter_id`.
+
+  This turns, for example, the output of `ptb_reader.ptb_raw_data` into a list
+  of sentences when `delimiter_id` is the id of `<eos>`.
+
+  Args:
+    token_ids: Iterable of integer token ids.
+    delimiter_id: Token id that terminates a sequence. It is kept as the last
+      element of each sequence.
+
+  Returns:
+    A list of lists of token ids. A trailing sequence without delimiter is
+    included as is.
+  """
+  sequences = []
+  current = []
+  for token_id in token_ids:
+    current.append(token_id)
+    if token_id == delimiter_id:
+      sequences.append(current)
+      current = []
+  if current:
+    sequences.append(current)
+  return sequences
+
+
+def geometric_bucket_boundaries(min_length, max_length, ratio=1.5):
+  """Returns bucket boundaries growing geometrically from `min_length`.
+
+  With geometric boundaries the padding within a bucket is at most a fixed
+  fraction (`ratio - 1`) of the sequence length.
+
+  Args:
+    min_length: Upper bound (inclusive) of the first bucket.
+    max_length: Upper bound (inclusive) of the last bucket.
+    ratio: Ratio between consecutive boundaries. Must be > 1.
+
+  Returns:
+    A sorted list of integer boundaries ending with `max_length`.
+
+  Raises:
+    ValueError: If `ratio` is not > 1 or `min_length` is not positive.
+  """
+  if ratio <= 1:
+    raise ValueError("ratio must be > 1, got {}.".format(ratio))
+  if min_length < 1:
+    raise ValueError("min_length must be positive, got {}.".format(min_length))
+  boundaries = []
+  boundary = float(min_length)
+  while boundary < max_length:
+    if not boundaries or int(boundary) > boundaries[-1]:
+      boundaries.append(int(boundary))
+    boundary *= ratio
+  boundaries.append(max_length)
+  return boundaries
+
+
+def bucket_by_length(sequences, batch_size, bucket_boundaries, pad_value=0,
+                     shuffle=True, seed=None, drop_remainder=False):
+  """Yields padded batches of sequences of similar length.
+
+  A sequence of length `l` goes in the first bucket whose boundary is `>= l`;
+  sequences longer than the last boundary go in an overflow bucket. Each batch
+  is padded to the length of its longest sequence.
+
+  Args:
+    sequences: List of sequences (lists or 1D arrays of token ids).
+    batch_size: Number of sequences per batch.
+    bucket_boundaries: Sorted list of integer bucket boundaries, e.g. from
+      `geometric_bucket_boundaries`.
+    pad_value: Value used to pad sequences.
+    shuffle: Whether to shuffle the sequences within each bucket and the order
+      of the batches.
+    seed: Optional seed for shuffling.
+    drop_remainder: Whether to drop the last, smaller batch of each bucket.
+
+  Yields:
+    Tuples `(batch, lengths)` where `batch` is an int32 array of shape
+    `[batch_size, padded_length]` and `lengths` an int32 array of shape
+    `[batch_size]`.
+
+  Raises:
+    ValueError: If `bucket_boundaries` is not sorted in increasing order.
+  """
+  if list(bucket_boundaries) != sorted(set(bucket_boundaries)):
+    raise ValueError("bucket_boundaries must be strictly increasing, got "
+                     "{}.".format(bucket_boundaries))
+  rng = np.random.RandomState(seed)
+
+  buckets = [[] for _ in range(len(bucket_boundaries) + 1)]
+  for sequence in sequences:
+    buckets[bisect.bisect_left(bucket_boundaries, len(sequence))].append(
+        sequence)
+
+  batches = []
+  for bucket in buckets:
+    if shuffle:
+      rng.shuffle(bucket)
+    for start in range(0, len(bucket), batch_size):
+      batch = bucket[start:start + batch_size]
+      if drop_remainder and len(batch) < batch_size:
+        continue
+      batches.append(batch)
+  if shuffle:
+    rng.shuffle(batches)
+
+  for batch in batches:
+    lengths = np.array([len(sequence) for sequence in batch], dtype=np.int32)
+    padded = np.full([len(batch), lengths.max()], pad_value, dtype=np.int32)
+    for i, sequence in enumerate(batch):
+      padded[i, :len(sequence)] = sequence
+    yield padded, lengths
@@ -0,0 +1,70 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for sonnet.examples.sequence_bucketing."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Dependency imports
+import numpy as np
+from sonnet.examples import sequence_bucketing
+import tensorflow as tf
+
+
+class SequenceBucketingTest(tf.test.TestCase):
+
+  def testSplitOnToken(self):
+    sequences = sequence_bucketing.split_on_token([1, 2, 0, 3, 0, 4], 0)
+    self.assertEqual(sequences, [[1, 2, 0], [3, 0], [4]])
+
+  def testGeometricBucketBoundaries(self):
+    self.assertEqual(
+        sequence_bucketing.geometric_bucket_boundaries(5, 20, ratio=2),
+        [5, 10, 20])
+    with self.assertRaises(ValueError):
+      sequence_bucketing.geometric_bucket_boundaries(5, 20, ratio=1)
+
+  def testBucketByLength(self):
+    lengths = [3, 9, 2, 15, 8, 4, 30, 1]
+    sequences = [list(range(1, l + 1)) for l in lengths]
+    batches = list(sequence_bucketing.bucket_by_length(
+        sequences, batch_size=2, bucket_boundaries=[4, 10, 20], seed=0))
+
+    seen_lengths = []
+    for batch, batch_lengths in batches:
+      self.assertEqual(batch.shape, (len(batch_lengths), max(batch_lengths)))
+      for row, length in zip(batch, batch_lengths):
+        np.testing.assert_array_equal(row[:length], np.arange(1, length + 1))
+        np.testing.assert_array_equal(row[length:], 0)
+      seen_lengths.extend(batch_lengths)
+      # All sequences of a batch fall in the same bucket.
+      buckets = {np.searchsorted([4, 10, 20], l) for l in batch_lengths}
+      self.assertEqual(len(buckets), 1)
+
+    self.assertEqual(sorted(seen_lengths), sorted(lengths))
+
+  def testDropRemainder(self):
+    sequences = [[1]] * 3 + [[1] * 8]
+    batches = list(sequence_bucketing.bucket_by_length(
+        sequences, batch_size=2, bucket_boundaries=[4], shuffle=False,
+        drop_remainder=True))
+    self.assertEqual(len(batches), 1)
+    self.assertEqual(batches[0][0].shape, (2, 1))
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -0,0 +1,139 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for the lazy imports of the top level `sonnet` package."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import subprocess
+import sys
+
+# Dependency imports
+import sonnet as snt
+import tensorflow as tf
+
+# Lists the modules imported by `import sonnet`, then after accessing
+# `snt.Linear`, and after accessing `snt.Conv2D`.
+_LIST_IMPORTED_MODULES = """
+import json
+import sys
+
+import sonnet as snt
+imported = [sorted(sys.modules)]
+snt.Linear
+imported.append(sorted(sys.modules))
+snt.Conv2D
+imported.append(sorted(sys.modules))
+print(json.dumps(imported))
+"""
+
+# Measures `import sonnet` and then the resolution of every public name, which
+# imports the same modules as an eager `import sonnet`, after TensorFlow has
+# been imported. Both are measured in the same process, so that their ratio
+# does not depend on the speed or load of the machine.
+_MEASURE_IMPORT = """
+import json
+import sys
+import time
+
+import tensorflow
+
+def sonnet_modules():
+  return [name for name in sys.modules if name.split(".")[0] == "sonnet"]
+
+start = time.time()
+import sonnet as snt
+lazy_seconds = time.time() - start
+lazy_modules = sonnet_modules()
+
+start = time.time()
+for name in dir(snt):
+  getattr(snt, name)
+eager_seconds = lazy_seconds + time.time() - start
+
+print(json.dumps({
+    "lazy_seconds": lazy_seconds,
+    "eager_seconds": eager_seconds,
+    "lazy_modules": lazy_modules,
+    "eager_modules": sonnet_modules(),
+}))
+"""
+
+# Maximum share of the time and of the number of modules of an eager import
+# that `import sonnet` may take.
+_MAX_IMPORT_SHARE = 0.25
+
+
+class LazyImportTest(tf.test.TestCase):
+
+  def _measure_import(self):
+    output = subprocess.check_output([sys.executable, "-c", _MEASURE_IMPORT])
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+  def testImportTime(self):
+    measurements = self._measure_import()
+
+    self.assertLess(
+        len(measurements["lazy_modules"]),
+        _MAX_IMPORT_SHARE * len(measurements["eager_modules"]))
+    self.assertLess(measurements["lazy_seconds"],
+                    _MAX_IMPORT_SHARE * measurements["eager_seconds"])
+
+  def _list_imported_modules(self):
+    output = subprocess.check_output(
+        [sys.executable, "-c", _LIST_IMPORTED_MODULES])
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+  def testModulesAreImportedOnFirstAccess(self):
+    after_import, after_linear, after_conv = self._list_imported_modules()
+
+    for module in ("sonnet.python.modules.basic",
+                   "sonnet.python.modules.conv",
+                   "sonnet.python.modules.gated_rnn",
+                   "sonnet.python.modules.spatial_transformer",
+                   "sonnet.python.modules.nets",
+                   "sonnet.python.custom_getters",
+                   "tensorflow.contrib"):
+      self.assertNotIn(module, after_import)
+
+    self.assertIn("sonnet.python.modules.basic", after_linear)
+    self.assertNotIn("sonnet.python.modules.conv", after_linear)
+    self.assertNotIn("sonnet.python.modules.nets", after_linear)
+
+    self.assertIn("sonnet.python.modules.conv", after_conv)
+    for module in ("sonnet.python.modules.gated_rnn",
+                   "sonnet.python.modules.spatial_transformer",
+                   "sonnet.python.custom_getters",
+                   "tensorflow.contrib"):
+      self.assertNotIn(module, after_conv)
+
+  def testAllNamesResolve(self):
+    for name in dir(snt):
+      self.assertIsNotNone(getattr(snt, name))
+
+  def testAttributeAccess(self):
+    from sonnet.python.modules import conv  # pylint: disable=g-import-not-at-top
+    self.assertIs(snt.Conv2D, conv.Conv2D)
+    self.assertIs(snt.nets.MLP, snt.nets.mlp.MLP)
+
+    with self.assertRaisesRegexp(AttributeError, "NotAModule"):
+      getattr(snt, "NotAModule")
+
+
+if __name__ == "__main__":
+  tf.test.main()
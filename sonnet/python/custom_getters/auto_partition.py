@@ -0,0 +1,145 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Custom getter assigning partitioners to large variables.
+
+## Usage
+
+Variables larger than `min_variable_bytes` are partitioned when they are
+created, so parameter servers can be scaled without passing `partitioners` to
+each module constructor.
+```
+import sonnet as snt
+import tensorflow as tf
+
+getter = snt.custom_getters.auto_partitioner(max_shard_bytes=16 << 20)
+with tf.variable_scope("", custom_getter=getter):
+  embed = snt.Embed(vocab_size=1000000, embed_dim=256)
+  lstm = snt.LSTM(hidden_size=2048)
+
+...
+snt.summarize_shards()
+```
+
+Partitioners given explicitly to a module, or to an enclosing
+`tf.variable_scope`, take precedence over the automatic ones.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Dependency imports
+import tensorflow as tf
+
+
+def _variable_bytes(shape, dtype):
+  """Returns the size in bytes of a variable, or `None` if it is not known."""
+  shape = tf.TensorShape(shape)
+  if not shape.is_fully_defined() or dtype == tf.string:
+    return None
+  return shape.num_elements() * dtype.size
+
+
+def plan_partitioner(shape, dtype=tf.float32, num_shards=None,
+                     max_shard_bytes=None, min_variable_bytes=256 << 10,
+                     axis=0):
+  """Returns a partitioner for a variable of the given shape, or `None`.
+
+  Args:
+    shape: Shape of the variable.
+    dtype: Type of the variable.
+    num_shards: Maximum number of shards. If `max_shard_bytes` is not given,
+      variables are split into this many shards, or one shard per slice along
+      `axis` if there are fewer slices.
+    max_shard_bytes: Maximum size of a shard in bytes. Variables are split into
+      as few shards as possible along `axis` to satisfy this bound.
+    min_variable_bytes: Variables smaller than this are not partitioned.
+    axis: Axis along which variables are partitioned.
+
+  Returns:
+    A partitioner, which is a function taking a shape and a dtype and returning
+    the number of shards along each axis, or `None` if the variable should not
+    be partitioned.
+
+  Raises:
+    ValueError: If neither `num_shards` nor `max_shard_bytes` is given, or if
+      either of them is not positive.
+  """
+  if num_shards is None and max_shard_bytes is None:
+    raise ValueError("At least one of num_shards and max_shard_bytes must be "
+                     "given.")
+  if num_shards is not None and num_shards < 1:
+    raise ValueError("num_shards must be positive, got {}.".format(num_shards))
+  if max_shard_bytes is not None and max_shard_bytes < 1:
+    raise ValueError("max_shard_bytes must be positive, got {}.".format(
+        max_shard_bytes))
+
+  shape = tf.TensorShape(shape)
+  dtype = tf.as_dtype(dtype).base_dtype
+  num_bytes = _variable_bytes(shape, dtype)
+  if (num_bytes is None or shape.ndims <= axis or
+      num_bytes < min_variable_bytes or shape[axis].value < 2):
+    return None
+
+  if max_shard_bytes is not None:
+    if num_bytes <= max_shard_bytes:
+      return None
+    return tf.variable_axis_size_partitioner(
+        max_shard_bytes=max_shard_bytes, axis=axis,
+        max_shards=num_shards)
+  if num_shards == 1:
+    return None
+  return tf.fixed_size_partitioner(min(num_shards, shape[axis].value),
+                                   axis=axis)
+
+
+def auto_partitioner(num_shards=None, max_shard_bytes=None,
+                     min_variable_bytes=256 << 10, axis=0):
+  """Creates a custom getter which partitions large variables.
+
+  The partitioner of each variable created without one is chosen by
+  `plan_partitioner` from its shape and dtype. Variables of unknown shape,
+  string variables and scalars are never partitioned.
+
+  Args:
+    num_shards: Maximum number of shards, e.g. the number of parameter servers.
+    max_shard_bytes: Maximum size of a shard in bytes.
+    min_variable_bytes: Variables smaller than this are not partitioned.
+    axis: Axis along which variables are partitioned.
+
+  Returns:
+    A custom getter, which is a function taking arguments
+    (getter, name, *args, **kwargs).
+
+  Raises:
+    ValueError: If neither `num_shards` nor `max_shard_bytes` is given, or if
+      either of them is not positive.
+  """
+  # Checks the arguments up front rather than when creating the first variable.
+  plan_partitioner([], num_shards=num_shards, max_shard_bytes=max_shard_bytes)
+
+  def _auto_partitioner(getter, name, *args, **kwargs):
+    """Gets a variable, partitioned if it is large."""
+    if kwargs.get("partitioner") is None and kwargs.get("shape") is not None:
+      kwargs["partitioner"] = plan_partitioner(
+          kwargs["shape"],
+          dtype=kwargs.get("dtype") or tf.float32,
+          num_shards=num_shards,
+          max_shard_bytes=max_shard_bytes,
+          min_variable_bytes=min_variable_bytes,
+          axis=axis)
+    return getter(name, *args, **kwargs)
+
+  return _auto_partitioner
@@ -0,0 +1,114 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Tests for sonnet.python.custom_getters.auto_partition."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Dependency imports
+from absl.testing import parameterized
+import mock
+import sonnet as snt
+import tensorflow as tf
+
+from tensorflow.python.ops import variables
+
+
+class AutoPartitionerTest(parameterized.TestCase, tf.test.TestCase):
+
+  @parameterized.parameters(
+      # (shape, num_shards, max_shard_bytes, expected_shards)
+      ([1000, 10], 4, None, 4),
+      ([3, 10000], 4, None, 3),
+      ([1000, 10], None, 10000, 4),
+      ([1000, 10], 2, 10000, 2),
+      ([1000, 10], None, 40000, None),
+      ([10], 4, None, None),
+      ([1, 10000], 4, None, None),
+      ([], 4, None, None),
+  )
+  def testPlanPartitioner(self, shape, num_shards, max_shard_bytes,
+                          expected_shards):
+    partitioner = snt.custom_getters.plan_partitioner(
+        shape, tf.float32, num_shards=num_shards,
+        max_shard_bytes=max_shard_bytes, min_variable_bytes=1000)
+    if expected_shards is None:
+      self.assertIsNone(partitioner)
+    else:
+      partitions = partitioner(tf.TensorShape(shape), tf.float32)
+      self.assertEqual(list(partitions),
+                       [expected_shards] + [1] * (len(shape) - 1))
+
+  def testInvalidArguments(self):
+    with self.assertRaises(ValueError):
+      snt.custom_getters.auto_partitioner()
+    with self.assertRaises(ValueError):
+      snt.custom_getters.auto_partitioner(num_shards=0)
+    with self.assertRaises(ValueError):
+      snt.custom_getters.auto_partitioner(max_shard_bytes=0)
+
+  def testEmbedAndLinear(self):
+    getter = snt.custom_getters.auto_partitioner(num_shards=3,
+                                                 min_variable_bytes=4096)
+    with tf.variable_scope("", custom_getter=getter):
+      embed = snt.Embed(vocab_size=100, embed_dim=16)
+      lin = snt.Linear(output_size=4)
+    outputs = lin(embed(tf.constant([[1, 2, 3]])))
+
+    self.assertIsInstance(embed.embeddings, variables.PartitionedVariable)
+    self.assertEqual(len(list(embed.embeddings)), 3)
+    self.assertEqual(embed.embeddings.get_shape(), [100, 16])
+    self.assertNotIsInstance(lin.w, variables.PartitionedVariable)
+    self.assertNotIsInstance(lin.b, variables.PartitionedVariable)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      self.assertEqual(session.run(outputs).shape, (1, 3, 4))
+
+  def testExplicitPartitionerTakesPrecedence(self):
+    getter = snt.custom_getters.auto_partitioner(num_shards=3,
+                                                 min_variable_bytes=0)
+    with tf.variable_scope("", custom_getter=getter):
+      lin = snt.Linear(output_size=8,
+                       partitioners={"w": tf.fixed_size_partitioner(2)})
+    lin(tf.ones([2, 6]))
+
+    self.assertEqual(len(list(lin.w)), 2)
+    self.assertEqual(len(list(lin.b)), 3)
+
+  def testSummarizeShards(self):
+    getter = snt.custom_getters.auto_partitioner(num_shards=2,
+                                                 min_variable_bytes=0)
+    with tf.variable_scope("", custom_getter=getter):
+      tf.get_variable("w", shape=[4, 3])
+      tf.get_variable("b", shape=[1])
+
+    rows = snt.format_shards(tf.global_variables(), join_lines=False)
+    self.assertEqual(
+        [row.split()[:4] for row in rows][1:],
+        [["b", "1", "float32", "1"], ["w", "4x3", "float32", "2"]])
+
+    with mock.patch.object(tf.logging, "info") as mocked_logging_info:
+      snt.summarize_shards()
+      logged = [args[0] % args[1:]
+                for args, _ in mocked_logging_info.call_args_list]
+    self.assertIn("Device '': 3 shards, 52 B", logged)
+    self.assertEqual(
+        logged[-1], "Total: 3 variables comprising 13 scalars, 52 B")
+
+
+if __name__ == "__main__":
+  tf.test.main()
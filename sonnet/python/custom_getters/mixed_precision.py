@@ -0,0 +1,290 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Custom getter and loss scaling for mixed-precision training.
+
+## Usage
+
+Modules constructed under `mixed_precision_getter` and connected to float16
+(or bfloat16) inputs compute in low precision, while their trainable variables
+are kept in float32. Loss scaling keeps small float16 gradients from flushing
+to zero.
+```
+import sonnet as snt
+from sonnet.python.custom_getters import mixed_precision
+import tensorflow as tf
+
+getter = mixed_precision.mixed_precision_getter()
+with tf.variable_scope("", custom_getter=getter):
+  model = snt.nets.ConvNet2D(...)
+
+logits = model(tf.cast(images, tf.float16))
+loss = tf.losses.sparse_softmax_cross_entropy(
+    labels, tf.cast(logits, tf.float32))
+
+loss_scale = mixed_precision.DynamicLossScale()
+optimizer = tf.train.MomentumOptimizer(0.1, 0.9)
+grads_and_vars = optimizer.compute_gradients(loss_scale.scale_loss(loss))
+train_op = loss_scale.apply_gradients(optimizer, grads_and_vars)
+```
+
+Modules which need float32 statistics, such as `snt.LayerNorm`, should be
+connected to float32 inputs; their variables are then created in float32 and
+returned unchanged by the getter.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import weakref
+
+# Dependency imports
+import tensorflow as tf
+
+
+_LOW_PRECISION_DTYPES = (tf.float16, tf.bfloat16)
+
+
+class _WeakRegistry(weakref.WeakKeyDictionary):
+
+  def __getitem__(self, key):
+    try:
+      return weakref.WeakKeyDictionary.__getitem__(self, key)
+    except KeyError:
+      new_value = collections.OrderedDict()
+      self[key] = new_value
+      return new_value
+
+
+def _device_scope(graph):
+  """Returns a hashable key identifying the current device scope of `graph`."""
+  # pylint: disable=protected-access
+  stack = graph._device_function_stack
+  if hasattr(stack, "peek_objs"):
+    # Newer versions of TensorFlow keep `_UserDeviceSpec`s in a `TraceableStack`.
+    return tuple(getattr(spec, "display_name", spec)
+                 for spec in stack.peek_objs())
+  return tuple(stack)
+  # pylint: enable=protected-access
+
+
+def mixed_precision_getter(dtypes=_LOW_PRECISION_DTYPES):
+  """Custom getter which keeps float32 master copies of low-precision weights.
+
+  When a trainable variable is requested with one of `dtypes`, the getter
+  creates it in float32 instead and returns it cast to the requested dtype.
+  The cast is created once per graph, control flow context and device scope,
+  so connecting a module several times reads each variable through the same
+  cast, while each tower of a multi-device model gets its own cast. Other
+  variables, such as float32 batch norm moving statistics, are returned
+  unchanged.
+
+  Args:
+    dtypes: Iterable of low-precision dtypes for which float32 master weights
+      are created. By default `tf.float16` and `tf.bfloat16`.
+
+  Returns:
+    A custom getter, which is a function taking arguments
+    (getter, name, *args, **kwargs).
+  """
+  dtypes = tuple(tf.as_dtype(dtype) for dtype in dtypes)
+  casts = _WeakRegistry()
+
+  def _mixed_precision_getter(getter, name, *args, **kwargs):
+    """Gets a float32 variable and returns it cast to the requested dtype."""
+    requested_dtype = tf.as_dtype(kwargs.get("dtype") or tf.float32)
+    if requested_dtype not in dtypes or not kwargs.get("trainable", True):
+      return getter(name, *args, **kwargs)
+
+    kwargs["dtype"] = tf.float32
+    variable = getter(name, *args, **kwargs)
+
+    graph = tf.get_default_graph()
+    # Casts created inside a while loop can not be used outside of it, and
+    # casts placed on the device of one tower should not be read by others.
+    key = (name, requested_dtype,
+           graph._get_control_flow_context(),  # pylint: disable=protected-access
+           _device_scope(graph))
+    graph_casts = casts[graph]
+    if key not in graph_casts:
+      graph_casts[key] = tf.cast(variable, requested_dtype)
+    return graph_casts[key]
+
+  return _mixed_precision_getter
+
+
+class DynamicLossScale(object):
+  """Dynamic loss scaling for mixed-precision training.
+
+  The loss is multiplied by `scale` before computing gradients, and the
+  gradients are divided by it before being applied. If any gradient is not
+  finite, the update is skipped and the scale is divided by `multiplier`.
+  After `increment_period` consecutive finite steps, the scale is multiplied by
+  `multiplier`.
+  """
+
+  def __init__(self, initial_scale=2.0 ** 15, increment_period=2000,
+               multiplier=2.0, name="dynamic_loss_scale"):
+    """Creates the loss scale variables.
+
+    Args:
+      initial_scale: Initial value of the loss scale.
+      increment_period: Number of consecutive steps with finite gradients
+        after which the scale is increased.
+      multiplier: Factor by which the scale is increased or decreased.
+      name: Name of the variable scope holding the loss scale variables.
+
+    Raises:
+      ValueError: If `initial_scale` is smaller than 1, `increment_period` is
+        not positive or `multiplier` is not greater than 1.
+    """
+    if initial_scale < 1:
+      raise ValueError("initial_scale must be at least 1.")
+    if increment_period < 1:
+      raise ValueError("increment_period must be positive.")
+    if multiplier <= 1:
+      raise ValueError("multiplier must be greater than 1.")
+
+    self._increment_period = increment_period
+    self._multiplier = multiplier
+
+    with tf.variable_scope(None, default_name=name):
+      self._scale = tf.get_variable(
+          "scale",
+          shape=[],
+          dtype=tf.float32,
+          initializer=tf.constant_initializer(initial_scale),
+          trainable=False)
+      self._num_good_steps = tf.get_variable(
+          "num_good_steps",
+          shape=[],
+          dtype=tf.int32,
+          initializer=tf.zeros_initializer(),
+          trainable=False)
+
+  @property
+  def scale(self):
+    """Returns the Variable holding the current loss scale."""
+    return self._scale
+
+  @property
+  def num_good_steps(self):
+    """Returns the Variable counting consecutive finite steps."""
+    return self._num_good_steps
+
+  def scale_loss(self, loss):
+    """Returns `loss` multiplied by the loss scale."""
+    return loss * tf.cast(self._scale, loss.dtype)
+
+  def unscale_gradients(self, grads_and_vars):
+    """Divides gradients by the loss scale.
+
+    Args:
+      grads_and_vars: List of `(gradient, variable)` pairs, as returned by
+        `tf.train.Optimizer.compute_gradients`.
+
+    Returns:
+      A list of `(gradient, variable)` pairs. `None` gradients are kept.
+    """
+    inverse_scale = 1.0 / self._scale
+    unscaled = []
+    for grad, var in grads_and_vars:
+      if grad is None:
+        unscaled.append((grad, var))
+      elif isinstance(grad, tf.IndexedSlices):
+        values = grad.values * tf.cast(inverse_scale, grad.values.dtype)
+        unscaled.append(
+            (tf.IndexedSlices(values, grad.indices, grad.dense_shape), var))
+      else:
+        unscaled.append((grad * tf.cast(inverse_scale, grad.dtype), var))
+    return unscaled
+
+  def all_finite(self, grads_and_vars):
+    """Returns a boolean Tensor, `True` if all gradients are finite."""
+    checks = []
+    for grad, _ in grads_and_vars:
+      if grad is None:
+        continue
+      if isinstance(grad, tf.IndexedSlices):
+        grad = grad.values
+      checks.append(tf.reduce_all(tf.is_finite(grad)))
+    if not checks:
+      return tf.constant(True)
+    return tf.reduce_all(tf.stack(checks))
+
+  def update(self, grads_finite):
+    """Returns an op adjusting the loss scale.
+
+    Args:
+      grads_finite: Boolean Tensor, `True` if the gradients of this step are
+        finite.
+
+    Returns:
+      An op updating `scale` and `num_good_steps`.
+    """
+    def increment():
+      num_good_steps = self._num_good_steps + 1
+      should_grow = num_good_steps >= self._increment_period
+      new_scale = tf.where(should_grow, self._scale * self._multiplier,
+                           tf.identity(self._scale))
+      # Do not grow the scale past the float32 range.
+      new_scale = tf.where(tf.is_finite(new_scale), new_scale,
+                           tf.identity(self._scale))
+      new_num_good_steps = tf.where(should_grow,
+                                    tf.zeros_like(num_good_steps),
+                                    num_good_steps)
+      return tf.group(tf.assign(self._scale, new_scale),
+                      tf.assign(self._num_good_steps, new_num_good_steps))
+
+    def decrement():
+      new_scale = tf.maximum(self._scale / self._multiplier, 1.0)
+      return tf.group(tf.assign(self._scale, new_scale),
+                      tf.assign(self._num_good_steps, 0))
+
+    return tf.cond(grads_finite, increment, decrement)
+
+  def apply_gradients(self, optimizer, grads_and_vars, global_step=None,
+                      name=None):
+    """Applies scaled gradients if they are finite, and updates the scale.
+
+    Args:
+      optimizer: A `tf.train.Optimizer`.
+      grads_and_vars: List of `(gradient, variable)` pairs computed from the
+        loss returned by `scale_loss`.
+      global_step: Optional Variable to increment when the update is applied.
+      name: Optional name for the returned operation.
+
+    Returns:
+      An op which applies the gradients when they are all finite and updates
+      the loss scale.
+    """
+    grads_and_vars = list(grads_and_vars)
+    grads_finite = self.all_finite(grads_and_vars)
+    unscaled = self.unscale_gradients(grads_and_vars)
+
+    # Optimizers create their slot variables, such as the moments of Adam, when
+    # applying gradients. They are created here, outside of `tf.cond`, so that
+    # their initializers do not depend on the condition.
+    optimizer._create_slots(  # pylint: disable=protected-access
+        [var for grad, var in unscaled if grad is not None])
+
+    def apply_fn():
+      return optimizer.apply_gradients(unscaled, global_step=global_step)
+
+    apply_op = tf.cond(grads_finite, apply_fn, tf.no_op)
+    with tf.control_dependencies([apply_op]):
+      update_op = self.update(grads_finite)
+    return tf.group(apply_op, update_op, name=name)
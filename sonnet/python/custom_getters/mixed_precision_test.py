@@ -0,0 +1,199 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+"""Tests for sonnet.python.custom_getters.mixed_precision."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Dependency imports
+from absl.testing import parameterized
+import numpy as np
+import sonnet as snt
+from sonnet.python.custom_getters import mixed_precision
+import tensorflow as tf
+
+
+class MixedPrecisionGetterTest(parameterized.TestCase, tf.test.TestCase):
+
+  def _assert_float32_variables(self, module):
+    variables = module.get_all_variables()
+    self.assertTrue(variables)
+    for variable in variables:
+      self.assertEqual(variable.dtype.base_dtype, tf.float32)
+
+  @parameterized.parameters(tf.float16, tf.bfloat16)
+  def testLinear(self, dtype):
+    getter = mixed_precision.mixed_precision_getter()
+    lin = snt.Linear(output_size=4, custom_getter=getter)
+    inputs = tf.ones([2, 3], dtype=dtype)
+    outputs = lin(inputs)
+
+    self.assertEqual(outputs.dtype, dtype)
+    self._assert_float32_variables(lin)
+
+    grads = tf.gradients(tf.reduce_sum(tf.cast(outputs, tf.float32)),
+                         lin.get_variables())
+    for grad in grads:
+      self.assertEqual(grad.dtype, tf.float32)
+
+  def testCastCachedAcrossConnections(self):
+    getter = mixed_precision.mixed_precision_getter()
+    conv = snt.Conv2D(output_channels=4, kernel_shape=3, custom_getter=getter)
+    inputs = tf.ones([2, 8, 8, 3], dtype=tf.float16)
+    conv(inputs)
+    conv(inputs)
+    conv(inputs)
+
+    self._assert_float32_variables(conv)
+    graph = tf.get_default_graph()
+    conv_ops = [op for op in graph.get_operations() if op.type == "Conv2D"]
+    self.assertEqual(len(conv_ops), 3)
+    filters = set(op.inputs[1] for op in conv_ops)
+    self.assertEqual(len(filters), 1)
+
+  def testCastPerDevice(self):
+    getter = mixed_precision.mixed_precision_getter()
+    lin = snt.Linear(output_size=4, custom_getter=getter)
+    inputs = tf.ones([2, 3], dtype=tf.float16)
+    casts = []
+    for device in ("/device:CPU:0", "/device:CPU:1"):
+      with tf.device(device):
+        lin(inputs)
+        casts.append(lin.w)
+        lin(inputs)
+        self.assertIs(lin.w, casts[-1])
+
+    self.assertIsNot(casts[0], casts[1])
+    self.assertEqual([cast.device for cast in casts],
+                     ["/device:CPU:0", "/device:CPU:1"])
+
+  def testLSTM(self):
+    getter = mixed_precision.mixed_precision_getter()
+    with tf.variable_scope("", custom_getter=getter):
+      lstm = snt.LSTM(hidden_size=8)
+    inputs = tf.ones([5, 2, 3], dtype=tf.float16)
+    initial_state = lstm.initial_state(2, dtype=tf.float16)
+    outputs, _ = tf.nn.dynamic_rnn(lstm, inputs, initial_state=initial_state,
+                                   time_major=True)
+
+    self.assertEqual(outputs.dtype, tf.float16)
+    self._assert_float32_variables(lstm)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      self.assertTrue(np.all(np.isfinite(session.run(outputs))))
+
+  @parameterized.parameters(True, False)
+  def testBatchNormV2(self, fused):
+    getter = mixed_precision.mixed_precision_getter()
+    with tf.variable_scope("", custom_getter=getter):
+      bn = snt.BatchNormV2(scale=True, fused=fused)
+    inputs = tf.ones([2, 4, 4, 3], dtype=tf.float16)
+    outputs = bn(inputs, is_training=True)
+
+    self.assertEqual(outputs.dtype, tf.float16)
+    self.assertEqual(bn.moving_mean.dtype.base_dtype, tf.float32)
+    self._assert_float32_variables(bn)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      session.run(outputs)
+
+  def testLayerNormUnchanged(self):
+    getter = mixed_precision.mixed_precision_getter()
+    with tf.variable_scope("", custom_getter=getter):
+      layer_norm = snt.LayerNorm()
+      layer_norm_16 = snt.LayerNorm()
+    outputs = layer_norm(tf.ones([2, 6], dtype=tf.float32))
+
+    self.assertEqual(outputs.dtype, tf.float32)
+    self._assert_float32_variables(layer_norm)
+    self.assertIn(layer_norm.gamma, tf.trainable_variables())
+
+    # LayerNorm statistics still need float32 inputs.
+    with self.assertRaises(snt.NotSupportedError):
+      layer_norm_16(tf.ones([2, 6], dtype=tf.float16))
+
+
+class DynamicLossScaleTest(parameterized.TestCase, tf.test.TestCase):
+
+  def testScaleLoss(self):
+    loss_scale = mixed_precision.DynamicLossScale(initial_scale=8.0)
+    scaled = loss_scale.scale_loss(tf.constant(2.0, dtype=tf.float16))
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      self.assertEqual(session.run(scaled), 16.0)
+
+  def testApplyGradients(self):
+    loss_scale = mixed_precision.DynamicLossScale(initial_scale=4.0,
+                                                  increment_period=2)
+    var = tf.get_variable("var", initializer=tf.constant([1.0, 1.0]))
+    grad = tf.placeholder(tf.float32, [2])
+    optimizer = tf.train.GradientDescentOptimizer(1.0)
+    train_op = loss_scale.apply_gradients(optimizer, [(grad, var)])
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+
+      session.run(train_op, feed_dict={grad: [4.0, 8.0]})
+      self.assertAllClose(session.run(var), [0.0, -1.0])
+      self.assertEqual(session.run(loss_scale.num_good_steps), 1)
+
+      session.run(train_op, feed_dict={grad: [0.0, 0.0]})
+      self.assertEqual(session.run(loss_scale.scale), 8.0)
+      self.assertEqual(session.run(loss_scale.num_good_steps), 0)
+
+      session.run(train_op, feed_dict={grad: [np.inf, 1.0]})
+      self.assertAllClose(session.run(var), [0.0, -1.0])
+      self.assertEqual(session.run(loss_scale.scale), 4.0)
+
+  @parameterized.named_parameters(
+      ("Momentum", lambda: tf.train.MomentumOptimizer(1.0, 0.9), ["momentum"]),
+      ("Adam", lambda: tf.train.AdamOptimizer(1.0), ["m", "v"]))
+  def testApplyGradientsWithSlots(self, optimizer_fn, slot_names):
+    loss_scale = mixed_precision.DynamicLossScale(initial_scale=4.0)
+    var = tf.get_variable("var", initializer=tf.constant([1.0, 1.0]))
+    grad = tf.placeholder(tf.float32, [2])
+    optimizer = optimizer_fn()
+    train_op = loss_scale.apply_gradients(optimizer, [(grad, var)])
+    slots = [optimizer.get_slot(var, name) for name in slot_names]
+    for slot in slots:
+      self.assertIsNotNone(slot)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+
+      session.run(train_op, feed_dict={grad: [4.0, 8.0]})
+      var_value, slot_values = session.run([var, slots])
+      self.assertTrue(np.all(var_value < 1.0))
+
+      # The update, including that of the slots, is skipped.
+      session.run(train_op, feed_dict={grad: [np.inf, 1.0]})
+      self.assertAllClose(session.run(var), var_value)
+      for slot, slot_value in zip(slots, slot_values):
+        self.assertAllClose(session.run(slot), slot_value)
+      self.assertEqual(session.run(loss_scale.scale), 2.0)
+
+  def testInvalidArguments(self):
+    with self.assertRaises(ValueError):
+      mixed_precision.DynamicLossScale(initial_scale=0.5)
+    with self.assertRaises(ValueError):
+      mixed_precision.DynamicLossScale(multiplier=1.0)
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -63,6 +63,17 @@ def _is_iterable(obj):
   return isinstance(obj, (list, tuple, dict))
 
 
+def _memoize(fn, cache):
+  """Returns `fn` with its results stored in the dict `cache`."""
+  def memoized_fn(arg):
+    try:
+      return cache[arg]
+    except KeyError:
+      result = cache[arg] = fn(arg)
+      return result
+  return memoized_fn
+
+
 def _graph_element_to_path(graph_element):
   """Returns the path of the given graph element.
 
@@ -223,18 +234,23 @@ def _nested_to_proto(nested_value, nested_proto, process_leafs,
     nested_proto.value = process_leafs(nested_value)
 
 
-def _module_info_to_proto(module_info, export_scope=None):
+def _module_info_to_proto(module_info, export_scope=None, path_cache=None):
   """Serializes `module_into`.
 
   Args:
     module_info: An instance of `ModuleInfo`.
     export_scope: Optional `string`. Name scope to remove.
+    path_cache: Optional dict from graph paths to stripped paths, shared
+      between calls with the same `export_scope`.
 
   Returns:
     An instance of `module_pb2.SonnetModule`.
   """
+  if path_cache is None:
+    path_cache = {}
   def strip_name_scope(name_scope):
     return ops.strip_name_scope(name_scope, export_scope)
+  strip_name_scope = _memoize(strip_name_scope, path_cache)
   def process_leafs(value):
     return strip_name_scope(_graph_element_to_path(value))
   module_info_def = module_pb2.SonnetModule(
@@ -256,6 +272,61 @@ def _module_info_to_proto(module_info, export_scope=None):
   return module_info_def
 
 
+# Cache of the namedtuple types created during deserialization, keyed by type
+# name and field names. Creating a namedtuple type compiles a new class, which
+# dominates the cost of deserializing large collections.
+_NAMEDTUPLE_TYPES = {}
+
+
+def _namedtuple_type(name, field_names):
+  """Returns a `collections.namedtuple` type, reusing previously created ones.
+
+  Args:
+    name: Name of the namedtuple type.
+    field_names: Iterable of field names. Fields are sorted, so that the same
+      type is returned independently of their order.
+
+  Returns:
+    A `collections.namedtuple` type.
+  """
+  key = (name, tuple(sorted(field_names)))
+  namedtuple_type = _NAMEDTUPLE_TYPES.get(key)
+  if namedtuple_type is None:
+    namedtuple_type = collections.namedtuple(name, key[1])
+    _NAMEDTUPLE_TYPES[key] = namedtuple_type
+  return namedtuple_type
+
+
+def _leaf_from_proto(value, process_leafs):
+  """Deserializes the leaf `value` of a `module_pb2.NestedData`."""
+  if not value:
+    return _UnserializableObject()
+  return process_leafs(value)
+
+
+def _children_from_proto(children, process_leafs):
+  """Deserializes a repeated field of `module_pb2.NestedData`.
+
+  Leaves are handled inline, so only nested containers recurse into
+  `_nested_from_proto`.
+
+  Args:
+    children: Iterable of `module_pb2.NestedData`.
+    process_leafs: A function to be applied to the leaf values of the nested
+      structure.
+
+  Returns:
+    A list of deserialized children.
+  """
+  values = []
+  for child in children:
+    if child.WhichOneof("one_of") == "value":
+      values.append(_leaf_from_proto(child.value, process_leafs))
+    else:
+      values.append(_nested_from_proto(child, process_leafs))
+  return values
+
+
 def _nested_from_proto(nested_proto, process_leafs):
   """Deserializes `nested_proto`.
 
@@ -274,30 +345,29 @@ def _nested_from_proto(nested_proto, process_leafs):
   if not isinstance(nested_proto, module_pb2.NestedData):
     raise base_errors.ModuleInfoError("Expected module_pb2.NestedData.")
 
-  if nested_proto.HasField("value"):
-    value = nested_proto.value
-    if not value:
-      value = _UnserializableObject()
-    else:
-      value = process_leafs(value)
-    return value
-  elif nested_proto.HasField("list"):
-    return [_nested_from_proto(child, process_leafs)
-            for child in nested_proto.list.list]
-  elif nested_proto.HasField("tuple"):
-    return tuple(_nested_from_proto(child, process_leafs)
-                 for child in nested_proto.tuple.list)
-  elif nested_proto.HasField("dict"):
-    return {name: _nested_from_proto(child, process_leafs)
-            for name, child in six.iteritems(nested_proto.dict.map)}
-  elif nested_proto.HasField("named_tuple"):
-    tmp_dict = {name: _nested_from_proto(child, process_leafs)
-                for name, child in six.iteritems(nested_proto.named_tuple.map)}
+  kind = nested_proto.WhichOneof("one_of")
+  if kind == "value":
+    return _leaf_from_proto(nested_proto.value, process_leafs)
+  elif kind == "list":
+    return _children_from_proto(nested_proto.list.list, process_leafs)
+  elif kind == "tuple":
+    return tuple(_children_from_proto(nested_proto.tuple.list, process_leafs))
+  elif kind == "dict":
+    proto_map = nested_proto.dict.map
+    names = list(proto_map)
+    values = _children_from_proto(
+        [proto_map[name] for name in names], process_leafs)
+    return dict(zip(names, values))
+  elif kind == "named_tuple":
+    proto_map = nested_proto.named_tuple.map
+    names = list(proto_map)
+    values = _children_from_proto(
+        [proto_map[name] for name in names], process_leafs)
     # Note that this needs to be a named tuple to work with existing usage.
-    NamedTuple = collections.namedtuple(  # pylint: disable=invalid-name
-        nested_proto.named_tuple.name, tmp_dict.keys())
-    return NamedTuple(**tmp_dict)
-  elif nested_proto.HasField("special_type"):
+    NamedTuple = _namedtuple_type(  # pylint: disable=invalid-name
+        nested_proto.named_tuple.name, names)
+    return NamedTuple(**dict(zip(names, values)))
+  elif kind == "special_type":
     if nested_proto.special_type.name not in _TO_PROTO_SPECIAL_TYPES:
       return _UnserializableObject()
     type_info = _TO_PROTO_SPECIAL_TYPES[nested_proto.special_type.name]
@@ -307,12 +377,17 @@ def _nested_from_proto(nested_proto, process_leafs):
         "Cannot deserialize a `ModuleInfo` protobuf with no fields.")
 
 
-def _module_info_from_proto(module_info_def, import_scope=None):
+def _module_info_from_proto(module_info_def, import_scope=None,
+                            leaf_cache=None):
   """Deserializes `module_info_def` proto.
 
   Args:
     module_info_def: An instance of `module_pb2.SonnetModule`.
     import_scope: Optional `string`. Name scope to use.
+    leaf_cache: Optional dict from serialized paths to graph elements, shared
+      between calls with the same `import_scope` and default graph. Tensors
+      are typically both the outputs of a module and the inputs of the next
+      one, so they are only looked up once.
 
   Returns:
     An instance of `ModuleInfo`.
@@ -322,10 +397,13 @@ def _module_info_from_proto(module_info_def, import_scope=None):
       if some of its fields are missing.
   """
   graph = tf.get_default_graph()
+  if leaf_cache is None:
+    leaf_cache = {}
   def prepend_name_scope(name_scope):
     return ops.prepend_name_scope(name_scope, import_scope)
   def process_leafs(name):
     return _path_to_graph_element(prepend_name_scope(name), graph)
+  process_leafs = _memoize(process_leafs, leaf_cache)
   connected_subgraphs = []
   module_info = ModuleInfo(
       module_name=module_info_def.module_name,
@@ -362,6 +440,72 @@ def _module_info_from_proto_safe(module_info_def, import_scope=None):
     return None
 
 
+def export_module_infos(graph=None, export_scope=None):
+  """Serializes the `SONNET_COLLECTION_NAME` collection of `graph`.
+
+  This is equivalent to serializing each `ModuleInfo` with the function
+  registered for `tf.train.export_meta_graph`, but the stripped names of
+  tensors shared between modules are only computed once.
+
+  Args:
+    graph: The graph to export from. Defaults to the default graph.
+    export_scope: Optional `string`. Name scope to remove. Only modules
+      within this name scope are exported.
+
+  Returns:
+    A list of `module_pb2.SonnetModule`.
+  """
+  graph = graph or tf.get_default_graph()
+  path_cache = {}
+  module_info_defs = []
+  if export_scope:
+    export_scope = export_scope.rstrip("/")
+  for module_info in graph.get_collection(SONNET_COLLECTION_NAME):
+    scope_name = module_info.scope_name
+    if export_scope and not (scope_name == export_scope or
+                             scope_name.startswith(export_scope + "/")):
+      continue
+    module_info_defs.append(
+        _module_info_to_proto(module_info, export_scope, path_cache))
+  return module_info_defs
+
+
+def import_module_infos(module_info_defs, graph=None, import_scope=None):
+  """Deserializes `module_info_defs` into the `SONNET_COLLECTION_NAME`.
+
+  Graph elements are looked up once for all modules, instead of once per
+  connection. As with `tf.train.import_meta_graph`, protos which cannot be
+  deserialized are logged and skipped.
+
+  Args:
+    module_info_defs: Iterable of `module_pb2.SonnetModule`, as returned by
+      `export_module_infos`.
+    graph: The graph to import into, which must contain the serialized
+      tensors. Defaults to the default graph.
+    import_scope: Optional `string`. Name scope to use.
+
+  Returns:
+    The list of imported `ModuleInfo`, also added to the
+    `SONNET_COLLECTION_NAME` collection of `graph`.
+  """
+  graph = graph or tf.get_default_graph()
+  leaf_cache = {}
+  module_infos = []
+  with graph.as_default():
+    for module_info_def in module_info_defs:
+      try:
+        module_info = _module_info_from_proto(
+            module_info_def, import_scope, leaf_cache)
+      except Exception as e:  # pylint: disable=broad-except
+        logging.warning(
+            "Error encountered when deserializing sonnet ModuleInfo:\n%s",
+            str(e))
+        continue
+      graph.add_to_collection(SONNET_COLLECTION_NAME, module_info)
+      module_infos.append(module_info)
+  return module_infos
+
+
 # `to_proto` is already wrapped into a try...except externally but
 # `from_proto` isn't. In order to minimize disruption, catch all the exceptions
 # happening during `from_proto` and just log them.
@@ -289,6 +289,65 @@ class ModuleInfoTest(tf.test.TestCase):
     _copy_default_graph()
     check(base_info._UnserializableObject)
 
+  def testModuleInfo_namedtuple_type_cached(self):
+    # pylint: disable=not-callable
+    tf.reset_default_graph()
+    dumb_a = DumbModule(name="dumb_a")
+    dumb_b = DumbModule(name="dumb_b")
+    ph_0 = tf.placeholder(dtype=tf.float32, shape=(1, 10,))
+    ph_1 = tf.placeholder(dtype=tf.float32, shape=(1, 10,))
+    dumb_a(DumbNamedTuple(ph_0, ph_1))
+    dumb_b(DumbNamedTuple(ph_1, ph_0))
+    _copy_default_graph()
+    sonnet_collection = tf.get_default_graph().get_collection(
+        base_info.SONNET_COLLECTION_NAME)
+    types = set()
+    for module_info in sonnet_collection:
+      connected_subgraph = module_info.connected_subgraphs[0]
+      types.add(type(connected_subgraph.inputs["inputs"]))
+      types.add(type(connected_subgraph.outputs))
+    self.assertEqual(len(types), 1)
+    self.assertEqual(types.pop()._fields, DumbNamedTuple._fields)
+
+  def testModuleInfo_bulk_export_import(self):
+    # pylint: disable=not-callable
+    tf.reset_default_graph()
+    dumb_a = DumbModule(name="dumb_a")
+    dumb_b = DumbModule(name="dumb_b")
+    ph_0 = tf.placeholder(dtype=tf.float32, shape=(1, 10,))
+    dumb_b(dumb_a({"a": ph_0, "b": [ph_0, (ph_0,)]}))
+    module_info_defs = base_info.export_module_infos()
+    self.assertEqual(len(module_info_defs), 2)
+
+    graph_def = tf.get_default_graph().as_graph_def()
+    with tf.Graph().as_default() as graph:
+      tf.import_graph_def(graph_def, name="")
+      module_infos = base_info.import_module_infos(module_info_defs)
+      self.assertEqual(module_infos,
+                       graph.get_collection(base_info.SONNET_COLLECTION_NAME))
+      self.assertEqual([m.module_name for m in module_infos],
+                       ["dumb_a", "dumb_b"])
+      outputs_a = module_infos[0].connected_subgraphs[0].outputs
+      inputs_b = module_infos[1].connected_subgraphs[0].inputs["inputs"]
+      self.assertIs(outputs_a["a"], inputs_b["a"])
+      self.assertIs(outputs_a["b"][1][0], inputs_b["b"][1][0])
+      self.assertIsInstance(inputs_b["b"][1], tuple)
+      self.assertEqual(outputs_a["a"].graph, graph)
+
+  def testModuleInfo_bulk_export_scope(self):
+    # pylint: disable=not-callable
+    tf.reset_default_graph()
+    ph_0 = tf.placeholder(dtype=tf.float32, shape=(1, 10,))
+    with tf.variable_scope("mlp"):
+      DumbModule(name="dumb")(ph_0)
+    with tf.variable_scope("mlp_1"):
+      DumbModule(name="dumb")(ph_0)
+
+    for export_scope in ("mlp", "mlp/"):
+      module_info_defs = base_info.export_module_infos(
+          export_scope=export_scope)
+      self.assertEqual([m.scope_name for m in module_info_defs], ["dumb"])
+
 
 if __name__ == "__main__":
   tf.test.main()
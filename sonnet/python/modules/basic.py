@@ -32,7 +32,20 @@ from sonnet.python.modules import base
 from sonnet.python.modules import util
 import tensorflow as tf
 
-nest = tf.contrib.framework.nest
+from tensorflow.python.util import nest
+
+
+def _is_inferable_shape(known_dims):
+  """Returns whether a reshape can infer a dimension from `known_dims`.
+
+  Args:
+    known_dims: List of the other dimensions of the reshaped tensor.
+
+  Returns:
+    `True` if all dimensions are known and non-zero, in which case the missing
+    dimension of a reshape can be given as -1.
+  """
+  return all(dim for dim in known_dims)
 
 
 def merge_leading_dims(array_or_tensor, n_dims=2):
@@ -72,6 +85,11 @@ def merge_leading_dims(array_or_tensor, n_dims=2):
 
     return tf.reshape(tensor, new_shape)
 
+  # Only leading dimensions are unknown, their product is inferred by a single
+  # reshape to a constant shape.
+  if _is_inferable_shape(tensor_shape_list[n_dims:]):
+    return tf.reshape(tensor, [-1] + tensor_shape_list[n_dims:])
+
   # Shape can't be inferred statically.
   tensor_shape = tf.shape(tensor)
   new_first_dim = tf.reduce_prod(tensor_shape[:n_dims], keepdims=True)
@@ -109,6 +127,13 @@ def split_leading_dim(tensor, inputs, n_dims=2):
     new_shape = input_shape_list[:n_dims] + tensor_shape_list[1:]
     return tf.reshape(tensor, new_shape)
 
+  # At most one of the dimensions is unknown, it is inferred by a single reshape
+  # to a constant shape.
+  new_shape = input_shape_list[:n_dims] + tensor_shape_list[1:]
+  if (new_shape.count(None) == 1 and
+      _is_inferable_shape([dim for dim in new_shape if dim is not None])):
+    return tf.reshape(tensor, [-1 if dim is None else dim for dim in new_shape])
+
   # Shape can't be inferred statically.
   dims_after_first = tf.shape(tensor)[1:]
   split_sizes = tf.shape(inputs)[:n_dims]
@@ -141,6 +166,7 @@ class Linear(base.AbstractModule, base.Transposable):
                partitioners=None,
                regularizers=None,
                custom_getter=None,
+               allow_many_batch_dims=False,
                name="linear"):
     """Constructs a Linear module.
 
@@ -168,6 +194,11 @@ class Linear(base.AbstractModule, base.Transposable):
         custom getters inside the module. If a dictionary, the keys
         correspond to regexes to match variable names. See the `tf.get_variable`
         documentation for information about the custom_getter API.
+      allow_many_batch_dims: If true, inputs may have any rank of at least 2,
+        all dimensions but the last being batch dimensions. Inputs of rank
+        greater than 2 have their batch dimensions merged around a single
+        matrix multiplication, as by `BatchApply`, so the module can be applied
+        to e.g. sequences directly.
       name: Name of the module.
 
     Raises:
@@ -179,6 +210,7 @@ class Linear(base.AbstractModule, base.Transposable):
     super(Linear, self).__init__(custom_getter=custom_getter, name=name)
     self._output_size = output_size
     self._use_bias = use_bias
+    self._allow_many_batch_dims = allow_many_batch_dims
     self._input_shape = None
     self._w = None
     self._b = None
@@ -203,54 +235,70 @@ class Linear(base.AbstractModule, base.Transposable):
     batch size may differ for each connection.
 
     Args:
-      inputs: A 2D Tensor of size [batch_size, input_size].
+      inputs: A 2D Tensor of size [batch_size, input_size], or with
+          `allow_many_batch_dims`, a Tensor of size
+          [batch_size_1, ..., batch_size_n, input_size].
 
     Returns:
-      A 2D Tensor of size [batch_size, output_size].
+      A Tensor of size [batch_size, output_size], or
+      [batch_size_1, ..., batch_size_n, output_size].
 
     Raises:
       base.IncompatibleShapeError: If the input is not a 2-D `Tensor` with
-          the size of the second dimension specified.
+          the size of the second dimension specified, or with
+          `allow_many_batch_dims`, if it has rank smaller than 2 or an
+          unspecified last dimension.
       base.IncompatibleShapeError: If reconnecting an already connected module
           into the graph, and the shape of the input is not compatible with
           previous inputs.
     """
     input_shape = tuple(inputs.get_shape().as_list())
 
-    if len(input_shape) != 2:
+    if self._allow_many_batch_dims:
+      if len(input_shape) < 2:
+        raise base.IncompatibleShapeError(
+            "{}: rank of shape must be at least 2 not: {}".format(
+                self.scope_name, len(input_shape)))
+    elif len(input_shape) != 2:
       raise base.IncompatibleShapeError(
           "{}: rank of shape must be 2 not: {}".format(
               self.scope_name, len(input_shape)))
 
-    if input_shape[1] is None:
+    if input_shape[-1] is None:
       raise base.IncompatibleShapeError(
           "{}: Input size must be specified at module build time".format(
               self.scope_name))
 
-    if self._input_shape is not None and input_shape[1] != self._input_shape[1]:
+    if (self._input_shape is not None and
+        input_shape[-1] != self._input_shape[-1]):
       raise base.IncompatibleShapeError(
           "{}: Input shape must be [batch_size, {}] not: [batch_size, {}]"
-          .format(self.scope_name, self._input_shape[1], input_shape[1]))
+          .format(self.scope_name, self._input_shape[-1], input_shape[-1]))
 
     self._input_shape = input_shape
     dtype = inputs.dtype
+    input_size = self._input_shape[-1]
 
     if "w" not in self._initializers:
-      self._initializers["w"] = create_linear_initializer(self._input_shape[1],
-                                                          dtype)
+      self._initializers["w"] = create_linear_initializer(input_size, dtype)
 
     if "b" not in self._initializers and self._use_bias:
-      self._initializers["b"] = create_bias_initializer(self._input_shape[1],
-                                                        dtype)
+      self._initializers["b"] = create_bias_initializer(input_size, dtype)
 
-    weight_shape = (self._input_shape[1], self.output_size)
+    weight_shape = (input_size, self.output_size)
     self._w = tf.get_variable("w",
                               shape=weight_shape,
                               dtype=dtype,
                               initializer=self._initializers["w"],
                               partitioner=self._partitioners.get("w", None),
                               regularizer=self._regularizers.get("w", None))
-    outputs = tf.matmul(inputs, self._w)
+    # The batch dimensions are merged with reshapes to constant shapes unless
+    # several of them are unknown.
+    n_batch_dims = len(input_shape) - 1
+    if n_batch_dims > 1:
+      outputs = tf.matmul(merge_leading_dims(inputs, n_batch_dims), self._w)
+    else:
+      outputs = tf.matmul(inputs, self._w)
 
     if self._use_bias:
       bias_shape = (self.output_size,)
@@ -262,6 +310,8 @@ class Linear(base.AbstractModule, base.Transposable):
                                 regularizer=self._regularizers.get("b", None))
       outputs += self._b
 
+    if n_batch_dims > 1:
+      outputs = split_leading_dim(outputs, inputs, n_batch_dims)
     return outputs
 
   @property
@@ -308,6 +358,11 @@ class Linear(base.AbstractModule, base.Transposable):
     """Returns `True` if bias Variable is present in the module."""
     return self._use_bias
 
+  @property
+  def allow_many_batch_dims(self):
+    """Returns `True` if the module accepts inputs with many batch dims."""
+    return self._allow_many_batch_dims
+
   @property
   def initializers(self):
     """Returns the initializers dictionary."""
@@ -340,6 +395,7 @@ class Linear(base.AbstractModule, base.Transposable):
                   initializers=self._initializers,
                   partitioners=self._partitioners,
                   regularizers=self._regularizers,
+                  allow_many_batch_dims=self._allow_many_batch_dims,
                   name=name)
 
   # Implements Transposable interface.
@@ -362,14 +418,244 @@ class Linear(base.AbstractModule, base.Transposable):
     """
     if name is None:
       name = self.module_name + "_transpose"
-    return Linear(output_size=lambda: self.input_shape[1],
+    return Linear(output_size=lambda: self.input_shape[-1],
                   use_bias=self._use_bias,
                   initializers=self._initializers,
                   partitioners=self._partitioners,
                   regularizers=self._regularizers,
+                  allow_many_batch_dims=self._allow_many_batch_dims,
                   name=name)
 
 
+class EnsembleLinear(base.AbstractModule):
+  """Stack of independent Linear modules, optionally including bias.
+
+  The weights and biases of `num_models` Linear modules are stacked along a
+  leading dimension, of shapes `[num_models, input_size, output_size]` and
+  `[num_models, output_size]`, so that all models are evaluated with a single
+  batched matrix multiplication. This is useful to train or evaluate many small
+  models, such as the members of an ensemble or of a hyperparameter sweep, in a
+  single graph.
+  """
+
+  def __init__(self,
+               output_size,
+               num_models,
+               use_bias=True,
+               initializers=None,
+               partitioners=None,
+               regularizers=None,
+               custom_getter=None,
+               name="ensemble_linear"):
+    """Constructs an EnsembleLinear module.
+
+    Args:
+      output_size: Output dimensionality of each model. `output_size` can be
+          either an integer or a callable, as for `Linear`.
+      num_models: Number of models.
+      use_bias: Whether to include bias parameters. Default `True`.
+      initializers: Optional dict containing initializers to initialize the
+          stacked weights (with key 'w') or biases (with key 'b'). The default
+          initializers are those of `Linear`, applied independently to each
+          model.
+      partitioners: Optional dict containing partitioners to partition
+          weights (with key 'w') or biases (with key 'b'). As a default, no
+          partitioners are used.
+      regularizers: Optional dict containing regularizers for the weights
+        (with key 'w') and the biases (with key 'b'). As a default, no
+        regularizers are used.
+      custom_getter: Callable or dictionary of callables to use as
+        custom getters inside the module. If a dictionary, the keys
+        correspond to regexes to match variable names. See the `tf.get_variable`
+        documentation for information about the custom_getter API.
+      name: Name of the module.
+
+    Raises:
+      KeyError: If `initializers`, `partitioners` or `regularizers` contains any
+        keys other than 'w' or 'b'.
+      TypeError: If any of the given initializers, partitioners or regularizers
+        are not callable.
+      ValueError: If `num_models` is smaller than 1.
+    """
+    super(EnsembleLinear, self).__init__(custom_getter=custom_getter,
+                                         name=name)
+    if num_models < 1:
+      raise ValueError("num_models must be at least 1, got {}.".format(
+          num_models))
+    self._output_size = output_size
+    self._num_models = num_models
+    self._use_bias = use_bias
+    self._input_shape = None
+    self._w = None
+    self._b = None
+    self.possible_keys = self.get_possible_initializer_keys(use_bias=use_bias)
+    self._initializers = util.check_initializers(
+        initializers, self.possible_keys)
+    self._partitioners = util.check_partitioners(
+        partitioners, self.possible_keys)
+    self._regularizers = util.check_regularizers(
+        regularizers, self.possible_keys)
+
+  @classmethod
+  def get_possible_initializer_keys(cls, use_bias=True):
+    return {"w", "b"} if use_bias else {"w"}
+
+  def _build(self, inputs):
+    """Connects the EnsembleLinear module into the graph.
+
+    Args:
+      inputs: A Tensor of size [num_models, batch_size, input_size], with the
+          inputs of each model, or a 2D Tensor of size
+          [batch_size, input_size], shared by all models.
+
+    Returns:
+      A Tensor of size [num_models, batch_size, output_size].
+
+    Raises:
+      base.IncompatibleShapeError: If the input is not a 2-D or 3-D `Tensor`
+          with the size of the last dimension specified, or if the leading
+          dimension of a 3-D input is not `num_models`.
+      base.IncompatibleShapeError: If reconnecting an already connected module
+          into the graph, and the shape of the input is not compatible with
+          previous inputs.
+    """
+    input_shape = tuple(inputs.get_shape().as_list())
+
+    if len(input_shape) not in (2, 3):
+      raise base.IncompatibleShapeError(
+          "{}: rank of shape must be 2 or 3 not: {}".format(
+              self.scope_name, len(input_shape)))
+
+    if len(input_shape) == 3 and input_shape[0] not in (None,
+                                                        self._num_models):
+      raise base.IncompatibleShapeError(
+          "{}: Input shape must be [{}, batch_size, input_size] not: {}"
+          .format(self.scope_name, self._num_models, input_shape))
+
+    if input_shape[-1] is None:
+      raise base.IncompatibleShapeError(
+          "{}: Input size must be specified at module build time".format(
+              self.scope_name))
+
+    if (self._input_shape is not None and
+        input_shape[-1] != self._input_shape[-1]):
+      raise base.IncompatibleShapeError(
+          "{}: Input size must be {} not: {}".format(
+              self.scope_name, self._input_shape[-1], input_shape[-1]))
+
+    self._input_shape = input_shape
+    dtype = inputs.dtype
+    input_size = self._input_shape[-1]
+    output_size = self.output_size
+
+    if "w" not in self._initializers:
+      self._initializers["w"] = create_linear_initializer(input_size, dtype)
+
+    if "b" not in self._initializers and self._use_bias:
+      self._initializers["b"] = create_bias_initializer(input_size, dtype)
+
+    weight_shape = (self._num_models, input_size, output_size)
+    self._w = tf.get_variable("w",
+                              shape=weight_shape,
+                              dtype=dtype,
+                              initializer=self._initializers["w"],
+                              partitioner=self._partitioners.get("w", None),
+                              regularizer=self._regularizers.get("w", None))
+    if len(input_shape) == 3:
+      outputs = tf.matmul(inputs, self._w)
+    else:
+      # Shared inputs are multiplied by the weights of all models at once,
+      # viewed as a single [input_size, num_models * output_size] matrix.
+      w = tf.reshape(tf.transpose(self._w, [1, 0, 2]),
+                     [input_size, self._num_models * output_size])
+      outputs = tf.reshape(tf.matmul(inputs, w),
+                           [-1, self._num_models, output_size])
+      outputs = tf.transpose(outputs, [1, 0, 2])
+    outputs.set_shape((self._num_models, input_shape[-2], output_size))
+
+    if self._use_bias:
+      bias_shape = (self._num_models, output_size)
+      self._b = tf.get_variable("b",
+                                shape=bias_shape,
+                                dtype=dtype,
+                                initializer=self._initializers["b"],
+                                partitioner=self._partitioners.get("b", None),
+                                regularizer=self._regularizers.get("b", None))
+      outputs += tf.expand_dims(self._b, 1)
+
+    return outputs
+
+  @property
+  def w(self):
+    """Returns the Variable containing the stacked weight matrices.
+
+    Returns:
+      Variable object containing the weights, from the most recent __call__.
+
+    Raises:
+      base.NotConnectedError: If the module has not been connected to the
+          graph yet, meaning the variables do not exist.
+    """
+    self._ensure_is_connected()
+    return self._w
+
+  @property
+  def b(self):
+    """Returns the Variable containing the stacked biases.
+
+    Returns:
+      Variable object containing the bias, from the most recent __call__.
+
+    Raises:
+      base.NotConnectedError: If the module has not been connected to the
+          graph yet, meaning the variables do not exist.
+      AttributeError: If the module does not use bias.
+    """
+    self._ensure_is_connected()
+    if not self._use_bias:
+      raise AttributeError(
+          "No bias Variable in EnsembleLinear Module when `use_bias=False`.")
+    return self._b
+
+  @property
+  def output_size(self):
+    """Returns the output size of each model."""
+    if callable(self._output_size):
+      self._output_size = self._output_size()
+    return self._output_size
+
+  @property
+  def num_models(self):
+    """Returns the number of models."""
+    return self._num_models
+
+  @property
+  def has_bias(self):
+    """Returns `True` if bias Variable is present in the module."""
+    return self._use_bias
+
+  @property
+  def input_shape(self):
+    """Returns shape of input `Tensor` passed at last call to `build`."""
+    self._ensure_is_connected()
+    return self._input_shape
+
+  @property
+  def initializers(self):
+    """Returns the initializers dictionary."""
+    return self._initializers
+
+  @property
+  def partitioners(self):
+    """Returns the partitioners dictionary."""
+    return self._partitioners
+
+  @property
+  def regularizers(self):
+    """Returns the regularizers dictionary."""
+    return self._regularizers
+
+
 def calculate_bias_shape(input_shape, bias_dims):
   """Calculate `bias_shape` based on the `input_shape` and `bias_dims`.
 
@@ -940,6 +1226,9 @@ class BatchApply(base.AbstractModule):
   and then the internal module can be applied. The result of that operation is
   reshaped such that its first dimensions are split to match the leading
   dimensions of the input.
+
+  Tensors whose shape is known statically, apart from at most the leading
+  dimensions, are merged and split with a single reshape each.
   """
 
   def __init__(self, module_or_op, n_dims=2, input_example_index=0,
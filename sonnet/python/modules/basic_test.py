@@ -387,6 +387,59 @@ class LinearTest(tf.test.TestCase, parameterized.TestCase):
     self.assertEqual(linear_transposed_output.get_shape(),
                      input_to_linear.get_shape())
 
+  @parameterized.named_parameters(
+      ("Rank3", [2, 3]),
+      ("Rank4", [2, 3, 5]),
+      ("UnknownBatchSize", [None, 3]),
+      ("UnknownBatchDims", [None, None]))
+  def testManyBatchDims(self, batch_shape):
+    inputs = tf.placeholder(tf.float32, shape=batch_shape + [self.in_size])
+    lin = snt.Linear(output_size=self.out_size, allow_many_batch_dims=True)
+    self.assertTrue(lin.allow_many_batch_dims)
+    outputs = lin(inputs)
+    self.assertEqual(outputs.get_shape().as_list(),
+                     batch_shape + [self.out_size])
+
+    # A single matrix multiplication, between reshapes to constant shapes when
+    # at most one batch dimension is unknown.
+    op_types = [op.type for op in tf.get_default_graph().get_operations()]
+    self.assertEqual(op_types.count("MatMul"), 1)
+    self.assertEqual(op_types.count("Reshape"), 2)
+    if batch_shape.count(None) <= 1:
+      self.assertNotIn("Shape", op_types)
+
+    # The module can still be connected to 2D inputs.
+    inputs_2d = tf.reshape(inputs, [-1, self.in_size])
+    outputs_2d = lin(inputs_2d)
+
+    inputs_shape = [2, 3] if batch_shape[0] is None else batch_shape
+    inputs_np = np.random.randn(*(inputs_shape + [self.in_size]))
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      outputs_np, outputs_2d_np = sess.run([outputs, outputs_2d],
+                                           feed_dict={inputs: inputs_np})
+    self.assertAllClose(outputs_np.reshape(outputs_2d_np.shape), outputs_2d_np)
+
+    # Transposes and clones also accept many batch dims.
+    self.assertEqual(lin.transpose()(outputs).get_shape().as_list(),
+                     batch_shape + [self.in_size])
+    self.assertEqual(lin.clone()(inputs).get_shape().as_list(),
+                     batch_shape + [self.out_size])
+
+  def testManyBatchDimsErrors(self):
+    lin = snt.Linear(output_size=self.out_size)
+    with self.assertRaisesRegexp(snt.IncompatibleShapeError,
+                                 "rank of shape must be 2"):
+      lin(tf.placeholder(tf.float32, shape=[2, 3, self.in_size]))
+
+    lin = snt.Linear(output_size=self.out_size, allow_many_batch_dims=True)
+    with self.assertRaisesRegexp(snt.IncompatibleShapeError,
+                                 "rank of shape must be at least 2"):
+      lin(tf.placeholder(tf.float32, shape=[self.in_size]))
+    with self.assertRaisesRegexp(snt.IncompatibleShapeError,
+                                 "Input size must be specified"):
+      lin(tf.placeholder(tf.float32, shape=[2, 3, None]))
+
   def testGradientColocation(self):
     """Tests a particular device (e.g. gpu, cpu) placement.
 
@@ -476,6 +529,57 @@ class LinearTest(tf.test.TestCase, parameterized.TestCase):
     self.assertEqual(outputs.dtype.base_dtype, dtype)
 
 
+class EnsembleLinearTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters(True, False)
+  def testMatchesIndependentModels(self, shared_inputs):
+    num_models, batch_size, input_size, output_size = 3, 5, 7, 4
+    if shared_inputs:
+      inputs_np = np.random.randn(batch_size, input_size)
+    else:
+      inputs_np = np.random.randn(num_models, batch_size, input_size)
+    inputs = tf.constant(inputs_np, dtype=tf.float32)
+    lin = snt.EnsembleLinear(output_size, num_models=num_models,
+                             initializers={"b": tf.random_normal_initializer()})
+    outputs = lin(inputs)
+
+    self.assertEqual(lin.w.get_shape().as_list(),
+                     [num_models, input_size, output_size])
+    self.assertEqual(lin.b.get_shape().as_list(), [num_models, output_size])
+    self.assertEqual(outputs.get_shape().as_list(),
+                     [num_models, batch_size, output_size])
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      w, b, outputs = session.run([lin.w, lin.b, outputs])
+
+    for i in range(num_models):
+      model_inputs = inputs_np if shared_inputs else inputs_np[i]
+      self.assertAllClose(outputs[i], model_inputs.dot(w[i]) + b[i],
+                          atol=1e-5)
+
+  def testSingleMatMul(self):
+    lin = snt.EnsembleLinear(4, num_models=10)
+    lin(tf.placeholder(tf.float32, [None, 10, 7]))
+    matmuls = [op for op in tf.get_default_graph().get_operations()
+               if op.type in ("MatMul", "BatchMatMul", "BatchMatMulV2")]
+    self.assertEqual(len(matmuls), 1)
+
+  def testErrors(self):
+    with self.assertRaises(ValueError):
+      snt.EnsembleLinear(4, num_models=0)
+    lin = snt.EnsembleLinear(4, num_models=3, use_bias=False)
+    with self.assertRaises(snt.IncompatibleShapeError):
+      lin(tf.zeros([2, 3, 5]))
+    with self.assertRaises(snt.IncompatibleShapeError):
+      lin(tf.zeros([3, 2, 5, 1]))
+    lin(tf.zeros([3, 2, 5]))
+    with self.assertRaises(snt.IncompatibleShapeError):
+      lin(tf.zeros([2, 6]))
+    with self.assertRaises(AttributeError):
+      lin.b  # pylint: disable=pointless-statement
+
+
 class AddBiasTest(tf.test.TestCase, parameterized.TestCase):
 
   BATCH_SIZE = 11
@@ -1115,6 +1219,28 @@ class MergeLeadingDimsTest(tf.test.TestCase, parameterized.TestCase):
     output = basic.merge_leading_dims(input_, 3)
     self.assertEqual(output.shape.as_list(), expected_output_shape)
 
+  @parameterized.parameters(
+      ([None, 5, 7, 13], [None, 13]),
+      ([3, None, 7, 13], [None, 13]),
+  )
+  def testUnknownLeadingDimsSingleReshape(self, input_shape,
+                                          expected_output_shape):
+    """Tests that unknown leading dimensions do not require a dynamic shape."""
+    input_ = tf.placeholder(tf.float32, shape=input_shape)
+    output = basic.merge_leading_dims(input_, 3)
+    self.assertEqual(output.shape.as_list(), expected_output_shape)
+    split = basic.split_leading_dim(output, input_, 3)
+    self.assertEqual(split.shape.as_list(), input_shape)
+
+    op_types = [op.type for op in tf.get_default_graph().get_operations()]
+    self.assertEqual(op_types.count("Reshape"), 2)
+    self.assertNotIn("Shape", op_types)
+
+    input_np = np.random.randn(*[dim or 2 for dim in input_shape])
+    with self.test_session() as sess:
+      self.assertAllClose(sess.run(split, feed_dict={input_: input_np}),
+                          input_np)
+
 
 class BatchFlattenTest(tf.test.TestCase, parameterized.TestCase):
 
@@ -1280,6 +1406,23 @@ class BatchApplyTest(tf.test.TestCase, parameterized.TestCase):
     self.assertEqual(merge_linear.get_variables(), ())
     self.assertEqual(merge_tanh.get_variables(), ())
 
+  def testLinearWithManyBatchDims(self):
+    in_shape = [2, None, 3, 4]
+    inputs = tf.placeholder(tf.float32, shape=in_shape)
+    linear = snt.Linear(5, allow_many_batch_dims=True)
+    outputs = snt.BatchApply(module_or_op=linear, n_dims=2)(inputs)
+    self.assertEqual(outputs.get_shape().as_list(), [2, None, 3, 5])
+    # Only the requested number of leading dimensions is merged.
+    self.assertEqual(linear.input_shape, (None, 3, 4))
+
+    reference = tf.reshape(linear(tf.reshape(inputs, [-1, 4])), [2, -1, 3, 5])
+    inputs_np = np.random.randn(2, 3, 3, 4)
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      outputs_np, reference_np = sess.run([outputs, reference],
+                                          feed_dict={inputs: inputs_np})
+    self.assertAllClose(outputs_np, reference_np)
+
   def testOverTwoDims(self):
     hidden_size = 42
     in_shape = (3, 4, 5, 6)
@@ -32,6 +32,9 @@ from tensorflow.python.layers import utils
 from tensorflow.python.training import moving_averages
 
 
+_RENORM_CLIPPING_KEYS = frozenset(("rmin", "rmax", "dmax"))
+
+
 def create_beta_initializer():
   """Returns a default initializer for the `beta` in batch norm."""
   return tf.zeros_initializer()
@@ -139,6 +142,7 @@ class BatchNorm(base.AbstractModule):
                decay_rate=0.999, eps=1e-3, initializers=None,
                partitioners=None, regularizers=None,
                update_ops_collection="update_ops", fused=False,
+               zero_debias=False, renorm=False, renorm_clipping=None,
                name="batch_norm"):
     """Constructs a BatchNorm module.
 
@@ -175,6 +179,18 @@ class BatchNorm(base.AbstractModule):
         some slowdown, as the feed-forward of the network is now blocked. By
         default, `tf.GraphKeys.UPDATE_OPS`.
       fused: Use nn.fused_batch_norm if True, nn.batch_normalization otherwise.
+      zero_debias: If `True`, the moving averages are corrected for the bias
+        towards their initial value in the first updates, as in
+        `tf.train.ExponentialMovingAverage`.
+      renorm: If `True`, uses batch renormalization at training time: the
+        batch statistics are corrected towards the moving averages, so that
+        the output does not depend on the composition of small or non-i.i.d.
+        batches (https://arxiv.org/abs/1702.03275).
+      renorm_clipping: Optional dict mapping the keys `rmin`, `rmax` and `dmax`
+        to bounds of the batch renormalization corrections. The scale
+        correction is clipped to `[rmin, rmax]`, `rmin` defaulting to
+        `1 / rmax`, and the offset correction to `[-dmax, dmax]`. Corrections
+        are not clipped by default.
       name: Name of the module.
 
     Raises:
@@ -182,8 +198,11 @@ class BatchNorm(base.AbstractModule):
         `moving_mean` or `moving_variance`.
       KeyError: If `partitioners` or `regularizers` contains any keys other
         than `gamma` or `beta`.
+      KeyError: If `renorm_clipping` contains any keys other than `rmin`,
+        `rmax` or `dmax`.
       TypeError: If any of the given initializers, partitioners or regularizers
         are not callable.
+      base.NotSupportedError: If both `renorm` and `fused` are `True`.
     """
     super(BatchNorm, self).__init__(name=name)
 
@@ -194,6 +213,17 @@ class BatchNorm(base.AbstractModule):
     self._eps = eps
     self._update_ops_collection = update_ops_collection
     self._fused = fused
+    self._zero_debias = zero_debias
+    self._renorm = renorm
+    self._renorm_clipping = dict(renorm_clipping or {})
+
+    if not _RENORM_CLIPPING_KEYS.issuperset(self._renorm_clipping):
+      raise KeyError("Invalid renorm_clipping keys {}, allowed keys are "
+                     "{}.".format(sorted(self._renorm_clipping),
+                                  sorted(_RENORM_CLIPPING_KEYS)))
+    if renorm and fused:
+      raise base.NotSupportedError(
+          "Batch renormalization is not supported by the fused batch norm.")
 
     self._initializers = util.check_initializers(
         initializers, self.POSSIBLE_INITIALIZER_KEYS)
@@ -287,8 +317,30 @@ class BatchNorm(base.AbstractModule):
       could be `True`. Returns `None` when `is_training=False`.
     """
 
+    def build_debias_variables():
+      """Returns the biased averages and update counts of the statistics."""
+      return [
+          tf.get_variable(
+              "{}_{}".format(variable.op.name.split("/")[-1], suffix),
+              shape=variable.get_shape(),
+              dtype=variable.dtype.base_dtype,
+              initializer=tf.zeros_initializer(),
+              trainable=False)
+          for variable in (self._moving_mean, self._moving_variance)
+          for suffix in ("biased", "local_step")]
+
     def build_update_ops():
       """Builds the exponential moving average update ops."""
+      if self._zero_debias:
+        mean_biased, mean_step, variance_biased, variance_step = (
+            debias_variables)
+        update_mean_op = _zero_debiased_moving_average(
+            self._moving_mean, mean, self._decay_rate, mean_biased, mean_step,
+            name="update_moving_mean").op
+        update_variance_op = _zero_debiased_moving_average(
+            self._moving_variance, variance, self._decay_rate, variance_biased,
+            variance_step, name="update_moving_variance").op
+        return update_mean_op, update_variance_op
 
       update_mean_op = moving_averages.assign_moving_average(
           variable=self._moving_mean,
@@ -313,6 +365,9 @@ class BatchNorm(base.AbstractModule):
     # `is_training` is unknown.
     is_training_const = utils.constant_value(is_training)
     if is_training_const is None or is_training_const:
+      # The debiasing variables are created outside of the `tf.cond`, as their
+      # initializers cannot be inside a control flow construct.
+      debias_variables = build_debias_variables() if self._zero_debias else None
       update_mean_op, update_variance_op = utils.smart_cond(
           is_training,
           build_update_ops,
@@ -397,8 +452,47 @@ class BatchNorm(base.AbstractModule):
     variance = tf.reshape(variance, variance_shape)
     return batch_norm_op, mean, variance
 
+  def _build_renorm_correction(self, mean, variance, is_training):
+    """Builds the batch renormalization corrections of the batch statistics.
+
+    Args:
+      mean: The batch mean, of the same dtype as the input.
+      variance: The batch variance, of the same dtype as the input.
+      is_training: Boolean to indicate if the corrections should be applied.
+        Can be a Tensor.
+
+    Returns:
+      Tuple of `(r, d)`, the scale and offset corrections of the normalized
+      input, which are constants with respect to gradients.
+    """
+    dtype = mean.dtype.base_dtype
+    moving_mean = tf.cast(self._moving_mean, dtype)
+    moving_std = tf.sqrt(tf.cast(self._moving_variance, dtype) + self._eps)
+
+    r = tf.sqrt(variance + self._eps) / moving_std
+    d = (mean - moving_mean) / moving_std
+    rmax = self._renorm_clipping.get("rmax")
+    rmin = self._renorm_clipping.get("rmin")
+    if rmin is None and rmax is not None:
+      rmin = 1.0 / rmax
+    if rmax is not None:
+      r = tf.minimum(r, rmax)
+    if rmin is not None:
+      r = tf.maximum(r, rmin)
+    dmax = self._renorm_clipping.get("dmax")
+    if dmax is not None:
+      d = tf.clip_by_value(d, -dmax, dmax)
+    r = tf.stop_gradient(r, name="renorm_r")
+    d = tf.stop_gradient(d, name="renorm_d")
+
+    return utils.smart_cond(
+        is_training,
+        lambda: (r, d),
+        lambda: (tf.ones_like(r), tf.zeros_like(d)),
+    )
+
   def _batch_norm_op(self, input_batch, mean, variance, use_batch_stats,
-                     stat_dtype):
+                     stat_dtype, renorm_correction=None):
     """Creates a batch normalization op.
 
     It uses the tf.nn.batch_normalization op by default and the
@@ -411,6 +505,8 @@ class BatchNorm(base.AbstractModule):
       use_batch_stats: A bool value that indicates whether the operation should
          use the batch statistics.
       stat_dtype: TensorFlow datatype used for the moving mean and variance.
+      renorm_correction: Optional tuple `(r, d)` of batch renormalization
+        corrections, applied as `(normalized * r + d) * gamma + beta`.
 
     Returns:
       A batch normalization operation.
@@ -425,12 +521,19 @@ class BatchNorm(base.AbstractModule):
           input_batch,
           self._moving_mean, self._moving_variance, use_batch_stats)
     else:
+      offset, scale = self._beta, self._gamma
+      if renorm_correction is not None:
+        r, d = renorm_correction
+        if scale is not None:
+          r, d = r * scale, d * scale
+        offset = d if offset is None else offset + d
+        scale = r
       batch_norm_op = tf.nn.batch_normalization(
           input_batch,
           mean,
           variance,
-          self._beta,
-          self._gamma,
+          offset,
+          scale,
           self._eps,
           name="batch_norm")
       # We'll echo the supplied mean and variance so that they can also be used
@@ -535,9 +638,15 @@ class BatchNorm(base.AbstractModule):
 
     # Sets up optional gamma and beta parameters
     self._build_scale_offset(dtype)
+    # Sets up the optional batch renormalization.
+    renorm_correction = None
+    if self._renorm:
+      renorm_correction = self._build_renorm_correction(mean, variance,
+                                                        is_training)
     # Sets up the batch normalization op.
     out, mean, variance = self._batch_norm_op(input_batch, mean, variance,
-                                              use_batch_stats, stat_dtype)
+                                              use_batch_stats, stat_dtype,
+                                              renorm_correction)
     # Sets up the update op.
     update_ops = self._build_update_ops(mean, variance, is_training)
 
@@ -594,3 +703,27 @@ class BatchNorm(base.AbstractModule):
           "Batch normalization doesn't have a scale, so no gamma")
     else:
       return self._gamma
+
+
+def _zero_debiased_moving_average(variable, value, decay, biased, local_step,
+                                  name):
+  """Assigns the zero-debiased moving average of `value` to `variable`.
+
+  Args:
+    variable: The moving average variable.
+    value: The new value.
+    decay: The decay rate of the moving average.
+    biased: Variable of the shape of `variable`, holding the biased moving
+      average.
+    local_step: Variable of the shape of `variable`, holding the number of
+      updates.
+    name: Name scope of the ops.
+
+  Returns:
+    The assigned value of `variable`.
+  """
+  with tf.name_scope(name):
+    value = tf.cast(value, biased.dtype.base_dtype)
+    biased = tf.assign_sub(biased, (biased - value) * (1.0 - decay))
+    local_step = tf.assign_add(local_step, tf.ones_like(local_step))
+    return tf.assign(variable, biased / (1.0 - tf.pow(decay, local_step)))
@@ -0,0 +1,360 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Folding of batch normalization into preceding linear layers.
+
+At inference time batch normalization with moving statistics is an affine
+transform per channel, so it can be merged into the kernel and bias of the
+`snt.Linear` or convolutional layer that feeds it. `fold_batch_norm` reads the
+trained values of such a network and returns an equivalent `snt.Sequential`
+without any `snt.BatchNorm` / `snt.BatchNormV2` modules.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import functools
+
+# Dependency imports
+import numpy as np
+from sonnet.python.modules import base
+from sonnet.python.modules import basic
+from sonnet.python.modules import batch_norm
+from sonnet.python.modules import batch_norm_v2
+from sonnet.python.modules import conv
+from sonnet.python.modules import layer_norm
+from sonnet.python.modules import sequential
+from sonnet.python.modules.nets import convnet
+from sonnet.python.modules.nets import mlp
+import tensorflow as tf
+
+
+_FOLDABLE_TYPES = (basic.Linear, conv.Conv1D, conv.Conv2D, conv.Conv3D)
+_BATCH_NORM_TYPES = (batch_norm.BatchNorm, batch_norm_v2.BatchNormV2)
+_NORMALIZATION_TYPES = (layer_norm.GroupNorm, layer_norm.LayerNorm)
+
+
+def _unwrap_batch_norm(layer):
+  """Returns the batch norm module behind `layer`, or None."""
+  if isinstance(layer, functools.partial):
+    layer = layer.func
+  return layer if isinstance(layer, _BATCH_NORM_TYPES) else None
+
+
+def _check_not_normalization(layer, force=False):
+  """Raises if `layer` is a normalization module other than batch norm.
+
+  Args:
+    layer: A layer, optionally wrapped in `functools.partial`.
+    force: Whether `layer` is known to be a normalization module, such as the
+      modules built by the `normalization_ctor` of `snt.nets.ConvNet2D`.
+
+  Raises:
+    snt.NotSupportedError: If `layer` is a normalization module, and not a batch
+      norm module.
+  """
+  if _unwrap_batch_norm(layer) is not None:
+    return
+  if isinstance(layer, functools.partial):
+    layer = layer.func
+  if force or isinstance(layer, _NORMALIZATION_TYPES):
+    raise base.NotSupportedError(
+        "Normalization module {} of type {} is not supported, only batch "
+        "norm modules are.".format(
+            getattr(layer, "module_name", layer), type(layer).__name__))
+
+
+def _flatten_layers(module):
+  """Expands `module` into a flat list of layers applied in sequence.
+
+  `snt.nets.ConvNet2D`, `snt.nets.MLP` and `snt.Sequential` are expanded
+  recursively into their layers, batch norm modules and activations; any other
+  callable is returned as a single layer.
+
+  Args:
+    module: The module to expand.
+
+  Returns:
+    A list of callables.
+
+  Raises:
+    snt.NotConnectedError: If `module` is a `snt.nets.ConvNet2D` that has not
+      been connected to the graph.
+    snt.NotSupportedError: If `module` is a `snt.nets.ConvNet2DTranspose`, or
+      contains normalization modules other than batch norm modules, such as
+      `snt.LayerNorm` or the modules built by a custom `normalization_ctor`,
+      which hold variables and cannot be kept as is.
+  """
+  if isinstance(module, convnet.ConvNet2DTranspose):
+    raise base.NotSupportedError(
+        "Folding into transposed convolutions is not supported.")
+
+  if isinstance(module, convnet.ConvNet2D):
+    normalizers = module.normalization_modules
+    for normalizer in normalizers:
+      _check_not_normalization(normalizer, force=True)
+    final_index = len(module.layers) - 1
+    layers = []
+    for i, layer in enumerate(module.layers):
+      layers.append(layer)
+      if i != final_index or module.activate_final:
+        if normalizers:
+          layers.append(normalizers[i])
+        layers.append(module.activation)
+    return layers
+
+  if isinstance(module, mlp.MLP):
+    final_index = len(module.layers) - 1
+    layers = []
+    for i, layer in enumerate(module.layers):
+      layers.append(layer)
+      if i != final_index or module.activate_final:
+        layers.append(module.activation)
+    return layers
+
+  if isinstance(module, sequential.Sequential):
+    layers = []
+    for layer in module.layers:
+      layers.extend(_flatten_layers(layer))
+    return layers
+
+  _check_not_normalization(module)
+  return [module]
+
+
+def _is_foldable(layer):
+  """Returns whether `layer` can be rebuilt with folded values."""
+  # Subclasses can take other constructor arguments, such as the int8 weights
+  # of `snt.QuantizedConv2D`, so only the exact types are rebuilt.
+  return type(layer) in _FOLDABLE_TYPES
+
+
+def _check_stateless(layer):
+  """Raises if `layer` is a module holding variables that cannot be folded.
+
+  Such layers, for example depthwise, separable or transposed convolutions,
+  would otherwise be kept as is and share their variables with the original
+  module.
+
+  Args:
+    layer: A layer that is neither foldable nor a batch norm module, optionally
+      wrapped in `functools.partial`.
+
+  Raises:
+    snt.NotConnectedError: If `layer` is a module that is not connected.
+    snt.NotSupportedError: If `layer` is a module holding variables.
+  """
+  if isinstance(layer, functools.partial):
+    layer = layer.func
+  if (isinstance(layer, base.AbstractModule) and
+      layer.get_all_variables(tf.GraphKeys.GLOBAL_VARIABLES)):
+    raise base.NotSupportedError(
+        "Layer {} of type {} holds variables and cannot be folded.".format(
+            layer.module_name, type(layer).__name__))
+
+
+def _output_channel_axis(layer):
+  """Returns `(rank, channel_axis)` of the output of a foldable layer."""
+  if isinstance(layer, basic.Linear):
+    return 2, 1
+  rank = len(layer.data_format)
+  channel_axis = 1 if layer.data_format.startswith("NC") else rank - 1
+  return rank, channel_axis
+
+
+def _check_channel_axis(layer, bn):
+  """Checks that `bn` normalizes the output channels of `layer`."""
+  rank, channel_axis = _output_channel_axis(layer)
+
+  if isinstance(bn, batch_norm_v2.BatchNormV2):
+    bn_channel_axis = bn._channel_index  # pylint: disable=protected-access
+    matches = bn_channel_axis == channel_axis
+  else:
+    axis = bn._axis  # pylint: disable=protected-access
+    reduced = set(range(rank - 1) if axis is None else axis)
+    matches = set(range(rank)) - reduced == {channel_axis}
+
+  if not matches:
+    raise base.NotSupportedError(
+        "Batch norm module {} does not normalize the output channels of "
+        "{}.".format(bn.module_name, layer.module_name))
+
+
+def _batch_norm_fetches(bn):
+  """Returns the tensors holding the inference statistics of `bn`."""
+  # pylint: disable=protected-access
+  fetches = {"mean": bn.moving_mean, "variance": bn.moving_variance}
+  if bn._scale:
+    fetches["gamma"] = bn.gamma
+  if bn._offset:
+    fetches["beta"] = bn.beta
+  # pylint: enable=protected-access
+  return fetches
+
+
+def _fold(layer_values, bn_values, eps):
+  """Folds batch norm statistics into a kernel and a bias.
+
+  Args:
+    layer_values: Dict with the kernel "w" and, optionally, the bias "b".
+    bn_values: Dict with "mean", "variance" and optionally "gamma" and
+      "beta" values of the batch norm module.
+    eps: The epsilon of the batch norm module.
+
+  Returns:
+    A tuple `(w, b)` of the folded kernel and bias.
+  """
+  w = layer_values["w"]
+  num_channels = w.shape[-1]
+  b = layer_values.get("b", np.zeros([num_channels], dtype=w.dtype))
+
+  mean = np.reshape(bn_values["mean"], [-1])
+  variance = np.reshape(bn_values["variance"], [-1])
+  scale = 1.0 / np.sqrt(variance + eps)
+  if "gamma" in bn_values:
+    scale *= np.reshape(bn_values["gamma"], [-1])
+
+  folded_b = (b - mean) * scale
+  if "beta" in bn_values:
+    folded_b += np.reshape(bn_values["beta"], [-1])
+
+  # The output channels are the last dimension of Linear and Conv kernels.
+  folded_w = w * scale
+  return folded_w.astype(w.dtype), folded_b.astype(w.dtype)
+
+
+def _rebuild(layer, w, b, name):
+  """Returns a copy of `layer` whose variables are initialized to `w`, `b`."""
+  initializers = {"w": tf.constant_initializer(w)}
+  if b is not None:
+    initializers["b"] = tf.constant_initializer(b)
+
+  if isinstance(layer, basic.Linear):
+    return basic.Linear(output_size=layer.output_size,
+                        use_bias=b is not None,
+                        initializers=initializers,
+                        name=name)
+
+  # pylint: disable=protected-access
+  kwargs = {"sparse_mask": True} if layer._sparse_mask else {}
+  return type(layer)(output_channels=layer.output_channels,
+                     kernel_shape=layer._kernel_shape,
+                     stride=layer._stride,
+                     rate=layer._rate,
+                     padding=layer._padding,
+                     use_bias=b is not None,
+                     initializers=initializers,
+                     mask=layer._mask,
+                     data_format=layer._data_format,
+                     name=name,
+                     **kwargs)
+  # pylint: enable=protected-access
+
+
+def fold_batch_norm(module, session, name=None):
+  """Returns an inference copy of `module` with batch norm folded away.
+
+  Every `snt.BatchNorm` or `snt.BatchNormV2` that directly follows a
+  `snt.Linear`, `snt.Conv1D`, `snt.Conv2D` or `snt.Conv3D` is merged into the
+  kernel and bias of that layer using its moving statistics:
+
+    w' = w * gamma / sqrt(moving_variance + eps)
+    b' = (b - moving_mean) * gamma / sqrt(moving_variance + eps) + beta
+
+  The result matches `module` connected with `is_training=False` and
+  `test_local_stats=False`. Note that `snt.ConvNet2D` defaults to
+  `test_local_stats=True`, which uses batch statistics instead.
+
+  Supported inputs are a connected `snt.nets.ConvNet2D`, `snt.nets.MLP` or a
+  `snt.Sequential` of the above, of foldable layers, of batch norm modules
+  (optionally wrapped in `functools.partial` to bind `is_training`) and of
+  arbitrary stateless callables such as activations, which are kept as is.
+  Subclasses of the foldable layers, such as `snt.QuantizedConv2D`, and other
+  modules holding variables are not supported.
+
+  Args:
+    module: The trained module to fold. It must have been connected to the
+      graph.
+    session: A `tf.Session` used to read the trained variable values.
+    name: Optional name of the returned module. Defaults to the name of
+      `module` with "_folded" appended.
+
+  Returns:
+    An unconnected `snt.Sequential` whose layers are initialized with constant
+    values, so it must be connected and initialized before use.
+
+  Raises:
+    snt.NotConnectedError: If `module` or any of its layers is not connected.
+    snt.NotSupportedError: If a batch norm module does not directly follow a
+      foldable layer, does not normalize its output channels, or if `module`
+      contains transposed convolutions, other normalization modules or other
+      modules holding variables.
+  """
+  if name is None:
+    name = getattr(module, "module_name", "module") + "_folded"
+
+  layers = _flatten_layers(module)
+
+  # Pair up every foldable layer with the batch norm that follows it, if any.
+  plan = []
+  i = 0
+  while i < len(layers):
+    layer = layers[i]
+    bn = _unwrap_batch_norm(layer)
+    if bn is not None:
+      raise base.NotSupportedError(
+          "Batch norm module {} does not directly follow a Linear or "
+          "convolutional layer.".format(bn.module_name))
+
+    if _is_foldable(layer):
+      next_bn = None
+      if i + 1 < len(layers):
+        next_bn = _unwrap_batch_norm(layers[i + 1])
+      if next_bn is not None:
+        _check_channel_axis(layer, next_bn)
+        i += 1
+      plan.append((layer, next_bn))
+    else:
+      _check_stateless(layer)
+      plan.append((layer, None))
+    i += 1
+
+  # Read every value needed in a single call to the session.
+  fetches = []
+  for layer, bn in plan:
+    if _is_foldable(layer):
+      layer_fetches = {"w": layer.w}
+      if layer.has_bias:
+        layer_fetches["b"] = layer.b
+      bn_fetches = _batch_norm_fetches(bn) if bn is not None else {}
+      fetches.append((layer_fetches, bn_fetches))
+    else:
+      fetches.append(({}, {}))
+  values = session.run(fetches)
+
+  folded_layers = []
+  for (layer, bn), (layer_values, bn_values) in zip(plan, values):
+    if not _is_foldable(layer):
+      folded_layers.append(layer)
+      continue
+
+    if bn is None:
+      w, b = layer_values["w"], layer_values.get("b")
+    else:
+      w, b = _fold(layer_values, bn_values, bn._eps)  # pylint: disable=protected-access
+    folded_layers.append(_rebuild(layer, w, b, name=layer.module_name))
+
+  return sequential.Sequential(folded_layers, name=name)
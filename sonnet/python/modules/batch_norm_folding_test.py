@@ -0,0 +1,222 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for sonnet.python.modules.batch_norm_folding."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import functools
+
+# Dependency imports
+from absl.testing import parameterized
+import numpy as np
+import sonnet as snt
+import tensorflow as tf
+
+
+class FoldBatchNormTest(parameterized.TestCase, tf.test.TestCase):
+
+  def _randomize_variables(self, session):
+    """Assigns random positive values to every global variable."""
+    session.run(tf.global_variables_initializer())
+    for variable in tf.global_variables():
+      shape = variable.get_shape().as_list()
+      value = np.random.uniform(0.5, 1.5, shape).astype(np.float32)
+      variable.load(value, session)
+
+  def _check_equivalent(self, module, inputs, outputs):
+    with self.test_session() as session:
+      self._randomize_variables(session)
+      folded = snt.fold_batch_norm(module, session)
+      folded_outputs = folded(inputs)
+      session.run(tf.variables_initializer(folded.get_all_variables()))
+
+      expected, actual = session.run([outputs, folded_outputs])
+
+    self.assertAllClose(expected, actual, rtol=1e-4, atol=1e-4)
+    return folded
+
+  @parameterized.parameters(True, False)
+  def testConvNet2D(self, activate_final):
+    inputs = tf.constant(np.random.randn(2, 8, 8, 3).astype(np.float32))
+    net = snt.nets.ConvNet2D(output_channels=[4, 5, 6],
+                             kernel_shapes=[3],
+                             strides=[1, 2, 1],
+                             paddings=[snt.SAME],
+                             activate_final=activate_final,
+                             use_batch_norm=True,
+                             use_bias=False,
+                             batch_norm_config={"scale": True})
+    outputs = net(inputs, is_training=False, test_local_stats=False)
+
+    folded = self._check_equivalent(net, inputs, outputs)
+
+    folded_types = [type(layer) for layer in folded.layers]
+    self.assertNotIn(snt.BatchNorm, folded_types)
+    self.assertEqual(folded_types.count(snt.Conv2D), 3)
+
+  def testNoBatchNorm(self):
+    inputs = tf.constant(np.random.randn(2, 8, 8, 3).astype(np.float32))
+    net = snt.nets.ConvNet2D(output_channels=[4, 5],
+                             kernel_shapes=[3],
+                             strides=[1],
+                             paddings=[snt.SAME])
+    outputs = net(inputs)
+
+    self._check_equivalent(net, inputs, outputs)
+
+  @parameterized.parameters(
+      (snt.BatchNorm, {}),
+      (snt.BatchNorm, {"scale": True, "offset": False}),
+      (snt.BatchNormV2, {"scale": True}),
+      (snt.BatchNormV2, {"fused": True}),
+  )
+  def testSequentialConv(self, bn_class, bn_kwargs):
+    inputs = tf.constant(np.random.randn(2, 10, 10, 3).astype(np.float32))
+    bn = bn_class(**bn_kwargs)
+    seq = snt.Sequential([
+        snt.Conv2D(output_channels=4, kernel_shape=3),
+        functools.partial(bn, is_training=False, test_local_stats=False),
+        tf.nn.relu,
+        snt.Conv2D(output_channels=2, kernel_shape=1),
+    ])
+    outputs = seq(inputs)
+
+    folded = self._check_equivalent(seq, inputs, outputs)
+    self.assertEqual(len(folded.layers), 3)
+
+  def testSequentialLinearAndMLP(self):
+    inputs = tf.constant(np.random.randn(4, 7).astype(np.float32))
+    bn = snt.BatchNormV2(scale=True)
+    seq = snt.Sequential([
+        snt.nets.MLP(output_sizes=[6, 5]),
+        functools.partial(bn, is_training=False),
+        tf.nn.relu,
+        snt.Linear(output_size=3, use_bias=False),
+    ])
+    outputs = seq(inputs)
+
+    self._check_equivalent(seq, inputs, outputs)
+
+  def testConv1D(self):
+    inputs = tf.constant(np.random.randn(2, 10, 3).astype(np.float32))
+    bn = snt.BatchNorm(scale=True)
+    seq = snt.Sequential([
+        snt.Conv1D(output_channels=4, kernel_shape=3, rate=2),
+        functools.partial(bn, is_training=False, test_local_stats=False),
+    ])
+    outputs = seq(inputs)
+
+    self._check_equivalent(seq, inputs, outputs)
+
+  def testLeadingBatchNormRaises(self):
+    inputs = tf.constant(np.random.randn(4, 7).astype(np.float32))
+    bn = snt.BatchNorm()
+    seq = snt.Sequential([
+        functools.partial(bn, is_training=False),
+        snt.Linear(output_size=3),
+    ])
+    seq(inputs)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      with self.assertRaisesRegexp(snt.NotSupportedError,
+                                   "does not directly follow"):
+        snt.fold_batch_norm(seq, session)
+
+  def testWrongAxisRaises(self):
+    inputs = tf.constant(np.random.randn(2, 10, 10, 3).astype(np.float32))
+    bn = snt.BatchNorm(axis=[0, 1])
+    seq = snt.Sequential([
+        snt.Conv2D(output_channels=4, kernel_shape=3),
+        functools.partial(bn, is_training=False, test_local_stats=False),
+    ])
+    seq(inputs)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      with self.assertRaisesRegexp(snt.NotSupportedError,
+                                   "output channels"):
+        snt.fold_batch_norm(seq, session)
+
+  @parameterized.parameters(snt.LayerNorm,
+                            functools.partial(snt.GroupNorm, groups=2))
+  def testOtherNormalizationRaises(self, normalization_ctor):
+    inputs = tf.constant(np.random.randn(2, 10, 10, 4).astype(np.float32))
+    net = snt.nets.ConvNet2D(output_channels=[4, 4],
+                             kernel_shapes=[3],
+                             strides=[1],
+                             paddings=[snt.SAME],
+                             use_batch_norm=True,
+                             normalization_ctor=normalization_ctor)
+    net(inputs)
+    seq = snt.Sequential([snt.Conv2D(output_channels=4, kernel_shape=3),
+                          normalization_ctor()])
+    seq(inputs)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      for module in (net, seq):
+        with self.assertRaisesRegexp(snt.NotSupportedError,
+                                     "only batch norm"):
+          snt.fold_batch_norm(module, session)
+        with self.assertRaisesRegexp(snt.NotSupportedError,
+                                     "only batch norm"):
+          snt.factorize_low_rank(module, session, rank=2)
+
+  @parameterized.named_parameters(
+      ("DepthwiseConv2D",
+       lambda: snt.DepthwiseConv2D(channel_multiplier=1, kernel_shape=3)),
+      ("SeparableConv2D",
+       lambda: snt.SeparableConv2D(output_channels=3, channel_multiplier=1,
+                                   kernel_shape=3)),
+      ("QuantizedConv2D",
+       lambda: snt.QuantizedConv2D(
+           w_quantized=np.ones([3, 3, 3, 3], dtype=np.int8),
+           w_scale=np.ones([3], dtype=np.float32))))
+  def testUnfoldableLayersRaise(self, module_fn):
+    inputs = tf.constant(np.random.randn(2, 10, 10, 3).astype(np.float32))
+    bn = snt.BatchNorm()
+    seq = snt.Sequential([
+        module_fn(),
+        functools.partial(bn, is_training=False, test_local_stats=False),
+        tf.nn.relu,
+    ])
+    seq(inputs)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      with self.assertRaisesRegexp(snt.NotSupportedError,
+                                   "cannot be folded"):
+        snt.fold_batch_norm(seq, session)
+      with self.assertRaisesRegexp(snt.NotSupportedError,
+                                   "cannot be folded"):
+        snt.fold_batch_norm(snt.Sequential(seq.layers[:1]), session)
+
+  def testNotConnectedRaises(self):
+    net = snt.nets.ConvNet2D(output_channels=[4],
+                             kernel_shapes=[3],
+                             strides=[1],
+                             paddings=[snt.SAME])
+
+    with self.test_session() as session:
+      with self.assertRaises(snt.NotConnectedError):
+        snt.fold_batch_norm(net, session)
+
+
+if __name__ == "__main__":
+  tf.test.main()
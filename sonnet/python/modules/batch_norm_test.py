@@ -347,6 +347,65 @@ class BatchNormTest(parameterized.TestCase, tf.test.TestCase):
           (input_v - mm3) / np.sqrt(mv3 + bn._eps),
           out_v)
 
+  @parameterized.named_parameters(
+      ("PythonBool", False),
+      ("Placeholder", True),
+  )
+  def testZeroDebias(self, use_placeholder):
+    """Zero-debiased moving averages are not biased by their initial value."""
+    v, _, inputs = self._get_inputs()
+    is_training = tf.placeholder(tf.bool) if use_placeholder else True
+    feed_dict = {is_training: True} if use_placeholder else {}
+    bn = snt.BatchNorm(decay_rate=0.9, zero_debias=True)
+    bn(inputs, is_training=is_training)
+    update_ops = tf.get_collection(tf.GraphKeys.UPDATE_OPS)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      if use_placeholder:
+        sess.run(update_ops, feed_dict={is_training: False})
+        self.assertAllClose(np.zeros([1, 6]), sess.run(bn.moving_mean))
+      for _ in range(2):
+        sess.run(update_ops, feed_dict=feed_dict)
+        # The inputs have the same statistics at each step, which the moving
+        # averages are then equal to.
+        self.assertAllClose(np.reshape(v, [1, 6]), sess.run(bn.moving_mean))
+        self.assertAllClose(np.zeros([1, 6]), sess.run(bn.moving_variance))
+
+  def testRenorm(self):
+    """Batch renormalization corrects the batch statistics at training time."""
+    input_v = np.random.randn(16, 5).astype(np.float32)
+    inputs = tf.constant(input_v)
+    bn = snt.BatchNorm(renorm=True, update_ops_collection=None)
+    bn_clipped = snt.BatchNorm(renorm=True,
+                               renorm_clipping={"rmax": 1.0, "dmax": 0.0},
+                               update_ops_collection=None)
+
+    out = bn(inputs, is_training=True)
+    out_test = bn(inputs, is_training=False)
+    out_clipped = bn_clipped(inputs, is_training=True)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      out_v, out_test_v, out_clipped_v = sess.run(
+          [out, out_test, out_clipped])
+
+    # The moving averages are initialized to a mean of 0 and a variance of 1,
+    # so the batch statistics are corrected back to these.
+    self.assertAllClose(input_v / np.sqrt(1.0 + bn._eps), out_v,
+                        rtol=1e-4, atol=1e-4)
+    # Without corrections, the output is normalized with the batch statistics.
+    mean, variance = input_v.mean(axis=0), input_v.var(axis=0)
+    expected = (input_v - mean) / np.sqrt(variance + bn._eps)
+    self.assertAllClose(expected, out_test_v, rtol=1e-4, atol=1e-4)
+    self.assertAllClose(expected, out_clipped_v, rtol=1e-4, atol=1e-4)
+
+  def testInvalidUpdateOptions(self):
+    with self.assertRaises(snt.NotSupportedError):
+      snt.BatchNorm(renorm=True, fused=True)
+    with self.assertRaisesRegexp(KeyError, "Invalid renorm_clipping keys"):
+      snt.BatchNorm(renorm=True, renorm_clipping={"r_max": 3.0})
+
   def testSharing(self):
     """Check that the correct number of variables are made when sharing."""
 
@@ -23,6 +23,9 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
+import hashlib
+
 # Dependency imports
 
 import numpy as np
@@ -36,6 +39,12 @@ import tensorflow as tf
 from tensorflow.python.layers import utils
 from tensorflow.python.training import moving_averages
 
+# Collective ops are only available from TensorFlow 1.8.
+try:
+  from tensorflow.python.ops import collective_ops  # pylint: disable=g-import-not-at-top
+except ImportError:
+  collective_ops = None
+
 
 def create_beta_initializer():
   """Returns a default initializer for the `beta` in batch norm."""
@@ -57,6 +66,54 @@ def create_variance_initializer():
   return tf.ones_initializer()
 
 
+def _collective_instance_key(scope_name, step, direction):
+  """Returns a collective instance key which is stable across processes.
+
+  Collective instance keys must be equal for the same reduction in all
+  replicas, including replicas built in other processes or in a different
+  order, so they are derived from the scope name of the module rather than
+  allocated in graph construction order.
+
+  Args:
+    scope_name: Scope name of the module.
+    step: Index of the synchronized connection of the module.
+    direction: "forward" or "backward".
+
+  Returns:
+    A positive integer smaller than `2 ** 31`.
+  """
+  digest = hashlib.sha256(
+      "{}:{}:{}".format(scope_name, step, direction).encode("utf-8"))
+  return int(digest.hexdigest()[:8], 16) % (2 ** 31 - 1) + 1
+
+
+def _cross_replica_sum(tensor, num_replicas, group_key, instance_keys):
+  """Sums `tensor` over all replicas in a single collective reduction.
+
+  Args:
+    tensor: A Tensor, of the same shape in all replicas.
+    num_replicas: Number of replicas taking part in the reduction.
+    group_key: Collective group key shared by the replicas.
+    instance_keys: Tuple of the collective instance keys of the forward and
+      backward reductions.
+
+  Returns:
+    A Tensor holding the sum of `tensor` over replicas. Its gradient is the sum
+    of the gradients of all replicas.
+  """
+  forward_key, backward_key = instance_keys
+
+  @tf.custom_gradient
+  def all_sum(x):
+    def grad(dy):
+      return collective_ops.all_reduce(
+          dy, num_replicas, group_key, backward_key, "Add", "Id")
+    return collective_ops.all_reduce(
+        x, num_replicas, group_key, forward_key, "Add", "Id"), grad
+
+  return all_sum(tensor)
+
+
 class BatchNormV2(base.AbstractModule):
   """Batch normalization module, including optional affine transformation.
 
@@ -70,7 +127,16 @@ class BatchNormV2(base.AbstractModule):
 
   This is also the case for distributed replica training, where the batch
   statistics are not aggregated across replicas, but the moving averages are
-  shared globally.
+  shared globally, unless `num_sync_replicas` is given. In that case each
+  connection computes the sum and sum of squares of its batch, which are summed
+  over the replicas in a single collective reduction before normalizing.
+  Connections are counted per device, and the n-th connections of all replicas
+  are reduced together. Replicas in the same graph, such as the towers built by
+  `snt.replicate`, must therefore each connect the module under their own
+  device scope, and all replicas must connect it the same number of times, in
+  the same order. The fused batch normalization kernel is not used for
+  synchronized connections, whatever the value of `fused`, since gradients
+  must flow through the aggregated statistics.
 
   When connecting the module to the graph, `is_training=True` means that
 
@@ -149,6 +215,7 @@ class BatchNormV2(base.AbstractModule):
                decay_rate=0.999, eps=1e-3, initializers=None,
                partitioners=None, regularizers=None,
                update_ops_collection=None, fused=True,
+               num_sync_replicas=None, sync_group_key=1,
                name="batch_norm"):
     """Constructs a BatchNormV2 module.
 
@@ -183,6 +250,15 @@ class BatchNormV2(base.AbstractModule):
         may result in some slowdown, as the feed-forward of the network is now
         blocked.
       fused: Use nn.fused_batch_norm if True, nn.batch_normalization otherwise.
+        Ignored when `num_sync_replicas` is given: statistics are then always
+        applied with nn.batch_normalization, so that gradients flow through
+        the aggregated statistics.
+      num_sync_replicas: Optional number of replicas over which batch
+        statistics are synchronized. If not provided, each connection uses the
+        statistics of its own batch. Synchronization requires TensorFlow 1.8
+        or later. The replicas are matched by the scope name of the module, so
+        replicas in other processes must construct it with the same name.
+      sync_group_key: Collective group key of the synchronized replicas.
       name: Name of the module.
 
     Raises:
@@ -193,11 +269,23 @@ class BatchNormV2(base.AbstractModule):
       TypeError: If any of the given initializers, partitioners or regularizers
         are not callable.
       ValueError: If `data_format` is invalid.
+      ValueError: If `num_sync_replicas` is not positive.
+      base.NotSupportedError: If `num_sync_replicas` is given and the version
+        of TensorFlow does not support collective ops.
     """
     super(BatchNormV2, self).__init__(name=name)
 
     if data_format not in self.SUPPORTED_DATA_FORMATS.union({None}):
       raise ValueError("Invalid data_format: %r" % (data_format,))
+    if num_sync_replicas is not None and num_sync_replicas < 1:
+      raise ValueError("num_sync_replicas must be positive, got %r" %
+                       (num_sync_replicas,))
+    if num_sync_replicas is not None and (
+        collective_ops is None or not hasattr(tf, "custom_gradient")):
+      raise base.NotSupportedError(
+          "num_sync_replicas requires collective ops and tf.custom_gradient, "
+          "which are available from TensorFlow 1.8, got TensorFlow {}.".format(
+              tf.VERSION))
 
     self._data_format = data_format
     self._offset = offset
@@ -206,6 +294,10 @@ class BatchNormV2(base.AbstractModule):
     self._eps = eps
     self._update_ops_collection = update_ops_collection
     self._fused = fused
+    self._num_sync_replicas = num_sync_replicas
+    self._sync_group_key = sync_group_key
+    # Number of synchronized connections so far, for each device.
+    self._num_sync_connections = collections.defaultdict(int)
 
     self._initializers = util.check_initializers(
         initializers, self.POSSIBLE_INITIALIZER_KEYS)
@@ -255,6 +347,8 @@ class BatchNormV2(base.AbstractModule):
 
     def build_batch_stats():
       """Builds the batch statistics calculation ops."""
+      if self._num_sync_replicas:
+        return self._build_sync_moments(input_batch, stat_dtype)
       mean, variance = tf.nn.moments(input_batch, self._axis,
                                      keep_dims=True, name="normalize_moments")
 
@@ -284,6 +378,64 @@ class BatchNormV2(base.AbstractModule):
 
     return mean, variance
 
+  def _next_sync_instance_keys(self, device):
+    """Returns the collective instance keys of the next connection on `device`.
+
+    Each replica counts its own connections, so the n-th connections of all
+    replicas, whether they are in the same graph on other devices or in other
+    processes, share their instance keys, which are derived from the scope name
+    of the module and from n.
+
+    Args:
+      device: The device of the replica making the connection.
+
+    Returns:
+      A tuple of the instance keys of the forward and backward reductions.
+    """
+    step = self._num_sync_connections[device]
+    self._num_sync_connections[device] += 1
+    return tuple(_collective_instance_key(self.scope_name, step, direction)
+                 for direction in ("forward", "backward"))
+
+  def _build_sync_moments(self, input_batch, stat_dtype):
+    """Builds batch statistics aggregated over all replicas.
+
+    The sum, sum of squares and number of elements of each channel are
+    concatenated, so the replicas are synchronized by a single reduction.
+
+    Args:
+      input_batch: Input batch Tensor.
+      stat_dtype: TensorFlow datatype in which statistics are accumulated.
+
+    Returns:
+      Tuple of (mean, variance), each of the same datatype as `input_batch`.
+    """
+    with tf.name_scope("sync_moments"):
+      inputs = tf.cast(input_batch, stat_dtype)
+      local_sum = tf.reduce_sum(inputs, self._axis)
+      local_squared_sum = tf.reduce_sum(tf.square(inputs), self._axis)
+      local_count = tf.reduce_prod(
+          tf.gather(tf.shape(inputs), self._axis), keep_dims=True)
+      local_stats = tf.concat(
+          [local_sum, local_squared_sum, tf.cast(local_count, stat_dtype)],
+          axis=0)
+
+      stats = _cross_replica_sum(local_stats, self._num_sync_replicas,
+                                 self._sync_group_key,
+                                 self._next_sync_instance_keys(
+                                     local_stats.device))
+      total_sum, squared_sum, count = tf.split(
+          stats, [self._num_channels, self._num_channels, 1])
+      mean = total_sum / count
+      # The variance is clipped to zero against rounding errors.
+      variance = tf.maximum(squared_sum / count - tf.square(mean), 0.)
+
+      input_dtype = input_batch.dtype.base_dtype
+      mean = tf.cast(tf.reshape(mean, self._expanded_mean_shape), input_dtype)
+      variance = tf.cast(tf.reshape(variance, self._expanded_mean_shape),
+                         input_dtype)
+    return mean, variance
+
   def _build_update_ops(self, mean, variance, is_training):
     """Builds the moving average update ops when using moving variance.
 
@@ -423,7 +575,7 @@ class BatchNormV2(base.AbstractModule):
       The current mean tensor, of datatype `stat_dtype`.
       The current variance tensor, of datatype `stat_dtype`.
     """
-    if self._fused:
+    if self._fused and not self._num_sync_replicas:
       # For the non-training case where not using batch stats,
       # pass in the moving statistic variables directly.
       # These will already be in the correct dtype, even for float16 input.
@@ -461,7 +613,7 @@ class BatchNormV2(base.AbstractModule):
     """Sets up optional scale and offset factors."""
 
     # tf.nn.fused_batch_norm accepts float16 batch data, but not scale/offset.
-    if self._fused and dtype == tf.float16:
+    if self._fused and not self._num_sync_replicas and dtype == tf.float16:
       dtype = tf.float32
 
     # The fused batch norm operation needs the beta, gamma variables,
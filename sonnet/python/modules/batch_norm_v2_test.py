@@ -670,6 +670,81 @@ class BatchNormV2Test(parameterized.TestCase, tf.test.TestCase):
       with self.assertRaises(tf.errors.InvalidArgumentError):
         saver3.restore(sess, save_path)
 
+  @parameterized.parameters(True, False)
+  def testSyncSingleReplica(self, fused):
+    inputs = tf.constant(np.random.randn(8, 4, 4, 3).astype(np.float32))
+    bn = snt.BatchNormV2(fused=fused, num_sync_replicas=1)
+    sync_outputs = bn(inputs, is_training=True)
+    outputs = snt.BatchNormV2(fused=fused)(inputs, is_training=True)
+    grads = tf.gradients(tf.reduce_sum(tf.square(outputs)), inputs)
+    sync_grads = tf.gradients(tf.reduce_sum(tf.square(sync_outputs)), inputs)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      self.assertAllClose(*sess.run([outputs, sync_outputs]), atol=1e-4)
+      self.assertAllClose(*sess.run([grads, sync_grads]), atol=1e-4)
+
+  @parameterized.parameters(True, False)
+  def testSyncReplicas(self, fused):
+    num_replicas = 2
+    inputs = np.random.randn(8, 5).astype(np.float32)
+    shards = tf.split(tf.constant(inputs), num_replicas)
+    bn = snt.BatchNormV2(decay_rate=0.5, fused=fused,
+                         num_sync_replicas=num_replicas,
+                         update_ops_collection=tf.GraphKeys.UPDATE_OPS)
+    devices = ["/cpu:{}".format(i) for i in range(num_replicas)]
+    outputs = snt.replicate(bn, shards, devices, is_training=True)
+    update_ops = tf.get_collection(tf.GraphKeys.UPDATE_OPS)
+
+    config = tf.ConfigProto(device_count={"CPU": num_replicas})
+    with self.test_session(config=config) as sess:
+      sess.run(tf.global_variables_initializer())
+      outputs_np, _ = sess.run([tf.concat(outputs, axis=0), update_ops])
+      moving_mean = sess.run(bn.moving_mean)
+
+    # All replicas are normalized with the statistics of the whole batch.
+    expected = ((inputs - inputs.mean(axis=0)) /
+                np.sqrt(inputs.var(axis=0) + 1e-3))
+    self.assertAllClose(outputs_np, expected, atol=1e-4)
+    self.assertAllClose(moving_mean[0], 0.5 * inputs.mean(axis=0), atol=1e-5)
+
+  def testInvalidSyncReplicas(self):
+    with self.assertRaises(ValueError):
+      snt.BatchNormV2(num_sync_replicas=0)
+
+  def testSyncInstanceKeysAreStable(self):
+    devices = ["/cpu:0", "/cpu:1", "/cpu:0", "/cpu:1"]
+
+    def instance_keys(other_first):
+      with tf.Graph().as_default():
+        if other_first:
+          other = snt.BatchNormV2(num_sync_replicas=2, name="other")
+          other._next_sync_instance_keys("/cpu:0")  # pylint: disable=protected-access
+        bn = snt.BatchNormV2(num_sync_replicas=2, name="bn")
+        return [bn._next_sync_instance_keys(device) for device in devices]  # pylint: disable=protected-access
+
+    # Modules constructed and connected before do not change the keys.
+    keys = instance_keys(other_first=False)
+    self.assertEqual(keys, instance_keys(other_first=True))
+    self.assertEqual(keys[0], keys[1])
+    self.assertEqual(keys[2], keys[3])
+    self.assertEqual(len(set(keys[0] + keys[2])), 4)
+
+  def testSyncInstanceKeysOneReplicaPerGraph(self):
+    def replica_instance_keys(device):
+      with tf.Graph().as_default() as graph, tf.device(device):
+        bn = snt.BatchNormV2(num_sync_replicas=2, fused=False)
+        inputs = tf.zeros([2, 3])
+        # For example a training and an evaluation tower.
+        bn(inputs, is_training=True)
+        bn(inputs, is_training=True)
+        return [op.get_attr("instance_key") for op in graph.get_operations()
+                if op.type == "CollectiveReduce"]
+
+    keys = replica_instance_keys("/cpu:0")
+    self.assertEqual(len(keys), 2)
+    self.assertNotEqual(keys[0], keys[1])
+    self.assertEqual(keys, replica_instance_keys("/cpu:1"))
 
 if __name__ == "__main__":
   tf.test.main()
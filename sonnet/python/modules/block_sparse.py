@@ -0,0 +1,509 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Block-sparse Linear modules with magnitude pruning.
+
+`BlockSparseLinear` stores its weights as a grid of dense blocks, together with
+a non-trainable mask selecting the active blocks. Only the active blocks are
+multiplied, so the cost of the module scales with the density of the mask.
+
+The mask is updated by magnitude pruning, for instance following a
+`polynomial_sparsity_schedule` during training:
+
+```python
+lin = snt.BlockSparseLinear(1024, block_shape=(32, 32))
+outputs = lin(inputs)
+...
+sparsity = snt.polynomial_sparsity_schedule(
+    global_step, final_sparsity=0.9, begin_step=1000, end_step=10000)
+train_op = tf.group(optimizer.minimize(loss, global_step=global_step),
+                    lin.prune(sparsity))
+```
+
+Trained dense models are converted with `block_sparsify`.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Dependency imports
+import numpy as np
+from sonnet.python.modules import base
+from sonnet.python.modules import basic
+from sonnet.python.modules import batch_norm_folding
+from sonnet.python.modules import sequential
+from sonnet.python.modules import util
+import tensorflow as tf
+
+
+def _check_block_shape(block_shape):
+  """Returns `block_shape` as a pair of positive integers."""
+  if isinstance(block_shape, int):
+    block_shape = (block_shape, block_shape)
+  block_shape = tuple(block_shape)
+  if len(block_shape) != 2 or min(block_shape) < 1:
+    raise ValueError("block_shape must be a positive integer or a pair of "
+                     "positive integers, got {}.".format(block_shape))
+  return block_shape
+
+
+def to_blocks(w, block_shape):
+  """Splits a weight matrix into blocks.
+
+  Args:
+    w: A NumPy array of shape `[input_size, output_size]`.
+    block_shape: Pair `(block_rows, block_cols)` dividing the shape of `w`.
+
+  Returns:
+    A NumPy array of shape
+    `[input_size // block_rows, output_size // block_cols, block_rows,
+    block_cols]`, whose element `[i, j]` is the block of `w` at block row `i`
+    and block column `j`.
+
+  Raises:
+    ValueError: If the shape of `w` is not a multiple of `block_shape`.
+  """
+  block_rows, block_cols = _check_block_shape(block_shape)
+  input_size, output_size = w.shape
+  if input_size % block_rows or output_size % block_cols:
+    raise ValueError("Weights of shape {} cannot be split into blocks of shape "
+                     "{}.".format(w.shape, (block_rows, block_cols)))
+  blocks = np.reshape(w, (input_size // block_rows, block_rows,
+                          output_size // block_cols, block_cols))
+  return np.transpose(blocks, (0, 2, 1, 3))
+
+
+def from_blocks(blocks):
+  """Merges blocks into a weight matrix, the inverse of `to_blocks`."""
+  num_block_rows, num_block_cols, block_rows, block_cols = blocks.shape
+  w = np.transpose(blocks, (0, 2, 1, 3))
+  return np.reshape(w, (num_block_rows * block_rows,
+                        num_block_cols * block_cols))
+
+
+def magnitude_mask(blocks, sparsity):
+  """Returns the mask keeping the blocks with the largest L2 norm.
+
+  Args:
+    blocks: A NumPy array of blocks, as returned by `to_blocks`.
+    sparsity: Fraction of blocks to prune.
+
+  Returns:
+    A float32 NumPy array of shape `blocks.shape[:2]`, equal to one for the
+    `round((1 - sparsity) * num_blocks)` blocks of largest norm, and zero for
+    the others.
+  """
+  norms = np.sqrt(np.sum(np.square(blocks), axis=(2, 3))).reshape(-1)
+  num_kept = int(np.round((1.0 - sparsity) * norms.size))
+  mask = np.zeros(norms.size, dtype=np.float32)
+  # Stable sort, so that ties are broken in the same order as `tf.nn.top_k`.
+  mask[np.argsort(-norms, kind="mergesort")[:num_kept]] = 1.0
+  return mask.reshape(blocks.shape[:2])
+
+
+def _block_sparse_matmul(inputs, w, mask):
+  """Multiplies `inputs` by the active blocks of `w`.
+
+  The blocks selected by the mask are gathered, together with the matching
+  blocks of the inputs, and multiplied with a single batched matrix
+  multiplication. The products are then summed into their block column.
+
+  Args:
+    inputs: Tensor of shape `[batch_size, input_size]`.
+    w: Tensor of blocks of shape
+      `[num_block_rows, num_block_cols, block_rows, block_cols]`.
+    mask: Tensor of shape `[num_block_rows, num_block_cols]`, non-zero for
+      active blocks.
+
+  Returns:
+    Tensor of shape `[batch_size, num_block_cols * block_cols]`.
+  """
+  num_block_rows, num_block_cols, block_rows, block_cols = (
+      w.get_shape().as_list())
+  active = tf.where(tf.not_equal(mask, 0))
+  input_blocks = tf.transpose(
+      tf.reshape(inputs, [-1, num_block_rows, block_rows]), [1, 0, 2])
+  products = tf.matmul(tf.gather(input_blocks, active[:, 0]),
+                       tf.gather_nd(w, active))
+  outputs = tf.unsorted_segment_sum(products, active[:, 1], num_block_cols)
+  return tf.reshape(tf.transpose(outputs, [1, 0, 2]),
+                    [-1, num_block_cols * block_cols])
+
+
+class BlockSparseLinear(base.AbstractModule):
+  """Linear module with block-sparse weights, optionally including bias.
+
+  The weights `w` are a trainable Variable of shape
+  `[num_block_rows, num_block_cols, block_rows, block_cols]`, and `mask` a
+  non-trainable Variable of shape `[num_block_rows, num_block_cols]`. The
+  module computes `inputs * W + b`, where `W` is the dense matrix made of the
+  blocks of `w` multiplied by the mask. Pruned blocks receive no gradient.
+  """
+
+  def __init__(self,
+               output_size,
+               block_shape=(32, 32),
+               use_bias=True,
+               initializers=None,
+               regularizers=None,
+               custom_getter=None,
+               name="block_sparse_linear"):
+    """Constructs a BlockSparseLinear module.
+
+    Args:
+      output_size: Output dimensionality, a multiple of the block width.
+      block_shape: Shape `(block_rows, block_cols)` of the blocks, or an
+        integer for square blocks. The input size must be a multiple of
+        `block_rows`.
+      use_bias: Whether to include bias parameters. Default `True`.
+      initializers: Optional dict containing initializers for the weights
+        (with key 'w'), the biases (with key 'b') or the mask (with key
+        'mask'). The default initializers are those of `snt.Linear`, and ones
+        for the mask.
+      regularizers: Optional dict containing regularizers for the weights
+        (with key 'w') and the biases (with key 'b').
+      custom_getter: Callable or dictionary of callables to use as
+        custom getters inside the module.
+      name: Name of the module.
+
+    Raises:
+      KeyError: If `initializers` contains any keys other than 'w', 'b' or
+        'mask', or `regularizers` any keys other than 'w' or 'b'.
+      TypeError: If any of the given initializers or regularizers are not
+        callable.
+      ValueError: If `block_shape` is invalid or `output_size` is not a
+        multiple of the block width.
+    """
+    super(BlockSparseLinear, self).__init__(custom_getter=custom_getter,
+                                            name=name)
+    self._block_shape = _check_block_shape(block_shape)
+    if output_size % self._block_shape[1]:
+      raise ValueError("output_size {} must be a multiple of the block width "
+                       "{}.".format(output_size, self._block_shape[1]))
+    self._output_size = output_size
+    self._use_bias = use_bias
+    self._input_shape = None
+    self._w = None
+    self._b = None
+    self._mask = None
+    possible_keys = self.get_possible_initializer_keys(use_bias=use_bias)
+    self._initializers = util.check_initializers(initializers, possible_keys)
+    self._regularizers = util.check_regularizers(
+        regularizers, possible_keys - {"mask"})
+
+  @classmethod
+  def get_possible_initializer_keys(cls, use_bias=True):
+    return {"w", "b", "mask"} if use_bias else {"w", "mask"}
+
+  def _build(self, inputs):
+    """Connects the BlockSparseLinear module into the graph.
+
+    Args:
+      inputs: A 2D Tensor of size [batch_size, input_size].
+
+    Returns:
+      A 2D Tensor of size [batch_size, output_size].
+
+    Raises:
+      base.IncompatibleShapeError: If the input is not a 2-D `Tensor` with
+          the size of the second dimension specified and a multiple of the
+          block height, or if it is not compatible with previous inputs.
+    """
+    input_shape = tuple(inputs.get_shape().as_list())
+    block_rows, block_cols = self._block_shape
+
+    if len(input_shape) != 2 or input_shape[1] is None:
+      raise base.IncompatibleShapeError(
+          "{}: Input shape must be [batch_size, input_size] with a known "
+          "input_size, not: {}".format(self.scope_name, input_shape))
+
+    if input_shape[1] % block_rows:
+      raise base.IncompatibleShapeError(
+          "{}: Input size {} must be a multiple of the block height {}".format(
+              self.scope_name, input_shape[1], block_rows))
+
+    if self._input_shape is not None and input_shape[1] != self._input_shape[1]:
+      raise base.IncompatibleShapeError(
+          "{}: Input shape must be [batch_size, {}] not: [batch_size, {}]"
+          .format(self.scope_name, self._input_shape[1], input_shape[1]))
+
+    self._input_shape = input_shape
+    dtype = inputs.dtype
+    input_size = input_shape[1]
+    mask_shape = (input_size // block_rows, self._output_size // block_cols)
+
+    if "w" not in self._initializers:
+      self._initializers["w"] = basic.create_linear_initializer(input_size,
+                                                                dtype)
+    if "b" not in self._initializers and self._use_bias:
+      self._initializers["b"] = basic.create_bias_initializer(
+          self._output_size, dtype)
+    if "mask" not in self._initializers:
+      self._initializers["mask"] = tf.ones_initializer()
+
+    self._w = tf.get_variable("w",
+                              shape=mask_shape + self._block_shape,
+                              dtype=dtype,
+                              initializer=self._initializers["w"],
+                              regularizer=self._regularizers.get("w", None))
+    self._mask = tf.get_variable("mask",
+                                 shape=mask_shape,
+                                 dtype=dtype,
+                                 initializer=self._initializers["mask"],
+                                 trainable=False)
+    outputs = _block_sparse_matmul(inputs, self._w, self._mask)
+    outputs.set_shape([input_shape[0], self._output_size])
+
+    if self._use_bias:
+      self._b = tf.get_variable("b",
+                                shape=(self._output_size,),
+                                dtype=dtype,
+                                initializer=self._initializers["b"],
+                                regularizer=self._regularizers.get("b", None))
+      outputs += self._b
+
+    return outputs
+
+  def prune(self, sparsity, name=None):
+    """Returns an op pruning the blocks of smallest magnitude.
+
+    The mask is set to keep the `round((1 - sparsity) * num_blocks)` active
+    blocks with the largest L2 norm. Pruned blocks are never reactivated, as
+    their weights are stale: if `sparsity` is lower than the current sparsity,
+    for instance when a `polynomial_sparsity_schedule` starting at 0 is applied
+    to a module created by `from_linear` with a positive sparsity, the mask is
+    left unchanged.
+
+    Args:
+      sparsity: Fraction of blocks to prune, a float or a scalar Tensor such as
+        the output of `polynomial_sparsity_schedule`.
+      name: Optional name scope for the created ops.
+
+    Returns:
+      An op updating the mask.
+
+    Raises:
+      base.NotConnectedError: If the module has not been connected.
+    """
+    self._ensure_is_connected()
+    num_blocks = self._mask.get_shape().num_elements()
+    with tf.name_scope(name, self.module_name + "_prune", [sparsity]):
+      masked_w = self._w * self._mask[:, :, tf.newaxis, tf.newaxis]
+      flat_mask = tf.reshape(self._mask, [-1])
+      # Pruned blocks rank below active blocks, even those of zero norm.
+      norms = tf.where(
+          flat_mask > 0,
+          tf.reshape(
+              tf.sqrt(tf.reduce_sum(tf.square(masked_w), axis=[2, 3])), [-1]),
+          -tf.ones([num_blocks], dtype=masked_w.dtype))
+      num_active = tf.cast(tf.reduce_sum(flat_mask), tf.int32)
+      num_kept = tf.round((1.0 - tf.cast(sparsity, tf.float32)) * num_blocks)
+      num_kept = tf.clip_by_value(tf.cast(num_kept, tf.int32), 0, num_active)
+      _, kept = tf.nn.top_k(norms, k=num_kept)
+      mask = tf.scatter_nd(tf.expand_dims(kept, 1),
+                           tf.ones_like(kept, dtype=self._mask.dtype),
+                           [num_blocks])
+      return tf.assign(self._mask,
+                       tf.reshape(mask, self._mask.get_shape())).op
+
+  @classmethod
+  def from_linear(cls, linear, session, block_shape=(32, 32), sparsity=0.0,
+                  name=None):
+    """Creates a BlockSparseLinear module from a trained `snt.Linear`.
+
+    Args:
+      linear: A connected `snt.Linear`.
+      session: A `tf.Session` used to read the trained variable values.
+      block_shape: Shape `(block_rows, block_cols)` of the blocks.
+      sparsity: Fraction of the blocks of smallest magnitude to prune.
+      name: Optional name of the module. Defaults to the name of `linear` with
+        "_block_sparse" appended.
+
+    Returns:
+      An unconnected `BlockSparseLinear` initialized with the blocks of `w`,
+      the mask and the biases.
+
+    Raises:
+      base.NotConnectedError: If `linear` is not connected.
+      ValueError: If the shape of `w` is not a multiple of `block_shape`.
+    """
+    if name is None:
+      name = linear.module_name + "_block_sparse"
+    fetches = {"w": linear.w}
+    if linear.has_bias:
+      fetches["b"] = linear.b
+    values = session.run(fetches)
+
+    blocks = to_blocks(values["w"], block_shape)
+    initializers = {
+        "w": tf.constant_initializer(blocks),
+        "mask": tf.constant_initializer(magnitude_mask(blocks, sparsity)),
+    }
+    if linear.has_bias:
+      initializers["b"] = tf.constant_initializer(values["b"])
+    return cls(output_size=values["w"].shape[1],
+               block_shape=block_shape,
+               use_bias=linear.has_bias,
+               initializers=initializers,
+               name=name)
+
+  @property
+  def w(self):
+    """Returns the Variable containing the blocks of the weight matrix."""
+    self._ensure_is_connected()
+    return self._w
+
+  @property
+  def b(self):
+    """Returns the Variable containing the bias.
+
+    Raises:
+      base.NotConnectedError: If the module has not been connected.
+      AttributeError: If the module does not use bias.
+    """
+    self._ensure_is_connected()
+    if not self._use_bias:
+      raise AttributeError(
+          "No bias Variable in BlockSparseLinear Module when `use_bias=False`.")
+    return self._b
+
+  @property
+  def mask(self):
+    """Returns the non-trainable Variable containing the block mask."""
+    self._ensure_is_connected()
+    return self._mask
+
+  @property
+  def output_size(self):
+    return self._output_size
+
+  @property
+  def block_shape(self):
+    return self._block_shape
+
+  @property
+  def has_bias(self):
+    return self._use_bias
+
+  @property
+  def input_shape(self):
+    self._ensure_is_connected()
+    return self._input_shape
+
+  @property
+  def initializers(self):
+    return self._initializers
+
+  @property
+  def regularizers(self):
+    return self._regularizers
+
+
+def polynomial_sparsity_schedule(global_step, final_sparsity, begin_step,
+                                 end_step, initial_sparsity=0.0, exponent=3,
+                                 name=None):
+  """Returns a sparsity increasing polynomially from begin to end step.
+
+  The sparsity is `initial_sparsity` until `begin_step`, then increases as
+
+    final_sparsity + (initial_sparsity - final_sparsity) * (1 - progress)^exponent
+
+  where `progress` goes linearly from 0 to 1 between `begin_step` and
+  `end_step`, after which the sparsity is `final_sparsity`. With the default
+  cubic exponent, blocks are pruned quickly at first, while there are many
+  redundant blocks, and slowly towards the end (https://arxiv.org/abs/1710.01878).
+
+  Args:
+    global_step: Scalar Tensor of the training step.
+    final_sparsity: Sparsity at `end_step`.
+    begin_step: Step at which pruning starts.
+    end_step: Step at which `final_sparsity` is reached.
+    initial_sparsity: Sparsity at `begin_step`.
+    exponent: Exponent of the polynomial.
+    name: Optional name scope for the created ops.
+
+  Returns:
+    A float32 scalar Tensor.
+
+  Raises:
+    ValueError: If the sparsities are not in `[0, 1]`, or if `end_step` is
+      smaller than `begin_step`.
+  """
+  for sparsity in (initial_sparsity, final_sparsity):
+    if not 0 <= sparsity <= 1:
+      raise ValueError("Sparsities must be in [0, 1], got {}.".format(sparsity))
+  if end_step < begin_step:
+    raise ValueError("end_step {} must not be smaller than begin_step "
+                     "{}.".format(end_step, begin_step))
+
+  with tf.name_scope(name, "polynomial_sparsity_schedule", [global_step]):
+    step = tf.cast(global_step, tf.float32)
+    progress = (step - begin_step) / max(end_step - begin_step, 1)
+    progress = tf.clip_by_value(progress, 0.0, 1.0)
+    return (final_sparsity +
+            (initial_sparsity - final_sparsity) * (1.0 - progress) ** exponent)
+
+
+def block_sparsify(module, session, block_shape=(32, 32), sparsity=0.0,
+                   name=None):
+  """Returns a copy of `module` with block-sparse Linear layers.
+
+  Each `snt.Linear` in `module` whose shape is a multiple of `block_shape` is
+  replaced by a `BlockSparseLinear` with the same weights, from which the
+  fraction `sparsity` of blocks of smallest magnitude is pruned. Other layers,
+  including Linear layers of other shapes, are kept as is and share their
+  variables with `module`.
+
+  Supported inputs are a connected `snt.Linear`, `snt.nets.MLP` or
+  `snt.Sequential` of those and of stateless callables such as activations.
+
+  Args:
+    module: The trained module to convert. It must have been connected to the
+      graph.
+    session: A `tf.Session` used to read the trained variable values.
+    block_shape: Shape `(block_rows, block_cols)` of the blocks.
+    sparsity: Fraction of the blocks of each layer to prune.
+    name: Optional name of the returned module. Defaults to the name of
+      `module` with "_block_sparse" appended.
+
+  Returns:
+    An unconnected `snt.Sequential`, which must be connected and initialized
+    before use.
+
+  Raises:
+    snt.NotConnectedError: If `module` or any of its layers is not connected.
+    snt.NotSupportedError: If `module` contains normalization modules.
+  """
+  if name is None:
+    name = getattr(module, "module_name", "module") + "_block_sparse"
+  block_rows, block_cols = _check_block_shape(block_shape)
+
+  layers = batch_norm_folding._flatten_layers(module)  # pylint: disable=protected-access
+  converted = {}
+  for layer in layers:
+    if batch_norm_folding._unwrap_batch_norm(layer) is not None:  # pylint: disable=protected-access
+      raise base.NotSupportedError(
+          "Batch normalization must be folded with snt.fold_batch_norm before "
+          "conversion to block-sparse layers.")
+    if isinstance(layer, basic.Linear):
+      input_size = layer.input_shape[-1]
+      if input_size % block_rows == 0 and layer.output_size % block_cols == 0:
+        converted[layer] = BlockSparseLinear.from_linear(
+            layer, session, block_shape=block_shape, sparsity=sparsity,
+            name=layer.module_name)
+
+  return sequential.Sequential([converted.get(layer, layer)
+                                for layer in layers], name=name)
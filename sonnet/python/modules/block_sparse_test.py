@@ -0,0 +1,197 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for sonnet.python.modules.block_sparse."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Dependency imports
+from absl.testing import parameterized
+import numpy as np
+import sonnet as snt
+from sonnet.python.modules import block_sparse
+import tensorflow as tf
+
+
+def _dense_weights(blocks, mask):
+  return block_sparse.from_blocks(blocks * mask[:, :, np.newaxis, np.newaxis])
+
+
+class BlockSparseLinearTest(parameterized.TestCase, tf.test.TestCase):
+
+  @parameterized.parameters({"block_shape": 2}, {"block_shape": (4, 2)},
+                            {"block_shape": (1, 3)})
+  def testMatchesMaskedDense(self, block_shape):
+    inputs_np = np.random.randn(5, 8).astype(np.float32)
+    lin = snt.BlockSparseLinear(6, block_shape=block_shape)
+    outputs = lin(tf.constant(inputs_np))
+    self.assertEqual(outputs.get_shape().as_list(), [5, 6])
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      mask = np.random.randint(2, size=lin.mask.get_shape().as_list())
+      session.run(tf.assign(lin.mask, mask.astype(np.float32)))
+      blocks, b, outputs_np = session.run([lin.w, lin.b, outputs])
+
+    expected = inputs_np.dot(_dense_weights(blocks, mask)) + b
+    self.assertAllClose(outputs_np, expected, atol=1e-5)
+
+  def testVariables(self):
+    lin = snt.BlockSparseLinear(6, block_shape=(4, 3))
+    lin(tf.zeros([2, 8]))
+
+    self.assertEqual(lin.w.get_shape().as_list(), [2, 2, 4, 3])
+    self.assertEqual(lin.mask.get_shape().as_list(), [2, 2])
+    self.assertEqual(lin.b.get_shape().as_list(), [6])
+    self.assertEqual(set(tf.trainable_variables()), {lin.w, lin.b})
+
+  def testPrunedBlocksHaveNoGradient(self):
+    lin = snt.BlockSparseLinear(4, block_shape=2, use_bias=False,
+                                initializers={
+                                    "mask": tf.constant_initializer(
+                                        [[1.0, 0.0], [0.0, 1.0]])})
+    outputs = lin(tf.constant(np.random.randn(3, 4).astype(np.float32)))
+    grad, = tf.gradients(tf.reduce_sum(outputs), [lin.w])
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      grad = session.run(tf.convert_to_tensor(grad))
+    self.assertAllEqual(grad[0, 1], np.zeros([2, 2]))
+    self.assertAllEqual(grad[1, 0], np.zeros([2, 2]))
+    self.assertNotEqual(np.abs(grad[0, 0]).sum(), 0)
+
+  def testPrune(self):
+    blocks = np.random.randn(2, 4, 2, 2).astype(np.float32)
+    lin = snt.BlockSparseLinear(
+        8, block_shape=2, initializers={"w": tf.constant_initializer(blocks)})
+    lin(tf.zeros([1, 4]))
+    sparsity = tf.placeholder(tf.float32, [])
+    prune = lin.prune(sparsity)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      session.run(prune, feed_dict={sparsity: 0.5})
+      mask = session.run(lin.mask)
+      self.assertAllEqual(mask, block_sparse.magnitude_mask(blocks, 0.5))
+
+      session.run(prune, feed_dict={sparsity: 0.75})
+      pruned_mask = session.run(lin.mask)
+    self.assertEqual(pruned_mask.sum(), 2)
+    self.assertTrue(np.all(pruned_mask <= mask))
+
+  def testPruneNeverReactivates(self):
+    blocks = np.random.randn(2, 4, 2, 2).astype(np.float32)
+    lin = snt.BlockSparseLinear(
+        8, block_shape=2, initializers={"w": tf.constant_initializer(blocks)})
+    lin(tf.zeros([1, 4]))
+    sparsity = tf.placeholder(tf.float32, [])
+    prune = lin.prune(sparsity)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      session.run(prune, feed_dict={sparsity: 0.75})
+      mask = session.run(lin.mask)
+
+      # A lower sparsity, such as the start of a schedule, keeps the mask.
+      session.run(prune, feed_dict={sparsity: 0.0})
+      self.assertAllEqual(session.run(lin.mask), mask)
+      session.run(prune, feed_dict={sparsity: 0.5})
+      self.assertAllEqual(session.run(lin.mask), mask)
+
+      # Active blocks of zero norm are pruned before any pruned block is kept.
+      session.run(lin.w.assign(tf.zeros_like(lin.w)))
+      session.run(prune, feed_dict={sparsity: 0.875})
+      pruned_mask = session.run(lin.mask)
+    self.assertEqual(pruned_mask.sum(), 1)
+    self.assertTrue(np.all(pruned_mask <= mask))
+
+  def testPolynomialSparsitySchedule(self):
+    global_step = tf.placeholder(tf.int64, [])
+    sparsity = snt.polynomial_sparsity_schedule(
+        global_step, final_sparsity=0.8, begin_step=10, end_step=20,
+        initial_sparsity=0.1)
+
+    with self.test_session() as session:
+      values = [session.run(sparsity, feed_dict={global_step: step})
+                for step in (0, 10, 15, 20, 30)]
+    self.assertAllClose(values, [0.1, 0.1, 0.8 - 0.7 / 8, 0.8, 0.8])
+
+  def testFromLinear(self):
+    inputs_np = np.random.randn(3, 8).astype(np.float32)
+    inputs = tf.constant(inputs_np)
+    lin = snt.Linear(4)
+    outputs = lin(inputs)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      sparse = snt.BlockSparseLinear.from_linear(lin, session, block_shape=2,
+                                                 sparsity=0.5)
+      sparse_outputs = sparse(inputs)
+      session.run(tf.variables_initializer(sparse.get_all_variables()))
+      w, b, mask, sparse_outputs = session.run(
+          [lin.w, lin.b, sparse.mask, sparse_outputs])
+
+    self.assertEqual(sparse.module_name, "linear_block_sparse")
+    self.assertEqual(mask.sum(), 4)
+    blocks = block_sparse.to_blocks(w, (2, 2))
+    expected = inputs_np.dot(_dense_weights(blocks, mask)) + b
+    self.assertAllClose(sparse_outputs, expected, atol=1e-5)
+
+  def testBlockSparsifyMLP(self):
+    inputs = tf.constant(np.random.randn(3, 8).astype(np.float32))
+    mlp = snt.nets.MLP(output_sizes=[8, 6])
+    outputs = mlp(inputs)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      sparse = snt.block_sparsify(mlp, session, block_shape=4)
+      sparse_outputs = sparse(inputs)
+      session.run(tf.variables_initializer(
+          [v for v in sparse.get_all_variables()
+           if v not in mlp.get_all_variables()]))
+      outputs, sparse_outputs = session.run([outputs, sparse_outputs])
+
+    # The last layer has 6 outputs, which is not a multiple of 4.
+    self.assertIsInstance(sparse.layers[0], snt.BlockSparseLinear)
+    self.assertIsInstance(sparse.layers[-1], snt.Linear)
+    self.assertAllClose(sparse_outputs, outputs, atol=1e-5)
+
+  def testErrors(self):
+    with self.assertRaises(ValueError):
+      snt.BlockSparseLinear(6, block_shape=4)
+    with self.assertRaises(ValueError):
+      snt.BlockSparseLinear(6, block_shape=(2, 3, 1))
+    with self.assertRaises(KeyError):
+      snt.BlockSparseLinear(6, block_shape=3, regularizers={"mask": tf.abs})
+
+    lin = snt.BlockSparseLinear(6, block_shape=3)
+    with self.assertRaises(snt.NotConnectedError):
+      lin.prune(0.5)
+    with self.assertRaises(snt.IncompatibleShapeError):
+      lin(tf.zeros([2, 4]))
+    lin(tf.zeros([2, 6]))
+    with self.assertRaises(snt.IncompatibleShapeError):
+      lin(tf.zeros([2, 9]))
+
+    with self.assertRaises(ValueError):
+      snt.polynomial_sparsity_schedule(0, 1.5, 0, 10)
+    with self.assertRaises(ValueError):
+      snt.polynomial_sparsity_schedule(0, 0.5, 10, 0)
+
+
+if __name__ == "__main__":
+  tf.test.main()
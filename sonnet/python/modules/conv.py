@@ -31,9 +31,12 @@ import numbers
 
 import numpy as np
 from sonnet.python.modules import base
+from sonnet.python.modules import rnn_core
 from sonnet.python.modules import util
 import tensorflow as tf
 
+from tensorflow.python.framework import tensor_util
+
 
 # Strings for TensorFlow convolution padding modes. See the following
 # documentation for an explanation of VALID versus SAME:
@@ -293,6 +296,30 @@ def _apply_bias(inputs, outputs, channel_index, data_format, output_channels,
   return b, outputs
 
 
+def _pad_or_crop(inputs, axes, before, after):
+  """Pads (positive amounts) or crops (negative amounts) `inputs` along `axes`.
+
+  Args:
+    inputs: A Tensor.
+    axes: Sequence of axes of `inputs` to pad or crop.
+    before: Sequence of integers, the amount to add at the start of each axis.
+    after: Sequence of integers, the amount to add at the end of each axis.
+
+  Returns:
+    The padded or cropped Tensor.
+  """
+  rank = inputs.get_shape().ndims
+  paddings = [[0, 0]] * rank
+  slices = [slice(None)] * rank
+  for axis, amount_before, amount_after in zip(axes, before, after):
+    paddings[axis] = [max(amount_before, 0), max(amount_after, 0)]
+    slices[axis] = slice(max(-amount_before, 0),
+                         amount_after if amount_after < 0 else None)
+  if any(amount > 0 for padding in paddings for amount in padding):
+    inputs = tf.pad(inputs, paddings)
+  return inputs[tuple(slices)]
+
+
 class _ConvND(base.AbstractModule):
   """N-dimensional convolution and dilated convolution module, including bias.
 
@@ -304,7 +331,7 @@ class _ConvND(base.AbstractModule):
                padding=SAME, use_bias=True, initializers=None,
                partitioners=None, regularizers=None, mask=None,
                data_format=DATA_FORMAT_NHWC,
-               custom_getter=None, name="conv_nd"):
+               custom_getter=None, sparse_mask=False, name="conv_nd"):
     """Constructs a _ConvND module.
 
     See the following documentation for an explanation of VALID versus SAME
@@ -343,13 +370,20 @@ class _ConvND(base.AbstractModule):
           a single `Tensor` as an input and returns a scalar `Tensor` output,
           e.g. the L1 and L2 regularizers in `tf.contrib.layers`.
       mask: A convertible to a ND tensor which is multiplied
-          component-wise with the weights (Optional).
+          component-wise with the weights (Optional). The masked weights are
+          computed once and shared by all connections of the module.
       data_format: The data format of the input.
       custom_getter: Callable or dictionary of callables to use as
           custom getters inside the module. If a dictionary, the keys
           correspond to regexes to match variable names. See the
           `tf.get_variable` documentation for information about the
           custom_getter API.
+      sparse_mask: Whether to skip the kernel taps that are zeroed out by
+          `mask` for all channels. The convolution is then computed with the
+          kernel cropped to the bounding box of the remaining taps, which
+          saves computation when the mask is mostly zero (e.g. masked
+          PixelCNN-style convolutions). Requires a mask with a statically known
+          value and a stride of 1.
       name: Name of the module.
 
     Raises:
@@ -370,6 +404,13 @@ class _ConvND(base.AbstractModule):
           are not callable.
       TypeError: If mask is given and it is not convertible to a Tensor.
       ValueError: If the passed-in data_format doesn't have a channel dimension.
+      ValueError: If `sparse_mask` is `True` and no mask with a statically
+          known value and at least one non-zero entry is given.
+      base.NotSupportedError: If `sparse_mask` is `True` and the stride in any
+          dimension is > 1.
+      base.IncompatibleShapeError: If `sparse_mask` is `True` and the mask has
+          more dimensions than the weight matrix, or its spatial dimensions
+          don't match `kernel_shape`.
     """
     super(_ConvND, self).__init__(custom_getter=custom_getter, name=name)
 
@@ -420,6 +461,15 @@ class _ConvND(base.AbstractModule):
     else:
       self._mask = None
 
+    # Maps (weights, control flow context) to the corresponding masked weights,
+    # so that the mask is only applied once per graph rather than once per
+    # connection.
+    self._masked_w_cache = {}
+
+    self._sparse_mask = sparse_mask
+    if sparse_mask:
+      self._setup_sparse_mask()
+
     self._channel_index = _find_channel_index(self._data_format)
 
   @classmethod
@@ -461,12 +511,14 @@ class _ConvND(base.AbstractModule):
 
     self._w = self._construct_w(inputs)
 
-    if self._mask is not None:
-      w = self._apply_mask()
+    if self._sparse_mask:
+      outputs = self._apply_sparse_conv(inputs)
     else:
-      w = self._w
-
-    outputs = self._apply_conv(inputs, w)
+      if self._mask is not None:
+        w = self._apply_mask()
+      else:
+        w = self._w
+      outputs = self._apply_conv(inputs, w)
 
     if self._use_bias:
       self._b, outputs = _apply_bias(
@@ -476,6 +528,113 @@ class _ConvND(base.AbstractModule):
 
     return outputs
 
+  def _setup_sparse_mask(self):
+    """Finds the kernel taps that are not zeroed out by the mask.
+
+    Raises:
+      ValueError: If there is no mask, if its value is not statically known or
+          if it is zero everywhere.
+      base.NotSupportedError: If the stride in any dimension is > 1.
+      base.IncompatibleShapeError: If the mask has more dimensions than the
+          weight matrix, or its spatial dimensions don't match the kernel
+          shape.
+    """
+    if self._mask is None:
+      raise ValueError("sparse_mask requires a mask.")
+    mask_value = tensor_util.constant_value(self._mask)
+    if mask_value is None:
+      raise ValueError("sparse_mask requires a mask with a statically known "
+                       "value.")
+    if any(x > 1 for x in self._stride):
+      raise base.NotSupportedError("sparse_mask requires stride to be 1.")
+
+    # The channel dimensions of the weights are only known once connected, and
+    # are checked then.
+    if mask_value.ndim > self._n + 2:
+      raise base.IncompatibleShapeError(
+          "Invalid mask shape: {}. Max shape: {}".format(
+              mask_value.ndim, self._n + 2))
+    num_spatial_dims = min(mask_value.ndim, self._n)
+    if (tuple(mask_value.shape[:num_spatial_dims]) !=
+        tuple(self._kernel_shape[:num_spatial_dims])):
+      raise base.IncompatibleShapeError(
+          "Invalid mask shape: {}. Kernel shape: {}".format(
+              mask_value.shape, self._kernel_shape))
+
+    # Only the leading (spatial) dimensions of the mask can be cropped.
+    live_taps = np.any(
+        mask_value != 0, axis=tuple(range(num_spatial_dims, mask_value.ndim)))
+    if not live_taps.any():
+      raise ValueError("sparse_mask requires a mask with non-zero entries.")
+
+    # Indices of the kernel taps which contribute to the output.
+    self._mask_taps = np.argwhere(live_taps)
+    lower = self._mask_taps.min(axis=0)
+    upper = self._mask_taps.max(axis=0)
+    self._mask_bounds = tuple(
+        (int(lower[i]), int(upper[i])) if i < num_spatial_dims
+        else (0, self._kernel_shape[i] - 1) for i in range(self._n))
+
+    cropped_mask = mask_value[tuple(
+        slice(low, high + 1)
+        for low, high in self._mask_bounds[:num_spatial_dims])]
+    if np.all(cropped_mask == 1):
+      self._cropped_mask = None
+    else:
+      self._cropped_mask = cropped_mask
+
+  def _apply_sparse_conv(self, inputs):
+    """Applies the convolution using only the taps kept by the mask.
+
+    Args:
+      inputs: A Tensor of shape `data_format` and of type `tf.float16` or
+          `tf.float32`.
+
+    Returns:
+      outputs: The result of the convolution operation on `inputs`.
+
+    Raises:
+      base.IncompatibleShapeError: If the mask and the weight matrix don't
+          match on shape.
+    """
+    w = self._w
+    self._check_mask_shape(w)
+    cache_key = (w, "sparse",
+                 tf.get_default_graph()._get_control_flow_context())  # pylint: disable=protected-access
+    if cache_key not in self._masked_w_cache:
+      begin = [low for low, _ in self._mask_bounds] + [0, 0]
+      size = [high - low + 1 for low, high in self._mask_bounds] + [-1, -1]
+      cropped_w = tf.slice(w, begin, size)
+      if self._cropped_mask is not None:
+        mask = np.reshape(self._cropped_mask, self._cropped_mask.shape + (1,) *
+                          (cropped_w.get_shape().ndims -
+                           self._cropped_mask.ndim))
+        cropped_w *= tf.constant(mask, dtype=cropped_w.dtype)
+      self._masked_w_cache[cache_key] = cropped_w
+    cropped_w = self._masked_w_cache[cache_key]
+
+    # Pad (or crop) the inputs such that a VALID convolution with the cropped
+    # kernel gives the same result as the original convolution.
+    before, after = [], []
+    for (low, high), kernel_size, rate in zip(
+        self._mask_bounds, self._kernel_shape, self._rate):
+      if self._padding == SAME:
+        total = (kernel_size - 1) * rate
+        pad_before, pad_after = total // 2, total - total // 2
+      else:
+        pad_before, pad_after = 0, 0
+      before.append(pad_before - low * rate)
+      after.append(pad_after - (kernel_size - 1 - high) * rate)
+    if self._data_format.startswith("NC"):
+      spatial_axes = range(2, self._n + 2)
+    else:
+      spatial_axes = range(1, self._n + 1)
+    inputs = _pad_or_crop(inputs, spatial_axes, before, after)
+
+    return tf.nn.convolution(inputs, cropped_w, strides=self._stride,
+                             padding=VALID, dilation_rate=self._rate,
+                             data_format=self._data_format)
+
   def _apply_conv(self, inputs, w):
     """Apply a convolution operation on `inputs` using variable `w`.
 
@@ -520,11 +679,11 @@ class _ConvND(base.AbstractModule):
 
     return w
 
-  def _apply_mask(self):
-    """Applies the passed-in mask to the convolution matrix.
+  def _check_mask_shape(self, w):
+    """Checks that the mask can be applied to the convolution matrix `w`.
 
-    Returns:
-      w: A copy of the convolution matrix that has had the mask applied.
+    Args:
+      w: The convolution matrix.
 
     Raises:
       base.IncompatibleShapeError: If the mask shape has more dimensions than
@@ -532,8 +691,6 @@ class _ConvND(base.AbstractModule):
       base.IncompatibleShapeError: If the mask and the weight matrix don't
           match on shape.
     """
-    w = self._w
-
     if self._mask.shape.ndims > w.shape.ndims:
       raise base.IncompatibleShapeError(
           "Invalid mask shape: {}. Max shape: {}".format(
@@ -546,15 +703,42 @@ class _ConvND(base.AbstractModule):
               self._mask.shape, w.shape
           )
       )
+
+  def _apply_mask(self):
+    """Applies the passed-in mask to the convolution matrix.
+
+    Returns:
+      w: A copy of the convolution matrix that has had the mask applied.
+
+    Raises:
+      base.IncompatibleShapeError: If the mask shape has more dimensions than
+          the weight matrix.
+      base.IncompatibleShapeError: If the mask and the weight matrix don't
+          match on shape.
+    """
+    w = self._w
+
+    # The masked weights only depend on `w`, so they are shared between
+    # connections. Tensors created inside a control flow construct (e.g. the
+    # body of a `tf.while_loop`) cannot be used outside of it, hence the
+    # control flow context is part of the key.
+    cache_key = (w, tf.get_default_graph()._get_control_flow_context())  # pylint: disable=protected-access
+    if cache_key in self._masked_w_cache:
+      return self._masked_w_cache[cache_key]
+
+    self._check_mask_shape(w)
     # TF broadcasting is a bit fragile.
-    # Expand the shape of self._mask by one dim at a time to the right
-    # until the rank matches `weight_shape`.
-    while self._mask.shape.ndims < w.shape.ndims:
-      self._mask = tf.expand_dims(self._mask, -1)
+    # Pad the shape of the mask with ones to the right until the rank matches
+    # `weight_shape`.
+    mask = self._mask
+    if mask.shape.ndims < w.shape.ndims:
+      mask = tf.reshape(mask, mask.shape.as_list() +
+                        [1] * (w.shape.ndims - mask.shape.ndims))
 
     # tf.Variable & tf.ResourceVariable don't support *=.
-    w = w * self._mask  # pylint: disable=g-no-augmented-assignment
+    w = w * mask  # pylint: disable=g-no-augmented-assignment
 
+    self._masked_w_cache[cache_key] = w
     return w
 
   @property
@@ -669,6 +853,9 @@ class _ConvND(base.AbstractModule):
     if name is None:
       name = self.module_name + "_clone"
 
+    # Only the modules using the default convolution accept `sparse_mask`.
+    kwargs = {"sparse_mask": True} if self._sparse_mask else {}
+
     return type(self)(output_channels=self.output_channels,
                       kernel_shape=self._kernel_shape,
                       stride=self._stride,
@@ -681,7 +868,8 @@ class _ConvND(base.AbstractModule):
                       mask=self._mask,
                       data_format=self._data_format,
                       custom_getter=self._custom_getter,
-                      name=name)
+                      name=name,
+                      **kwargs)
 
 
 class _ConvNDTranspose(base.AbstractModule):
@@ -1100,7 +1288,7 @@ class Conv1D(_ConvND, base.Transposable):
                padding=SAME, use_bias=True, initializers=None,
                partitioners=None, regularizers=None, mask=None,
                data_format=DATA_FORMAT_NWC, custom_getter=None,
-               name="conv_1d"):
+               sparse_mask=False, name="conv_1d"):
     """Constructs a Conv1D module.
 
     See the following documentation for an explanation of VALID versus SAME
@@ -1147,6 +1335,9 @@ class Conv1D(_ConvND, base.Transposable):
           correspond to regexes to match variable names. See the
           `tf.get_variable` documentation for information about the
           custom_getter API.
+      sparse_mask: Whether to skip the kernel taps that are zeroed out by
+          `mask` for all channels, see `_ConvND`. Requires a mask with a
+          statically known value and a stride of 1.
       name: Name of the module.
 
     Raises:
@@ -1178,7 +1369,7 @@ class Conv1D(_ConvND, base.Transposable):
         stride=stride, rate=rate, padding=padding, use_bias=use_bias,
         initializers=initializers, partitioners=partitioners,
         regularizers=regularizers, mask=mask, data_format=data_format,
-        custom_getter=custom_getter, name=name)
+        custom_getter=custom_getter, sparse_mask=sparse_mask, name=name)
 
   # Implement Transposable interface
   def transpose(self, name=None):
@@ -1463,6 +1654,211 @@ class CausalConv1D(_ConvND):
     inputs = self._construct_causal_input(inputs)
     return super(CausalConv1D, self)._apply_conv(inputs, w)
 
+  def _build(self, inputs, prev_state=None):
+    """Connects the CausalConv1D module into the graph.
+
+    By default the convolution is applied to the whole sequence in `inputs`.
+    If `prev_state` is given, the module instead runs incrementally: `inputs`
+    must contain a single timestep and `prev_state` holds the past inputs within
+    the receptive field of the convolution (see `incremental_state_size`). Only
+    the taps needed for the new timestep are computed, so the cost of one step
+    does not depend on the length of the sequence seen so far.
+
+    Args:
+      inputs: A 3D Tensor of shape `data_format`, and either of types
+          `tf.float16` or `tf.float32`. When `prev_state` is given, the width
+          dimension of `inputs` must be 1.
+      prev_state: Optional 3D Tensor of shape `data_format` containing the
+          previous `(kernel_shape - 1) * rate` inputs along the width dimension.
+
+    Returns:
+      If `prev_state` is `None`, a 3D Tensor of shape `data_format` with the
+      convolved sequence. Otherwise a tuple `(outputs, next_state)`, where
+      `outputs` is the convolution output for the single timestep and
+      `next_state` has the same shape as `prev_state`.
+
+    Raises:
+      base.IncompatibleShapeError: If the input tensor has the wrong number
+          of dimensions, or if `prev_state` is given and `inputs` contains more
+          than one timestep.
+      base.UnderspecifiedError: If the channel dimension of `inputs` isn't
+          defined.
+      base.NotSupportedError: If `prev_state` is given and the stride is > 1.
+      TypeError: If input Tensor dtype is not compatible with either
+          `tf.float16` or `tf.float32`.
+    """
+    if prev_state is None:
+      return super(CausalConv1D, self)._build(inputs)
+    return self._build_step(inputs, prev_state)
+
+  def _build_step(self, inputs, prev_state):
+    """Computes a single timestep of the causal convolution.
+
+    Args:
+      inputs: A 3D Tensor of shape `data_format` containing a single timestep.
+      prev_state: A 3D Tensor of shape `data_format` containing the previous
+          `(kernel_shape - 1) * rate` inputs.
+
+    Returns:
+      outputs: The convolution output for the single timestep.
+      next_state: The updated buffer of past inputs.
+    """
+    if any(x > 1 for x in self._stride):
+      raise base.NotSupportedError(
+          "Incremental inference requires stride to be 1. Got: {}".format(
+              self._stride))
+    _verify_inputs(inputs, self._channel_index, self._data_format)
+    input_shape = tuple(inputs.get_shape().as_list())
+    self._input_channels = input_shape[self._channel_index]
+
+    time_index = 2 if self._data_format == DATA_FORMAT_NCW else 1
+    if input_shape[time_index] != 1:
+      raise base.IncompatibleShapeError(
+          "Incremental inference requires a single timestep, but inputs had "
+          "shape {}.".format(input_shape))
+
+    self._w = self._construct_w(inputs)
+
+    if self._mask is not None:
+      w = self._apply_mask()
+    else:
+      w = self._w
+
+    kernel_size = self._kernel_shape[0]
+    rate = self._rate[0]
+    window = tf.concat([prev_state, inputs], axis=time_index)
+
+    # The window spans `(kernel_size - 1) * rate + 1` timesteps; only every
+    # `rate`-th entry contributes to the output, oldest first.
+    if self._data_format == DATA_FORMAT_NCW:
+      taps = tf.transpose(window[:, :, ::rate], [0, 2, 1])
+      next_state = window[:, :, 1:]
+    else:  # self._data_format == DATA_FORMAT_NWC
+      taps = window[:, ::rate, :]
+      next_state = window[:, 1:, :]
+
+    taps = tf.reshape(taps, [-1, kernel_size * self._input_channels])
+    w = tf.reshape(w, [kernel_size * self._input_channels,
+                       self.output_channels])
+    outputs = tf.expand_dims(tf.matmul(taps, w), time_index)
+
+    if self._use_bias:
+      self._b, outputs = _apply_bias(
+          inputs, outputs, self._channel_index, self._data_format,
+          self.output_channels, self._initializers, self._partitioners,
+          self._regularizers)
+
+    return outputs, next_state
+
+  @property
+  def incremental_state_size(self):
+    """Returns the state size used when running the module incrementally.
+
+    The shape excludes the batch dimension and follows `data_format`.
+
+    Raises:
+      base.NotConnectedError: If the number of input channels is not known yet.
+    """
+    buffer_length = (self._kernel_shape[0] - 1) * self._rate[0]
+    if self._data_format == DATA_FORMAT_NCW:
+      return tf.TensorShape([self.input_channels, buffer_length])
+    return tf.TensorShape([buffer_length, self.input_channels])
+
+
+class CausalConv1DCore(rnn_core.RNNCore):
+  """RNN core running a `CausalConv1D` module one timestep at a time.
+
+  The core keeps the inputs within the receptive field of the wrapped
+  convolution as its state, so each step only computes the taps of the newest
+  output instead of the whole padded sequence. Variables are shared with the
+  wrapped module, so a `CausalConv1D` trained on full sequences can be used
+  directly for autoregressive generation:
+
+  ```python
+  conv1 = snt.CausalConv1D(output_channels=32, kernel_shape=2, rate=1)
+  conv2 = snt.CausalConv1D(output_channels=32, kernel_shape=2, rate=2)
+  train_output = conv2(tf.nn.relu(conv1(sequence)))
+
+  core = snt.DeepRNN([snt.CausalConv1DCore(conv1, input_channels=16),
+                      tf.nn.relu,
+                      snt.CausalConv1DCore(conv2)],
+                     skip_connections=False)
+  output, next_state = core(timestep, prev_state)
+  ```
+
+  Inputs and outputs of the core have shape `[batch_size, channels]`.
+  """
+
+  def __init__(self, conv_module, input_channels=None,
+               name="causal_conv_1d_core"):
+    """Constructs a CausalConv1DCore.
+
+    Args:
+      conv_module: The `CausalConv1D` module to run incrementally.
+      input_channels: Number of input channels of `conv_module`. Only needed to
+          compute `state_size` before `conv_module` has been connected.
+      name: Name of the module.
+
+    Raises:
+      TypeError: If `conv_module` is not a `CausalConv1D` module.
+      base.NotSupportedError: If the stride of `conv_module` is > 1.
+    """
+    super(CausalConv1DCore, self).__init__(name=name)
+    if not isinstance(conv_module, CausalConv1D):
+      raise TypeError("conv_module must be a CausalConv1D module, got "
+                      "{}.".format(type(conv_module)))
+    if any(x > 1 for x in conv_module.stride):
+      raise base.NotSupportedError(
+          "Incremental inference requires stride to be 1.")
+    self._conv_module = conv_module
+    self._input_channels = input_channels
+    if conv_module.data_format == DATA_FORMAT_NCW:
+      self._time_index = 2
+    else:
+      self._time_index = 1
+
+  def _build(self, inputs, prev_state):
+    """Connects the core into the graph.
+
+    Args:
+      inputs: Tensor of shape `[batch_size, input_channels]`.
+      prev_state: Tensor of shape `[batch_size] + state_size`.
+
+    Returns:
+      A tuple `(output, next_state)` where `output` has shape
+      `[batch_size, output_channels]` and `next_state` has the same shape as
+      `prev_state`.
+    """
+    outputs, next_state = self._conv_module(
+        tf.expand_dims(inputs, self._time_index), prev_state=prev_state)
+    return tf.squeeze(outputs, [self._time_index]), next_state
+
+  @property
+  def conv_module(self):
+    """Returns the wrapped `CausalConv1D` module."""
+    return self._conv_module
+
+  @property
+  def state_size(self):
+    """Returns the size of the buffer of past inputs, without batch dimension.
+
+    Raises:
+      base.NotConnectedError: If `input_channels` was not given and the wrapped
+          module has not been connected yet.
+    """
+    if self._input_channels is None:
+      return self._conv_module.incremental_state_size
+    buffer_length = ((self._conv_module.kernel_shape[0] - 1) *
+                     self._conv_module.rate[0])
+    if self._time_index == 2:
+      return tf.TensorShape([self._input_channels, buffer_length])
+    return tf.TensorShape([buffer_length, self._input_channels])
+
+  @property
+  def output_size(self):
+    """Returns the number of output channels."""
+    return tf.TensorShape([self._conv_module.output_channels])
+
 
 class Conv2D(_ConvND, base.Transposable):
   """Spatial convolution and dilated convolution module, including bias.
@@ -1474,7 +1870,7 @@ class Conv2D(_ConvND, base.Transposable):
                padding=SAME, use_bias=True, initializers=None,
                partitioners=None, regularizers=None, mask=None,
                data_format=DATA_FORMAT_NHWC, custom_getter=None,
-               name="conv_2d"):
+               sparse_mask=False, name="conv_2d"):
     """Constructs a Conv2D module.
 
     See the following documentation for an explanation of VALID versus SAME
@@ -1521,6 +1917,9 @@ class Conv2D(_ConvND, base.Transposable):
           correspond to regexes to match variable names. See the
           `tf.get_variable` documentation for information about the
           custom_getter API.
+      sparse_mask: Whether to skip the kernel taps that are zeroed out by
+          `mask` for all channels, see `_ConvND`. Requires a mask with a
+          statically known value and a stride of 1.
       name: Name of the module.
 
     Raises:
@@ -1552,7 +1951,7 @@ class Conv2D(_ConvND, base.Transposable):
         stride=stride, rate=rate, padding=padding, use_bias=use_bias,
         initializers=initializers, partitioners=partitioners,
         regularizers=regularizers, mask=mask, data_format=data_format,
-        custom_getter=custom_getter, name=name)
+        custom_getter=custom_getter, sparse_mask=sparse_mask, name=name)
 
   # Implements Transposable interface.
   def transpose(self, name=None):
@@ -1723,7 +2122,7 @@ class Conv3D(_ConvND, base.Transposable):
                padding=SAME, use_bias=True, initializers=None,
                partitioners=None, regularizers=None, mask=None,
                data_format=DATA_FORMAT_NDHWC, custom_getter=None,
-               name="conv_3d"):
+               sparse_mask=False, name="conv_3d"):
     """Constructs a Conv3D module.
 
     See the following documentation for an explanation of VALID versus SAME
@@ -1770,6 +2169,9 @@ class Conv3D(_ConvND, base.Transposable):
           correspond to regexes to match variable names. See the
           `tf.get_variable` documentation for information about the
           custom_getter API.
+      sparse_mask: Whether to skip the kernel taps that are zeroed out by
+          `mask` for all channels, see `_ConvND`. Requires a mask with a
+          statically known value and a stride of 1.
       name: Name of the module.
 
     Raises:
@@ -1798,7 +2200,7 @@ class Conv3D(_ConvND, base.Transposable):
         stride=stride, rate=rate, padding=padding, use_bias=use_bias,
         initializers=initializers, partitioners=partitioners,
         regularizers=regularizers, mask=mask, data_format=data_format,
-        custom_getter=custom_getter, name=name)
+        custom_getter=custom_getter, sparse_mask=sparse_mask, name=name)
 
   # Implements Transposable interface.
   def transpose(self, name=None):
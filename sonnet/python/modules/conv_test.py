@@ -919,6 +919,83 @@ class Conv2DTest(parameterized.TestCase, tf.test.TestCase):
       tf.variables_initializer([conv1.w]).run()
       self.assertAllClose(np.reshape(out.eval(), [3, 3]), expected_out)
 
+  def testMaskedWeightsShared(self):
+    """The mask is applied once and shared between connections."""
+    mask = np.ones((3, 3), dtype=np.float32)
+    conv1 = snt.Conv2D(output_channels=1, kernel_shape=3, mask=mask)
+    conv1(tf.zeros([1, 5, 5, 2]))
+    conv1(tf.zeros([1, 5, 5, 2]))
+    conv1(tf.zeros([3, 5, 5, 2]))
+
+    conv_ops = [op for op in tf.get_default_graph().get_operations()
+                if op.type == "Conv2D"]
+    self.assertEqual(len(conv_ops), 3)
+    self.assertEqual(len({op.inputs[1] for op in conv_ops}), 1)
+
+  @parameterized.named_parameters(
+      ("Same", snt.SAME, 1),
+      ("SameDilated", snt.SAME, 2),
+      ("Valid", snt.VALID, 1),
+      ("ValidDilated", snt.VALID, 2))
+  def testSparseMask(self, padding, rate):
+    """Skipping the masked taps gives the same result as the dense mask."""
+    # PixelCNN-style mask: only taps above or left of the centre are kept.
+    mask = np.zeros((5, 5, 2, 3), dtype=np.float32)
+    mask[:2, :, :, :] = 1
+    mask[2, :2, :, :] = 1
+    mask[2, 2, 0, :] = 1
+    inputs = tf.constant(np.random.randn(2, 9, 9, 2).astype(np.float32))
+
+    dense_conv = snt.Conv2D(output_channels=3, kernel_shape=5, rate=rate,
+                            padding=padding, mask=mask, name="dense")
+    sparse_conv = snt.Conv2D(output_channels=3, kernel_shape=5, rate=rate,
+                             padding=padding, mask=mask, sparse_mask=True,
+                             name="sparse")
+    dense_out = dense_conv(inputs)
+    sparse_out = sparse_conv(inputs)
+    self.assertEqual(dense_out.get_shape().as_list(),
+                     sparse_out.get_shape().as_list())
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      sess.run(sparse_conv.w.assign(dense_conv.w))
+      sess.run(sparse_conv.b.assign(dense_conv.b))
+      dense_value, sparse_value = sess.run([dense_out, sparse_out])
+
+    self.assertAllClose(dense_value, sparse_value, atol=1e-5)
+
+  def testSparseMaskErrors(self):
+    mask = np.ones((3, 3), dtype=np.float32)
+    with self.assertRaisesRegexp(ValueError, "requires a mask"):
+      snt.Conv2D(output_channels=1, kernel_shape=3, sparse_mask=True)
+    with self.assertRaisesRegexp(ValueError, "non-zero"):
+      snt.Conv2D(output_channels=1, kernel_shape=3, mask=0 * mask,
+                 sparse_mask=True)
+    with self.assertRaisesRegexp(ValueError, "statically known"):
+      snt.Conv2D(output_channels=1, kernel_shape=3,
+                 mask=tf.placeholder(tf.float32, [3, 3]), sparse_mask=True)
+    with self.assertRaises(snt.NotSupportedError):
+      snt.Conv2D(output_channels=1, kernel_shape=3, stride=2, mask=mask,
+                 sparse_mask=True)
+
+  def testSparseMaskShapeErrors(self):
+    # A mask smaller than the kernel is not cropped into a smaller kernel.
+    with self.assertRaisesRegexp(snt.IncompatibleShapeError,
+                                 "Kernel shape"):
+      snt.Conv2D(output_channels=1, kernel_shape=5,
+                 mask=np.ones((3, 3), dtype=np.float32), sparse_mask=True)
+    with self.assertRaisesRegexp(snt.IncompatibleShapeError, "Max shape"):
+      snt.Conv2D(output_channels=1, kernel_shape=3,
+                 mask=np.ones((3, 3, 2, 1, 1), dtype=np.float32),
+                 sparse_mask=True)
+
+    # The channel dimensions are checked when connecting the module.
+    conv = snt.Conv2D(output_channels=1, kernel_shape=3,
+                      mask=np.ones((3, 3, 4), dtype=np.float32),
+                      sparse_mask=True)
+    with self.assertRaisesRegexp(snt.IncompatibleShapeError, "Weight shape"):
+      conv(tf.zeros([1, 8, 8, 2]))
+
   def testMaskErrorIncompatibleRank1(self):
     """Errors are thrown for incompatible rank 1 mask."""
 
@@ -2258,6 +2335,96 @@ class CausalConv1DTest(parameterized.TestCase, tf.test.TestCase):
       snt.CausalConv1D(output_channels=4, kernel_shape=4,
                        data_format=data_format)(x)
 
+  @parameterized.named_parameters(
+      ("Rate1", 1, True),
+      ("Rate2", 2, True),
+      ("Rate3WithoutBias", 3, False))
+  def testIncrementalMatchesFullSequence(self, rate, use_bias):
+    """Running one step at a time gives the same outputs as the full conv."""
+    batch_size, length, input_channels = 2, 9, 3
+    conv1 = snt.CausalConv1D(
+        output_channels=4,
+        kernel_shape=3,
+        rate=rate,
+        use_bias=use_bias,
+        name="conv1")
+
+    x = np.random.randn(batch_size, length, input_channels).astype(np.float32)
+    full_out = conv1(tf.constant(x))
+
+    state = tf.zeros([batch_size] + conv1.incremental_state_size.as_list())
+    step_outs = []
+    for t in range(length):
+      step_out, state = conv1(tf.constant(x[:, t:t + 1, :]), prev_state=state)
+      step_outs.append(step_out)
+    incremental_out = tf.concat(step_outs, axis=1)
+
+    # Both paths share the same variables.
+    self.assertEqual(len(conv1.get_variables()), 2 if use_bias else 1)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      full_out_value, incremental_out_value = sess.run(
+          [full_out, incremental_out])
+
+    self.assertAllClose(full_out_value, incremental_out_value, atol=1e-5)
+
+  def testIncrementalStrided(self):
+    """Errors are thrown when running a strided conv incrementally."""
+    conv1 = snt.CausalConv1D(output_channels=1, kernel_shape=3, stride=2)
+    with self.assertRaises(snt.NotSupportedError):
+      conv1(tf.zeros([1, 1, 1]), prev_state=tf.zeros([1, 2, 1]))
+    with self.assertRaises(snt.NotSupportedError):
+      snt.CausalConv1DCore(conv1)
+
+  def testIncrementalMultipleTimesteps(self):
+    """Errors are thrown when the incremental input has several timesteps."""
+    conv1 = snt.CausalConv1D(output_channels=1, kernel_shape=3)
+    with self.assertRaisesRegexp(snt.IncompatibleShapeError,
+                                 "single timestep"):
+      conv1(tf.zeros([1, 2, 1]), prev_state=tf.zeros([1, 2, 1]))
+
+
+class CausalConv1DCoreTest(tf.test.TestCase):
+
+  def testStateSize(self):
+    conv1 = snt.CausalConv1D(output_channels=5, kernel_shape=3, rate=4)
+    core = snt.CausalConv1DCore(conv1, input_channels=2)
+    self.assertEqual(core.state_size.as_list(), [8, 2])
+    self.assertEqual(core.output_size.as_list(), [5])
+
+    with self.assertRaises(snt.NotConnectedError):
+      _ = snt.CausalConv1DCore(conv1).state_size
+
+  def testInvalidModule(self):
+    with self.assertRaisesRegexp(TypeError, "CausalConv1D"):
+      snt.CausalConv1DCore(snt.Conv1D(output_channels=1, kernel_shape=3))
+
+  def testDilatedStackMatchesFullSequence(self):
+    """A stack of streaming cores reproduces the full sequence outputs."""
+    batch_size, length, input_channels = 2, 10, 3
+    conv1 = snt.CausalConv1D(output_channels=4, kernel_shape=2, rate=1)
+    conv2 = snt.CausalConv1D(output_channels=4, kernel_shape=2, rate=2)
+    conv3 = snt.CausalConv1D(output_channels=1, kernel_shape=2, rate=4)
+
+    x = np.random.randn(batch_size, length, input_channels).astype(np.float32)
+    full_out = conv3(tf.nn.relu(conv2(tf.nn.relu(conv1(tf.constant(x))))))
+
+    core = snt.DeepRNN([snt.CausalConv1DCore(conv1), tf.nn.relu,
+                        snt.CausalConv1DCore(conv2), tf.nn.relu,
+                        snt.CausalConv1DCore(conv3)],
+                       skip_connections=False)
+    initial_state = core.initial_state(batch_size)
+    incremental_out, _ = tf.nn.dynamic_rnn(
+        core, tf.constant(x), initial_state=initial_state)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      full_out_value, incremental_out_value = sess.run(
+          [full_out, incremental_out])
+
+    self.assertAllClose(full_out_value, incremental_out_value, atol=1e-5)
+
 
 class InPlaneConv2DTest(parameterized.TestCase, tf.test.TestCase):
 
@@ -0,0 +1,377 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Persistent cache of constructed graphs.
+
+Connecting large modules can take minutes, and processes serving or evaluating
+the same model rebuild an identical graph every time they start. `GraphCache`
+stores the constructed graph as a MetaGraph, which includes the Sonnet module
+information of `SONNET_COLLECTION_NAME`, and imports it on later runs instead
+of connecting the modules again:
+
+```python
+cache = snt.GraphCache("/tmp/graph_cache")
+key = snt.graph_cache_key(config, [(tf.float32, [None, 224, 224, 3])])
+
+net = snt.nets.ConvNet2D(**config)
+
+def build():
+  images = tf.placeholder(tf.float32, [None, 224, 224, 3], name="images")
+  return {"images": images, "logits": net(images)}
+
+tensors = cache.load_or_build(key, build, modules=[net])
+```
+
+On a cache hit, `build` is not called. The modules given in `modules`, which
+must have been constructed in the same order as when the graph was cached, are
+rebound to the imported graph: their connected subgraphs and variables are
+restored, and connecting them again reuses the imported variables.
+
+Keys depend on the sources of Sonnet and on the TensorFlow version, so that
+graphs are rebuilt after an upgrade. Changes to other code building the graph
+must be reflected in the configuration of the key.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import functools
+import hashlib
+import json
+import os
+import types
+
+# Dependency imports
+import numpy as np
+import six
+from sonnet.python.modules import base
+from sonnet.python.modules import base_info
+from sonnet.python.modules import util
+import tensorflow as tf
+
+
+_SONNET_DIRECTORY = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_sonnet_source_digest = None
+
+
+def _qualified_name(obj):
+  return "{}.{}".format(getattr(obj, "__module__", ""), obj.__name__)
+
+
+def _stable_default(obj):
+  """Returns a representation of `obj` that is stable across processes.
+
+  Args:
+    obj: An object of a graph cache key configuration which is not natively
+      serializable to JSON.
+
+  Returns:
+    A JSON serializable representation of `obj`, in which other objects are
+    again passed to `_stable_default`.
+
+  Raises:
+    TypeError: If `obj` has no representation identifying it by value, such as
+      modules, lambdas and objects whose `repr` contains their address.
+  """
+  if isinstance(obj, base.AbstractModule):
+    raise TypeError("Modules cannot be part of a graph cache key, use their "
+                    "configuration instead.")
+  if isinstance(obj, tf.DType):
+    return obj.name
+  if isinstance(obj, tf.TensorShape):
+    return obj.as_list() if obj.ndims is not None else None
+  if isinstance(obj, (np.ndarray, np.generic)):
+    return obj.tolist()
+  if isinstance(obj, (set, frozenset)):
+    return sorted(obj, key=repr)
+  if isinstance(obj, functools.partial):
+    return {"partial": obj.func, "args": list(obj.args),
+            "keywords": obj.keywords or {}}
+  if isinstance(obj, types.FunctionType):
+    if obj.__name__ == "<lambda>":
+      raise TypeError("Lambdas cannot be part of a graph cache key, as they "
+                      "are not identified by their name; use a function "
+                      "defined with def instead.")
+    # Closures, such as regularizers, are also identified by the values they
+    # capture.
+    closure = [cell.cell_contents for cell in obj.__closure__ or ()]
+    if closure:
+      return {"function": _qualified_name(obj), "closure": closure}
+    return _qualified_name(obj)
+  if isinstance(obj, six.class_types) or (
+      callable(obj) and hasattr(obj, "__name__")):
+    return _qualified_name(obj)
+  if hasattr(obj, "get_config"):
+    # Initializers and other configurable objects are identified by their
+    # class and configuration.
+    return {"class": _qualified_name(type(obj)), "config": obj.get_config()}
+  raise TypeError(
+      "{!r} of type {} has no representation that is stable across "
+      "processes, and cannot be part of a graph cache key.".format(
+          obj, type(obj).__name__))
+
+
+def _input_signature(inputs):
+  """Returns `[dtype, shape]` pairs of Tensors or `(dtype, shape)` pairs."""
+  signature = []
+  for spec in inputs:
+    if isinstance(spec, (tf.Tensor, tf.SparseTensor)):
+      dtype, shape = spec.dtype, spec.get_shape()
+    else:
+      dtype, shape = spec
+    signature.append([tf.as_dtype(dtype).name,
+                      _stable_default(tf.TensorShape(shape))])
+  return signature
+
+
+def _source_digest():
+  """Returns a digest of the non-test Python sources of Sonnet."""
+  global _sonnet_source_digest
+  if _sonnet_source_digest is None:
+    digest = hashlib.sha256()
+    for directory, subdirectories, filenames in os.walk(_SONNET_DIRECTORY):
+      subdirectories.sort()
+      for filename in sorted(filenames):
+        if not filename.endswith(".py") or filename.endswith("_test.py"):
+          continue
+        path = os.path.join(directory, filename)
+        digest.update(os.path.relpath(path, _SONNET_DIRECTORY).encode("utf-8"))
+        with open(path, "rb") as f:
+          digest.update(f.read())
+    _sonnet_source_digest = digest.hexdigest()
+  return _sonnet_source_digest
+
+
+def graph_cache_key(config, input_signature=()):
+  """Returns the key of a graph in a `GraphCache`.
+
+  Args:
+    config: The configuration of the modules in the graph, such as a dict of
+      their constructor arguments. It must be serializable to JSON, except for
+      functions and classes, which are identified by their module and name and
+      the values captured by closures, `functools.partial` objects, which are
+      identified by their function and arguments, and objects with a
+      `get_config` method such as initializers, which are identified by their
+      class and configuration.
+    input_signature: Iterable of the inputs of the graph, as Tensors or
+      `(dtype, shape)` pairs.
+
+  Returns:
+    A hexadecimal string, which also depends on the sources of Sonnet and on
+    the TensorFlow version.
+
+  Raises:
+    TypeError: If `config` contains modules, lambdas or other objects which
+      cannot be identified by value.
+  """
+  description = json.dumps(
+      {"config": config,
+       "inputs": _input_signature(input_signature),
+       "sonnet": _source_digest(),
+       "tensorflow": tf.VERSION},
+      sort_keys=True, default=_stable_default)
+  return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+
+def _rebind_module(module, module_info, graph):
+  """Rebinds an unconnected `module` to its imported `module_info`."""
+  # pylint: disable=protected-access
+  module._graph = graph
+  module._connected_subgraphs = [
+      base_info.ConnectedSubGraph(module=module,
+                                  name_scope=subgraph.name_scope,
+                                  inputs=subgraph.inputs,
+                                  outputs=subgraph.outputs)
+      for subgraph in module_info.connected_subgraphs]
+
+  # Replace the imported module information by the one of `module`.
+  graph.get_collection_ref(base_info.SONNET_COLLECTION_NAME).remove(
+      module_info)
+  module._set_module_info()
+
+  with graph.as_default():
+    scope = module._template.variable_scope
+    for collection in (tf.GraphKeys.GLOBAL_VARIABLES,
+                       tf.GraphKeys.LOCAL_VARIABLES):
+      module._all_variables.update(
+          util.get_variables_in_scope(scope, collection=collection))
+
+  # Further connections reuse the imported variables. They are not in the
+  # variable store of `graph`, so `tf.get_variable` could not reuse them, and
+  # are instead returned by a custom getter of the scope of the module, below
+  # the custom getters of the module itself.
+  imported_variables = {variable.op.name: variable
+                        for variable in module._all_variables}
+  def imported_variable_getter(getter, name, *args, **kwargs):
+    if name in imported_variables:
+      return imported_variables[name]
+    return getter(name, *args, **kwargs)
+  if scope.custom_getter is None:
+    scope.set_custom_getter(imported_variable_getter)
+  else:
+    scope.set_custom_getter(base._maybe_wrap_custom_getter(
+        scope.custom_getter, imported_variable_getter))
+  module._template._variables_created = True
+  # pylint: enable=protected-access
+
+
+class GraphCache(object):
+  """Persistent cache of constructed graphs, keyed by `graph_cache_key`."""
+
+  def __init__(self, directory, clear_devices=False):
+    """Constructs a GraphCache.
+
+    Args:
+      directory: Directory of the cached graphs, which is created if needed.
+        Any filesystem supported by `tf.gfile` can be used.
+      clear_devices: Whether to clear the devices of the cached graphs when
+        importing them.
+    """
+    self._directory = directory
+    self._clear_devices = clear_devices
+
+  @property
+  def directory(self):
+    return self._directory
+
+  def _paths(self, key):
+    path = os.path.join(self._directory, key)
+    return path + ".meta", path + ".json"
+
+  def contains(self, key):
+    """Returns whether a graph is cached under `key`."""
+    return all(tf.gfile.Exists(path) for path in self._paths(key))
+
+  def _write(self, path, write_fn):
+    """Writes `path` atomically, so that readers never see partial files."""
+    temp_path = "{}.tmp{}".format(path, os.getpid())
+    write_fn(temp_path)
+    tf.gfile.Rename(temp_path, path, overwrite=True)
+
+  def save(self, key, tensors, graph=None):
+    """Saves `graph` in the cache under `key`.
+
+    Args:
+      key: Key of the graph, as returned by `graph_cache_key`.
+      tensors: Dict from names to the Tensors or Operations of `graph` to
+        return when loading it, such as its inputs and outputs.
+      graph: The graph to save. Defaults to the default graph.
+
+    Raises:
+      ValueError: If `tensors` is not a dict of graph elements of `graph`.
+    """
+    graph = graph or tf.get_default_graph()
+    if not isinstance(tensors, dict):
+      raise ValueError("tensors must be a dict, got {}.".format(type(tensors)))
+    names = {}
+    for name, tensor in six.iteritems(tensors):
+      if getattr(tensor, "graph", None) is not graph:
+        raise ValueError("{} is not an element of the cached graph.".format(
+            name))
+      names[name] = tensor.name
+
+    tf.gfile.MakeDirs(self._directory)
+    meta_path, json_path = self._paths(key)
+    self._write(meta_path,
+                lambda path: tf.train.export_meta_graph(filename=path,
+                                                        graph=graph))
+    def write_json(path):
+      with tf.gfile.GFile(path, "w") as f:
+        f.write(json.dumps({"tensors": names}, sort_keys=True))
+    # The JSON file is written last, as it marks the entry as complete.
+    self._write(json_path, write_json)
+
+  def load(self, key, modules=(), graph=None):
+    """Imports the graph cached under `key` into `graph`.
+
+    Args:
+      key: Key of the graph, as returned by `graph_cache_key`.
+      modules: Iterable of unconnected modules to rebind to the imported graph.
+        Each must have the scope name of a module connected in the cached
+        graph, which is the case when modules are constructed in the same
+        order as when the graph was saved.
+      graph: The graph to import into, which should be empty. Defaults to the
+        default graph.
+
+    Returns:
+      The dict of Tensors and Operations passed to `save`.
+
+    Raises:
+      base.Error: If a module is already connected, or is not part of the
+        cached graph.
+      tf.errors.NotFoundError: If no graph is cached under `key`.
+    """
+    graph = graph or tf.get_default_graph()
+    modules = list(modules)
+    for module in modules:
+      if module.is_connected:
+        raise base.Error("Module {} is already connected.".format(
+            module.scope_name))
+
+    meta_path, json_path = self._paths(key)
+    with tf.gfile.GFile(json_path, "r") as f:
+      names = json.loads(f.read())["tensors"]
+
+    with graph.as_default():
+      tf.train.import_meta_graph(meta_path, clear_devices=self._clear_devices)
+
+    module_infos = {
+        module_info.scope_name: module_info
+        for module_info in graph.get_collection(
+            base_info.SONNET_COLLECTION_NAME)}
+    for module in modules:
+      module_info = module_infos.get(module.scope_name)
+      if module_info is None:
+        raise base.Error("Module {} is not part of the cached graph.".format(
+            module.scope_name))
+      _rebind_module(module, module_info, graph)
+
+    return {name: graph.as_graph_element(tensor_name)
+            for name, tensor_name in six.iteritems(names)}
+
+  def load_or_build(self, key, build_fn, modules=(), graph=None):
+    """Loads the graph cached under `key`, or builds and caches it.
+
+    Args:
+      key: Key of the graph, as returned by `graph_cache_key`.
+      build_fn: Callable without arguments building the graph, which is only
+        called on a cache miss. It must return a dict from names to Tensors or
+        Operations, such as the inputs and outputs of the graph.
+      modules: Iterable of modules connected by `build_fn`, which are rebound
+        to the imported graph on a cache hit. Modules connected again after a
+        hit must be listed together with the submodules they construct in
+        their constructor, such as the layers of `snt.nets.MLP`, so that all
+        of them reuse the imported variables. Only the state common to all
+        modules is restored: the variable scope, variables and connected
+        subgraphs. Attributes set by `_build` of specific modules, such as the
+        `w` property of `snt.Linear`, are not; use `get_variables()` or
+        `last_connected_subgraph` instead.
+      graph: The graph to build in or import into. Defaults to the default
+        graph.
+
+    Returns:
+      The dict returned by `build_fn`, or its cached equivalent.
+    """
+    graph = graph or tf.get_default_graph()
+    if self.contains(key):
+      return self.load(key, modules=modules, graph=graph)
+
+    with graph.as_default():
+      tensors = build_fn()
+    self.save(key, tensors, graph=graph)
+    return tensors
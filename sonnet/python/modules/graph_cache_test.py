@@ -0,0 +1,159 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for sonnet.python.modules.graph_cache."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import functools
+import os
+
+# Dependency imports
+import mock
+import numpy as np
+import sonnet as snt
+from sonnet.python.modules import graph_cache
+import tensorflow as tf
+
+
+class GraphCacheKeyTest(tf.test.TestCase):
+
+  def testKey(self):
+    config = {"output_sizes": [4, 2], "activation": tf.nn.relu}
+    signature = [(tf.float32, [None, 3])]
+    key = snt.graph_cache_key(config, signature)
+
+    self.assertEqual(key, snt.graph_cache_key(dict(config), signature))
+    self.assertEqual(
+        key, snt.graph_cache_key(config, [tf.placeholder(tf.float32,
+                                                         [None, 3])]))
+    self.assertNotEqual(
+        key, snt.graph_cache_key({"output_sizes": [4, 2],
+                                  "activation": tf.nn.tanh}, signature))
+    self.assertNotEqual(
+        key, snt.graph_cache_key(config, [(tf.float32, [None, 4])]))
+
+  def testSonnetSources(self):
+    key = snt.graph_cache_key({})
+    self.assertEqual(key, snt.graph_cache_key({}))
+    with mock.patch.object(graph_cache, "_sonnet_source_digest", "modified"):
+      self.assertNotEqual(key, snt.graph_cache_key({}))
+
+  def testInitializers(self):
+    def config(stddev):
+      return {
+          "initializers": {
+              "w": tf.truncated_normal_initializer(stddev=stddev),
+              "b": tf.constant_initializer(0.1)},
+          "regularizers": {"w": tf.contrib.layers.l2_regularizer(stddev)},
+          "activation": functools.partial(tf.clip_by_value,
+                                          clip_value_min=-stddev,
+                                          clip_value_max=stddev)}
+
+    # Equal configurations constructed separately have the same key.
+    self.assertEqual(snt.graph_cache_key(config(0.1)),
+                     snt.graph_cache_key(config(0.1)))
+    self.assertNotEqual(snt.graph_cache_key(config(0.1)),
+                        snt.graph_cache_key(config(0.2)))
+
+  def testUnstableConfigRaises(self):
+    with self.assertRaisesRegexp(TypeError, "Lambdas"):
+      snt.graph_cache_key({"activation": lambda x: x})
+    with self.assertRaises(TypeError):
+      snt.graph_cache_key({"object": object()})
+    with self.assertRaises(TypeError):
+      snt.graph_cache_key({"module": snt.Linear(2)})
+
+
+class GraphCacheTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(GraphCacheTest, self).setUp()
+    self.cache = snt.GraphCache(os.path.join(self.get_temp_dir(), "cache"))
+    self.num_builds = 0
+
+  def _load_or_build(self):
+    config = {
+        "output_sizes": [4, 2],
+        "initializers": {"w": tf.constant_initializer(0.5),
+                         "b": tf.constant_initializer(0.1)}}
+    self.key = snt.graph_cache_key(config, [(tf.float32, [None, 3])])
+    mlp = snt.nets.MLP(**config)
+
+    def build():
+      self.num_builds += 1
+      inputs = tf.placeholder(tf.float32, [None, 3], name="inputs")
+      return {"inputs": inputs, "outputs": mlp(inputs)}
+
+    tensors = self.cache.load_or_build(self.key, build,
+                                       modules=[mlp] + list(mlp.layers))
+    return mlp, tensors
+
+  def _evaluate(self, tensors):
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      return session.run(tensors["outputs"],
+                         feed_dict={tensors["inputs"]: np.ones([2, 3])})
+
+  def testLoadOrBuild(self):
+    with tf.Graph().as_default():
+      _, tensors = self._load_or_build()
+      expected = self._evaluate(tensors)
+    self.assertEqual(self.num_builds, 1)
+    self.assertTrue(self.cache.contains(self.key))
+
+    with tf.Graph().as_default() as graph:
+      mlp, tensors = self._load_or_build()
+      self.assertEqual(self.num_builds, 1)
+      self.assertAllClose(self._evaluate(tensors), expected)
+
+      self.assertTrue(mlp.is_connected)
+      self.assertIs(mlp.graph, graph)
+      self.assertIs(mlp.last_connected_subgraph.outputs, tensors["outputs"])
+      self.assertEqual(len(mlp.get_variables()), 4)
+      self.assertEqual(len(mlp.get_all_variables()), 4)
+      module_infos = graph.get_collection(snt.SONNET_COLLECTION_NAME)
+      self.assertEqual(
+          len([info for info in module_infos if info.scope_name == "mlp"]), 1)
+
+      # Connecting the module again reuses the imported variables.
+      outputs = mlp(tf.ones([2, 3]))
+      self.assertEqual(len(tf.global_variables()), 4)
+      self.assertEqual(set(mlp.get_all_variables()),
+                       set(tf.global_variables()))
+      with self.test_session() as session:
+        session.run(tf.global_variables_initializer())
+        self.assertAllClose(session.run(outputs), expected)
+
+  def testConnectedModuleRaises(self):
+    with tf.Graph().as_default():
+      self._load_or_build()
+
+    with tf.Graph().as_default():
+      lin = snt.Linear(2, name="mlp")
+      lin(tf.zeros([1, 3]))
+      with self.assertRaises(snt.Error):
+        self.cache.load(self.key, modules=[lin])
+
+  def testSaveRaises(self):
+    with tf.Graph().as_default():
+      with self.assertRaises(ValueError):
+        self.cache.save(snt.graph_cache_key({}), [tf.zeros([1])])
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -0,0 +1,207 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Export of trained modules as frozen inference graphs.
+
+Training graphs contain moving average update ops, `tf.cond` branches on
+`is_training` and variables, none of which are needed for serving.
+`export_inference_graph` connects a trained module once more in inference mode,
+with Python boolean `is_training` and `test_local_stats` flags so that
+`snt.BatchNorm`, dropout and other conditional branches are resolved at graph
+construction time, and freezes the variables into constants:
+
+```python
+inference_graph = snt.export_inference_graph(
+    net, session, {"inputs": (tf.float32, [None, 28, 28, 1])},
+    export_dir="/tmp/model")
+seconds_per_run = snt.benchmark_inference_graph(
+    inference_graph, {"inputs": np.zeros([32, 28, 28, 1])})
+```
+
+The exported graph only contains the ops computing the outputs from the inputs,
+and no collections, so neither update ops nor Sonnet module information.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import inspect
+import time
+
+# Dependency imports
+import six
+from sonnet.python.ops import nest
+import tensorflow as tf
+
+
+InferenceGraph = collections.namedtuple(
+    "InferenceGraph", ("graph_def", "inputs", "outputs"))
+
+
+# Connection flags set to `False` in inference mode, when `_build` takes them.
+_INFERENCE_FLAGS = ("is_training", "test_local_stats")
+
+
+def _inference_kwargs(module, build_kwargs):
+  """Returns `build_kwargs` with the inference flags `module` supports."""
+  kwargs = dict(build_kwargs or {})
+  build = getattr(module, "_build", module)
+  try:
+    arg_spec = inspect.getargspec(build)
+  except TypeError:
+    return kwargs
+  for flag in _INFERENCE_FLAGS:
+    if flag in arg_spec.args:
+      kwargs.setdefault(flag, False)
+  return kwargs
+
+
+def _named_outputs(outputs):
+  """Returns an ordered dict of the named Tensors in `outputs`."""
+  if isinstance(outputs, dict):
+    items = sorted(six.iteritems(outputs))
+  elif isinstance(outputs, (tf.Tensor, tf.Variable)):
+    items = [("outputs", outputs)]
+  else:
+    items = [("outputs_{}".format(i), output)
+             for i, output in enumerate(nest.flatten(outputs))]
+  return collections.OrderedDict(
+      (name, tf.identity(output, name=name)) for name, output in items)
+
+
+def export_inference_graph(module, session, input_signature,
+                           build_kwargs=None, export_dir=None,
+                           name="inference"):
+  """Exports `module` as a frozen inference graph.
+
+  The module is connected to new placeholders in `session.graph`, under the
+  name scope `name`, with `is_training=False` and `test_local_stats=False` if
+  its `_build` accepts these arguments. Batch normalization then uses its
+  moving statistics and creates no update ops, and conditionals built with
+  `snt.smart_cond` are resolved statically. The variables read by the outputs
+  are then replaced by constants holding their values in `session`.
+
+  Args:
+    module: A trained module or callable. It is connected once more, with
+      keyword arguments named after the inputs.
+    session: A `tf.Session` holding the trained variable values.
+    input_signature: Dict from names of `_build` arguments to `(dtype, shape)`
+      pairs, or to Tensors whose dtype and shape are used.
+    build_kwargs: Optional dict of additional keyword arguments for `module`.
+      Values given for the inference flags are used instead of `False`.
+    export_dir: Optional directory where a SavedModel with the tag "serve" and
+      a default serving signature is written. It must not exist.
+    name: Name scope of the inference connection.
+
+  Returns:
+    An `InferenceGraph` whose `graph_def` is the frozen `tf.GraphDef`, and
+    `inputs` and `outputs` are dicts from names to tensor names in it. A dict
+    output keeps its keys, a single Tensor is named "outputs", and the
+    elements of other nested outputs are named "outputs_<i>" in the order of
+    `nest.flatten`.
+
+  Raises:
+    ValueError: If an input is not used to compute the outputs.
+  """
+  graph = session.graph
+  with graph.as_default(), tf.name_scope(name):
+    inputs = collections.OrderedDict()
+    for input_name, spec in sorted(six.iteritems(input_signature)):
+      if isinstance(spec, tf.Tensor):
+        dtype, shape = spec.dtype, spec.get_shape()
+      else:
+        dtype, shape = spec
+      inputs[input_name] = tf.placeholder(dtype, shape, name=input_name)
+    kwargs = _inference_kwargs(module, build_kwargs)
+    kwargs.update(inputs)
+    outputs = _named_outputs(module(**kwargs))
+
+  output_nodes = [output.op.name for output in outputs.values()]
+  graph_def = tf.graph_util.convert_variables_to_constants(
+      session, graph.as_graph_def(), output_nodes)
+  graph_def = tf.graph_util.remove_training_nodes(
+      graph_def, protected_nodes=output_nodes)
+
+  node_names = set(node.name for node in graph_def.node)
+  for input_name, placeholder in six.iteritems(inputs):
+    if placeholder.op.name not in node_names:
+      raise ValueError("Input {} is not used to compute the outputs.".format(
+          input_name))
+
+  inference_graph = InferenceGraph(
+      graph_def=graph_def,
+      inputs={k: v.name for k, v in six.iteritems(inputs)},
+      outputs={k: v.name for k, v in six.iteritems(outputs)})
+  if export_dir is not None:
+    _write_saved_model(inference_graph, export_dir)
+  return inference_graph
+
+
+def _write_saved_model(inference_graph, export_dir):
+  """Writes `inference_graph` as a SavedModel with a serving signature."""
+  with tf.Graph().as_default() as graph:
+    tf.import_graph_def(inference_graph.graph_def, name="")
+
+    def tensor_infos(names):
+      return {
+          key: tf.saved_model.utils.build_tensor_info(
+              graph.get_tensor_by_name(tensor_name))
+          for key, tensor_name in six.iteritems(names)}
+
+    signature = tf.saved_model.signature_def_utils.build_signature_def(
+        inputs=tensor_infos(inference_graph.inputs),
+        outputs=tensor_infos(inference_graph.outputs),
+        method_name=tf.saved_model.signature_constants.PREDICT_METHOD_NAME)
+    builder = tf.saved_model.builder.SavedModelBuilder(export_dir)
+    with tf.Session(graph=graph) as session:
+      builder.add_meta_graph_and_variables(
+          session, [tf.saved_model.tag_constants.SERVING],
+          signature_def_map={
+              tf.saved_model.signature_constants
+              .DEFAULT_SERVING_SIGNATURE_DEF_KEY: signature},
+          clear_devices=True)
+    builder.save()
+
+
+def benchmark_inference_graph(inference_graph, feed_values, num_runs=100,
+                              num_warmup_runs=10, config=None):
+  """Returns the mean time in seconds to compute the outputs of a graph.
+
+  Args:
+    inference_graph: An `InferenceGraph` returned by `export_inference_graph`.
+    feed_values: Dict from input names to the values to feed.
+    num_runs: Number of timed runs.
+    num_warmup_runs: Number of runs before timing, which allocate memory and
+      select kernels.
+    config: Optional `tf.ConfigProto` of the benchmark session.
+
+  Returns:
+    The mean wall time of a run, in seconds.
+  """
+  with tf.Graph().as_default() as graph:
+    tf.import_graph_def(inference_graph.graph_def, name="")
+    fetches = [graph.get_tensor_by_name(name)
+               for name in inference_graph.outputs.values()]
+    feed_dict = {graph.get_tensor_by_name(inference_graph.inputs[key]): value
+                 for key, value in six.iteritems(feed_values)}
+    with tf.Session(graph=graph, config=config) as session:
+      for _ in range(num_warmup_runs):
+        session.run(fetches, feed_dict=feed_dict)
+      start = time.time()
+      for _ in range(num_runs):
+        session.run(fetches, feed_dict=feed_dict)
+      return (time.time() - start) / max(num_runs, 1)
@@ -0,0 +1,116 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for sonnet.python.modules.inference_export."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+# Dependency imports
+import numpy as np
+import sonnet as snt
+import tensorflow as tf
+
+
+class ExportInferenceGraphTest(tf.test.TestCase):
+
+  def setUp(self):
+    super(ExportInferenceGraphTest, self).setUp()
+    self.inputs_np = np.random.randn(4, 8, 8, 3).astype(np.float32)
+    self.net = snt.nets.ConvNet2D(output_channels=[4, 4],
+                                  kernel_shapes=[3],
+                                  strides=[1],
+                                  paddings=[snt.SAME],
+                                  use_batch_norm=True)
+    is_training = tf.placeholder(tf.bool, [])
+    self.net(tf.constant(self.inputs_np), is_training=is_training)
+    self.expected = self.net(tf.constant(self.inputs_np), is_training=False,
+                             test_local_stats=False)
+
+  def _assign_moving_statistics(self, session):
+    for variable in tf.global_variables():
+      if "moving_" in variable.name:
+        session.run(tf.assign(variable, tf.random_uniform(
+            variable.get_shape(), 0.5, 1.5)))
+
+  def testFrozenGraph(self):
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      self._assign_moving_statistics(session)
+      expected = session.run(self.expected)
+      inference_graph = snt.export_inference_graph(
+          self.net, session, {"inputs": (tf.float32, [None, 8, 8, 3])})
+
+    self.assertEqual(inference_graph.inputs, {"inputs": "inference/inputs:0"})
+    self.assertEqual(inference_graph.outputs,
+                     {"outputs": "inference/outputs:0"})
+    op_types = set(node.op for node in inference_graph.graph_def.node)
+    self.assertIn("Placeholder", op_types)
+    for op_type in ("VariableV2", "VarHandleOp", "AssignSub", "Switch",
+                    "Merge"):
+      self.assertNotIn(op_type, op_types)
+
+    with tf.Graph().as_default() as graph:
+      tf.import_graph_def(inference_graph.graph_def, name="")
+      self.assertEqual(graph.get_all_collection_keys(), [])
+      with self.test_session(graph=graph) as session:
+        outputs = session.run(inference_graph.outputs["outputs"],
+                              feed_dict={inference_graph.inputs["inputs"]:
+                                             self.inputs_np})
+    self.assertAllClose(outputs, expected, atol=1e-5)
+
+    seconds_per_run = snt.benchmark_inference_graph(
+        inference_graph, {"inputs": self.inputs_np}, num_runs=2,
+        num_warmup_runs=1)
+    self.assertGreater(seconds_per_run, 0.0)
+
+  def testSavedModel(self):
+    export_dir = os.path.join(self.get_temp_dir(), "saved_model")
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      expected = session.run(self.expected)
+      snt.export_inference_graph(
+          self.net, session, {"inputs": (tf.float32, [None, 8, 8, 3])},
+          export_dir=export_dir)
+
+    with tf.Graph().as_default():
+      with self.test_session() as session:
+        meta_graph_def = tf.saved_model.loader.load(
+            session, [tf.saved_model.tag_constants.SERVING], export_dir)
+        signature = meta_graph_def.signature_def[
+            tf.saved_model.signature_constants
+            .DEFAULT_SERVING_SIGNATURE_DEF_KEY]
+        outputs = session.run(
+            signature.outputs["outputs"].name,
+            feed_dict={signature.inputs["inputs"].name: self.inputs_np})
+    self.assertAllClose(outputs, expected, atol=1e-5)
+
+  def testUnusedInputRaises(self):
+    lin = snt.Linear(2)
+    lin(tf.zeros([1, 3]))
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      with self.assertRaises(ValueError):
+        snt.export_inference_graph(
+            lambda inputs, unused: lin(inputs), session,
+            {"inputs": (tf.float32, [None, 3]),
+             "unused": (tf.float32, [None, 3])})
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -13,12 +13,13 @@
 # limitations under the License.
 # ============================================================================
 
-"""Layer normalization module for Sonnet.
+"""Layer and group normalization modules for Sonnet.
 
 This contains the module LayerNorm, which performs layer normalization on
-its inputs.
+its inputs, and the module GroupNorm, which normalizes groups of channels.
 
-Original paper: https://arxiv.org/abs/1607.06450.
+Original papers: https://arxiv.org/abs/1607.06450,
+https://arxiv.org/abs/1803.08494.
 
 """
 
@@ -33,6 +34,66 @@ from sonnet.python.modules import util
 import tensorflow as tf
 
 
+def _moments(inputs, axes):
+  """Computes the mean and variance of `inputs` over `axes` in a single pass.
+
+  The sums of the shifted inputs and of their squares are computed from the
+  inputs directly, rather than computing the mean before the squared
+  deviations. The inputs are shifted by their first element along `axes` to
+  limit cancellation when the mean is large compared to the standard
+  deviation.
+
+  Args:
+    inputs: A Tensor.
+    axes: List of axes to reduce over.
+
+  Returns:
+    Tuple of (mean, variance), with the reduced axes kept with size 1.
+  """
+  ndims = inputs.get_shape().ndims
+  begin = [0] * ndims
+  size = [-1] * ndims
+  for axis in axes:
+    size[axis] = 1
+  shift = tf.stop_gradient(tf.slice(inputs, begin, size))
+  counts, shifted_sum, shifted_squared_sum, _ = tf.nn.sufficient_statistics(
+      inputs, axes, shift=shift, keep_dims=True)
+  return tf.nn.normalize_moments(counts, shifted_sum, shifted_squared_sum,
+                                 shift)
+
+
+def _normalize(inputs, mean, variance, gamma, beta, eps):
+  """Returns `gamma * (inputs - mean) / sqrt(variance + eps) + beta`.
+
+  The scale and offset are folded together first, so the inputs are only read
+  once by a single multiply-add.
+
+  Args:
+    inputs: A Tensor.
+    mean: Mean, broadcastable to `inputs`.
+    variance: Variance, broadcastable to `inputs`.
+    gamma: Scale, broadcastable to `inputs`.
+    beta: Offset, broadcastable to `inputs`.
+    eps: Small number added to the variance.
+
+  Returns:
+    A Tensor of the shape of `inputs`.
+  """
+  scale = tf.rsqrt(variance + eps) * gamma
+  return inputs * scale + (beta - mean * scale)
+
+
+def _channel_index(data_format, rank):
+  """Returns the index of the channel dimension, or raises an error."""
+  if data_format is None:
+    return rank - 1
+  if len(data_format) != rank:
+    raise base.IncompatibleShapeError(
+        "Incorrect data format {} for input of rank {}.".format(
+            data_format, rank))
+  return data_format.index("C")
+
+
 class LayerNorm(base.AbstractModule):
   """Layer normalization module.
 
@@ -46,6 +107,10 @@ class LayerNorm(base.AbstractModule):
   where mu and sigma are respectively the mean and standard deviation of x.
   Gamma and beta are trainable parameters for scaling and shifting respectively.
 
+  The statistics are computed over all dimensions but the batch dimension, in a
+  single pass over the inputs. Gamma and beta have one element per channel, so
+  this module can normalize the outputs of convolutions, e.g. in
+  `snt.nets.ConvNet2D(normalization_ctor=snt.LayerNorm)`.
   """
 
   GAMMA = "gamma"  # Layer norm scaling.
@@ -61,6 +126,7 @@ class LayerNorm(base.AbstractModule):
                initializers=None,
                partitioners=None,
                regularizers=None,
+               data_format=None,
                name="layer_norm"):
     """Constructs a LayerNorm module.
 
@@ -75,6 +141,9 @@ class LayerNorm(base.AbstractModule):
       regularizers: Optional dict containing regularizers for the scale (with
         key 'gamma') and bias (with key 'beta').. As a default, no regularizers
         are used.
+      data_format: Optional data format of the inputs, such as "NHWC" or
+        "NCHW", defining the channel dimension of gamma and beta. If not
+        provided, channels are the last dimension.
       name: name of the module.
 
     Raises:
@@ -82,10 +151,15 @@ class LayerNorm(base.AbstractModule):
         any keys other than `gamma` or `beta`.
       TypeError: If any of the given initializers, partitioners or regularizers
         are not callable.
+      ValueError: If `data_format` has no channel dimension.
     """
     super(LayerNorm, self).__init__(name=name)
 
+    if data_format is not None and "C" not in data_format:
+      raise ValueError("Invalid data_format: %r" % (data_format,))
+
     self._eps = eps
+    self._data_format = data_format
 
     self._initializers = util.check_initializers(initializers,
                                                  self.POSSIBLE_INITIALIZER_KEYS)
@@ -98,13 +172,17 @@ class LayerNorm(base.AbstractModule):
     """Connects the LayerNorm module into the graph.
 
     Args:
-      inputs: a Tensor of shape `[batch_size, layer_dim]`.
+      inputs: a Tensor of shape `[batch_size, layer_dim]`, or of higher rank
+        such as `[batch_size, height, width, channels]`.
 
     Returns:
       normalized: layer normalized outputs with same shape as inputs.
 
     Raises:
       base.NotSupportedError: If `inputs` has data type of `tf.float16`.
+      base.NotSupportedError: If `inputs` has rank lower than 2.
+      base.IncompatibleShapeError: If `data_format` does not match the rank of
+        `inputs`.
     """
 
     if inputs.dtype == tf.float16:
@@ -112,12 +190,14 @@ class LayerNorm(base.AbstractModule):
           "LayerNorm does not support `tf.float16`, insufficient "
           "precision for calculating sufficient statistics.")
 
-    if inputs.get_shape().ndims != 2:
+    rank = inputs.get_shape().ndims
+    if rank is None or rank < 2:
       raise base.NotSupportedError(
-          "Layer normalization expects inputs of rank 2."
-          " Got inputs of rank {}.".format(inputs.get_shape().ndims))
+          "Layer normalization expects inputs of rank at least 2."
+          " Got inputs of rank {}.".format(rank))
 
-    hidden_size = inputs.get_shape()[1].value
+    channel_index = _channel_index(self._data_format, rank)
+    hidden_size = inputs.get_shape()[channel_index].value
 
     if self.GAMMA not in self._initializers:
       self._initializers[self.GAMMA] = create_gamma_initializer()
@@ -139,12 +219,199 @@ class LayerNorm(base.AbstractModule):
         partitioner=self._partitioners.get(self.BETA),
         regularizer=self._regularizers.get(self.BETA))
 
-    mean, var = tf.nn.moments(inputs, [1], keep_dims=True)
+    params_shape = [1] * rank
+    params_shape[channel_index] = hidden_size
+    gamma = tf.reshape(self._gamma, params_shape)
+    beta = tf.reshape(self._beta, params_shape)
+
+    mean, var = _moments(inputs, list(range(1, rank)))
+
+    normalized = _normalize(inputs, mean, var, gamma, beta, self._eps)
+    return normalized
+
+  @property
+  def initializers(self):
+    return self._initializers
+
+  @property
+  def partitioners(self):
+    return self._partitioners
+
+  @property
+  def regularizers(self):
+    return self._regularizers
+
+  @property
+  def beta(self):
+    self._ensure_is_connected()
+    return self._beta
+
+  @property
+  def gamma(self):
+    self._ensure_is_connected()
+    return self._gamma
+
+
+class GroupNorm(base.AbstractModule):
+  """Group normalization module.
+
+  Implementation based on:
+  https://arxiv.org/abs/1803.08494
+
+  The channels are split into `groups` groups, and each group is normalized
+  with the mean and standard deviation of its channels over all spatial
+  positions of each example:
+
+    outputs = gamma * (x - mu_group) / sigma_group + beta
+
+  where gamma and beta are trainable, per-channel parameters. As with
+  `snt.LayerNorm`, the statistics do not depend on the batch, so the module
+  behaves identically during training and evaluation. It can be used in
+  `snt.nets.ConvNet2D(normalization_ctor=snt.GroupNorm)`.
+  """
+
+  GAMMA = "gamma"  # Group norm scaling.
+  BETA = "beta"  # Group norm bias.
+
+  POSSIBLE_INITIALIZER_KEYS = {GAMMA, BETA}
+
+  def __init__(self,
+               groups=32,
+               eps=1e-5,
+               data_format=None,
+               initializers=None,
+               partitioners=None,
+               regularizers=None,
+               name="group_norm"):
+    """Constructs a GroupNorm module.
+
+    Args:
+      groups: Number of groups of channels. The number of channels of the
+        inputs must be a multiple of `groups`.
+      eps: small epsilon to avoid division by zero variance.
+      data_format: Optional data format of the inputs, such as "NHWC" or
+        "NCHW". If not provided, channels are the last dimension.
+      initializers: Dict containing ops to initialize the scale
+        (with key 'gamma') and bias (with key 'beta').
+      partitioners: Optional dict containing partitioners to partition
+        the scale (with key 'gamma') and bias (with key 'beta'). As a default,
+        no partitioners are used.
+      regularizers: Optional dict containing regularizers for the scale (with
+        key 'gamma') and bias (with key 'beta'). As a default, no regularizers
+        are used.
+      name: name of the module.
+
+    Raises:
+      KeyError: If `initializers`, `partitioners` or `regularizers` contain
+        any keys other than `gamma` or `beta`.
+      TypeError: If any of the given initializers, partitioners or regularizers
+        are not callable.
+      ValueError: If `groups` is not positive or if `data_format` has no
+        channel dimension.
+    """
+    super(GroupNorm, self).__init__(name=name)
+
+    if groups < 1:
+      raise ValueError("groups must be positive, got {}.".format(groups))
+    if data_format is not None and "C" not in data_format:
+      raise ValueError("Invalid data_format: %r" % (data_format,))
+
+    self._groups = groups
+    self._eps = eps
+    self._data_format = data_format
 
-    normalized = tf.nn.batch_normalization(inputs, mean, var, self._beta,
-                                           self._gamma, self._eps)
+    self._initializers = util.check_initializers(initializers,
+                                                 self.POSSIBLE_INITIALIZER_KEYS)
+    self._partitioners = util.check_partitioners(partitioners,
+                                                 self.POSSIBLE_INITIALIZER_KEYS)
+    self._regularizers = util.check_regularizers(regularizers,
+                                                 self.POSSIBLE_INITIALIZER_KEYS)
+
+  def _build(self, inputs):
+    """Connects the GroupNorm module into the graph.
+
+    Args:
+      inputs: a Tensor of rank at least 2, such as
+        `[batch_size, height, width, channels]`.
+
+    Returns:
+      normalized: group normalized outputs with same shape as inputs.
+
+    Raises:
+      base.NotSupportedError: If `inputs` has data type of `tf.float16`.
+      base.NotSupportedError: If `inputs` has rank lower than 2.
+      base.IncompatibleShapeError: If `data_format` does not match the rank of
+        `inputs`, or if the number of channels is unknown or not a multiple of
+        `groups`.
+    """
+    if inputs.dtype == tf.float16:
+      raise base.NotSupportedError(
+          "GroupNorm does not support `tf.float16`, insufficient "
+          "precision for calculating sufficient statistics.")
+
+    rank = inputs.get_shape().ndims
+    if rank is None or rank < 2:
+      raise base.NotSupportedError(
+          "Group normalization expects inputs of rank at least 2."
+          " Got inputs of rank {}.".format(rank))
+
+    channel_index = _channel_index(self._data_format, rank)
+    num_channels = inputs.get_shape()[channel_index].value
+    if num_channels is None:
+      raise base.IncompatibleShapeError(
+          "Number of channels must be known at module build time.")
+    groups = self._groups
+    if num_channels % groups:
+      raise base.IncompatibleShapeError(
+          "Number of channels {} is not a multiple of groups {}.".format(
+              num_channels, groups))
+
+    if self.GAMMA not in self._initializers:
+      self._initializers[self.GAMMA] = create_gamma_initializer()
+    self._gamma = tf.get_variable(
+        self.GAMMA,
+        shape=[num_channels],
+        dtype=inputs.dtype,
+        initializer=self._initializers[self.GAMMA],
+        partitioner=self._partitioners.get(self.GAMMA),
+        regularizer=self._regularizers.get(self.GAMMA))
+
+    if self.BETA not in self._initializers:
+      self._initializers[self.BETA] = create_beta_initializer()
+    self._beta = tf.get_variable(
+        self.BETA,
+        shape=[num_channels],
+        dtype=inputs.dtype,
+        initializer=self._initializers[self.BETA],
+        partitioner=self._partitioners.get(self.BETA),
+        regularizer=self._regularizers.get(self.BETA))
+
+    # Splits the channel dimension into `[groups, num_channels // groups]`,
+    # and reduces over every other dimension but the batch and the groups.
+    input_shape = tf.shape(inputs)
+    grouped_shape = tf.concat(
+        [input_shape[:channel_index],
+         [groups, num_channels // groups],
+         input_shape[channel_index + 1:]], axis=0)
+    grouped = tf.reshape(inputs, grouped_shape)
+    axes = [axis for axis in range(1, rank + 1) if axis != channel_index]
+
+    params_shape = [1] * (rank + 1)
+    params_shape[channel_index:channel_index + 2] = [
+        groups, num_channels // groups]
+    gamma = tf.reshape(self._gamma, params_shape)
+    beta = tf.reshape(self._beta, params_shape)
+
+    mean, var = _moments(grouped, axes)
+    normalized = _normalize(grouped, mean, var, gamma, beta, self._eps)
+    normalized = tf.reshape(normalized, input_shape)
+    normalized.set_shape(inputs.get_shape())
     return normalized
 
+  @property
+  def groups(self):
+    return self._groups
+
   @property
   def initializers(self):
     return self._initializers
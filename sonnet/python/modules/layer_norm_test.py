@@ -25,6 +25,7 @@ import numpy as np
 import sonnet as snt
 import tensorflow as tf
 
+from sonnet.python.modules import layer_norm
 from tensorflow.python.ops import variables
 
 
@@ -36,13 +37,16 @@ class LayerNormTest(parameterized.TestCase, tf.test.TestCase):
     layer_norm1 = snt.LayerNorm()
     layer_norm1(inputs)
 
-    err = (r"Layer normalization expects inputs of rank 2. "
+    err = (r"Layer normalization expects inputs of rank at least 2. "
            r"Got inputs of rank \d.")
     with self.assertRaisesRegexp(snt.Error, err):
-      malformed_inputs = tf.placeholder(tf.float32, shape=[None, 64, 1])
+      malformed_inputs = tf.placeholder(tf.float32, shape=[64])
       layer_norm2 = snt.LayerNorm()
       layer_norm2(malformed_inputs)
 
+    with self.assertRaises(snt.IncompatibleShapeError):
+      snt.LayerNorm(data_format="NCHW")(inputs)
+
   def testFloat16Error(self):
     inputs = tf.placeholder(tf.float16, shape=[None, 64])
     layer_norm = snt.LayerNorm()
@@ -80,6 +84,56 @@ class LayerNormTest(parameterized.TestCase, tf.test.TestCase):
       self.assertAllClose(outputs_.mean(axis=1), [0., 0.], atol=1e-04)
       self.assertAllClose(outputs_.var(axis=1), [1., 1.], atol=1e-04)
 
+  @parameterized.parameters("NHWC", "NCHW")
+  def testNormalizationConv(self, data_format):
+    inputs_np = 100. + np.random.randn(2, 3, 4, 5).astype(np.float32)
+    ln = snt.LayerNorm(data_format=data_format)
+    outputs = ln(tf.constant(inputs_np))
+    channel_index = data_format.index("C")
+    self.assertEqual(ln.gamma.get_shape(), [inputs_np.shape[channel_index]])
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      outputs_ = sess.run(outputs)
+
+    mean = inputs_np.mean(axis=(1, 2, 3), keepdims=True)
+    std = np.sqrt(inputs_np.var(axis=(1, 2, 3), keepdims=True) + 1e-5)
+    self.assertAllClose(outputs_, (inputs_np - mean) / std, atol=1e-3)
+
+  def testGradients(self):
+    inputs_np = np.random.randn(4, 6).astype(np.float32)
+    inputs = tf.constant(inputs_np)
+    outputs = snt.LayerNorm()(inputs)
+    mean, var = tf.nn.moments(inputs, [1], keep_dims=True)
+    expected = (inputs - mean) * tf.rsqrt(var + 1e-5)
+    weights = tf.constant(np.random.randn(4, 6).astype(np.float32))
+    grads = tf.gradients(tf.reduce_sum(outputs * weights), inputs)
+    expected_grads = tf.gradients(tf.reduce_sum(expected * weights), inputs)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      self.assertAllClose(*sess.run([grads, expected_grads]), atol=1e-4)
+
+  def testMomentsSinglePass(self):
+    inputs_np = (1e3 + np.random.randn(4, 5, 6)).astype(np.float32)
+    inputs = tf.placeholder(tf.float32, [None, 5, 6])
+    mean, var = layer_norm._moments(inputs, [1, 2])
+
+    # Both sums reduce the inputs directly, without first computing the mean or
+    # copying the inputs.
+    ops = tf.get_default_graph().get_operations()
+    reductions = [op for op in ops if op.type == "Sum"]
+    self.assertEqual(len(reductions), 2)
+    for op in reductions:
+      self.assertEqual(op.inputs[0].get_shape().as_list(), [None, 5, 6])
+    self.assertFalse([op for op in ops if op.type in ("Pack", "ConcatV2")])
+
+    with self.test_session() as sess:
+      mean_, var_ = sess.run([mean, var], feed_dict={inputs: inputs_np})
+    self.assertAllClose(mean_, inputs_np.mean(axis=(1, 2), keepdims=True))
+    self.assertAllClose(var_, inputs_np.var(axis=(1, 2), keepdims=True),
+                        rtol=1e-3)
+
   def testSharing(self):
     """Check that the correct number of variables are made when sharing."""
 
@@ -169,5 +223,54 @@ class LayerNormTest(parameterized.TestCase, tf.test.TestCase):
     self.assertEqual(type(ln.beta), variables.PartitionedVariable)
 
 
+
+class GroupNormTest(parameterized.TestCase, tf.test.TestCase):
+
+  @parameterized.parameters(
+      ("NHWC", 4, [2, 3, 3, 8]),
+      ("NCHW", 4, [2, 8, 3, 3]),
+      ("NHWC", 8, [2, 3, 3, 8]),
+      (None, 2, [5, 6]),
+  )
+  def testNormalization(self, data_format, groups, shape):
+    inputs_np = 10. + np.random.randn(*shape).astype(np.float32)
+    gn = snt.GroupNorm(groups=groups, data_format=data_format)
+    outputs = gn(tf.constant(inputs_np))
+    self.assertEqual(outputs.get_shape(), shape)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      outputs_ = sess.run(outputs)
+
+    # Moves channels last and splits them into groups.
+    if data_format == "NCHW":
+      inputs_np = np.transpose(inputs_np, [0, 2, 3, 1])
+      outputs_ = np.transpose(outputs_, [0, 2, 3, 1])
+    batch_size, num_channels = shape[0], inputs_np.shape[-1]
+    grouped = inputs_np.reshape([batch_size, -1, groups, num_channels // groups])
+    mean = grouped.mean(axis=(1, 3), keepdims=True)
+    std = np.sqrt(grouped.var(axis=(1, 3), keepdims=True) + 1e-5)
+    expected = ((grouped - mean) / std).reshape(inputs_np.shape)
+    self.assertAllClose(outputs_, expected, atol=1e-3)
+
+  def testErrors(self):
+    with self.assertRaises(ValueError):
+      snt.GroupNorm(groups=0)
+    with self.assertRaisesRegexp(snt.IncompatibleShapeError, "multiple"):
+      snt.GroupNorm(groups=4)(tf.placeholder(tf.float32, [None, 6]))
+    with self.assertRaisesRegexp(snt.IncompatibleShapeError, "multiple"):
+      snt.GroupNorm(groups=32)(tf.placeholder(tf.float32, [None, 4, 4, 3]))
+    with self.assertRaisesRegexp(snt.IncompatibleShapeError, "known"):
+      snt.GroupNorm(groups=2)(tf.placeholder(tf.float32, [None, 4, 4, None]))
+    with self.assertRaises(snt.NotSupportedError):
+      snt.GroupNorm()(tf.placeholder(tf.float16, [None, 6]))
+
+  def testSharing(self):
+    gn = snt.GroupNorm(groups=2)
+    gn(tf.placeholder(tf.float32, shape=[None, 4, 4, 6]))
+    gn(tf.placeholder(tf.float32, shape=[None, 8, 8, 6]))
+    self.assertEqual(len(tf.get_collection(tf.GraphKeys.GLOBAL_VARIABLES)), 2)
+
+
 if __name__ == "__main__":
   tf.test.main()
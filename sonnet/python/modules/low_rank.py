@@ -0,0 +1,372 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Low-rank factorization of trained Linear and Conv2D layers.
+
+`factorize_low_rank` reads the trained weights of a network, truncates the
+singular value decomposition of each `snt.Linear` and `snt.Conv2D` kernel, and
+returns a smaller `snt.Sequential` computing an approximation of the network:
+
+```python
+factorized, reports = snt.factorize_low_rank(mlp, session, energy=0.95)
+for report in reports:
+  print(report.name, report.rank, report.num_params,
+        report.factorized_num_params)
+```
+
+A Linear layer with weights `w` of shape `[n, m]` becomes a pair of Linear
+layers of shapes `[n, r]` and `[r, m]`. A Conv2D kernel of shape
+`[kh, kw, c, m]` becomes either a `[kh, kw, c, r]` convolution followed by a
+1x1 convolution to `m` channels ("pointwise"), or a `snt.SeparableConv2D` with
+channel multiplier `r` ("separable").
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+
+# Dependency imports
+import numpy as np
+from sonnet.python.modules import base
+from sonnet.python.modules import basic
+from sonnet.python.modules import batch_norm_folding
+from sonnet.python.modules import conv
+from sonnet.python.modules import sequential
+import tensorflow as tf
+
+
+LowRankReport = collections.namedtuple(
+    "LowRankReport",
+    ("name", "factorized", "rank", "max_rank", "energy", "relative_error",
+     "num_params", "factorized_num_params", "flops", "factorized_flops"))
+
+
+_CONV_FACTORIZATIONS = ("pointwise", "separable")
+
+
+def _select_rank(singular_values, rank, energy):
+  """Returns the rank to keep given all singular values of a kernel.
+
+  Args:
+    singular_values: Array whose last dimension contains singular values in
+      decreasing order. Leading dimensions index independent decompositions
+      truncated to the same rank.
+    rank: Requested rank, or None.
+    energy: Requested fraction of the squared singular values to keep, or
+      None.
+
+  Returns:
+    The smallest rank keeping at least `energy` of the total energy, or `rank`
+    capped to the number of singular values.
+  """
+  max_rank = singular_values.shape[-1]
+  if rank is not None:
+    return min(rank, max_rank)
+  squares = np.square(singular_values.astype(np.float64))
+  total = np.sum(squares)
+  if total == 0:
+    return 1
+  cumulative = np.cumsum(np.sum(np.reshape(squares, [-1, max_rank]), axis=0))
+  return min(int(np.searchsorted(cumulative, energy * total * (1 - 1e-12))) + 1,
+             max_rank)
+
+
+def _kept_energy(singular_values, rank):
+  squares = np.square(singular_values.astype(np.float64))
+  total = np.sum(squares)
+  if total == 0:
+    return 1.0
+  return float(np.sum(squares[..., :rank]) / total)
+
+
+def _factors(u, s, vt, rank):
+  """Returns balanced factors of the rank `rank` approximation of a SVD."""
+  sqrt_s = np.sqrt(s[..., :rank])
+  return (u[..., :rank] * sqrt_s[..., np.newaxis, :],
+          sqrt_s[..., :, np.newaxis] * vt[..., :rank, :])
+
+
+def _relative_error(w, approximation):
+  norm = np.linalg.norm(w)
+  if norm == 0:
+    return 0.0
+  return float(np.linalg.norm(w - approximation) / norm)
+
+
+def _output_spatial_size(layer):
+  """Returns the number of output pixels of a conv layer, or None."""
+  outputs = layer.last_connected_subgraph.outputs
+  shape = outputs.get_shape().as_list()
+  spatial = shape[2:] if layer.data_format.startswith("NC") else shape[1:-1]
+  if None in spatial:
+    return None
+  return int(np.prod(spatial))
+
+
+def _factorize_linear(layer, values, rank, energy):
+  """Returns `(modules, report)` of the low-rank factorization of a Linear."""
+  w = values["w"]
+  b = values.get("b")
+  input_size, output_size = w.shape
+  bias_params = 0 if b is None else output_size
+  num_params = w.size + bias_params
+
+  u, s, vt = np.linalg.svd(w, full_matrices=False)
+  r = _select_rank(s, rank, energy)
+  factorized_num_params = (input_size + output_size) * r + bias_params
+  factorized = factorized_num_params < num_params
+  if factorized:
+    w_u, w_v = _factors(u, s, vt, r)
+    relative_error = _relative_error(w, np.dot(w_u, w_v))
+  else:
+    r = len(s)
+    factorized_num_params = num_params
+    relative_error = 0.0
+
+  report = LowRankReport(
+      name=layer.module_name,
+      factorized=factorized,
+      rank=r,
+      max_rank=len(s),
+      energy=_kept_energy(s, r),
+      relative_error=relative_error,
+      num_params=num_params,
+      factorized_num_params=factorized_num_params,
+      flops=2 * w.size,
+      factorized_flops=2 * (factorized_num_params - bias_params))
+  if not factorized:
+    return [layer], report
+
+  many_batch_dims = layer.allow_many_batch_dims
+  initializers = {"w": tf.constant_initializer(w_v.astype(w.dtype))}
+  if b is not None:
+    initializers["b"] = tf.constant_initializer(b)
+  modules = [
+      basic.Linear(output_size=r,
+                   use_bias=False,
+                   initializers={
+                       "w": tf.constant_initializer(w_u.astype(w.dtype))},
+                   allow_many_batch_dims=many_batch_dims,
+                   name=layer.module_name + "_u"),
+      basic.Linear(output_size=output_size,
+                   use_bias=b is not None,
+                   initializers=initializers,
+                   allow_many_batch_dims=many_batch_dims,
+                   name=layer.module_name + "_v"),
+  ]
+  return modules, report
+
+
+def _factorize_conv2d(layer, values, rank, energy, conv_factorization):
+  """Returns `(modules, report)` of the low-rank factorization of a Conv2D."""
+  w = values["w"]
+  b = values.get("b")
+  kernel_height, kernel_width, input_channels, output_channels = w.shape
+  kernel_size = kernel_height * kernel_width
+  spatial_size = _output_spatial_size(layer)
+  bias_params = 0 if b is None else output_channels
+  num_params = w.size + bias_params
+
+  if conv_factorization == "pointwise":
+    # The kernel as a single [kh * kw * c, m] matrix.
+    matrices = np.reshape(w, [kernel_size * input_channels, output_channels])
+    factor_params = kernel_size * input_channels + output_channels
+  else:
+    # One [kh * kw, m] matrix per input channel, all truncated to the channel
+    # multiplier of the depthwise convolution.
+    matrices = np.reshape(w, [kernel_size, input_channels, output_channels])
+    matrices = np.transpose(matrices, [1, 0, 2])
+    factor_params = (kernel_size + output_channels) * input_channels
+  u, s, vt = np.linalg.svd(matrices, full_matrices=False)
+  r = _select_rank(s, rank, energy)
+  factorized_num_params = factor_params * r + bias_params
+
+  # Separable convolutions do not support dilation.
+  factorized = (factorized_num_params < num_params and
+                (conv_factorization == "pointwise" or
+                 tuple(layer.rate) == (1, 1)))
+  if factorized:
+    w_u, w_v = _factors(u, s, vt, r)
+    approximation = np.matmul(w_u, w_v)
+    if conv_factorization == "separable":
+      approximation = np.transpose(approximation, [1, 0, 2])
+    relative_error = _relative_error(w, np.reshape(approximation, w.shape))
+  else:
+    r = s.shape[-1]
+    factorized_num_params = num_params
+    relative_error = 0.0
+
+  if spatial_size is None:
+    flops = factorized_flops = None
+  else:
+    flops = 2 * spatial_size * w.size
+    factorized_flops = 2 * spatial_size * (factorized_num_params - bias_params)
+  report = LowRankReport(
+      name=layer.module_name,
+      factorized=factorized,
+      rank=r,
+      max_rank=s.shape[-1],
+      energy=_kept_energy(s, r),
+      relative_error=relative_error,
+      num_params=num_params,
+      factorized_num_params=factorized_num_params,
+      flops=flops,
+      factorized_flops=factorized_flops)
+  if not factorized:
+    return [layer], report
+
+  initializers = {}
+  if b is not None:
+    initializers["b"] = tf.constant_initializer(b)
+
+  # pylint: disable=protected-access
+  if conv_factorization == "pointwise":
+    initializers["w"] = tf.constant_initializer(
+        np.reshape(w_v, [1, 1, r, output_channels]).astype(w.dtype))
+    modules = [
+        conv.Conv2D(output_channels=r,
+                    kernel_shape=layer._kernel_shape,
+                    stride=layer._stride,
+                    rate=layer._rate,
+                    padding=layer._padding,
+                    use_bias=False,
+                    initializers={"w": tf.constant_initializer(
+                        np.reshape(w_u, [kernel_height, kernel_width,
+                                         input_channels, r]).astype(w.dtype))},
+                    data_format=layer._data_format,
+                    name=layer.module_name + "_u"),
+        conv.Conv2D(output_channels=output_channels,
+                    kernel_shape=1,
+                    use_bias=b is not None,
+                    initializers=initializers,
+                    data_format=layer._data_format,
+                    name=layer.module_name + "_v"),
+    ]
+  else:
+    # The depthwise output channel `i * r + j` is the `j`-th factor of the
+    # input channel `i`.
+    w_dw = np.reshape(np.transpose(w_u, [1, 0, 2]),
+                      [kernel_height, kernel_width, input_channels, r])
+    w_pw = np.reshape(w_v, [1, 1, input_channels * r, output_channels])
+    initializers["w_dw"] = tf.constant_initializer(w_dw.astype(w.dtype))
+    initializers["w_pw"] = tf.constant_initializer(w_pw.astype(w.dtype))
+    modules = [
+        conv.SeparableConv2D(output_channels=output_channels,
+                             channel_multiplier=r,
+                             kernel_shape=layer._kernel_shape,
+                             stride=layer._stride,
+                             padding=layer._padding,
+                             use_bias=b is not None,
+                             initializers=initializers,
+                             data_format=layer._data_format,
+                             name=layer.module_name),
+    ]
+  # pylint: enable=protected-access
+  return modules, report
+
+
+def factorize_low_rank(module, session, rank=None, energy=None,
+                       conv_factorization="pointwise", name=None):
+  """Returns a copy of `module` with low-rank Linear and Conv2D layers.
+
+  The kernel of each `snt.Linear` and `snt.Conv2D` in `module` is replaced by
+  its truncated singular value decomposition, computed offline with NumPy. The
+  rank is either given, or the smallest keeping the fraction `energy` of the
+  sum of squared singular values. Layers whose factorization would not have
+  fewer parameters are kept as is and share their variables with `module`.
+
+  Supported inputs are a connected `snt.Linear`, `snt.Conv2D`,
+  `snt.nets.MLP`, `snt.nets.ConvNet2D` or `snt.Sequential` of those and of
+  stateless callables such as activations, which are kept as is. Batch
+  normalization must be folded first with `snt.fold_batch_norm`.
+
+  The reports give, per factorized layer, the relative Frobenius error of the
+  approximated kernel and the parameters and FLOPs per example before and after
+  factorization. The effect on the outputs of the network can be measured with
+  `snt.quantization_report`.
+
+  Args:
+    module: The trained module to factorize. It must have been connected to
+      the graph.
+    session: A `tf.Session` used to read the trained variable values.
+    rank: Rank of the factorization of every layer. For "separable" conv
+      factorization, this is the channel multiplier.
+    energy: Fraction in `(0, 1]` of the energy of the singular values to keep
+      in each layer. Exactly one of `rank` and `energy` must be given.
+    conv_factorization: Either "pointwise", to factorize Conv2D layers into a
+      convolution to `rank` channels followed by a 1x1 convolution, or
+      "separable", to factorize them into a `snt.SeparableConv2D`. Dilated
+      convolutions are not factorized with "separable".
+    name: Optional name of the returned module. Defaults to the name of
+      `module` with "_low_rank" appended.
+
+  Returns:
+    A tuple `(factorized, reports)` of an unconnected `snt.Sequential`, which
+    must be connected and initialized before use, and a list of
+    `LowRankReport`, one per Linear or Conv2D layer of `module`.
+
+  Raises:
+    ValueError: If not exactly one of `rank` and `energy` is given, if they
+      are out of range, or if `conv_factorization` is invalid.
+    snt.NotConnectedError: If `module` or any of its layers is not connected.
+    snt.NotSupportedError: If `module` contains normalization modules or a
+      masked convolution.
+  """
+  if (rank is None) == (energy is None):
+    raise ValueError("Exactly one of rank and energy must be given.")
+  if rank is not None and rank < 1:
+    raise ValueError("rank must be positive, got {}.".format(rank))
+  if energy is not None and not 0 < energy <= 1:
+    raise ValueError("energy must be in (0, 1], got {}.".format(energy))
+  if conv_factorization not in _CONV_FACTORIZATIONS:
+    raise ValueError("conv_factorization must be one of {}, got {}.".format(
+        _CONV_FACTORIZATIONS, conv_factorization))
+  if name is None:
+    name = getattr(module, "module_name", "module") + "_low_rank"
+
+  layers = batch_norm_folding._flatten_layers(module)  # pylint: disable=protected-access
+  factorizable = []
+  for layer in layers:
+    if batch_norm_folding._unwrap_batch_norm(layer) is not None:  # pylint: disable=protected-access
+      raise base.NotSupportedError(
+          "Batch normalization must be folded with snt.fold_batch_norm before "
+          "factorization.")
+    if type(layer) is conv.Conv2D and layer.mask is not None:  # pylint: disable=unidiomatic-typecheck
+      raise base.NotSupportedError(
+          "Factorization of masked convolutions is not supported.")
+    if type(layer) in (basic.Linear, conv.Conv2D):  # pylint: disable=unidiomatic-typecheck
+      factorizable.append(layer)
+
+  values = session.run([
+      {"w": layer.w, "b": layer.b} if layer.has_bias else {"w": layer.w}
+      for layer in factorizable])
+
+  factorized = {}
+  reports = []
+  for layer, layer_values in zip(factorizable, values):
+    if isinstance(layer, basic.Linear):
+      modules, report = _factorize_linear(layer, layer_values, rank, energy)
+    else:
+      modules, report = _factorize_conv2d(layer, layer_values, rank, energy,
+                                          conv_factorization)
+    factorized[layer] = modules
+    reports.append(report)
+
+  factorized_layers = []
+  for layer in layers:
+    factorized_layers.extend(factorized.get(layer, [layer]))
+  return sequential.Sequential(factorized_layers, name=name), reports
@@ -0,0 +1,135 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for sonnet.python.modules.low_rank."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Dependency imports
+from absl.testing import parameterized
+import numpy as np
+import sonnet as snt
+import tensorflow as tf
+
+
+def _low_rank_matrix(rows, cols, rank):
+  return np.dot(np.random.randn(rows, rank),
+                np.random.randn(rank, cols)).astype(np.float32)
+
+
+class FactorizeLowRankTest(parameterized.TestCase, tf.test.TestCase):
+
+  def _factorize(self, module, inputs, **kwargs):
+    outputs = module(inputs)
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      factorized, reports = snt.factorize_low_rank(module, session, **kwargs)
+      factorized_outputs = factorized(inputs)
+      session.run(tf.variables_initializer(
+          [v for v in factorized.get_all_variables()
+           if v not in module.get_all_variables()]))
+      outputs, factorized_outputs = session.run([outputs, factorized_outputs])
+    return factorized, reports, outputs, factorized_outputs
+
+  def testLinearEnergy(self):
+    inputs = tf.constant(np.random.randn(3, 16).astype(np.float32))
+    lin = snt.Linear(12, initializers={
+        "w": tf.constant_initializer(_low_rank_matrix(16, 12, 2))})
+
+    factorized, reports, outputs, factorized_outputs = self._factorize(
+        lin, inputs, energy=0.999)
+
+    self.assertEqual([layer.module_name for layer in factorized.layers],
+                     ["linear_u", "linear_v"])
+    self.assertEqual(factorized.layers[0].output_size, 2)
+    report, = reports
+    self.assertTrue(report.factorized)
+    self.assertEqual(report.rank, 2)
+    self.assertEqual(report.max_rank, 12)
+    self.assertEqual(report.num_params, 16 * 12 + 12)
+    self.assertEqual(report.factorized_num_params, (16 + 12) * 2 + 12)
+    self.assertEqual(report.flops, 2 * 16 * 12)
+    self.assertLess(report.relative_error, 1e-5)
+    self.assertAllClose(factorized_outputs, outputs, atol=1e-4)
+
+  def testMLPRank(self):
+    inputs = tf.constant(np.random.randn(3, 16).astype(np.float32))
+    mlp = snt.nets.MLP([16, 2])
+
+    factorized, reports, outputs, factorized_outputs = self._factorize(
+        mlp, inputs, rank=4)
+
+    # The second layer is too small to benefit from factorization.
+    self.assertEqual([report.factorized for report in reports], [True, False])
+    self.assertEqual(reports[0].rank, 4)
+    self.assertGreater(reports[0].relative_error, 0.0)
+    self.assertLess(reports[0].energy, 1.0)
+    self.assertIs(factorized.layers[-1], mlp.layers[-1])
+    self.assertEqual(factorized_outputs.shape, outputs.shape)
+
+  @parameterized.parameters("pointwise", "separable")
+  def testConv2D(self, conv_factorization):
+    inputs = tf.constant(np.random.randn(2, 8, 8, 6).astype(np.float32))
+    # Every [kh * kw, m] slice, and the [kh * kw * c, m] kernel, has rank 2.
+    w = np.reshape(_low_rank_matrix(3 * 3 * 6, 16, 2), [3, 3, 6, 16])
+    conv = snt.Conv2D(16, kernel_shape=3, stride=2,
+                      initializers={"w": tf.constant_initializer(w)})
+
+    factorized, reports, outputs, factorized_outputs = self._factorize(
+        conv, inputs, rank=2, conv_factorization=conv_factorization)
+
+    report, = reports
+    self.assertTrue(report.factorized)
+    self.assertEqual(report.flops, 2 * 4 * 4 * w.size)
+    self.assertLess(report.factorized_flops, report.flops)
+    if conv_factorization == "pointwise":
+      self.assertEqual(factorized.layers[0].output_channels, 2)
+      self.assertEqual(factorized.layers[1].kernel_shape, (1, 1))
+    else:
+      self.assertIsInstance(factorized.layers[0], snt.SeparableConv2D)
+    self.assertAllClose(factorized_outputs, outputs, atol=1e-4)
+
+  def testBatchNormRaises(self):
+    inputs = tf.constant(np.random.randn(2, 8, 8, 3).astype(np.float32))
+    net = snt.nets.ConvNet2D(output_channels=[4, 4],
+                             kernel_shapes=[3],
+                             strides=[1],
+                             paddings=[snt.SAME],
+                             use_batch_norm=True)
+    net(inputs, is_training=False)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      with self.assertRaisesRegexp(snt.NotSupportedError, "fold_batch_norm"):
+        snt.factorize_low_rank(net, session, rank=2)
+
+  def testErrors(self):
+    lin = snt.Linear(4)
+    lin(tf.zeros([2, 4]))
+    with self.test_session() as session:
+      with self.assertRaises(ValueError):
+        snt.factorize_low_rank(lin, session)
+      with self.assertRaises(ValueError):
+        snt.factorize_low_rank(lin, session, rank=2, energy=0.9)
+      with self.assertRaises(ValueError):
+        snt.factorize_low_rank(lin, session, energy=1.5)
+      with self.assertRaises(ValueError):
+        snt.factorize_low_rank(lin, session, rank=2, conv_factorization="cp")
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -0,0 +1,315 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Per-module accounting of parameter memory, activation memory and FLOPs.
+
+`module_report` walks the tree of modules built inside a connected module and
+returns, for each of them, the bytes of its variables, the bytes of its outputs
+for each connection and an estimate of the FLOPs of all its connections:
+
+```python
+logits = mlp(images)
+report = snt.module_report(mlp, batch_size=32)
+snt.log_module_report(report)
+with open("report.json", "w") as f:
+  f.write(snt.module_report_to_json(report))
+```
+
+FLOPs count a multiply-add as two operations and are estimated from the shapes
+of the variables and of the inputs and outputs of each connection, for
+`snt.Linear`, convolutions, RNN cores and attention modules. Elementwise
+operations, such as activations and normalization, are not counted.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import json
+
+# Dependency imports
+import numpy as np
+from sonnet.python.modules import attention
+from sonnet.python.modules import base
+from sonnet.python.modules import base_info
+from sonnet.python.modules import basic
+from sonnet.python.modules import conv
+from sonnet.python.modules import relational_memory
+from sonnet.python.modules import rnn_core
+from sonnet.python.modules import util
+from sonnet.python.ops import nest
+import tensorflow as tf
+
+
+ModuleReport = collections.namedtuple(
+    "ModuleReport",
+    ("name", "class_name", "num_params", "param_bytes", "activation_bytes",
+     "flops", "children"))
+
+
+def _num_elements(shape, batch_size):
+  """Returns the number of elements of `shape`, with unknown dims set."""
+  if shape.ndims is None:
+    return 0
+  return int(np.prod([batch_size if dim is None else dim
+                      for dim in shape.as_list()]))
+
+
+def _tensors(nested):
+  return [value for value in nest.flatten(nested)
+          if isinstance(value, (tf.Tensor, tf.Variable))]
+
+
+def _num_bytes(tensors, batch_size):
+  return sum(_num_elements(tensor.get_shape(), batch_size) *
+             tensor.dtype.base_dtype.size for tensor in tensors)
+
+
+def _connection_flops(module, subgraph, weights, batch_size):
+  """Returns the estimated FLOPs of a single connection of `module`.
+
+  Args:
+    module: A connected module.
+    subgraph: A `ConnectedSubGraph` of `module`.
+    weights: Variables of rank 2 or more created by `module` itself rather
+      than by its children.
+    batch_size: Size of unknown dimensions.
+
+  Returns:
+    The FLOPs of the connection, not including those of its children.
+  """
+  inputs = _tensors(subgraph.inputs)
+  outputs = _tensors(subgraph.outputs)
+  num_weights = sum(w.get_shape().num_elements() for w in weights)
+
+  if isinstance(module, (basic.Linear, basic.EnsembleLinear, conv._ConvND)):  # pylint: disable=protected-access
+    # Each output element is a dot product of (num_weights / output_channels)
+    # inputs.
+    # For `snt.EnsembleLinear`, the weights of all `num_models` models are
+    # stacked, but each output element only uses those of its own model.
+    output = outputs[0]
+    output_channels = output.get_shape().as_list()[
+        1 if getattr(module, "_data_format", "").startswith("NC") else -1]
+    num_models = getattr(module, "num_models", 1)
+    return (2 * _num_elements(output.get_shape(), batch_size) * num_weights //
+            (max(output_channels or 1, 1) * num_models))
+
+  if isinstance(module, conv._ConvNDTranspose):  # pylint: disable=protected-access
+    # Each input element is multiplied by (num_weights / input_channels)
+    # weights.
+    inputs = inputs[0]
+    input_channels = inputs.get_shape().as_list()[
+        1 if module._data_format.startswith("NC") else -1]  # pylint: disable=protected-access
+    return (2 * _num_elements(inputs.get_shape(), batch_size) * num_weights //
+            max(input_channels or 1, 1))
+
+  if isinstance(module, attention.AttentiveRead):
+    # Weighted sum of the [batch_size, memory_size, word_size] memory.
+    memory = subgraph.inputs["memory"]
+    return 2 * _num_elements(memory.get_shape(), batch_size)
+
+  flops = 0
+  if isinstance(module, rnn_core.RNNCore) and inputs:
+    # Matrix multiplications by the weights of the core, for a single step.
+    batch = inputs[0].get_shape().as_list()[0] or batch_size
+    flops += 2 * batch * num_weights
+
+  if isinstance(module, relational_memory.RelationalMemory):
+    # pylint: disable=protected-access
+    batch = subgraph.inputs["memory"].get_shape().as_list()[0] or batch_size
+    input_shape = subgraph.inputs["inputs"].get_shape().as_list()
+    num_input_slots = (
+        input_shape[1] if subgraph.inputs.get("treat_input_as_matrix") else 1)
+    num_slots = module._mem_slots + num_input_slots
+    # Logits and weighted sums of the multi-head attention of each block.
+    flops += (2 * batch * module._num_heads * num_slots * num_slots *
+              (module._key_size + module._head_size) * module._num_blocks)
+    # pylint: enable=protected-access
+
+  return flops
+
+
+def _connected_modules(graph):
+  """Returns the live modules connected in `graph`, in order of connection."""
+  modules = []
+  for module_info in graph.get_collection(base_info.SONNET_COLLECTION_NAME):
+    if not module_info.connected_subgraphs:
+      continue
+    module = module_info.connected_subgraphs[0].module
+    if isinstance(module, base.AbstractModule):
+      modules.append(module)
+  return modules
+
+
+def _subgraphs_within(module, subgraphs):
+  """Returns the connections of `module` made within one of `subgraphs`."""
+  name_scopes = [subgraph.name_scope + "/" for subgraph in subgraphs]
+  return [subgraph for subgraph in module.connected_subgraphs
+          if any(subgraph.name_scope.startswith(name_scope)
+                 for name_scope in name_scopes)]
+
+
+def _descendants(module, subgraphs, candidates):
+  """Returns the modules nested in `module`, with their nested connections.
+
+  A module is nested in `module` if it was connected within the name scope of
+  one of `subgraphs`, as the layers of `snt.Sequential` or the cores of
+  `snt.DeepRNN` are, or if it was created within the variable scope of
+  `module`.
+
+  Args:
+    module: A connected module.
+    subgraphs: The connections of `module` to look for nested modules in.
+    candidates: List of the modules which may be nested in `module`.
+
+  Returns:
+    List of `(descendant, descendant_subgraphs)` pairs, in the order of
+    `candidates`, where `descendant_subgraphs` are the connections of the
+    descendant made within `subgraphs`, or all of its connections if it was
+    only created within the variable scope of `module`.
+  """
+  prefix = module.scope_name + "/"
+  descendants = []
+  for other in candidates:
+    if other is module:
+      continue
+    other_subgraphs = _subgraphs_within(other, subgraphs)
+    if not other_subgraphs and other.scope_name.startswith(prefix):
+      other_subgraphs = list(other.connected_subgraphs)
+    if other_subgraphs:
+      descendants.append((other, other_subgraphs))
+  return descendants
+
+
+def _report(module, subgraphs, candidates, batch_size):
+  """Returns the `ModuleReport` of the connections `subgraphs` of `module`."""
+  descendants = _descendants(module, subgraphs, candidates)
+  descendant_modules = [descendant for descendant, _ in descendants]
+  # Children are the descendants that are not nested in another descendant,
+  # in the order in which they were first connected.
+  child_reports = []
+  child_variables = set()
+  for child, child_subgraphs in descendants:
+    if any(other is not child and
+           (_subgraphs_within(child, other_subgraphs) or
+            child.scope_name.startswith(other.scope_name + "/"))
+           for other, other_subgraphs in descendants):
+      continue
+    child_reports.append(
+        _report(child, child_subgraphs, descendant_modules, batch_size))
+    child_variables.update(child.get_all_variables(
+        tf.GraphKeys.GLOBAL_VARIABLES))
+
+  variables = set(module.get_all_variables(tf.GraphKeys.GLOBAL_VARIABLES))
+  variables.update(child_variables)
+  own_weights = [variable for variable in variables - child_variables
+                 if (variable.get_shape().ndims or 0) >= 2]
+
+  activation_bytes = tuple(
+      _num_bytes(_tensors(subgraph.outputs), batch_size)
+      for subgraph in subgraphs)
+  flops = sum(_connection_flops(module, subgraph, own_weights, batch_size)
+              for subgraph in subgraphs)
+  flops += sum(report.flops for report in child_reports)
+
+  return ModuleReport(
+      name=module.scope_name,
+      class_name="{}.{}".format(type(module).__module__,
+                                type(module).__name__),
+      num_params=sum(v.get_shape().num_elements() for v in variables),
+      param_bytes=_num_bytes(variables, batch_size),
+      activation_bytes=activation_bytes,
+      flops=flops,
+      children=tuple(child_reports))
+
+
+def module_report(module, batch_size=1):
+  """Returns a hierarchical report of the resources used by `module`.
+
+  The children of a module are the modules connected within one of its
+  connections, such as the layers of a `snt.nets.MLP` or of a `snt.Sequential`
+  and the cores of a `snt.DeepRNN`, or created within its variable scope. They
+  are found in the `SONNET_COLLECTION_NAME` collection of its graph. Only the
+  connections of a child made within its parent are reported under the parent.
+
+  Args:
+    module: A connected module.
+    batch_size: Size used for unknown dimensions of the inputs and outputs, such
+      as the batch dimension. Defaults to 1, which gives activation bytes and
+      FLOPs per example.
+
+  Returns:
+    A `ModuleReport`, with fields:
+      name: The scope name of the module.
+      class_name: The full name of the class of the module.
+      num_params: The number of scalars in the global variables used by the
+        module and its children.
+      param_bytes: The size in bytes of these variables.
+      activation_bytes: Tuple of the size in bytes of the outputs of each
+        connection of the module.
+      flops: The estimated FLOPs of all connections of the module, including
+        those of its children. For RNN cores, connections are single steps, and
+        modules of types other than `snt.Linear`, convolutions, RNN cores and
+        attention modules are counted as only performing the FLOPs of their
+        children.
+      children: Tuple of the `ModuleReport` of the children of the module.
+
+  Raises:
+    base.NotConnectedError: If `module` is not connected.
+  """
+  module._ensure_is_connected()  # pylint: disable=protected-access
+  with module.graph.as_default():
+    return _report(module, module.connected_subgraphs,
+                   _connected_modules(module.graph), batch_size)
+
+
+def _flatten_report(report, depth=0):
+  yield depth, report
+  for child in report.children:
+    for item in _flatten_report(child, depth + 1):
+      yield item
+
+
+def format_module_report(report, join_lines=True):
+  """Formats a `ModuleReport` as a table, indenting children by depth."""
+  rows = [("Module", "Type", "Params", "Param memory", "Activations", "FLOPs")]
+  for depth, item in _flatten_report(report):
+    rows.append((
+        "  " * depth + item.name.split("/")[-1] if depth else item.name,
+        item.class_name.split(".")[-1],
+        str(item.num_params),
+        util._num_bytes_to_human_readable(item.param_bytes),  # pylint: disable=protected-access
+        util._num_bytes_to_human_readable(sum(item.activation_bytes)),  # pylint: disable=protected-access
+        "{:,}".format(item.flops)))
+  return util._format_table(rows, join_lines=join_lines)  # pylint: disable=protected-access
+
+
+def log_module_report(report):
+  """Logs a `ModuleReport` formatted by `format_module_report`."""
+  for row in format_module_report(report, join_lines=False):
+    tf.logging.info(row)
+
+
+def _report_to_dict(report):
+  fields = report._asdict()
+  fields["activation_bytes"] = list(report.activation_bytes)
+  fields["children"] = [_report_to_dict(child) for child in report.children]
+  return fields
+
+
+def module_report_to_json(report, indent=None):
+  """Returns a JSON string of a `ModuleReport` and of all its children."""
+  return json.dumps(_report_to_dict(report), indent=indent, sort_keys=True)
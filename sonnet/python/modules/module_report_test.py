@@ -0,0 +1,139 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for sonnet.python.modules.module_report."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+
+# Dependency imports
+import sonnet as snt
+import tensorflow as tf
+
+
+class ModuleReportTest(tf.test.TestCase):
+
+  def testMLP(self):
+    mlp = snt.nets.MLP([4, 2])
+    mlp(tf.placeholder(tf.float32, [None, 3]))
+    report = snt.module_report(mlp)
+
+    self.assertEqual(report.name, "mlp")
+    self.assertEqual(report.class_name, "sonnet.python.modules.nets.mlp.MLP")
+    self.assertEqual(report.num_params, 26)
+    self.assertEqual(report.param_bytes, 104)
+    self.assertEqual(report.activation_bytes, (8,))
+    self.assertEqual(report.flops, 40)
+
+    self.assertEqual([child.name for child in report.children],
+                     ["mlp/linear_0", "mlp/linear_1"])
+    self.assertEqual([child.num_params for child in report.children], [16, 10])
+    self.assertEqual([child.activation_bytes for child in report.children],
+                     [(16,), (8,)])
+    self.assertEqual([child.flops for child in report.children], [24, 16])
+
+    report = snt.module_report(mlp, batch_size=32)
+    self.assertEqual(report.activation_bytes, (256,))
+    self.assertEqual(report.flops, 1280)
+
+  def testConnections(self):
+    lin = snt.Linear(4)
+    lin(tf.zeros([2, 3]))
+    lin(tf.zeros([5, 3]))
+    report = snt.module_report(lin)
+    self.assertEqual(report.activation_bytes, (32, 80))
+    self.assertEqual(report.flops, 2 * 7 * 12)
+    self.assertEqual(report.children, ())
+
+  def testEnsembleLinear(self):
+    shared = snt.EnsembleLinear(4, num_models=3)
+    shared(tf.zeros([2, 5]))
+    self.assertEqual(snt.module_report(shared).flops, 2 * 3 * 2 * 5 * 4)
+
+    batched = snt.EnsembleLinear(4, num_models=3)
+    batched(tf.zeros([3, 2, 5]))
+    self.assertEqual(snt.module_report(batched).flops, 2 * 3 * 2 * 5 * 4)
+
+  def testConv2D(self):
+    conv = snt.Conv2D(output_channels=5, kernel_shape=3, padding=snt.SAME)
+    conv(tf.zeros([2, 8, 8, 3]))
+    report = snt.module_report(conv)
+    self.assertEqual(report.num_params, 140)
+    self.assertEqual(report.activation_bytes, (2 * 8 * 8 * 5 * 4,))
+    self.assertEqual(report.flops, 2 * 2 * 8 * 8 * 5 * 3 * 3 * 3)
+
+  def testLSTM(self):
+    lstm = snt.LSTM(4)
+    lstm(tf.zeros([2, 3]), lstm.initial_state(2))
+    report = snt.module_report(lstm)
+    self.assertEqual(report.num_params, 7 * 16 + 16)
+    self.assertEqual(report.flops, 2 * 2 * 7 * 16)
+
+  def testSequential(self):
+    layers = [snt.Linear(4), tf.nn.relu, snt.Linear(2)]
+    seq = snt.Sequential(layers)
+    seq(tf.placeholder(tf.float32, [None, 3]))
+    report = snt.module_report(seq)
+
+    # The layers are constructed outside of the scope of the sequential module,
+    # but connected within it.
+    self.assertEqual([child.name for child in report.children],
+                     ["linear", "linear_1"])
+    self.assertEqual([child.num_params for child in report.children], [16, 10])
+    self.assertEqual(report.num_params, 26)
+    self.assertEqual(report.flops, 40)
+
+  def testDeepRNN(self):
+    cores = [snt.LSTM(4), snt.LSTM(2)]
+    deep_rnn = snt.DeepRNN(cores, skip_connections=False)
+    deep_rnn(tf.zeros([2, 3]), deep_rnn.initial_state(2))
+    # A connection of a core outside of the deep RNN is not reported under it.
+    cores[0](tf.zeros([5, 3]), cores[0].initial_state(5))
+    report = snt.module_report(deep_rnn)
+
+    self.assertEqual([child.name for child in report.children],
+                     ["lstm", "lstm_1"])
+    self.assertEqual([child.num_params for child in report.children],
+                     [7 * 16 + 16, 6 * 8 + 8])
+    self.assertEqual(len(report.children[0].activation_bytes), 1)
+    self.assertEqual(report.flops, 2 * 2 * (7 * 16 + 6 * 8))
+
+  def testFormatAndJSON(self):
+    mlp = snt.nets.MLP([4, 2])
+    mlp(tf.zeros([1, 3]))
+    report = snt.module_report(mlp)
+
+    rows = list(snt.format_module_report(report, join_lines=False))
+    self.assertEqual(len(rows), 4)
+    self.assertTrue(rows[1].startswith("mlp "))
+    self.assertTrue(rows[2].startswith("  linear_0 "))
+
+    decoded = json.loads(snt.module_report_to_json(report))
+    self.assertEqual(decoded["name"], "mlp")
+    self.assertEqual(decoded["flops"], 40)
+    self.assertEqual([child["name"] for child in decoded["children"]],
+                     ["mlp/linear_0", "mlp/linear_1"])
+    self.assertEqual(decoded["children"][0]["children"], [])
+
+  def testNotConnectedRaises(self):
+    with self.assertRaises(snt.NotConnectedError):
+      snt.module_report(snt.Linear(2))
+
+
+if __name__ == "__main__":
+  tf.test.main()
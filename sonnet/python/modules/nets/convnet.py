@@ -24,6 +24,7 @@ import functools
 from six.moves import xrange  # pylint: disable=redefined-builtin
 from sonnet.python.modules import base
 from sonnet.python.modules import batch_norm
+from sonnet.python.modules import batch_norm_v2
 from sonnet.python.modules import conv
 from sonnet.python.modules import util
 
@@ -41,6 +42,15 @@ def _replicate_elements(input_iterable, num_times):
   return tuple(input_iterable)
 
 
+def _is_batch_norm_ctor(normalization_ctor):
+  """Returns `True` if `normalization_ctor` builds batch normalization."""
+  # Unwraps `functools.partial`.
+  normalization_ctor = getattr(normalization_ctor, "func", normalization_ctor)
+  return (isinstance(normalization_ctor, type) and
+          issubclass(normalization_ctor,
+                     (batch_norm.BatchNorm, batch_norm_v2.BatchNormV2)))
+
+
 class ConvNet2D(base.AbstractModule, base.Transposable):
   """A 2D Convolutional Network module."""
 
@@ -65,6 +75,7 @@ class ConvNet2D(base.AbstractModule, base.Transposable):
                batch_norm_config=None,
                data_format=DATA_FORMAT_NHWC,
                custom_getter=None,
+               normalization_ctor=None,
                name="conv_net_2d"):
     """Constructs a `ConvNet2D` module.
 
@@ -117,6 +128,12 @@ class ConvNet2D(base.AbstractModule, base.Transposable):
           correspond to regexes to match variable names. See the
           `tf.get_variable` documentation for information about the
           custom_getter API.
+      normalization_ctor: Optional constructor of the normalization modules
+        applied after convolution when `use_batch_norm` is `True`, called with
+        `batch_norm_config` as keyword arguments, e.g. `snt.BatchNormV2`,
+        `snt.LayerNorm` or `snt.GroupNorm`. Defaults to `snt.BatchNorm`. Only
+        batch normalization modules are passed `is_training` and
+        `test_local_stats`.
       name: Name of the module.
 
     Raises:
@@ -133,6 +150,7 @@ class ConvNet2D(base.AbstractModule, base.Transposable):
         keys other than 'w' or 'b'.
       TypeError: If any of the given initializers, partitioners or regularizers
         are not callable.
+      TypeError: If `normalization_ctor` is not callable.
     """
     if not isinstance(output_channels, collections.Iterable):
       raise TypeError("output_channels must be iterable")
@@ -204,6 +222,12 @@ class ConvNet2D(base.AbstractModule, base.Transposable):
 
     self._batch_norm_config = batch_norm_config or {}
 
+    if normalization_ctor is None:
+      normalization_ctor = batch_norm.BatchNorm
+    elif not callable(normalization_ctor):
+      raise TypeError("normalization_ctor must be callable")
+    self._normalization_ctor = normalization_ctor
+
     if isinstance(use_bias, bool):
       use_bias = (use_bias,)
     else:
@@ -252,27 +276,38 @@ class ConvNet2D(base.AbstractModule, base.Transposable):
       ValueError: If `is_training` is not explicitly specified when using
         batch normalization.
     """
-    if self._use_batch_norm and is_training is None:
+    uses_batch_stats = _is_batch_norm_ctor(self._normalization_ctor)
+    if self._use_batch_norm and uses_batch_stats and is_training is None:
       raise ValueError("Boolean is_training flag must be explicitly specified "
                        "when using batch normalization.")
 
     self._input_shape = tuple(inputs.get_shape().as_list())
     net = inputs
 
+    normalization_modules = []
+    # Batch normalization modules keep the names of the default `snt.BatchNorm`
+    # modules, so that existing checkpoints can be restored.
+    name_format = "batch_norm_{}" if uses_batch_stats else "normalization_{}"
+
     final_index = len(self._layers) - 1
     for i, layer in enumerate(self._layers):
       net = layer(net)
 
       if i != final_index or self._activate_final:
         if self._use_batch_norm:
-          bn = batch_norm.BatchNorm(name="batch_norm_{}".format(i),
-                                    **self._batch_norm_config)
-          net = bn(net,
-                   is_training=is_training,
-                   test_local_stats=test_local_stats)
+          normalizer = self._normalization_ctor(name=name_format.format(i),
+                                                **self._batch_norm_config)
+          if uses_batch_stats:
+            net = normalizer(net,
+                             is_training=is_training,
+                             test_local_stats=test_local_stats)
+          else:
+            net = normalizer(net)
+          normalization_modules.append(normalizer)
 
         net = self._activation(net)
 
+    self._normalization_modules = tuple(normalization_modules)
     return net
 
   @property
@@ -280,6 +315,20 @@ class ConvNet2D(base.AbstractModule, base.Transposable):
     """Returns a tuple containing the convolutional layers of the network."""
     return self._layers
 
+  @property
+  def normalization_modules(self):
+    """Returns a tuple of the normalization modules of the last connection.
+
+    These are the modules built by `normalization_ctor`, which are
+    `snt.BatchNorm` modules by default. The i-th element follows the i-th
+    convolutional layer. The tuple is empty if `use_batch_norm` is `False`.
+
+    Raises:
+      snt.NotConnectedError: If the module has not been connected to the graph.
+    """
+    self._ensure_is_connected()
+    return self._normalization_modules
+
   @property
   def initializers(self):
     return self._initializers
@@ -324,6 +373,10 @@ class ConvNet2D(base.AbstractModule, base.Transposable):
   def batch_norm_config(self):
     return self._batch_norm_config
 
+  @property
+  def normalization_ctor(self):
+    return self._normalization_ctor
+
   @property
   def activation(self):
     return self._activation
@@ -467,6 +520,7 @@ class ConvNet2D(base.AbstractModule, base.Transposable):
                                  use_bias=use_bias,
                                  batch_norm_config=batch_norm_config,
                                  data_format=data_format,
+                                 normalization_ctor=self._normalization_ctor,
                                  name=name)
 
   # Implements Transposable interface.
@@ -587,6 +641,7 @@ class ConvNet2DTranspose(ConvNet2D):
                use_bias=True,
                batch_norm_config=None,
                data_format=DATA_FORMAT_NHWC,
+               normalization_ctor=None,
                name="conv_net_2d_transpose"):
     """Constructs a `ConvNetTranspose2D` module.
 
@@ -636,6 +691,9 @@ class ConvNet2DTranspose(ConvNet2D):
       data_format: A string, one of "NCHW" or "NHWC". Specifies whether the
         channel dimension of the input and output is the last dimension
         (default, "NHWC"), or the second dimension ("NCHW").
+      normalization_ctor: Optional constructor of the normalization modules
+        applied after convolution when `use_batch_norm` is `True`, as in
+        `ConvNet2D`. Defaults to `snt.BatchNorm`.
       name: Name of the module.
 
     Raises:
@@ -682,6 +740,7 @@ class ConvNet2DTranspose(ConvNet2D):
         use_bias=use_bias,
         batch_norm_config=batch_norm_config,
         data_format=data_format,
+        normalization_ctor=normalization_ctor,
         name=name)
 
   def _instantiate_layers(self):
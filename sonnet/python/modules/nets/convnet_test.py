@@ -286,6 +286,70 @@ class SharedConvNets2DTest(parameterized.TestCase, tf.test.TestCase):
         len(model_variables),
         len(self.output_channels) * 4 - 2)
 
+  @parameterized.named_parameters(
+      ("ConvNet2DGroupNorm", snt.nets.ConvNet2D,
+       partial(snt.GroupNorm, groups=1), snt.GroupNorm),
+      ("ConvNet2DLayerNorm", snt.nets.ConvNet2D, snt.LayerNorm, snt.LayerNorm),
+      ("ConvNet2DTransposeGroupNorm",
+       partial(snt.nets.ConvNet2DTranspose, output_shapes=[[100, 100]]),
+       partial(snt.GroupNorm, groups=1), snt.GroupNorm))
+  def testNormalizationCtor(self, module, normalization_ctor,
+                            normalization_class):
+    model = module(output_channels=self.output_channels,
+                   kernel_shapes=self.kernel_shapes,
+                   strides=self.strides,
+                   paddings=self.paddings,
+                   use_batch_norm=True,
+                   normalization_ctor=normalization_ctor)
+    self.assertIs(model.normalization_ctor, normalization_ctor)
+    input_to_net = tf.placeholder(tf.float32, shape=(1, 100, 100, 3))
+
+    # The is_training flag is not required without batch statistics.
+    model(input_to_net)
+
+    self.assertEqual(
+        len(model.get_variables()),
+        len(self.output_channels) * 4 - 2)
+    self.assertFalse(
+        any("moving_mean" in var.name for var in tf.global_variables()))
+    for i, layer in enumerate(model.normalization_modules):
+      self.assertIsInstance(layer, normalization_class)
+      self.assertEqual(layer.module_name, "normalization_{}".format(i))
+
+    transpose = model.transpose()
+    self.assertIs(transpose.normalization_ctor, normalization_ctor)
+
+  @parameterized.named_parameters(
+      ("ConvNet2D", snt.nets.ConvNet2D),
+      ("ConvNet2DTranspose", partial(snt.nets.ConvNet2DTranspose,
+                                     output_shapes=[[100, 100]])))
+  def testNormalizationCtorBatchNormV2(self, module):
+    model = module(output_channels=self.output_channels,
+                   kernel_shapes=self.kernel_shapes,
+                   strides=self.strides,
+                   paddings=self.paddings,
+                   use_batch_norm=True,
+                   normalization_ctor=snt.BatchNormV2)
+    input_to_net = tf.placeholder(tf.float32, shape=(1, 100, 100, 3))
+
+    err = "is_training flag must be explicitly specified"
+    with self.assertRaisesRegexp(ValueError, err):
+      model(input_to_net)
+
+    model(input_to_net, is_training=True)
+    for i, layer in enumerate(model.normalization_modules):
+      self.assertIsInstance(layer, snt.BatchNormV2)
+      self.assertEqual(layer.module_name, "batch_norm_{}".format(i))
+
+  def testNormalizationCtorNotCallable(self):
+    with self.assertRaisesRegexp(TypeError, "must be callable"):
+      snt.nets.ConvNet2D(output_channels=self.output_channels,
+                         kernel_shapes=self.kernel_shapes,
+                         strides=self.strides,
+                         paddings=self.paddings,
+                         use_batch_norm=True,
+                         normalization_ctor="group_norm")
+
   @parameterized.named_parameters(
       ("ConvNet2D", snt.nets.ConvNet2D),
       ("ConvNet2DTranspose", partial(snt.nets.ConvNet2DTranspose,
@@ -19,6 +19,7 @@ from __future__ import division
 from __future__ import print_function
 
 import collections
+import functools
 
 from six.moves import xrange  # pylint: disable=redefined-builtin
 from sonnet.python.modules import base
@@ -40,6 +41,7 @@ class MLP(base.AbstractModule, base.Transposable):
                regularizers=None,
                use_bias=True,
                custom_getter=None,
+               num_models=None,
                name="mlp"):
     """Constructs an MLP module.
 
@@ -69,6 +71,10 @@ class MLP(base.AbstractModule, base.Transposable):
         custom getters inside the module. If a dictionary, the keys
         correspond to regexes to match variable names. See the `tf.get_variable`
         documentation for information about the custom_getter API.
+      num_models: Optional number of independent MLPs to evaluate together. If
+        set, the layers are `basic.EnsembleLinear` modules whose variables have
+        a leading `[num_models]` dimension, and each layer is a single batched
+        matrix multiplication for all models.
       name: Name of the module.
 
     Raises:
@@ -102,6 +108,7 @@ class MLP(base.AbstractModule, base.Transposable):
     self._activate_final = activate_final
 
     self._use_bias = use_bias
+    self._num_models = num_models
     self._instantiate_layers()
 
   def _instantiate_layers(self):
@@ -118,13 +125,19 @@ class MLP(base.AbstractModule, base.Transposable):
     connected to the graph.
     """
 
+    if self._num_models is None:
+      linear = basic.Linear
+    else:
+      linear = functools.partial(basic.EnsembleLinear,
+                                 num_models=self._num_models)
+
     with self._enter_variable_scope():
-      self._layers = [basic.Linear(self._output_sizes[i],
-                                   name="linear_{}".format(i),
-                                   initializers=self._initializers,
-                                   partitioners=self._partitioners,
-                                   regularizers=self._regularizers,
-                                   use_bias=self.use_bias)
+      self._layers = [linear(self._output_sizes[i],
+                             name="linear_{}".format(i),
+                             initializers=self._initializers,
+                             partitioners=self._partitioners,
+                             regularizers=self._regularizers,
+                             use_bias=self.use_bias)
                       for i in xrange(self._num_layers)]
 
   @classmethod
@@ -135,10 +148,14 @@ class MLP(base.AbstractModule, base.Transposable):
     """Assembles the `MLP` and connects it to the graph.
 
     Args:
-      inputs: A 2D Tensor of size `[batch_size, input_size]`.
+      inputs: A 2D Tensor of size `[batch_size, input_size]`. With
+        `num_models`, inputs may also be a 3D Tensor of size
+        `[num_models, batch_size, input_size]` with the inputs of each model.
 
     Returns:
-      A 2D Tensor of size `[batch_size, output_sizes[-1]]`.
+      A 2D Tensor of size `[batch_size, output_sizes[-1]]`, or with
+      `num_models`, a 3D Tensor of size
+      `[num_models, batch_size, output_sizes[-1]]`.
     """
     self._input_shape = tuple(inputs.get_shape().as_list())
     net = inputs
@@ -178,6 +195,11 @@ class MLP(base.AbstractModule, base.Transposable):
   def use_bias(self):
     return self._use_bias
 
+  @property
+  def num_models(self):
+    """Returns the number of models, or `None` for a single model."""
+    return self._num_models
+
   @property
   def initializers(self):
     """Returns the intializers dictionary."""
@@ -226,7 +248,7 @@ class MLP(base.AbstractModule, base.Transposable):
       name = self.module_name + "_transpose"
     if activate_final is None:
       activate_final = self.activate_final
-    output_sizes = [lambda l=layer: l.input_shape[1] for layer in self._layers]
+    output_sizes = [lambda l=layer: l.input_shape[-1] for layer in self._layers]
     output_sizes.reverse()
     return MLP(name=name,
                output_sizes=output_sizes,
@@ -235,4 +257,5 @@ class MLP(base.AbstractModule, base.Transposable):
                initializers=self.initializers,
                partitioners=self.partitioners,
                regularizers=self.regularizers,
-               use_bias=self.use_bias)
+               use_bias=self.use_bias,
+               num_models=self.num_models)
@@ -296,6 +296,45 @@ class MLPTest(parameterized.TestCase, tf.test.TestCase):
       for var_value in sess.run(mlp_variables):
         self.assertAllClose(var_value, np.zeros_like(var_value)+pi)
 
+  def testEnsemble(self):
+    num_models = 4
+    inputs_np = np.random.randn(self.batch_size, self.input_size)
+    inputs = tf.constant(inputs_np, dtype=tf.float32)
+    mlp = snt.nets.MLP(output_sizes=self.output_sizes, num_models=num_models)
+    outputs = mlp(inputs)
+
+    self.assertEqual(mlp.num_models, num_models)
+    self.assertEqual(outputs.get_shape().as_list(),
+                     [num_models, self.batch_size, self.output_sizes[-1]])
+    for layer in mlp.layers:
+      self.assertIsInstance(layer, snt.EnsembleLinear)
+    self.assertEqual(mlp.layers[1].w.get_shape().as_list(),
+                     [num_models] + self.output_sizes[:2])
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      outputs, variables = session.run(
+          [outputs, [(layer.w, layer.b) for layer in mlp.layers]])
+
+    for i in range(num_models):
+      expected = inputs_np
+      for j, (w, b) in enumerate(variables):
+        expected = expected.dot(w[i]) + b[i]
+        if j < len(variables) - 1:
+          expected = np.maximum(expected, 0)
+      self.assertAllClose(outputs[i], expected, atol=1e-5)
+
+  def testEnsembleTranspose(self):
+    num_models = 3
+    mlp = snt.nets.MLP(output_sizes=self.output_sizes, num_models=num_models)
+    outputs = mlp(tf.zeros([self.batch_size, self.input_size]))
+    mlp_transpose = mlp.transpose()
+    transpose_outputs = mlp_transpose(outputs)
+
+    self.assertEqual(mlp_transpose.num_models, num_models)
+    self.assertEqual(transpose_outputs.get_shape().as_list(),
+                     [num_models, self.batch_size, self.input_size])
+
 
 if __name__ == "__main__":
   tf.test.main()
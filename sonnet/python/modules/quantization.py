@@ -0,0 +1,533 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Post-training int8 quantization of Linear and Conv2D modules.
+
+Weights are quantized symmetrically with one scale per output channel and
+stored as int8 variables, which are dequantized when the module is connected.
+Inputs to each layer can additionally be fake-quantized to 8 bits with a range
+calibrated on a representative dataset.
+
+Note that the matrix multiplications and convolutions still run in floating
+point on the dequantized weights, so this reduces the size of checkpoints and
+exported graphs, and simulates the accuracy of int8 inference, but does not
+reduce the compute or memory bandwidth of inference.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+
+# Dependency imports
+import numpy as np
+from sonnet.python.modules import base
+from sonnet.python.modules import basic
+from sonnet.python.modules import batch_norm_folding
+from sonnet.python.modules import conv
+from sonnet.python.modules import sequential
+import tensorflow as tf
+
+
+_INT8_MAX = 127
+
+
+QuantizationReport = collections.namedtuple(
+    "QuantizationReport",
+    ("max_abs_error", "mean_abs_error", "argmax_agreement", "accuracy",
+     "quantized_accuracy", "accuracy_delta"))
+
+
+def quantize_weights(w):
+  """Quantizes `w` to int8 with one symmetric scale per output channel.
+
+  Args:
+    w: A NumPy array whose last dimension indexes output channels, such as the
+      kernel of a `snt.Linear` or `snt.Conv2D`.
+
+  Returns:
+    A tuple `(w_quantized, w_scale)` of an int8 array with the shape of `w` and
+    a float32 array of shape `[w.shape[-1]]`, such that
+    `w ~= w_quantized * w_scale`.
+  """
+  w = np.asarray(w, dtype=np.float32)
+  reduce_axes = tuple(range(w.ndim - 1))
+  w_scale = np.max(np.abs(w), axis=reduce_axes) / _INT8_MAX
+  # Channels that are zero everywhere quantize to zero with any scale.
+  w_scale[w_scale == 0] = 1.0
+  w_quantized = np.clip(np.round(w / w_scale), -_INT8_MAX, _INT8_MAX)
+  return w_quantized.astype(np.int8), w_scale.astype(np.float32)
+
+
+def _non_trainable_getter(getter, *args, **kwargs):
+  """Custom getter creating non-trainable variables."""
+  kwargs["trainable"] = False
+  return getter(*args, **kwargs)
+
+
+def _quantized_weight(w_quantized, w_scale, dtype):
+  """Creates the int8 weight variables and returns the dequantized weight."""
+  w_quantized_var = tf.get_variable(
+      "w_quantized",
+      shape=w_quantized.shape,
+      dtype=tf.int8,
+      initializer=tf.constant_initializer(w_quantized, dtype=tf.int8),
+      trainable=False)
+  w_scale_var = tf.get_variable(
+      "w_scale",
+      shape=w_scale.shape,
+      dtype=tf.float32,
+      initializer=tf.constant_initializer(w_scale),
+      trainable=False)
+  w = tf.cast(w_quantized_var, tf.float32) * w_scale_var
+  return w_quantized_var, w_scale_var, tf.cast(w, dtype)
+
+
+def _fake_quantize_inputs(inputs, input_range):
+  """Fake-quantizes `inputs` to 8 bits if a calibrated range is given."""
+  if input_range is None:
+    return inputs
+  return tf.fake_quant_with_min_max_args(
+      inputs, min=input_range[0], max=input_range[1], num_bits=8)
+
+
+class QuantizedLinear(basic.Linear):
+  """Linear module with int8 weights and per-output-channel scales.
+
+  The module keeps the interface of `snt.Linear`: `w` is the dequantized
+  weight matrix, and `b` is a float bias. Inputs may have any rank of at least
+  2, all dimensions but the last being batch dimensions.
+  """
+
+  def __init__(self, w_quantized, w_scale, b=None, input_range=None,
+               name="quantized_linear"):
+    """Constructs a QuantizedLinear module.
+
+    Args:
+      w_quantized: An int8 NumPy array of shape `[input_size, output_size]`.
+      w_scale: A float NumPy array of shape `[output_size]`.
+      b: Optional float NumPy array of shape `[output_size]`. If `None`, no
+        bias is added.
+      input_range: Optional `(min, max)` tuple. If given, inputs are
+        fake-quantized to 8 bits within this range.
+      name: Name of the module.
+    """
+    w_quantized = np.asarray(w_quantized, dtype=np.int8)
+    initializers = None
+    if b is not None:
+      initializers = {"b": tf.constant_initializer(b)}
+
+    super(QuantizedLinear, self).__init__(
+        output_size=w_quantized.shape[1],
+        use_bias=b is not None,
+        initializers=initializers,
+        allow_many_batch_dims=True,
+        name=name)
+
+    self._w_quantized_value = w_quantized
+    self._w_scale_value = np.asarray(w_scale, dtype=np.float32)
+    self._b_value = b
+    self._input_range = input_range
+
+  def _build(self, inputs):
+    """Connects the QuantizedLinear module into the graph.
+
+    Args:
+      inputs: A Tensor of size `[batch_size_1, ..., batch_size_n, input_size]`,
+        with n >= 1.
+
+    Returns:
+      A Tensor of size `[batch_size_1, ..., batch_size_n, output_size]`.
+
+    Raises:
+      base.IncompatibleShapeError: If the input has rank smaller than 2, or if
+          its last dimension does not match the quantized weights.
+    """
+    input_shape = tuple(inputs.get_shape().as_list())
+    input_size = self._w_quantized_value.shape[0]
+
+    if len(input_shape) < 2 or input_shape[-1] != input_size:
+      raise base.IncompatibleShapeError(
+          "{}: Input shape must be [batch_size, ..., {}] not: {}".format(
+              self.scope_name, input_size, input_shape))
+
+    self._input_shape = input_shape
+    dtype = inputs.dtype
+
+    inputs = _fake_quantize_inputs(inputs, self._input_range)
+    self._w_quantized, self._w_scale, self._w = _quantized_weight(
+        self._w_quantized_value, self._w_scale_value, dtype)
+    if len(input_shape) == 2:
+      outputs = tf.matmul(inputs, self._w)
+    else:
+      outputs = tf.matmul(tf.reshape(inputs, [-1, input_size]), self._w)
+      if None in input_shape[1:-1]:
+        output_shape = tf.concat(
+            [tf.shape(inputs)[:-1], [self.output_size]], axis=0)
+      else:
+        output_shape = [-1] + list(input_shape[1:-1]) + [self.output_size]
+      outputs = tf.reshape(outputs, output_shape)
+      outputs.set_shape(input_shape[:-1] + (self.output_size,))
+
+    if self._use_bias:
+      self._b = tf.get_variable("b",
+                                shape=(self.output_size,),
+                                dtype=dtype,
+                                initializer=self._initializers["b"],
+                                trainable=False)
+      outputs += self._b
+
+    return outputs
+
+  @property
+  def w_quantized(self):
+    """Returns the int8 Variable holding the quantized weights."""
+    self._ensure_is_connected()
+    return self._w_quantized
+
+  @property
+  def w_scale(self):
+    """Returns the Variable holding the per-output-channel scales."""
+    self._ensure_is_connected()
+    return self._w_scale
+
+  @property
+  def input_range(self):
+    """Returns the calibrated `(min, max)` input range, or `None`."""
+    return self._input_range
+
+  def clone(self, name=None):
+    """Returns a cloned `QuantizedLinear` module.
+
+    Args:
+      name: Optional string assigning name of cloned module. The default name
+          is constructed by appending "_clone" to `self.module_name`.
+
+    Returns:
+      Cloned `QuantizedLinear` module.
+    """
+    if name is None:
+      name = self.module_name + "_clone"
+    return QuantizedLinear(w_quantized=self._w_quantized_value,
+                           w_scale=self._w_scale_value,
+                           b=self._b_value,
+                           input_range=self._input_range,
+                           name=name)
+
+  def transpose(self, name=None):
+    raise base.NotSupportedError(
+        "Transposing a quantized module is not supported.")
+
+
+class QuantizedConv2D(conv.Conv2D):
+  """Conv2D module with int8 weights and per-output-channel scales.
+
+  The module keeps the interface of `snt.Conv2D`: `w` is the dequantized
+  kernel, and `b` is a float bias. As in `QuantizedLinear`, all variables are
+  non-trainable.
+  """
+
+  def __init__(self, w_quantized, w_scale, b=None, input_range=None,
+               stride=1, rate=1, padding=conv.SAME,
+               data_format=conv.DATA_FORMAT_NHWC, name="quantized_conv_2d"):
+    """Constructs a QuantizedConv2D module.
+
+    Args:
+      w_quantized: An int8 NumPy array of shape
+        `[kernel_height, kernel_width, input_channels, output_channels]`.
+      w_scale: A float NumPy array of shape `[output_channels]`.
+      b: Optional float NumPy array of shape `[output_channels]`. If `None`,
+        no bias is added.
+      input_range: Optional `(min, max)` tuple. If given, inputs are
+        fake-quantized to 8 bits within this range.
+      stride: Sequence of kernel strides (of size 2), or integer.
+      rate: Sequence of dilation rates (of size 2), or integer.
+      padding: Padding algorithm, either `snt.SAME` or `snt.VALID`.
+      data_format: A string. Specifies whether the channel dimension of the
+        input and output is the last dimension (default, NHWC), or the second
+        dimension ("NCHW").
+      name: Name of the module.
+    """
+    w_quantized = np.asarray(w_quantized, dtype=np.int8)
+    initializers = None
+    if b is not None:
+      initializers = {"b": tf.constant_initializer(b)}
+
+    super(QuantizedConv2D, self).__init__(
+        output_channels=w_quantized.shape[-1],
+        custom_getter=_non_trainable_getter,
+        kernel_shape=w_quantized.shape[:2],
+        stride=stride,
+        rate=rate,
+        padding=padding,
+        use_bias=b is not None,
+        initializers=initializers,
+        data_format=data_format,
+        name=name)
+
+    self._w_quantized_value = w_quantized
+    self._w_scale_value = np.asarray(w_scale, dtype=np.float32)
+    self._b_value = b
+    self._input_range = input_range
+
+  def _construct_w(self, inputs):
+    """Creates the quantized kernel and returns its dequantized value.
+
+    Args:
+      inputs: A Tensor of shape `data_format`.
+
+    Returns:
+      w: The dequantized kernel, of the same type as `inputs`.
+
+    Raises:
+      base.IncompatibleShapeError: If the number of input channels does not
+          match the quantized kernel.
+    """
+    if self._input_channels != self._w_quantized_value.shape[2]:
+      raise base.IncompatibleShapeError(
+          "{}: Expected {} input channels, got {}.".format(
+              self.scope_name, self._w_quantized_value.shape[2],
+              self._input_channels))
+
+    self._w_quantized, self._w_scale, w = _quantized_weight(
+        self._w_quantized_value, self._w_scale_value, inputs.dtype)
+    return w
+
+  def _apply_conv(self, inputs, w):
+    inputs = _fake_quantize_inputs(inputs, self._input_range)
+    return super(QuantizedConv2D, self)._apply_conv(inputs, w)
+
+  @property
+  def w_quantized(self):
+    """Returns the int8 Variable holding the quantized kernel."""
+    self._ensure_is_connected()
+    return self._w_quantized
+
+  @property
+  def w_scale(self):
+    """Returns the Variable holding the per-output-channel scales."""
+    self._ensure_is_connected()
+    return self._w_scale
+
+  @property
+  def input_range(self):
+    """Returns the calibrated `(min, max)` input range, or `None`."""
+    return self._input_range
+
+  def clone(self, name=None):
+    """Returns a cloned `QuantizedConv2D` module.
+
+    Args:
+      name: Optional string assigning name of cloned module. The default name
+        is constructed by appending "_clone" to `self.module_name`.
+
+    Returns:
+      Cloned `QuantizedConv2D` module.
+    """
+    if name is None:
+      name = self.module_name + "_clone"
+    return QuantizedConv2D(w_quantized=self._w_quantized_value,
+                           w_scale=self._w_scale_value,
+                           b=self._b_value,
+                           input_range=self._input_range,
+                           stride=self._stride,
+                           rate=self._rate,
+                           padding=self._padding,
+                           data_format=self._data_format,
+                           name=name)
+
+  def transpose(self, name=None):
+    raise base.NotSupportedError(
+        "Transposing a quantized module is not supported.")
+
+
+def _calibrate_input_ranges(session, layers, calibration_feeds):
+  """Returns the `(min, max)` of the inputs to `layers` over all feeds."""
+  fetches = []
+  for layer in layers:
+    inputs = layer.last_connected_subgraph.inputs["inputs"]
+    fetches.append((tf.reduce_min(inputs), tf.reduce_max(inputs)))
+
+  ranges = None
+  for feed_dict in calibration_feeds:
+    batch_ranges = session.run(fetches, feed_dict=feed_dict)
+    if ranges is None:
+      ranges = batch_ranges
+    else:
+      ranges = [(min(lo, batch_lo), max(hi, batch_hi))
+                for (lo, hi), (batch_lo, batch_hi) in zip(ranges, batch_ranges)]
+
+  if ranges is None:
+    raise ValueError("calibration_feeds must contain at least one feed_dict.")
+  return [(float(lo), float(hi)) for lo, hi in ranges]
+
+
+def quantize_int8(module, session, calibration_feeds=None, name=None):
+  """Returns a copy of `module` with int8 Linear and Conv2D layers.
+
+  Each `snt.Linear` and `snt.Conv2D` in `module` is replaced by a
+  `QuantizedLinear` or `QuantizedConv2D` with per-output-channel weight scales.
+  If `calibration_feeds` is given, the range of the inputs to each of these
+  layers is measured over the feeds and used to fake-quantize the inputs at
+  inference time; otherwise only the weights are quantized.
+
+  Supported inputs are a connected `snt.Linear`, `snt.Conv2D`,
+  `snt.nets.MLP`, `snt.nets.ConvNet2D` or `snt.Sequential` of those and of
+  stateless callables such as activations, which are kept as is. Batch
+  normalization must be folded first with `snt.fold_batch_norm`.
+
+  The returned layers dequantize their weights and compute in floating point,
+  see the module docstring.
+
+  Args:
+    module: The trained module to quantize. It must have been connected to the
+      graph.
+    session: A `tf.Session` used to read the trained variable values.
+    calibration_feeds: Optional iterable of feed dicts with representative
+      inputs for `module`.
+    name: Optional name of the returned module. Defaults to the name of
+      `module` with "_int8" appended.
+
+  Returns:
+    An unconnected `snt.Sequential`, which must be connected and initialized
+    before use.
+
+  Raises:
+    snt.NotConnectedError: If `module` or any of its layers is not connected.
+    snt.NotSupportedError: If `module` contains normalization modules or a
+      masked convolution.
+    ValueError: If `calibration_feeds` is empty.
+  """
+  if name is None:
+    name = getattr(module, "module_name", "module") + "_int8"
+
+  layers = batch_norm_folding._flatten_layers(module)  # pylint: disable=protected-access
+  quantizable = []
+  for layer in layers:
+    if batch_norm_folding._unwrap_batch_norm(layer) is not None:  # pylint: disable=protected-access
+      raise base.NotSupportedError(
+          "Batch normalization must be folded with snt.fold_batch_norm before "
+          "quantization.")
+    if isinstance(layer, conv.Conv2D) and layer.mask is not None:
+      raise base.NotSupportedError(
+          "Quantization of masked convolutions is not supported.")
+    if isinstance(layer, (basic.Linear, conv.Conv2D)):
+      quantizable.append(layer)
+
+  if calibration_feeds is None:
+    input_ranges = [None] * len(quantizable)
+  else:
+    input_ranges = _calibrate_input_ranges(session, quantizable,
+                                           calibration_feeds)
+
+  values = session.run([
+      {"w": layer.w, "b": layer.b} if layer.has_bias else {"w": layer.w}
+      for layer in quantizable])
+
+  quantized = {}
+  for layer, layer_values, input_range in zip(quantizable, values,
+                                              input_ranges):
+    w_quantized, w_scale = quantize_weights(layer_values["w"])
+    kwargs = dict(w_quantized=w_quantized,
+                  w_scale=w_scale,
+                  b=layer_values.get("b"),
+                  input_range=input_range,
+                  name=layer.module_name)
+    if isinstance(layer, basic.Linear):
+      quantized[layer] = QuantizedLinear(**kwargs)
+    else:
+      # pylint: disable=protected-access
+      quantized[layer] = QuantizedConv2D(stride=layer._stride,
+                                         rate=layer._rate,
+                                         padding=layer._padding,
+                                         data_format=layer._data_format,
+                                         **kwargs)
+      # pylint: enable=protected-access
+
+  return sequential.Sequential([quantized.get(layer, layer)
+                                for layer in layers], name=name)
+
+
+def quantization_report(session, outputs, quantized_outputs, feed_dicts=None,
+                        labels=None):
+  """Compares the outputs of a float model and of its quantized copy.
+
+  Args:
+    session: A `tf.Session`.
+    outputs: Output Tensor of the float model.
+    quantized_outputs: Output Tensor of the quantized model for the same
+      inputs.
+    feed_dicts: Optional iterable of feed dicts to evaluate the outputs on.
+      Defaults to a single run without feeds.
+    labels: Optional integer Tensor of the class labels of the inputs, of the
+      shape of `outputs` without its last dimension. If given, the accuracy of
+      both models is computed, taking the argmax over the last dimension of
+      the outputs as the predicted class.
+
+  Returns:
+    A `QuantizationReport` with fields:
+      max_abs_error: The maximum absolute difference of the outputs.
+      mean_abs_error: The mean absolute difference of the outputs.
+      argmax_agreement: The fraction of rows whose argmax over the last
+        dimension agrees.
+      accuracy: The accuracy of the float model, or `None` if `labels` is not
+        given.
+      quantized_accuracy: The accuracy of the quantized model, or `None`.
+      accuracy_delta: `quantized_accuracy - accuracy`, or `None`.
+  """
+  if feed_dicts is None:
+    feed_dicts = [None]
+
+  fetches = [outputs, quantized_outputs]
+  if labels is not None:
+    fetches.append(labels)
+
+  max_abs_error = 0.0
+  abs_error_sum = 0.0
+  num_elements = 0
+  num_agreements = 0
+  num_correct = 0
+  num_quantized_correct = 0
+  num_rows = 0
+  for feed_dict in feed_dicts:
+    values = session.run(fetches, feed_dict=feed_dict)
+    expected, actual = values[:2]
+    abs_error = np.abs(expected - actual)
+    max_abs_error = max(max_abs_error, float(np.max(abs_error)))
+    abs_error_sum += float(np.sum(abs_error))
+    num_elements += abs_error.size
+    predictions = np.argmax(expected, axis=-1)
+    quantized_predictions = np.argmax(actual, axis=-1)
+    num_agreements += int(np.sum(predictions == quantized_predictions))
+    num_rows += predictions.size
+    if labels is not None:
+      num_correct += int(np.sum(predictions == values[2]))
+      num_quantized_correct += int(np.sum(quantized_predictions == values[2]))
+
+  num_rows = max(num_rows, 1)
+  accuracy = quantized_accuracy = accuracy_delta = None
+  if labels is not None:
+    accuracy = num_correct / num_rows
+    quantized_accuracy = num_quantized_correct / num_rows
+    accuracy_delta = quantized_accuracy - accuracy
+
+  return QuantizationReport(
+      max_abs_error=max_abs_error,
+      mean_abs_error=abs_error_sum / max(num_elements, 1),
+      argmax_agreement=num_agreements / num_rows,
+      accuracy=accuracy,
+      quantized_accuracy=quantized_accuracy,
+      accuracy_delta=accuracy_delta)
@@ -0,0 +1,172 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for sonnet.python.modules.quantization."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Dependency imports
+from absl.testing import parameterized
+import numpy as np
+import sonnet as snt
+from sonnet.python.modules import quantization
+import tensorflow as tf
+
+
+class QuantizeWeightsTest(tf.test.TestCase):
+
+  def testPerChannelScales(self):
+    w = np.array([[1.0, -0.5, 0.0],
+                  [-2.54, 0.25, 0.0]], dtype=np.float32)
+    w_quantized, w_scale = quantization.quantize_weights(w)
+
+    self.assertEqual(w_quantized.dtype, np.int8)
+    self.assertAllClose(w_scale, [0.02, 0.5 / 127, 1.0])
+    self.assertAllEqual(w_quantized[:, 2], [0, 0])
+    self.assertEqual(np.max(np.abs(w_quantized)), 127)
+    self.assertAllClose(w_quantized * w_scale, w, atol=np.max(w_scale) / 2)
+
+
+class QuantizeInt8Test(parameterized.TestCase, tf.test.TestCase):
+
+  def _quantize(self, module, inputs, outputs, feed_dicts, calibrate=True):
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      quantized = snt.quantize_int8(
+          module, session, calibration_feeds=feed_dicts if calibrate else None)
+      quantized_outputs = quantized(inputs)
+      session.run(tf.variables_initializer(quantized.get_all_variables()))
+      report = snt.quantization_report(session, outputs, quantized_outputs,
+                                       feed_dicts)
+    return quantized, report
+
+  @parameterized.parameters(True, False)
+  def testMLP(self, calibrate):
+    inputs = tf.placeholder(tf.float32, [None, 16])
+    mlp = snt.nets.MLP(output_sizes=[32, 10])
+    outputs = mlp(inputs)
+    feed_dicts = [{inputs: np.random.randn(8, 16)} for _ in range(3)]
+
+    quantized, report = self._quantize(mlp, inputs, outputs, feed_dicts,
+                                       calibrate=calibrate)
+
+    linears = [layer for layer in quantized.layers
+               if isinstance(layer, snt.QuantizedLinear)]
+    self.assertEqual(len(linears), 2)
+    self.assertEqual(linears[0].output_size, 32)
+    self.assertEqual(linears[0].w_quantized.dtype.base_dtype, tf.int8)
+    self.assertEqual(linears[0].w.get_shape().as_list(), [16, 32])
+    self.assertEqual(linears[0].input_range is not None, calibrate)
+    self.assertLess(report.mean_abs_error, 0.05)
+
+  def testConvNet2D(self):
+    inputs = tf.placeholder(tf.float32, [None, 8, 8, 3])
+    net = snt.nets.ConvNet2D(output_channels=[8, 4],
+                             kernel_shapes=[3],
+                             strides=[1, 2],
+                             paddings=[snt.SAME])
+    outputs = net(inputs)
+    feed_dicts = [{inputs: np.random.randn(2, 8, 8, 3)} for _ in range(2)]
+
+    quantized, report = self._quantize(net, inputs, outputs, feed_dicts)
+
+    convs = [layer for layer in quantized.layers
+             if isinstance(layer, snt.QuantizedConv2D)]
+    self.assertEqual(len(convs), 2)
+    self.assertEqual(convs[1].stride, (1, 2, 2, 1))
+    self.assertEqual(convs[1].w.get_shape().as_list(), [3, 3, 8, 4])
+    self.assertLess(report.mean_abs_error, 0.05)
+    self.assertGreater(report.argmax_agreement, 0.5)
+
+  @parameterized.named_parameters(
+      ("Linear", lambda: snt.Linear(output_size=3), [2, 5]),
+      ("Conv2D", lambda: snt.Conv2D(output_channels=3, kernel_shape=3),
+       [2, 6, 6, 5]))
+  def testNoTrainableVariables(self, module_fn, input_shape):
+    inputs = tf.constant(np.random.randn(*input_shape).astype(np.float32))
+    module = module_fn()
+    module(inputs)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      quantized = snt.quantize_int8(module, session)
+    quantized(inputs)
+
+    self.assertEqual(len(quantized.get_all_variables()), 3)
+    trainable = quantized.get_all_variables(tf.GraphKeys.TRAINABLE_VARIABLES)
+    self.assertEqual(trainable, ())
+
+  def testBatchNormRaises(self):
+    inputs = tf.constant(np.random.randn(2, 8, 8, 3).astype(np.float32))
+    net = snt.nets.ConvNet2D(output_channels=[4, 4],
+                             kernel_shapes=[3],
+                             strides=[1],
+                             paddings=[snt.SAME],
+                             use_batch_norm=True)
+    net(inputs, is_training=False)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      with self.assertRaisesRegexp(snt.NotSupportedError, "fold_batch_norm"):
+        snt.quantize_int8(net, session)
+
+  def testWrongInputSizeRaises(self):
+    w_quantized, w_scale = quantization.quantize_weights(np.ones([4, 3]))
+    lin = snt.QuantizedLinear(w_quantized, w_scale)
+
+    with self.assertRaises(snt.IncompatibleShapeError):
+      lin(tf.zeros([2, 5]))
+    with self.assertRaises(snt.IncompatibleShapeError):
+      lin(tf.zeros([4]))
+
+  @parameterized.parameters([3, 5], [None, 5], [3, None])
+  def testManyBatchDims(self, batch_size, time_size):
+    w = np.random.randn(4, 3).astype(np.float32)
+    w_quantized, w_scale = quantization.quantize_weights(w)
+    lin = snt.QuantizedLinear(w_quantized, w_scale)
+    inputs = tf.placeholder(tf.float32, [batch_size, time_size, 4])
+    outputs = lin(inputs)
+    self.assertEqual(outputs.get_shape().as_list(), [batch_size, time_size, 3])
+
+    inputs_value = np.random.randn(3, 5, 4).astype(np.float32)
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      outputs_value = session.run(outputs, feed_dict={inputs: inputs_value})
+    self.assertAllClose(outputs_value,
+                        np.dot(inputs_value, w_quantized * w_scale),
+                        atol=1e-5)
+
+  def testReportAccuracy(self):
+    outputs = tf.constant([[1., 0.], [0., 1.], [1., 0.], [0., 1.]])
+    quantized_outputs = tf.constant([[1., 0.], [1., 0.], [1., 0.], [0., 1.]])
+    labels = tf.constant([0, 1, 1, 1])
+
+    with self.test_session() as session:
+      report = snt.quantization_report(session, outputs, quantized_outputs)
+      self.assertIsNone(report.accuracy)
+      self.assertIsNone(report.accuracy_delta)
+
+      report = snt.quantization_report(session, outputs, quantized_outputs,
+                                       labels=labels)
+    self.assertEqual(report.argmax_agreement, 0.75)
+    self.assertEqual(report.accuracy, 0.75)
+    self.assertEqual(report.quantized_accuracy, 0.5)
+    self.assertEqual(report.accuracy_delta, -0.25)
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -0,0 +1,376 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Gradient checkpointing for Sonnet modules.
+
+A module wrapped in `Recompute` does not keep its intermediate activations for
+the backward pass. Its outputs are passed through an identity op whose gradient
+connects the module again to its inputs and backpropagates through this second
+copy. The original forward ops are then not needed by the backward pass and
+their activations can be freed.
+
+Checkpointing every `k`-th layer of an `N` layer network with `k ~ sqrt(N)`
+stores `O(sqrt(N))` activations at the cost of one extra forward pass.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import itertools
+
+# Dependency imports
+from sonnet.python.modules import base
+from sonnet.python.modules import sequential
+from sonnet.python.modules.nets import convnet
+import tensorflow as tf
+
+from tensorflow.python.framework import function
+from tensorflow.python.util import nest
+
+
+# Function names must be unique in a graph, since each one carries its own
+# gradient function.
+_function_uid = itertools.count()
+
+
+def _recompute(module, args, kwargs):
+  """Connects `module` and makes its gradient recompute the forward pass.
+
+  Args:
+    module: A Sonnet module.
+    args: Nested structure of Tensors passed as positional arguments to
+      `module`. Gradients are computed with respect to these.
+    kwargs: Dict of keyword arguments passed to `module`, such as
+      `is_training`. They are treated as constants.
+
+  Returns:
+    The outputs of `module`.
+  """
+  flat_inputs = [tf.convert_to_tensor(x) for x in nest.flatten(args)]
+  outputs = module(*nest.pack_sequence_as(args, flat_inputs), **kwargs)
+  flat_outputs = nest.flatten(outputs)
+  variables = list(module.get_all_variables())
+
+  num_outputs = len(flat_outputs)
+  num_inputs = len(flat_inputs)
+
+  def grad_fn(op, *grads):
+    """Connects `module` again and differentiates the recomputed outputs."""
+    # Delay the recomputation until the gradients of the outputs are needed.
+    with tf.control_dependencies(grads):
+      inputs = [tf.identity(x) for x in
+                op.inputs[num_outputs:num_outputs + num_inputs]]
+
+    # Batch norm update ops of the recomputed pass must not run again.
+    update_ops = tf.get_collection_ref(tf.GraphKeys.UPDATE_OPS)
+    num_update_ops = len(update_ops)
+    recomputed = module(*nest.pack_sequence_as(args, inputs), **kwargs)
+    del update_ops[num_update_ops:]
+
+    input_grads = tf.gradients(nest.flatten(recomputed), inputs + variables,
+                               grad_ys=grads)
+    return [None] * num_outputs + input_grads
+
+  identity_inputs = flat_outputs + flat_inputs + variables
+  input_types = [x.dtype.base_dtype for x in identity_inputs]
+
+  @function.Defun(*input_types,
+                  python_grad_func=grad_fn,
+                  func_name="Recompute_{}".format(next(_function_uid)))
+  def identity(*values):
+    return [tf.identity(x) for x in values[:num_outputs]]
+
+  identity_outputs = identity(*identity_inputs)
+  if num_outputs == 1:
+    identity_outputs = [identity_outputs]
+
+  for identity_output, output in zip(identity_outputs, flat_outputs):
+    identity_output.set_shape(output.get_shape())
+
+  return nest.pack_sequence_as(outputs, list(identity_outputs))
+
+
+class Recompute(base.AbstractModule):
+  """Recomputes the forward pass of a module during backpropagation.
+
+  Variables are shared between the forward pass and the recomputation through
+  the template of the wrapped module. Positional arguments must be (nested
+  structures of) Tensors; keyword arguments, such as `is_training`, are passed
+  unchanged to both passes.
+
+  Batch normalization update ops created by the recomputation are removed from
+  the `tf.GraphKeys.UPDATE_OPS` collection, so wrapped batch normalization
+  modules must add their update ops to that collection rather than to control
+  dependencies of their outputs.
+
+  The gradient is computed with `tf.gradients`, so a `Recompute` module can
+  not be connected inside a `tf.while_loop`. Use `checkpointed_dynamic_rnn`
+  to checkpoint recurrent unrolls.
+
+  Stochastic ops, such as dropout, draw new random values when they are
+  recomputed, so the gradients would not match the forward pass and would be
+  incorrect. The wrapped module must be deterministic.
+  """
+
+  def __init__(self, module, name=None):
+    """Constructs a Recompute module.
+
+    Args:
+      module: The Sonnet module to wrap.
+      name: Name of the module. Defaults to the name of `module` with
+        "_recompute" appended.
+
+    Raises:
+      TypeError: If `module` is not a Sonnet module.
+    """
+    if not isinstance(module, base.AbstractModule):
+      raise TypeError("module must be a Sonnet module, got {}.".format(
+          type(module)))
+    if name is None:
+      name = module.module_name + "_recompute"
+    super(Recompute, self).__init__(name=name)
+    self._module = module
+
+  def _build(self, *args, **kwargs):
+    """Connects the wrapped module with recomputation in the backward pass.
+
+    Args:
+      *args: Nested structures of Tensors, the inputs of the wrapped module.
+      **kwargs: Keyword arguments of the wrapped module.
+
+    Returns:
+      The outputs of the wrapped module.
+    """
+    return _recompute(self._module, args, kwargs)
+
+  @property
+  def module(self):
+    """Returns the wrapped module."""
+    return self._module
+
+
+def _group_layers(layers, every, name):
+  """Returns a `Sequential` recomputing each group of `every` layers."""
+  groups = []
+  for i in range(0, len(layers), every):
+    group = sequential.Sequential(layers[i:i + every],
+                                  name="{}_group_{}".format(name, len(groups)))
+    groups.append(Recompute(group))
+  return sequential.Sequential(groups, name=name)
+
+
+def _conv_net_group(module, indices, name):
+  """Returns a module connecting some convolutions of a `ConvNet2D`.
+
+  Each convolution is followed, as in `module`, by its normalization module
+  and by the activation.
+
+  Args:
+    module: A `snt.nets.ConvNet2D`. If it uses normalization, it must have been
+      connected to the graph, and its normalization modules are reused.
+    indices: The indices of the consecutive convolutions to connect.
+    name: Name of the returned module.
+
+  Returns:
+    A `snt.Module` taking the `is_training` and `test_local_stats` arguments of
+    `snt.nets.ConvNet2D`.
+  """
+  normalizers = module.normalization_modules if module.use_batch_norm else ()
+  uses_batch_stats = convnet._is_batch_norm_ctor(module.normalization_ctor)  # pylint: disable=protected-access
+  final_index = len(module.layers) - 1
+
+  def connect_group(inputs, is_training=None, test_local_stats=True):
+    net = inputs
+    for i in indices:
+      net = module.layers[i](net)
+      if i != final_index or module.activate_final:
+        if normalizers and uses_batch_stats:
+          net = normalizers[i](net,
+                               is_training=is_training,
+                               test_local_stats=test_local_stats)
+        elif normalizers:
+          net = normalizers[i](net)
+        net = module.activation(net)
+    return net
+
+  return base.Module(connect_group, name=name)
+
+
+class _CheckpointedConvNet2D(base.AbstractModule):
+  """Connects groups of layers of a `snt.nets.ConvNet2D` in sequence."""
+
+  def __init__(self, groups, uses_batch_stats, name):
+    super(_CheckpointedConvNet2D, self).__init__(name=name)
+    self._groups = tuple(groups)
+    self._uses_batch_stats = uses_batch_stats
+
+  def _build(self, inputs, is_training=None, test_local_stats=True):
+    """Connects each group, with the arguments of `snt.nets.ConvNet2D`.
+
+    Args:
+      inputs: A 4D Tensor, the inputs of the network.
+      is_training: Boolean to indicate to batch normalization modules if we
+        are currently training.
+      test_local_stats: Boolean to indicate to batch normalization modules if
+        they should use local batch statistics at test time.
+
+    Returns:
+      The outputs of the network.
+
+    Raises:
+      ValueError: If `is_training` is not explicitly specified when using
+        batch normalization.
+    """
+    if self._uses_batch_stats and is_training is None:
+      raise ValueError("Boolean is_training flag must be explicitly specified "
+                       "when using batch normalization.")
+    net = inputs
+    for group in self._groups:
+      net = group(net,
+                  is_training=is_training,
+                  test_local_stats=test_local_stats)
+    return net
+
+  @property
+  def layers(self):
+    """Returns the `Recompute` modules of each group."""
+    return self._groups
+
+
+def checkpoint_every(module, every, name=None):
+  """Returns a copy of `module` storing activations only every `every` layers.
+
+  The layers of `module` are split into consecutive groups of `every` layers,
+  each of which is wrapped in `Recompute`. Only the inputs of each group are
+  kept for the backward pass. The returned module shares its variables with
+  `module`.
+
+  For a `snt.nets.ConvNet2D`, each convolution, its normalization module and
+  its activation count as one layer. The returned module takes the same
+  `is_training` and `test_local_stats` arguments as `module`, and batch
+  normalization update ops are only added once, by the forward pass.
+
+  As for `Recompute`, the layers must be deterministic: stochastic ops such as
+  dropout would be recomputed with new random values, which makes the
+  gradients incorrect.
+
+  Args:
+    module: A `snt.Sequential` or a `snt.nets.ConvNet2D`. A `ConvNet2D` using
+      normalization must have been connected to the graph, so that its
+      normalization modules can be shared.
+    every: Number of layers in each recomputed group. `sqrt` of the number of
+      layers minimizes memory.
+    name: Optional name of the returned module. Defaults to the name of
+      `module` with "_checkpointed" appended.
+
+  Returns:
+    A module whose `layers` are the `Recompute` modules of each group: a
+    `snt.Sequential` if `module` is a `snt.Sequential`.
+
+  Raises:
+    ValueError: If `every` is not positive.
+    TypeError: If `module` is not a `snt.Sequential` or `snt.nets.ConvNet2D`.
+    snt.NotConnectedError: If `module` is a `snt.nets.ConvNet2D` using
+      normalization that has not been connected to the graph.
+  """
+  if every < 1:
+    raise ValueError("every must be positive, got {}.".format(every))
+  if name is None:
+    name = module.module_name + "_checkpointed"
+
+  if isinstance(module, sequential.Sequential):
+    return _group_layers(list(module.layers), every, name)
+  if not isinstance(module, convnet.ConvNet2D):
+    raise TypeError("module must be a Sequential or ConvNet2D, got {}.".format(
+        type(module)))
+
+  num_layers = len(module.layers)
+  groups = []
+  for start in range(0, num_layers, every):
+    group = _conv_net_group(module, range(start, min(start + every, num_layers)),
+                            name="{}_group_{}".format(name, len(groups)))
+    groups.append(Recompute(group))
+  uses_batch_stats = (
+      module.use_batch_norm and
+      convnet._is_batch_norm_ctor(module.normalization_ctor))  # pylint: disable=protected-access
+  return _CheckpointedConvNet2D(groups, uses_batch_stats, name=name)
+
+
+def checkpointed_dynamic_rnn(core, inputs, segment_length, initial_state=None,
+                             dtype=None, time_major=False, name=None):
+  """Unrolls `core` keeping only the state at every `segment_length` steps.
+
+  The sequence is split into segments of `segment_length` steps, each unrolled
+  with `tf.nn.dynamic_rnn` and recomputed during backpropagation from the state
+  at its start. With `segment_length ~ sqrt(T)` this stores `O(sqrt(T))`
+  activations instead of `O(T)`. This applies to any core, including
+  `snt.DeepRNN`.
+
+  Args:
+    core: An `snt.RNNCore`.
+    inputs: Tensor of shape `[batch_size, time, ...]`, or `[time, batch_size,
+      ...]` if `time_major` is `True`. The number of time steps must be
+      statically known.
+    segment_length: Number of steps in each recomputed segment.
+    initial_state: Optional initial state of the core. Defaults to the zero
+      state.
+    dtype: The dtype of the state. Required if `initial_state` is `None`.
+    time_major: Whether the time dimension of `inputs` comes first.
+    name: Optional name scope for the created ops.
+
+  Returns:
+    A tuple `(outputs, final_state)` as returned by `tf.nn.dynamic_rnn`.
+
+  Raises:
+    ValueError: If `segment_length` is not positive, if the number of time
+      steps is not statically known or if neither `initial_state` nor `dtype`
+      is given.
+  """
+  if segment_length < 1:
+    raise ValueError("segment_length must be positive, got {}.".format(
+        segment_length))
+  time_axis = 0 if time_major else 1
+  num_steps = inputs.get_shape()[time_axis].value
+  if num_steps is None:
+    raise ValueError("The number of time steps must be statically known.")
+
+  with tf.name_scope(name, "checkpointed_dynamic_rnn", [inputs]):
+    if initial_state is None:
+      if dtype is None:
+        raise ValueError("dtype must be given if initial_state is None.")
+      batch_size = tf.shape(inputs)[1 - time_axis]
+      initial_state = core.zero_state(batch_size, dtype)
+
+    def unroll_segment(segment_inputs, state):
+      return tf.nn.dynamic_rnn(core, segment_inputs, initial_state=state,
+                               time_major=time_major)
+
+    segment = Recompute(base.Module(unroll_segment,
+                                    name="{}_segment".format(core.module_name)))
+
+    sizes = [segment_length] * (num_steps // segment_length)
+    if num_steps % segment_length:
+      sizes.append(num_steps % segment_length)
+
+    state = initial_state
+    outputs = []
+    for segment_inputs in tf.split(inputs, sizes, axis=time_axis):
+      segment_outputs, state = segment(segment_inputs, state)
+      outputs.append(segment_outputs)
+
+    outputs = nest.map_structure(
+        lambda *x: tf.concat(x, axis=time_axis), *outputs)
+    return outputs, state
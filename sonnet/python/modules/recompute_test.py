@@ -0,0 +1,252 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for sonnet.python.modules.recompute."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Dependency imports
+from absl.testing import parameterized
+import numpy as np
+import sonnet as snt
+import tensorflow as tf
+
+from tensorflow.python.util import nest
+
+
+class RecomputeTest(parameterized.TestCase, tf.test.TestCase):
+
+  def _assert_same_gradients(self, outputs, recomputed_outputs, xs):
+    loss = tf.reduce_sum(tf.square(outputs))
+    recomputed_loss = tf.reduce_sum(tf.square(recomputed_outputs))
+    grads = tf.gradients(loss, xs)
+    recomputed_grads = tf.gradients(recomputed_loss, xs)
+    for grad in recomputed_grads:
+      self.assertIsNotNone(grad)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      outputs_np, recomputed_outputs_np = session.run(
+          [outputs, recomputed_outputs])
+      grads_np, recomputed_grads_np = session.run([grads, recomputed_grads])
+
+    self.assertAllClose(outputs_np, recomputed_outputs_np)
+    for grad, recomputed_grad in zip(grads_np, recomputed_grads_np):
+      self.assertAllClose(grad, recomputed_grad, rtol=1e-5, atol=1e-5)
+
+  def testMLP(self):
+    inputs = tf.constant(np.random.randn(4, 5).astype(np.float32))
+    mlp = snt.nets.MLP(output_sizes=[8, 8, 3])
+    recompute = snt.Recompute(mlp)
+
+    outputs = mlp(inputs)
+    recomputed_outputs = recompute(inputs)
+
+    self.assertEqual(set(recompute.get_all_variables()),
+                     set(mlp.get_all_variables()))
+    self._assert_same_gradients(outputs, recomputed_outputs,
+                                [inputs] + list(mlp.get_all_variables()))
+
+  def testForwardNotOnBackwardPath(self):
+    inputs = tf.constant(np.random.randn(4, 5).astype(np.float32))
+    mlp = snt.nets.MLP(output_sizes=[8, 3], activation=tf.nn.sigmoid)
+    outputs = snt.Recompute(mlp)(inputs)
+    forward_sigmoids = set(op for op in tf.get_default_graph().get_operations()
+                           if op.type == "Sigmoid")
+
+    tf.gradients(tf.reduce_sum(outputs), mlp.get_all_variables())
+
+    sigmoid_grads = [op for op in tf.get_default_graph().get_operations()
+                     if op.type == "SigmoidGrad"]
+    self.assertTrue(sigmoid_grads)
+    for op in sigmoid_grads:
+      self.assertNotIn(op.inputs[0].op, forward_sigmoids)
+
+  def testKeywordArguments(self):
+    inputs = tf.constant(np.random.randn(2, 8, 8, 3).astype(np.float32))
+    net = snt.nets.ConvNet2D(output_channels=[4, 4],
+                             kernel_shapes=[3],
+                             strides=[1],
+                             paddings=[snt.SAME],
+                             use_batch_norm=True)
+    outputs = net(inputs, is_training=False)
+    recomputed_outputs = snt.Recompute(net)(inputs, is_training=False)
+
+    self._assert_same_gradients(outputs, recomputed_outputs,
+                                [inputs] + list(net.get_variables()))
+
+  def testUpdateOpsNotDuplicated(self):
+    inputs = tf.constant(np.random.randn(2, 8, 8, 3).astype(np.float32))
+    net = snt.nets.ConvNet2D(output_channels=[4, 4],
+                             kernel_shapes=[3],
+                             strides=[1],
+                             paddings=[snt.SAME],
+                             use_batch_norm=True)
+    outputs = snt.Recompute(net)(inputs, is_training=True)
+    num_update_ops = len(tf.get_collection(tf.GraphKeys.UPDATE_OPS))
+
+    tf.gradients(tf.reduce_sum(outputs), net.get_variables())
+
+    self.assertEqual(len(tf.get_collection(tf.GraphKeys.UPDATE_OPS)),
+                     num_update_ops)
+
+  def testNotAModule(self):
+    with self.assertRaises(TypeError):
+      snt.Recompute(tf.nn.relu)
+
+
+class CheckpointEveryTest(parameterized.TestCase, tf.test.TestCase):
+
+  @parameterized.parameters(1, 2, 3)
+  def testSequential(self, every):
+    inputs = tf.constant(np.random.randn(4, 5).astype(np.float32))
+    layers = [snt.Linear(6), tf.nn.relu, snt.Linear(6), tf.nn.tanh,
+              snt.Linear(2)]
+    seq = snt.Sequential(layers)
+    checkpointed = snt.checkpoint_every(seq, every)
+
+    self.assertEqual(len(checkpointed.layers), -(-len(layers) // every))
+
+    outputs = seq(inputs)
+    checkpointed_outputs = checkpointed(inputs)
+    variables = seq.get_all_variables()
+    self.assertEqual(set(checkpointed.get_all_variables()), set(variables))
+
+    grads = tf.gradients(tf.reduce_sum(outputs), variables)
+    checkpointed_grads = tf.gradients(tf.reduce_sum(checkpointed_outputs),
+                                      variables)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      self.assertAllClose(*session.run([outputs, checkpointed_outputs]))
+      for grad, checkpointed_grad in zip(
+          *session.run([grads, checkpointed_grads])):
+        self.assertAllClose(grad, checkpointed_grad, rtol=1e-5, atol=1e-5)
+
+  def testConvNet2D(self):
+    inputs = tf.constant(np.random.randn(2, 8, 8, 3).astype(np.float32))
+    net = snt.nets.ConvNet2D(output_channels=[4, 4, 4, 4],
+                             kernel_shapes=[3],
+                             strides=[1],
+                             paddings=[snt.SAME])
+    checkpointed = snt.checkpoint_every(net, 2)
+    self.assertEqual(len(checkpointed.layers), 2)
+
+    outputs = net(inputs)
+    checkpointed_outputs = checkpointed(inputs)
+    self.assertEqual(set(checkpointed.get_all_variables()),
+                     set(net.get_variables()))
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      self.assertAllClose(*session.run([outputs, checkpointed_outputs]))
+
+  @parameterized.parameters(1, 2, 3)
+  def testConvNet2DBatchNorm(self, every):
+    inputs = tf.constant(np.random.randn(2, 8, 8, 3).astype(np.float32))
+    net = snt.nets.ConvNet2D(output_channels=[4, 4, 4],
+                             kernel_shapes=[3],
+                             strides=[1],
+                             paddings=[snt.SAME],
+                             use_batch_norm=True)
+    outputs = net(inputs, is_training=True)
+    num_update_ops = len(tf.get_collection(tf.GraphKeys.UPDATE_OPS))
+
+    checkpointed = snt.checkpoint_every(net, every)
+    self.assertEqual(len(checkpointed.layers), -(-3 // every))
+    checkpointed_outputs = checkpointed(inputs, is_training=True)
+    self.assertEqual(set(checkpointed.get_all_variables()),
+                     set(net.get_all_variables()))
+
+    variables = net.get_variables()
+    grads = tf.gradients(tf.reduce_sum(tf.square(outputs)), variables)
+    checkpointed_grads = tf.gradients(
+        tf.reduce_sum(tf.square(checkpointed_outputs)), variables)
+    # Batch norm update ops are added by each forward pass, but not by the
+    # recomputation.
+    self.assertEqual(len(tf.get_collection(tf.GraphKeys.UPDATE_OPS)),
+                     2 * num_update_ops)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      self.assertAllClose(*session.run([outputs, checkpointed_outputs]))
+      for grad, checkpointed_grad in zip(
+          *session.run([grads, checkpointed_grads])):
+        self.assertAllClose(grad, checkpointed_grad, rtol=1e-4, atol=1e-4)
+
+    with self.assertRaisesRegexp(ValueError, "is_training"):
+      checkpointed(inputs)
+
+  def testErrors(self):
+    net = snt.nets.ConvNet2D(output_channels=[4],
+                             kernel_shapes=[3],
+                             strides=[1],
+                             paddings=[snt.SAME],
+                             use_batch_norm=True)
+    with self.assertRaises(snt.NotConnectedError):
+      snt.checkpoint_every(net, 1)
+    with self.assertRaises(ValueError):
+      snt.checkpoint_every(snt.Sequential([]), 0)
+    with self.assertRaises(TypeError):
+      snt.checkpoint_every(snt.Linear(2), 1)
+
+
+class CheckpointedDynamicRNNTest(parameterized.TestCase, tf.test.TestCase):
+
+  @parameterized.parameters((2, False), (3, False), (7, True))
+  def testDeepRNN(self, segment_length, time_major):
+    batch_size, num_steps, input_size = 3, 7, 4
+    core = snt.DeepRNN([snt.LSTM(5), snt.LSTM(6)], skip_connections=False)
+    shape = ([num_steps, batch_size, input_size] if time_major
+             else [batch_size, num_steps, input_size])
+    inputs = tf.constant(np.random.randn(*shape).astype(np.float32))
+
+    outputs, final_state = tf.nn.dynamic_rnn(
+        core, inputs, dtype=tf.float32, time_major=time_major)
+    checkpointed_outputs, checkpointed_final_state = (
+        snt.checkpointed_dynamic_rnn(core, inputs, segment_length,
+                                     dtype=tf.float32, time_major=time_major))
+
+    self.assertEqual(outputs.get_shape(), checkpointed_outputs.get_shape())
+
+    variables = core.get_all_variables()
+    grads = tf.gradients(tf.reduce_sum(outputs), variables)
+    checkpointed_grads = tf.gradients(tf.reduce_sum(checkpointed_outputs),
+                                      variables)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      self.assertAllClose(*session.run([outputs, checkpointed_outputs]))
+      for state, checkpointed_state in zip(
+          *session.run([nest.flatten(final_state),
+                        nest.flatten(checkpointed_final_state)])):
+        self.assertAllClose(state, checkpointed_state)
+      for grad, checkpointed_grad in zip(
+          *session.run([grads, checkpointed_grads])):
+        self.assertAllClose(grad, checkpointed_grad, rtol=1e-5, atol=1e-5)
+
+  def testErrors(self):
+    core = snt.LSTM(4)
+    with self.assertRaisesRegexp(ValueError, "statically known"):
+      snt.checkpointed_dynamic_rnn(
+          core, tf.placeholder(tf.float32, [2, None, 3]), 2, dtype=tf.float32)
+    with self.assertRaisesRegexp(ValueError, "dtype"):
+      snt.checkpointed_dynamic_rnn(core, tf.zeros([2, 4, 3]), 2)
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -0,0 +1,281 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Data-parallel replication of Sonnet modules across devices.
+
+A module is connected once per input shard, each connection ("tower") placed
+on its own device, while its variables are placed on a single device and
+shared between towers as for any other repeated connection:
+
+```python
+mlp = snt.nets.MLP([1024, 10])
+devices = ["/gpu:0", "/gpu:1"]
+logits = snt.replicate(mlp, tf.split(images, 2), devices)
+
+tower_grads = []
+for device, tower_logits, tower_labels in zip(devices, logits,
+                                              tf.split(labels, 2)):
+  with tf.device(device):
+    loss = tf.losses.sparse_softmax_cross_entropy(tower_labels, tower_logits)
+    tower_grads.append(optimizer.compute_gradients(loss))
+train_op = optimizer.apply_gradients(snt.average_gradients(tower_grads))
+```
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Dependency imports
+from sonnet.python.modules import base
+import tensorflow as tf
+
+
+# Op types placed on the variable device, as in `tf.train.replica_device_setter`.
+_VARIABLE_OPS = frozenset(("Variable", "VariableV2", "VarHandleOp",
+                           "AutoReloadVariable"))
+
+# Moving average update ops, whose second input is the delta applied to the
+# variable given as first input.
+_ASSIGN_SUB_OPS = frozenset(("AssignSub", "AssignSubVariableOp"))
+
+
+def _tower_device_fn(tower_device, variable_device):
+  """Returns a device function placing variables on `variable_device`."""
+  def device_fn(op):
+    op_type = op.type if isinstance(op, tf.Operation) else op.op
+    if variable_device is not None and op_type in _VARIABLE_OPS:
+      return variable_device
+    return tower_device
+  return device_fn
+
+
+def _variables_by_op(graph):
+  """Returns a dict from variable ops of `graph` to their variables."""
+  with graph.as_default():
+    variables = tf.global_variables() + tf.local_variables()
+  return {variable.op: variable for variable in variables}
+
+
+def _average_update_ops(tower_update_ops, graph):
+  """Merges moving average updates of several towers into their mean.
+
+  Moving average updates subtract `(variable - value) * (1 - decay)` from the
+  variable. This is linear in `value`, so subtracting the mean of the deltas of
+  all towers updates the variable with the mean of their statistics.
+
+  Args:
+    tower_update_ops: List of lists of update ops, one per tower, in the same
+      order for each tower.
+    graph: The graph containing the update ops.
+
+  Returns:
+    A list of update ops, one per update op of a single tower.
+
+  Raises:
+    base.NotSupportedError: If update ops are not moving average updates. This
+      is the case when `is_training` is a Tensor rather than a Python boolean.
+    ValueError: If towers have different update ops.
+  """
+  num_updates = len(tower_update_ops[0])
+  if any(len(update_ops) != num_updates for update_ops in tower_update_ops):
+    raise ValueError("All towers must create the same number of update ops.")
+
+  variables_by_op = _variables_by_op(graph)
+  averaged = []
+  for tower_updates in zip(*tower_update_ops):
+    ops = [getattr(update, "op", update) for update in tower_updates]
+    if any(op.type not in _ASSIGN_SUB_OPS for op in ops):
+      raise base.NotSupportedError(
+          "Only moving average updates can be averaged across towers, got {}. "
+          "Connect the module with a Python boolean `is_training`.".format(
+              [op.type for op in ops]))
+    variable_ops = set(op.inputs[0].op for op in ops)
+    if len(variable_ops) != 1:
+      raise ValueError("Update ops {} of different towers update different "
+                       "variables.".format([op.name for op in ops]))
+    variable = variables_by_op[variable_ops.pop()]
+    with tf.colocate_with(variable):
+      delta = tf.add_n([op.inputs[1] for op in ops]) / len(ops)
+      averaged.append(tf.assign_sub(variable, delta).op)
+  return averaged
+
+
+def replicate(module, input_shards, devices, variable_device="/cpu:0",
+              update_ops="first",
+              update_ops_collection=tf.GraphKeys.UPDATE_OPS,
+              **kwargs):
+  """Connects `module` to each input shard on its own device.
+
+  Each connection ("tower") is built under the name scope `tower_<i>` and the
+  device `devices[i]`. Variables are created by the first tower on
+  `variable_device` and reused by the others.
+
+  Update ops added to `update_ops_collection` by each tower, such as batch
+  normalization moving average updates, are merged so that running the
+  collection updates each variable once per step.
+
+  Args:
+    module: A Sonnet module, or any callable creating its variables through a
+      shared template.
+    input_shards: List of inputs, one per tower. A tuple (other than a
+      namedtuple) is passed as positional arguments of `module`, any other
+      input as its single argument.
+    devices: List of devices, one per tower.
+    variable_device: Device holding the variables. If `None`, variables are
+      placed on the device of the first tower.
+    update_ops: Either "first", to keep only the update ops of the first tower,
+      or "mean", to update moving averages with the mean of the statistics of
+      all towers.
+    update_ops_collection: Name of the collection of update ops to merge.
+    **kwargs: Keyword arguments passed to each connection of `module`, such as
+      `is_training`.
+
+  Returns:
+    A list of the outputs of each tower.
+
+  Raises:
+    ValueError: If the numbers of input shards and devices differ, or if
+      `update_ops` is not one of "first" or "mean".
+    base.NotSupportedError: If `update_ops` is "mean" and update ops are not
+      moving average updates.
+  """
+  if len(input_shards) != len(devices):
+    raise ValueError("Got {} input shards for {} devices.".format(
+        len(input_shards), len(devices)))
+  if not devices:
+    raise ValueError("At least one device is required.")
+  if update_ops not in ("first", "mean"):
+    raise ValueError(
+        "update_ops must be 'first' or 'mean', got {}.".format(update_ops))
+
+  graph = tf.get_default_graph()
+  collection = graph.get_collection_ref(update_ops_collection)
+  num_initial_update_ops = len(collection)
+  outputs = []
+  tower_update_ops = []
+  for i, (inputs, device) in enumerate(zip(input_shards, devices)):
+    if not isinstance(inputs, tuple) or hasattr(inputs, "_fields"):
+      inputs = (inputs,)
+    num_update_ops = len(collection)
+    with tf.name_scope("tower_{}".format(i)):
+      with tf.device(_tower_device_fn(device, variable_device)):
+        outputs.append(module(*inputs, **kwargs))
+    tower_update_ops.append(collection[num_update_ops:])
+
+  del collection[num_initial_update_ops:]
+  if update_ops == "first":
+    collection.extend(tower_update_ops[0])
+  else:
+    collection.extend(_average_update_ops(tower_update_ops, graph))
+  return outputs
+
+
+def _bucket_mean(tower_grads, num_towers):
+  """Returns the means over towers of a bucket of dense gradients.
+
+  Args:
+    tower_grads: List of lists of gradients, one list per variable in the
+      bucket containing the gradients of each tower.
+    num_towers: Number of towers.
+
+  Returns:
+    A list of averaged gradients, one per variable.
+  """
+  if len(tower_grads) == 1:
+    return [tf.add_n(tower_grads[0]) / num_towers]
+  shapes = [grads[0].get_shape() for grads in tower_grads]
+  sizes = [shape.num_elements() for shape in shapes]
+  flat_grads = []
+  for grads in zip(*tower_grads):
+    with tf.colocate_with(grads[0]):
+      flat_grads.append(tf.concat([tf.reshape(grad, [-1]) for grad in grads],
+                                  axis=0))
+  mean = tf.add_n(flat_grads) / num_towers
+  return [tf.reshape(grad, shape)
+          for grad, shape in zip(tf.split(mean, sizes), shapes)]
+
+
+def average_gradients(tower_grads_and_vars, bucket_bytes=4 << 20, name=None):
+  """Averages the gradients of each variable over towers.
+
+  Dense gradients of the same dtype and fully defined shapes are flattened and
+  concatenated into buckets of up to `bucket_bytes` bytes, so that a single sum
+  is computed per bucket instead of one per variable. Sparse gradients
+  (`tf.IndexedSlices`) are concatenated rather than summed.
+
+  Args:
+    tower_grads_and_vars: List of lists of `(gradient, variable)` pairs, one
+      per tower, as returned by `tf.train.Optimizer.compute_gradients`. Each
+      list must contain the same variables in the same order.
+    bucket_bytes: Maximum size in bytes of a bucket of gradients. Gradients
+      larger than this are summed on their own.
+    name: Optional name scope for the created ops.
+
+  Returns:
+    A list of `(gradient, variable)` pairs, where the gradients are averaged
+    over towers. A gradient is `None` if it is `None` for all towers, and
+    missing gradients of other towers are treated as zero.
+
+  Raises:
+    ValueError: If there are no towers, or if towers have different variables.
+  """
+  if not tower_grads_and_vars:
+    raise ValueError("At least one tower is required.")
+  num_towers = len(tower_grads_and_vars)
+  variables = [var for _, var in tower_grads_and_vars[0]]
+  for grads_and_vars in tower_grads_and_vars[1:]:
+    if [var for _, var in grads_and_vars] != variables:
+      raise ValueError("All towers must have the same variables.")
+
+  averaged = [None] * len(variables)
+  with tf.name_scope(name, "average_gradients"):
+    buckets = {}
+    bucket_order = []
+    for i in range(len(variables)):
+      grads = [grads_and_vars[i][0] for grads_and_vars in tower_grads_and_vars]
+      grads = [grad for grad in grads if grad is not None]
+      if not grads:
+        continue
+      if any(isinstance(grad, tf.IndexedSlices) for grad in grads):
+        grads = [tf.convert_to_tensor_or_indexed_slices(grad) for grad in grads]
+        grads = [grad if isinstance(grad, tf.IndexedSlices) else
+                 tf.IndexedSlices(grad, tf.range(tf.shape(grad)[0]),
+                                  tf.shape(grad)) for grad in grads]
+        averaged[i] = tf.IndexedSlices(
+            tf.concat([grad.values for grad in grads], axis=0) / num_towers,
+            tf.concat([grad.indices for grad in grads], axis=0),
+            grads[0].dense_shape)
+        continue
+
+      shape = grads[0].get_shape()
+      dtype = grads[0].dtype.base_dtype
+      if len(grads) != num_towers or not shape.is_fully_defined():
+        averaged[i] = tf.add_n(grads) / num_towers
+        continue
+      num_bytes = shape.num_elements() * dtype.size
+      bucket = buckets.get(dtype)
+      if bucket is None or bucket[0] + num_bytes > bucket_bytes:
+        bucket = buckets[dtype] = [0, []]
+        bucket_order.append(bucket)
+      bucket[0] += num_bytes
+      bucket[1].append((i, grads))
+
+    for _, entries in bucket_order:
+      means = _bucket_mean([grads for _, grads in entries], num_towers)
+      for (i, _), mean in zip(entries, means):
+        averaged[i] = mean
+
+  return list(zip(averaged, variables))
@@ -0,0 +1,144 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for sonnet.python.modules.replication."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# Dependency imports
+from absl.testing import parameterized
+import numpy as np
+import sonnet as snt
+import tensorflow as tf
+
+
+class ReplicateTest(parameterized.TestCase, tf.test.TestCase):
+
+  def testVariablesShared(self):
+    mlp = snt.nets.MLP([6, 3])
+    shards = tf.split(tf.constant(np.random.randn(4, 5).astype(np.float32)), 2)
+    outputs = snt.replicate(mlp, shards, ["/cpu:0", "/cpu:0"],
+                            variable_device="/cpu:0")
+
+    self.assertEqual(len(outputs), 2)
+    self.assertEqual(len(tf.trainable_variables()), 4)
+    for variable in tf.trainable_variables():
+      self.assertEqual(variable.device, "/device:CPU:0")
+
+    expected = mlp(tf.concat(shards, axis=0))
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      self.assertAllClose(session.run(tf.concat(outputs, axis=0)),
+                          session.run(expected))
+
+  @parameterized.parameters("first", "mean")
+  def testUpdateOps(self, update_ops):
+    bn = snt.BatchNormV2(decay_rate=0.5,
+                         update_ops_collection=tf.GraphKeys.UPDATE_OPS)
+    shards = [tf.fill([2, 3], 2.0), tf.fill([2, 3], 4.0)]
+    snt.replicate(bn, shards, ["/cpu:0", "/cpu:0"], update_ops=update_ops,
+                  is_training=True)
+
+    update_collection = tf.get_collection(tf.GraphKeys.UPDATE_OPS)
+    self.assertEqual(len(update_collection), 2)
+
+    with self.test_session() as session:
+      session.run(tf.global_variables_initializer())
+      session.run(update_collection)
+      moving_mean = session.run(bn.moving_mean)
+    # The moving mean is updated once with the mean of the first tower, or with
+    # the mean of both towers.
+    expected = 1.0 if update_ops == "first" else 1.5
+    self.assertAllClose(moving_mean, np.full([1, 3], expected))
+
+  def testUpdateOpsMeanNotSupported(self):
+    bn = snt.BatchNormV2(update_ops_collection=tf.GraphKeys.UPDATE_OPS)
+    is_training = tf.placeholder(tf.bool, [])
+    with self.assertRaises(snt.NotSupportedError):
+      snt.replicate(bn, [tf.ones([2, 3]), tf.ones([2, 3])],
+                    ["/cpu:0", "/cpu:0"], update_ops="mean",
+                    is_training=is_training)
+
+  def testErrors(self):
+    lin = snt.Linear(2)
+    with self.assertRaises(ValueError):
+      snt.replicate(lin, [tf.ones([2, 3])], ["/cpu:0", "/cpu:0"])
+    with self.assertRaises(ValueError):
+      snt.replicate(lin, [tf.ones([2, 3])], ["/cpu:0"], update_ops="all")
+
+
+class AverageGradientsTest(parameterized.TestCase, tf.test.TestCase):
+
+  @parameterized.parameters(1, 64, 4 << 20)
+  def testAverageGradients(self, bucket_bytes):
+    num_towers = 3
+    variables = [tf.get_variable("w", shape=[4, 5]),
+                 tf.get_variable("b", shape=[5]),
+                 tf.get_variable("embed", shape=[10, 2]),
+                 tf.get_variable("unused", shape=[2])]
+    grads = [np.random.randn(num_towers, 4, 5).astype(np.float32),
+             np.random.randn(num_towers, 5).astype(np.float32),
+             np.random.randn(num_towers, 2, 2).astype(np.float32)]
+    tower_grads_and_vars = []
+    for tower in range(num_towers):
+      embed_grad = tf.IndexedSlices(tf.constant(grads[2][tower]),
+                                    tf.constant([tower, 7]),
+                                    tf.constant([10, 2]))
+      tower_grads_and_vars.append([
+          (tf.constant(grads[0][tower]), variables[0]),
+          (tf.constant(grads[1][tower]), variables[1]),
+          (embed_grad, variables[2]),
+          (None, variables[3])])
+
+    averaged = snt.average_gradients(tower_grads_and_vars,
+                                     bucket_bytes=bucket_bytes)
+
+    self.assertEqual([var for _, var in averaged], variables)
+    self.assertIsNone(averaged[3][0])
+    self.assertIsInstance(averaged[2][0], tf.IndexedSlices)
+
+    embed_grad = tf.convert_to_tensor(averaged[2][0])
+    with self.test_session() as session:
+      w_grad, b_grad, embed_grad = session.run(
+          [averaged[0][0], averaged[1][0], embed_grad])
+    self.assertAllClose(w_grad, grads[0].mean(axis=0))
+    self.assertAllClose(b_grad, grads[1].mean(axis=0))
+    expected_embed_grad = np.zeros([10, 2], dtype=np.float32)
+    for tower in range(num_towers):
+      expected_embed_grad[[tower, 7]] += grads[2][tower] / num_towers
+    self.assertAllClose(embed_grad, expected_embed_grad)
+
+  def testBucketingReducesAddOps(self):
+    num_variables = 10
+    variables = [tf.get_variable("v{}".format(i), shape=[3])
+                 for i in range(num_variables)]
+    tower_grads_and_vars = [[(tf.ones([3]), v) for v in variables]
+                            for _ in range(2)]
+    snt.average_gradients(tower_grads_and_vars, name="average")
+    add_ops = [op for op in tf.get_default_graph().get_operations()
+               if op.type in ("AddN", "Add") and op.name.startswith("average")]
+    self.assertEqual(len(add_ops), 1)
+
+  def testDifferentVariables(self):
+    v1 = tf.get_variable("v1", shape=[3])
+    v2 = tf.get_variable("v2", shape=[3])
+    with self.assertRaises(ValueError):
+      snt.average_gradients([[(tf.ones([3]), v1)], [(tf.ones([3]), v2)]])
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -164,6 +164,119 @@ def trainable_initial_state(batch_size, state_size, dtype, initializers=None,
                                flat_sequence=flat_initial_state)
 
 
+def length_aware_dynamic_rnn(core, inputs, sequence_length, initial_state=None,
+                             dtype=None, time_major=False, name=None):
+  """Unrolls `core` over a batch of variable length sequences.
+
+  Unlike `tf.nn.dynamic_rnn`, which runs the core on every row at every step
+  and then selects the results of the unfinished rows, this function only runs
+  the core on the rows that have not finished yet. Rows are sorted by
+  decreasing length so that the unfinished rows at step `t` are a prefix of the
+  batch; finished rows copy their state through and produce zero outputs. The
+  loop stops after `max(sequence_length)` steps.
+
+  The core must accept a batch size that changes from step to step.
+
+  Args:
+    core: An `RNNCore` (or any callable with the same interface providing
+        `output_size` and `initial_state`).
+    inputs: Tensor or nested structure of Tensors of shape
+        `[batch_size, max_time, ...]`, or `[max_time, batch_size, ...]` if
+        `time_major` is `True`.
+    sequence_length: int32 Tensor of shape `[batch_size]` with the length of
+        each sequence.
+    initial_state: Optional initial state of the core. Defaults to
+        `core.initial_state(batch_size, dtype)`.
+    dtype: The data type of the initial state and outputs. Defaults to the
+        dtype of the (first) input.
+    time_major: Whether `inputs` and the returned outputs are time major.
+    name: Optional name scope for the created ops.
+
+  Returns:
+    A tuple `(outputs, final_state)` with the same structure and shapes as
+    returned by `tf.nn.dynamic_rnn`.
+  """
+  with tf.name_scope(name, "length_aware_dynamic_rnn",
+                     nest.flatten(inputs) + [sequence_length]):
+    flat_inputs = nest.flatten(inputs)
+    if not time_major:
+      flat_inputs = [
+          tf.transpose(x, [1, 0] + list(range(2, x.get_shape().ndims)))
+          for x in flat_inputs]
+    dtype = dtype or flat_inputs[0].dtype
+    static_time_and_batch = flat_inputs[0].get_shape()[:2]
+    max_input_time = tf.shape(flat_inputs[0])[0]
+    batch_size = tf.shape(flat_inputs[0])[1]
+    if initial_state is None:
+      initial_state = core.initial_state(batch_size, dtype)
+
+    # Sort rows by decreasing length, so that the rows still running at any
+    # step form a prefix of the batch.
+    sequence_length = tf.to_int32(sequence_length)
+    sorted_length, order = tf.nn.top_k(sequence_length, k=batch_size)
+    flat_inputs = [tf.gather(x, order, axis=1) for x in flat_inputs]
+    flat_state = [tf.gather(s, order) for s in nest.flatten(initial_state)]
+
+    input_tas = [
+        tf.TensorArray(x.dtype, size=max_input_time).unstack(x)
+        for x in flat_inputs]
+    max_time = tf.reduce_max(sorted_length)
+    flat_output_size = nest.flatten(core.output_size)
+    output_tas = tuple(
+        tf.TensorArray(dtype, size=max_time, element_shape=(
+            tf.TensorShape([None]).concatenate(size)))
+        for size in flat_output_size)
+
+    def cond(t, *unused_args):
+      return t < max_time
+
+    def body(t, flat_state, output_tas):
+      """Runs the core on the rows that are still active at step `t`."""
+      num_active = tf.reduce_sum(tf.to_int32(sorted_length > t))
+      step_inputs = nest.pack_sequence_as(
+          inputs, [ta.read(t)[:num_active] for ta in input_tas])
+      active_state = nest.pack_sequence_as(
+          initial_state, [s[:num_active] for s in flat_state])
+      step_outputs, next_active_state = core(step_inputs, active_state)
+
+      next_flat_state = []
+      for next_state, prev_state in zip(nest.flatten(next_active_state),
+                                        flat_state):
+        next_state = tf.concat([next_state, prev_state[num_active:]], 0)
+        next_state.set_shape(prev_state.get_shape())
+        next_flat_state.append(next_state)
+
+      next_output_tas = []
+      for ta, output in zip(output_tas, nest.flatten(step_outputs)):
+        padding = [[0, batch_size - num_active]]
+        padding += [[0, 0]] * (output.get_shape().ndims - 1)
+        next_output_tas.append(ta.write(t, tf.pad(output, padding)))
+
+      return t + 1, next_flat_state, tuple(next_output_tas)
+
+    _, final_flat_state, output_tas = tf.while_loop(
+        cond, body, (tf.constant(0), flat_state, output_tas))
+
+    # Undo the sorting, and pad the outputs to the length of the inputs.
+    inverse_order = tf.invert_permutation(order)
+    flat_outputs = []
+    for ta, size in zip(output_tas, flat_output_size):
+      output = tf.gather(ta.stack(), inverse_order, axis=1)
+      padding = [[0, max_input_time - max_time]]
+      padding += [[0, 0]] * (output.get_shape().ndims - 1)
+      output = tf.pad(output, padding)
+      output.set_shape(static_time_and_batch.concatenate(size))
+      if not time_major:
+        output = tf.transpose(
+            output, [1, 0] + list(range(2, output.get_shape().ndims)))
+      flat_outputs.append(output)
+    final_flat_state = [tf.gather(s, inverse_order) for s in final_flat_state]
+
+    outputs = nest.pack_sequence_as(core.output_size, flat_outputs)
+    final_state = nest.pack_sequence_as(initial_state, final_flat_state)
+    return outputs, final_state
+
+
 @six.add_metaclass(abc.ABCMeta)
 class RNNCore(base.AbstractModule):
   """Superclass for Recurrent Neural Network Cores.
@@ -345,3 +458,134 @@ class TrainableInitialState(base.AbstractModule):
 
     return nest.pack_sequence_as(structure=self._initial_state,
                                  flat_sequence=flat_learnable_state)
+
+
+class TruncatedBPTTUnroll(base.AbstractModule):
+  """Unrolls an RNNCore while carrying its state across connections.
+
+  The state of the core is stored in non-trainable local variables, which are
+  read as the initial state of each unroll and assigned the final state once
+  the unroll has been computed. This allows training with short unrolls over
+  long streams of data (truncated backpropagation through time) without having
+  to plumb the state through the training loop by hand:
+
+      core = snt.LSTM(hidden_size=128)
+      unroll = snt.TruncatedBPTTUnroll(core, batch_size=32)
+      # `inputs` is a chunk of the stream, `new_episode` a boolean vector of
+      # shape [batch_size] marking rows whose stream starts in this chunk.
+      output_sequence, final_state = unroll(inputs, reset_mask=new_episode)
+
+  The outputs depend on the state assignment, so evaluating them always
+  advances the carried state. Gradients do not flow into previous unrolls.
+  """
+
+  def __init__(self, core, batch_size, dtype=tf.float32, time_major=False,
+               name="truncated_bptt_unroll"):
+    """Constructs a TruncatedBPTTUnroll module.
+
+    Args:
+      core: `RNNCore` to unroll.
+      batch_size: Python integer with the batch size of the inputs. The size of
+          the state variables is `[batch_size] + state_size`.
+      dtype: The data type of the state.
+      time_major: Whether the inputs to the module are time major, see
+          `tf.nn.dynamic_rnn`.
+      name: Name of the module.
+
+    Raises:
+      TypeError: If `core` is not an `RNNCore`.
+    """
+    super(TruncatedBPTTUnroll, self).__init__(name=name)
+    if not isinstance(core, RNNCore):
+      raise TypeError("core must be an RNNCore, got {}.".format(type(core)))
+    self._core = core
+    self._batch_size = batch_size
+    self._dtype = dtype
+    self._time_major = time_major
+
+  def _build(self, inputs, reset_mask=None, sequence_length=None):
+    """Unrolls the core over `inputs`, starting from the carried state.
+
+    Args:
+      inputs: Input sequence, see `tf.nn.dynamic_rnn`.
+      reset_mask: Optional boolean Tensor of shape `[batch_size]`. Rows for
+          which it is `True` start from the initial state of the core instead
+          of the carried state.
+      sequence_length: Optional int32 Tensor of shape `[batch_size]`, see
+          `tf.nn.dynamic_rnn`.
+
+    Returns:
+      A tuple `(output_sequence, final_state)`.
+    """
+    flat_state_size = nest.flatten(self._core.state_size)
+    flat_state_variables = [
+        tf.get_variable(
+            "state_{}".format(i),
+            shape=[self._batch_size] + tf.TensorShape(size).as_list(),
+            dtype=self._dtype,
+            initializer=tf.zeros_initializer(),
+            trainable=False,
+            collections=[tf.GraphKeys.LOCAL_VARIABLES])
+        for i, size in enumerate(flat_state_size)]
+    self._state_variables = nest.pack_sequence_as(
+        structure=self._core.state_size, flat_sequence=flat_state_variables)
+
+    flat_initial_state = [tf.identity(v) for v in flat_state_variables]
+    if reset_mask is not None:
+      flat_reset_state = nest.flatten(
+          self._core.initial_state(self._batch_size, self._dtype))
+      flat_initial_state = [
+          tf.where(reset_mask, reset, carried)
+          for reset, carried in zip(flat_reset_state, flat_initial_state)]
+    initial_state = nest.pack_sequence_as(
+        structure=self._core.state_size, flat_sequence=flat_initial_state)
+
+    output_sequence, final_state = tf.nn.dynamic_rnn(
+        self._core, inputs, initial_state=initial_state,
+        sequence_length=sequence_length, time_major=self._time_major)
+
+    assign_ops = [
+        tf.assign(variable, tf.stop_gradient(state))
+        for variable, state in zip(flat_state_variables,
+                                   nest.flatten(final_state))]
+    with tf.control_dependencies(assign_ops):
+      output_sequence = nest.map_structure(tf.identity, output_sequence)
+      final_state = nest.map_structure(tf.identity, final_state)
+
+    return output_sequence, final_state
+
+  def reset_state(self, name=None):
+    """Returns an op that resets all rows of the carried state.
+
+    Args:
+      name: Optional name for the returned op.
+
+    Returns:
+      An op assigning the initial state of the core to the state variables.
+
+    Raises:
+      base.NotConnectedError: If the module has not been connected yet.
+    """
+    self._ensure_is_connected()
+    with tf.name_scope(name, "reset_state"):
+      initial_state = self._core.initial_state(self._batch_size, self._dtype)
+      assign_ops = [
+          tf.assign(variable, state)
+          for variable, state in zip(nest.flatten(self._state_variables),
+                                     nest.flatten(initial_state))]
+      return tf.group(*assign_ops)
+
+  @property
+  def core(self):
+    """Returns the wrapped `RNNCore`."""
+    return self._core
+
+  @property
+  def state_variables(self):
+    """Returns the variables holding the carried state.
+
+    Raises:
+      base.NotConnectedError: If the module has not been connected yet.
+    """
+    self._ensure_is_connected()
+    return self._state_variables
@@ -181,5 +181,110 @@ class TrainableInitialState(tf.test.TestCase, parameterized.TestCase):
         sess.run(tf.global_variables_initializer())
 
 
+class TruncatedBPTTUnrollTest(tf.test.TestCase):
+
+  def _make_core(self):
+    # A core whose state counts the sum of its inputs.
+    return snt.VanillaRNN(
+        hidden_size=1, activation=tf.identity,
+        initializers={"in_to_hidden": {"w": tf.ones_initializer(),
+                                       "b": tf.zeros_initializer()},
+                      "hidden_to_hidden": {"w": tf.ones_initializer(),
+                                           "b": tf.zeros_initializer()}})
+
+  def testStateIsCarried(self):
+    batch_size, unroll_length = 2, 3
+    unroll = snt.TruncatedBPTTUnroll(self._make_core(), batch_size=batch_size)
+    inputs = tf.ones([batch_size, unroll_length, 1])
+    output_sequence, final_state = unroll(inputs)
+
+    self.assertEqual(unroll.state_variables.get_shape().as_list(),
+                     [batch_size, 1])
+    self.assertNotIn(unroll.state_variables, tf.trainable_variables())
+
+    with self.test_session() as sess:
+      sess.run([tf.global_variables_initializer(),
+                tf.local_variables_initializer()])
+      first_outputs = sess.run(output_sequence)
+      second_state = sess.run(final_state)
+      sess.run(unroll.reset_state())
+      reset_state = sess.run(final_state)
+
+    self.assertAllClose(first_outputs[:, :, 0], [[1, 2, 3], [1, 2, 3]])
+    self.assertAllClose(second_state, [[6], [6]])
+    self.assertAllClose(reset_state, [[3], [3]])
+
+  def testResetMask(self):
+    batch_size = 2
+    unroll = snt.TruncatedBPTTUnroll(self._make_core(), batch_size=batch_size)
+    reset_mask = tf.placeholder(tf.bool, [batch_size])
+    _, final_state = unroll(tf.ones([batch_size, 2, 1]), reset_mask=reset_mask)
+
+    with self.test_session() as sess:
+      sess.run([tf.global_variables_initializer(),
+                tf.local_variables_initializer()])
+      sess.run(final_state, feed_dict={reset_mask: [False, False]})
+      state = sess.run(final_state, feed_dict={reset_mask: [True, False]})
+
+    self.assertAllClose(state, [[2], [4]])
+
+  def testBadCore(self):
+    with self.assertRaises(TypeError):
+      snt.TruncatedBPTTUnroll(snt.Linear(output_size=1), batch_size=1)
+
+  def testNotConnected(self):
+    unroll = snt.TruncatedBPTTUnroll(self._make_core(), batch_size=1)
+    with self.assertRaises(snt.NotConnectedError):
+      unroll.reset_state()
+
+
+class LengthAwareDynamicRNNTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters((False,), (True,))
+  def testMatchesDynamicRNN(self, time_major):
+    batch_size, max_time, input_size = 4, 7, 3
+    core = snt.LSTM(hidden_size=5)
+    inputs_value = np.random.randn(
+        batch_size, max_time, input_size).astype(np.float32)
+    if time_major:
+      inputs_value = np.transpose(inputs_value, [1, 0, 2])
+    inputs = tf.constant(inputs_value)
+    sequence_length = tf.constant([3, 0, 6, 2])
+
+    outputs, final_state = snt.length_aware_dynamic_rnn(
+        core, inputs, sequence_length, time_major=time_major)
+    expected_outputs, expected_final_state = tf.nn.dynamic_rnn(
+        core, inputs, sequence_length=sequence_length,
+        initial_state=core.initial_state(batch_size), time_major=time_major)
+
+    self.assertEqual(outputs.get_shape().as_list(),
+                     expected_outputs.get_shape().as_list())
+    nest.assert_same_structure(final_state, expected_final_state)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      values = sess.run([outputs, final_state])
+      expected_values = sess.run([expected_outputs, expected_final_state])
+
+    for value, expected_value in zip(nest.flatten(values),
+                                     nest.flatten(expected_values)):
+      self.assertAllClose(value, expected_value, atol=1e-5)
+
+  def testInitialState(self):
+    batch_size = 2
+    core = snt.VanillaRNN(hidden_size=3)
+    inputs = tf.random_normal([batch_size, 4, 2])
+    initial_state = tf.ones([batch_size, 3])
+    _, final_state = snt.length_aware_dynamic_rnn(
+        core, inputs, tf.constant([0, 2]), initial_state=initial_state)
+
+    with self.test_session() as sess:
+      sess.run(tf.global_variables_initializer())
+      final_state_value = sess.run(final_state)
+
+    # The empty sequence keeps its initial state.
+    self.assertAllClose(final_state_value[0], np.ones([3]))
+
+
 if __name__ == "__main__":
   tf.test.main()
@@ -20,10 +20,10 @@ from __future__ import print_function
 
 import abc
 from itertools import chain
+from itertools import product
 
 # Dependency imports
 import numpy as np
-from six.moves import xrange  # pylint: disable=redefined-builtin
 from sonnet.python.modules import base
 from sonnet.python.modules import basic
 import tensorflow as tf
@@ -120,8 +120,8 @@ def _create_affine_features(output_shape, source_shape):
      resampled.
 
   Returns:
-    List of flattened numpy arrays of coordinates in range `[-1, 1]^N`, for
-    example:
+    Numpy array of coordinates in range `[-1, 1]^N`, of shape `[N + 1, n]`,
+    for example:
       ```
       [[x_0_0, .... , x_0_{n-1}],
        ....
@@ -139,14 +139,118 @@ def _create_affine_features(output_shape, source_shape):
   """
   ranges = [np.linspace(-1, 1, x, dtype=np.float32)
             for x in reversed(output_shape)]
-  psi = [x.reshape(-1) for x in np.meshgrid(*ranges, indexing='xy')]
-  dim_gap = len(source_shape) - len(output_shape)
-  for _ in xrange(dim_gap):
-    psi.append(np.zeros_like(psi[0], dtype=np.float32))
-  psi.append(np.ones_like(psi[0], dtype=np.float32))
+  grid = np.meshgrid(*ranges, indexing='xy')
+  psi = np.zeros((len(source_shape) + 1, grid[0].size), dtype=np.float32)
+  psi[:len(output_shape)] = np.reshape(grid, (len(output_shape), -1))
+  psi[-1] = 1
   return psi
 
 
+# Precomputed grids and features of affine grid warpers, keyed by the output
+# shape, source shape and constraints. The arrays are read-only, as they are
+# shared between warpers.
+_AFFINE_GRIDS = {}
+_AFFINE_FEATURES = {}
+
+
+def _read_only(array):
+  """Marks a numpy array as read-only and returns it."""
+  if array is not None:
+    array.flags.writeable = False
+  return array
+
+
+def _affine_grid(output_shape, source_shape):
+  """Returns the cached homogenous coordinates of an output grid."""
+  key = (tuple(output_shape), tuple(source_shape))
+  grid = _AFFINE_GRIDS.get(key)
+  if grid is None:
+    grid = _AFFINE_GRIDS[key] = _read_only(
+        _create_affine_features(output_shape, source_shape))
+  return grid
+
+
+def _affine_scales(source_shape):
+  """Returns the scales mapping coordinates in `[-1, 1]` to the source."""
+  return (np.array(source_shape[::-1], dtype=np.float32) - 1.0) * .5
+
+
+def _affine_features(output_shape, source_shape, constraints):
+  """Returns the cached features of an `AffineGridWarper`.
+
+  Transforming a point x's i-th coordinate via an affine transformation is
+  performed via the following dot product:
+
+    x_i' = s_i * (T_i * x) + t_i                                            (1)
+
+  where Ti is the i-th row of an affine matrix, and the scalars s_i and t_i
+  define a decentering and global scaling into the source space. Some of the
+  entries of Ti are provided via the input, some others are instead fixed,
+  according to the constraints. The dot product (1) is accordingly broken down
+  into two parts:
+
+    x_i' = Ti[uncon_i] * x[uncon_i, :] + offset(con_var)                    (2)
+
+  i.e. the sum of the dot product of the free parameters indexed by uncon_i
+  and an offset obtained by precomputing the fixed part of (1) according to
+  the constraints.
+
+  Args:
+    output_shape: Tuple of integers, the shape of the output grid.
+    source_shape: Tuple of integers, the shape of the source signal.
+    constraints: An `AffineWarpConstraints` object.
+
+  Returns:
+    A list of `3 * N` features: the `x[uncon_i, :]` scaled by `s_i` for each
+    row, or `None` for fully constrained rows; the precomputed offsets
+    `offset(con_var)` for each row, or `None` for rows without constraints;
+    and the `t_i` for each row.
+  """
+  key = (tuple(output_shape), tuple(source_shape), constraints.constraints)
+  features = _AFFINE_FEATURES.get(key)
+  if features is None:
+    psi = _affine_grid(output_shape, source_shape)
+    mask = np.array(constraints.mask)
+    values = np.array([[0 if x is None else x for x in row]
+                       for row in constraints.constraints], dtype=np.float32)
+    scales = _affine_scales(source_shape)
+
+    free = [psi[row] * scale if row.any() else None
+            for row, scale in zip(mask, scales)]
+    # The fixed parts of all rows are computed with a single product.
+    fixed = np.dot(values * ~mask, psi) * scales[:, np.newaxis]
+    fixed = [x if not row.all() else None for x, row in zip(fixed, mask)]
+    offsets = [float(scale) for scale in scales]
+    features = _AFFINE_FEATURES[key] = tuple(
+        [_read_only(x) for x in free + fixed] + offsets)
+  return list(features)
+
+
+def _affine_parameter_matrices(source_shape, constraints):
+  """Returns the matrices mapping free parameters to scaled affine matrices.
+
+  Args:
+    source_shape: Tuple of integers, the shape of the source signal.
+    constraints: An `AffineWarpConstraints` object.
+
+  Returns:
+    A tuple `(selection, offset)`, such that `params * selection + offset` is
+    the flattened affine matrix of the free parameters `params`, completed with
+    the constraints, each row `i` scaled by `s_i` as in `_affine_features`.
+  """
+  num_dim = constraints.num_dim
+  mask = np.array(constraints.mask).reshape(-1)
+  row_scales = np.repeat(_affine_scales(source_shape), num_dim + 1)
+  selection = np.zeros((constraints.num_free_params, mask.size),
+                       dtype=np.float32)
+  selection[np.arange(constraints.num_free_params), np.flatnonzero(mask)] = (
+      row_scales[mask])
+  values = np.array([0 if x is None else x
+                     for x in chain.from_iterable(constraints.constraints)],
+                    dtype=np.float32)
+  return selection, values * row_scales
+
+
 class AffineGridWarper(GridWarper):
   """Affine Grid Warper class.
 
@@ -216,66 +320,15 @@ class AffineGridWarper(GridWarper):
     affine_warp_constraints = constraints
     if not isinstance(affine_warp_constraints, AffineWarpConstraints):
       affine_warp_constraints = AffineWarpConstraints(affine_warp_constraints)
-    mask = affine_warp_constraints.mask
-    psi = _create_affine_features(output_shape=self._output_shape,
-                                  source_shape=self._source_shape)
-    scales = [(x - 1.0) * .5 for x in reversed(self._source_shape)]
-    offsets = scales
-    # Transforming a point x's i-th coordinate via an affine transformation
-    # is performed via the following dot product:
-    #
-    #  x_i' = s_i * (T_i * x) + t_i                                          (1)
-    #
-    # where Ti is the i-th row of an affine matrix, and the scalars s_i and t_i
-    # define a decentering and global scaling into the source space.
-    # In the AffineGridWarper some of the entries of Ti are provided via the
-    # input, some others are instead fixed, according to the constraints
-    # assigned in the constructor.
-    # In create_features the internal dot product (1) is accordingly broken down
-    # into two parts:
-    #
-    # x_i' = Ti[uncon_i] * x[uncon_i, :] + offset(con_var)                   (2)
-    #
-    # i.e. the sum of the dot product of the free parameters (coming
-    # from the input) indexed by uncond_i and an offset obtained by
-    # precomputing the fixed part of (1) according to the constraints.
-    # This step is implemented by analyzing row by row the constraints matrix
-    # and saving into a list the x[uncon_i] and offset(con_var) data matrices
-    # for each output dimension.
-    features = []
-    for row, scale in zip(mask, scales):
-      x_i = np.array([x for x, is_active in zip(psi, row) if is_active])
-      features.append(x_i * scale if len(x_i) else None)
-
-    for row_i, row in enumerate(mask):
-      x_i = None
-      s = scales[row_i]
-      for i, is_active in enumerate(row):
-        if is_active:
-          continue
-
-        # In principle a whole row of the affine matrix can be fully
-        # constrained. In that case the corresponding dot product between input
-        # parameters and grid coordinates doesn't need to be implemented in the
-        # computation graph since it can be precomputed.
-        # When a whole row if constrained, x_i - which is initialized to
-        # None - will still be None at the end do the loop when it is appended
-        # to the features list; this value is then used to detect this setup
-        # in the build function where the graph is assembled.
-        if x_i is None:
-          x_i = np.array(psi[i]) * affine_warp_constraints[row_i][i] * s
-        else:
-          x_i += np.array(psi[i]) * affine_warp_constraints[row_i][i] * s
-      features.append(x_i)
-
-    features += offsets
-    return features
+    return _affine_features(self._output_shape, self._source_shape,
+                            affine_warp_constraints)
 
   def _build(self, inputs):
     """Assembles the module network and adds it to the graph.
 
-    The internal computation graph is assembled according to the set of
-    constraints provided at construction time.
+    The free parameters are completed with the constraints provided at
+    construction time into a batch of affine matrices, which warp the
+    reference grid with a single matrix multiplication.
 
     Args:
       inputs: Tensor containing a batch of transformation parameters.
@@ -287,72 +340,26 @@ class AffineGridWarper(GridWarper):
       Error: If the input tensor size is not consistent with the constraints
         passed at construction time.
     """
-    input_shape = tf.shape(inputs)
     input_dtype = inputs.dtype.as_numpy_dtype
-    batch_size = tf.expand_dims(input_shape[0], 0)
     number_of_params = inputs.get_shape()[1]
     if number_of_params != self._constraints.num_free_params:
       raise base.Error('Input size is not consistent with constraint '
                        'definition: {} parameters expected, {} provided.'
                        .format(self._constraints.num_free_params,
                                number_of_params))
-    num_output_dimensions = len(self._psi) // 3
-    def get_input_slice(start, size):
-      """Extracts a subset of columns from the input 2D Tensor."""
-      return basic.SliceByDim([1], [start], [size])(inputs)
-
-    warped_grid = []
-    var_index_offset = 0
-    number_of_points = np.prod(self._output_shape)
-    for i in xrange(num_output_dimensions):
-      if self._psi[i] is not None:
-        # The i-th output dimension is not fully specified by the constraints,
-        # the graph is setup to perform matrix multiplication in batch mode.
-        grid_coord = self._psi[i].astype(input_dtype)
-
-        num_active_vars = self._psi[i].shape[0]
-        active_vars = get_input_slice(var_index_offset, num_active_vars)
-        warped_coord = tf.matmul(active_vars, grid_coord)
-        warped_coord = tf.expand_dims(warped_coord, 1)
-        var_index_offset += num_active_vars
-        offset = self._psi[num_output_dimensions + i]
-        if offset is not None:
-          offset = offset.astype(input_dtype)
-          # Some entries in the i-th row of the affine matrix were constrained
-          # and the corresponding matrix multiplications have been precomputed.
-          tiling_params = tf.concat(
-              [
-                  batch_size, tf.constant(
-                      1, shape=(1,)), tf.ones_like(offset.shape)
-              ],
-              0)
-          offset = offset.reshape((1, 1) + offset.shape)
-          warped_coord += tf.tile(offset, tiling_params)
-
-      else:
-        # The i-th output dimension is fully specified by the constraints, and
-        # the corresponding matrix multiplications have been precomputed.
-        warped_coord = self._psi[num_output_dimensions + i].astype(input_dtype)
-        tiling_params = tf.concat(
-            [
-                batch_size, tf.constant(
-                    1, shape=(1,)), tf.ones_like(warped_coord.shape)
-            ],
-            0)
-        warped_coord = warped_coord.reshape((1, 1) + warped_coord.shape)
-        warped_coord = tf.tile(warped_coord, tiling_params)
-
-      warped_coord += self._psi[i + 2 * num_output_dimensions]
-      # Need to help TF figuring out shape inference since tiling information
-      # is held in Tensors which are not known until run time.
-      warped_coord.set_shape([None, 1, number_of_points])
-      warped_grid.append(warped_coord)
-
-    # Reshape all the warped coordinates tensors to match the specified output
-    # shape and concatenate  into a single matrix.
-    grid_shape = self._output_shape + (1,)
-    warped_grid = [basic.BatchReshape(grid_shape)(grid) for grid in warped_grid]
-    return tf.concat(warped_grid, len(grid_shape))
+    num_dim = self._constraints.num_dim
+    grid = _affine_grid(self._output_shape, self._source_shape)
+    selection, offset = _affine_parameter_matrices(self._source_shape,
+                                                   self._constraints)
+
+    affine_matrices = (tf.matmul(inputs, selection.astype(input_dtype)) +
+                       offset.astype(input_dtype))
+    affine_matrices = tf.reshape(affine_matrices, [-1, num_dim + 1])
+    warped_grid = tf.matmul(affine_matrices, grid.astype(input_dtype))
+    warped_grid = tf.transpose(
+        tf.reshape(warped_grid, [-1, num_dim, grid.shape[1]]), [0, 2, 1])
+    warped_grid += _affine_scales(self._source_shape).astype(input_dtype)
+    return basic.BatchReshape(self._output_shape + (num_dim,))(warped_grid)
 
   @property
   def constraints(self):
@@ -593,3 +600,100 @@ class AffineWarpConstraints(object):
     return cls([[None, 0, 0, None],
                 [0, None, 0, None],
                 [0, 0, None, None]])
+
+
+class BilinearSampler(base.AbstractModule):
+  """Batched bilinear sampler of 2D and 3D signals.
+
+  Resamples a batch of signals at the points of a batch of warped grids, such
+  as the output of an `AffineGridWarper`, by linear interpolation of the
+  `2^N` neighbours of each point in `N` dimensions. The values of all
+  neighbours are fetched with a single gather. Points outside the signal are
+  interpolated with zeros.
+
+  ```python
+  warper = snt.AffineGridWarper(source_shape=[H, W], output_shape=[h, w])
+  sampler = snt.BilinearSampler()
+  outputs = sampler(images, warper(params))  # Shape [B, h, w, C].
+  ```
+  """
+
+  def __init__(self, name='bilinear_sampler'):
+    """Constructs a BilinearSampler module.
+
+    Args:
+      name: Name of the module.
+    """
+    super(BilinearSampler, self).__init__(name=name)
+
+  def _build(self, inputs, warp):
+    """Connects the BilinearSampler module into the graph.
+
+    Args:
+      inputs: Tensor of shape `[batch_size] + source_shape + [num_channels]`,
+        where `source_shape` has `N` dimensions, e.g. `[H, W]` for images.
+      warp: Tensor of shape `[batch_size] + output_shape + [N]` containing the
+        coordinates to sample at, in the order of the output of a
+        `GridWarper`: the last dimension holds the coordinates along the
+        dimensions of `source_shape` in reverse order, e.g. `(x, y)` for
+        images of shape `[H, W]`. Coordinates are in pixel units, from 0 to
+        the size of the dimension minus 1.
+
+    Returns:
+      Tensor of shape `[batch_size] + output_shape + [num_channels]`.
+
+    Raises:
+      base.IncompatibleShapeError: If the rank of `inputs` does not match the
+        number of coordinates of `warp`.
+      base.UnderspecifiedError: If the number of coordinates of `warp` is not
+        known.
+    """
+    warp_static_shape = warp.get_shape()
+    if warp_static_shape.ndims is None or warp_static_shape[-1].value is None:
+      raise base.UnderspecifiedError(
+          'The number of coordinates of warp must be known.')
+    num_dim = warp_static_shape[-1].value
+    if inputs.get_shape().ndims != num_dim + 2:
+      raise base.IncompatibleShapeError(
+          'Inputs of rank {} cannot be sampled with {}-dimensional '
+          'coordinates.'.format(inputs.get_shape().ndims, num_dim))
+
+    dtype = warp.dtype.base_dtype
+    input_shape = tf.shape(inputs)
+    sizes = input_shape[1:-1]
+    strides = tf.cumprod(sizes, exclusive=True, reverse=True)
+    batch_size = input_shape[0]
+    warp_shape = tf.shape(warp)
+
+    # Coordinates of shape [batch_size, num_points, N], in the order of the
+    # dimensions of `inputs`.
+    coords = tf.reverse(tf.reshape(warp, [batch_size, -1, num_dim]), [2])
+    floor = tf.floor(coords)
+    frac = coords - floor
+
+    # Offsets of the 2^N neighbours, of shape [2^N, 1, 1, N].
+    offsets = np.array(list(product((0, 1), repeat=num_dim)))
+    offsets = tf.constant(np.reshape(offsets, (-1, 1, 1, num_dim)),
+                          dtype=dtype)
+    corners = floor + offsets
+    max_index = tf.cast(sizes - 1, dtype)
+    in_bounds = tf.logical_and(corners >= 0, corners <= max_index)
+    weights = offsets * frac + (1 - offsets) * (1 - frac)
+    weights = tf.reduce_prod(weights * tf.cast(in_bounds, dtype), axis=-1)
+
+    # Indices into the flattened batch of inputs, clipped so that the values of
+    # points outside the inputs, which have zero weight, are still defined.
+    indices = tf.cast(tf.clip_by_value(corners, 0, max_index), tf.int32)
+    indices = tf.reduce_sum(indices * strides, axis=-1)
+    indices += tf.expand_dims(tf.range(batch_size) * tf.reduce_prod(sizes), 1)
+    flat_inputs = tf.reshape(inputs, [-1, input_shape[-1]])
+    neighbours = tf.gather(flat_inputs, indices)
+
+    outputs = tf.reduce_sum(
+        neighbours * tf.cast(tf.expand_dims(weights, -1), inputs.dtype),
+        axis=0)
+    outputs = tf.reshape(
+        outputs, tf.concat([warp_shape[:-1], input_shape[-1:]], 0))
+    outputs.set_shape(warp_static_shape[:-1].concatenate(
+        inputs.get_shape()[-1:]))
+    return outputs
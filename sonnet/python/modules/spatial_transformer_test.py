@@ -226,6 +226,93 @@ class AffineGridWarperTest(parameterized.TestCase, tf.test.TestCase):
                         atol=1e-05)
 
 
+  def testFeaturesCached(self):
+    constraints = scale_2d(x=.7)
+    agw1 = snt.AffineGridWarper([5, 6], [3, 4], constraints=constraints)
+    agw2 = snt.AffineGridWarper([5, 6], [3, 4], constraints=scale_2d(x=.7))
+    agw3 = snt.AffineGridWarper([5, 6], [3, 4], constraints=scale_2d(x=.5))
+
+    for feature1, feature2 in zip(agw1.psi, agw2.psi):
+      if isinstance(feature1, np.ndarray):
+        self.assertIs(feature1, feature2)
+        self.assertFalse(feature1.flags.writeable)
+    self.assertIsNot(agw1.psi[2], agw3.psi[2])
+
+
+class BilinearSamplerTest(parameterized.TestCase, tf.test.TestCase):
+
+  def _sample(self, inputs, warp):
+    """NumPy reference implementation of bilinear sampling."""
+    source_shape = inputs.shape[1:-1]
+    num_dim = len(source_shape)
+    outputs = np.zeros(warp.shape[:-1] + inputs.shape[-1:])
+    for index in np.ndindex(warp.shape[:-1]):
+      coords = warp[index][::-1]
+      floor = np.floor(coords).astype(np.int64)
+      for offsets in itertools.product((0, 1), repeat=num_dim):
+        corner = floor + offsets
+        if np.all(corner >= 0) and np.all(corner < source_shape):
+          weight = np.prod(1 - np.abs(coords - corner))
+          outputs[index] += weight * inputs[(index[0],) + tuple(corner)]
+    return outputs
+
+  @parameterized.named_parameters(
+      ("2d", [5, 7], [4, 3]),
+      ("3d", [4, 5, 3], [2, 3, 2]),
+  )
+  def testSameAsNumPyReference(self, source_shape, output_shape):
+    batch_size = 2
+    inputs_np = np.random.rand(*([batch_size] + source_shape + [3]))
+    # Some of the points are outside the inputs.
+    warp_np = np.random.uniform(
+        -1.5, max(source_shape) + 0.5,
+        size=[batch_size] + output_shape + [len(source_shape)])
+
+    inputs = tf.placeholder(tf.float64, [None] + source_shape + [3])
+    warp = tf.placeholder(tf.float64, [None] + output_shape +
+                          [len(source_shape)])
+    outputs = snt.BilinearSampler()(inputs, warp)
+    self.assertEqual(outputs.get_shape().as_list(),
+                     [None] + output_shape + [3])
+
+    with self.test_session() as sess:
+      outputs_np = sess.run(outputs, feed_dict={inputs: inputs_np,
+                                                warp: warp_np})
+    self.assertAllClose(outputs_np, self._sample(inputs_np, warp_np))
+
+  @parameterized.named_parameters(
+      ("2d", [6, 9], [1, 0, 0, 0, 1, 0]),
+      ("3d", [4, 6, 5], [1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 1, 0]),
+  )
+  def testIdentityWarp(self, source_shape, params):
+    inputs_np = np.random.rand(*([1] + source_shape + [2])).astype(np.float32)
+    warper = snt.AffineGridWarper(source_shape, source_shape)
+    outputs = snt.BilinearSampler()(tf.constant(inputs_np),
+                                    warper(tf.constant([params], tf.float32)))
+
+    with self.test_session() as sess:
+      self.assertAllClose(sess.run(outputs), inputs_np, atol=1e-5)
+
+  def testGradients(self):
+    inputs = tf.constant(np.random.rand(2, 5, 6, 3))
+    warp = tf.constant(np.random.uniform(0.2, 3.8, size=(2, 4, 4, 2)))
+    outputs = snt.BilinearSampler()(inputs, warp)
+
+    with self.test_session():
+      for x in (inputs, warp):
+        error = tf.test.compute_gradient_error(
+            x, x.get_shape().as_list(), outputs, [2, 4, 4, 3],
+            delta=1e-4)
+        self.assertLess(error, 1e-3)
+
+  def testIncompatibleShapes(self):
+    sampler = snt.BilinearSampler()
+    with self.assertRaises(snt.IncompatibleShapeError):
+      sampler(tf.ones([1, 4, 4, 3]), tf.ones([1, 2, 2, 3]))
+    with self.assertRaises(snt.UnderspecifiedError):
+      sampler(tf.ones([1, 4, 4, 3]), tf.placeholder(tf.float32))
+
+
 class AffineWarpConstraintsTest(tf.test.TestCase):
 
   def assertConstraintsEqual(self, warp_constraints, expected):
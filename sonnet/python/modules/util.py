@@ -31,6 +31,11 @@ import tensorflow as tf
 from tensorflow.python.ops import variable_scope as variable_scope_ops
 
 
+# Maximum number of variable names whose matching custom getters are memoized
+# by each `custom_getter_router`.
+_ROUTER_CACHE_SIZE = 10000
+
+
 def get_variable_scope_name(value):
   """Returns the name of the variable scope indicated by the given value.
 
@@ -293,6 +298,121 @@ def _get_sliced_variables(var_list):
 # pylint: enable=protected-access
 
 
+def _pattern_string(pattern):
+  """Returns the string of a regular expression or a compiled pattern."""
+  return getattr(pattern, "pattern", pattern)
+
+
+def _is_literal_pattern(pattern):
+  """Returns `True` if the regular expression `pattern` has no metacharacters."""
+  return not any(c in pattern for c in ".^$*+?{}[]\\|()")
+
+
+def _literal_prefix(compiled):
+  """Returns a prefix of every name the compiled pattern `compiled` matches."""
+  pattern = compiled.pattern
+  if compiled.flags & re.IGNORECASE or "|" in pattern:
+    return ""
+  for i, c in enumerate(pattern):
+    if c in ".^$*+?{}[]\\|()":
+      # A quantifier makes the preceding character optional.
+      return pattern[:i - 1] if c in "*?{" and i else pattern[:i]
+  return pattern
+
+
+def _check_custom_getter_map(custom_getter_map):
+  """Checks the rules of `custom_getter_map` and reports ambiguous ones.
+
+  Only literal patterns which are also matched by another pattern are reported:
+  whether two arbitrary regular expressions match a common name is not checked.
+
+  Args:
+    custom_getter_map: Mapping of regular expressions to custom getter
+      functions.
+
+  Returns:
+    A list of `(pattern, compiled_pattern, custom_getter)` tuples.
+
+  Raises:
+    TypeError: If an entry in `custom_getter_map` is not a callable function.
+    ValueError: If two keys of `custom_getter_map` are the same regular
+      expression.
+  """
+  routes = []
+  seen_patterns = set()
+  for pattern, custom_getter in custom_getter_map.items():
+    if not callable(custom_getter):
+      raise TypeError("Given custom_getter is not callable.")
+    pattern_string = _pattern_string(pattern)
+    if pattern_string in seen_patterns:
+      raise ValueError("Pattern {!r} appears more than once in "
+                       "custom_getter_map.".format(pattern_string))
+    seen_patterns.add(pattern_string)
+    routes.append((pattern, re.compile(pattern), custom_getter))
+
+  # Names equal to a literal pattern which also match another pattern can
+  # never be routed; report them before any variable is created.
+  for pattern, _, _ in routes:
+    pattern_string = _pattern_string(pattern)
+    if not _is_literal_pattern(pattern_string):
+      continue
+    overlapping = [_pattern_string(other) for other, compiled, _ in routes
+                   if other is not pattern and compiled.match(pattern_string)]
+    if overlapping:
+      tf.logging.warning(
+          "custom_getter_map pattern %r overlaps with %s: variables named %r "
+          "will match more than one custom_getter.",
+          pattern_string, overlapping, pattern_string)
+  return routes
+
+
+def _overlapping_routes(routes):
+  """Returns, for each route, the indices of the routes it may overlap with.
+
+  Patterns are matched from the start of names, so two patterns whose literal
+  prefixes differ before either ends cannot match the same name.
+
+  Args:
+    routes: A list of `(pattern, compiled_pattern, custom_getter)` tuples.
+
+  Returns:
+    A list of lists of indices into `routes`.
+  """
+  prefixes = [_literal_prefix(compiled) for _, compiled, _ in routes]
+  return [[j for j, other in enumerate(prefixes)
+           if j != i and (prefix.startswith(other) or other.startswith(prefix))]
+          for i, prefix in enumerate(prefixes)]
+
+
+def _combine_patterns(routes):
+  """Returns a single compiled pattern with one named group per route.
+
+  The alternative of route `i` is wrapped in the group `_route_<i>`, so that
+  `match.lastgroup` identifies the first route matching a name.
+
+  Args:
+    routes: A list of `(pattern, compiled_pattern, custom_getter)` tuples.
+
+  Returns:
+    A compiled regular expression, or `None` if the patterns cannot be safely
+    combined, which is the case when they use numbered backreferences, whose
+    numbering would change, conflicting flags, or clashing group names.
+  """
+  if not routes:
+    return None
+  flags = set(compiled.flags for _, compiled, _ in routes)
+  if len(flags) != 1 or any(re.search(r"\\[1-9]", compiled.pattern)
+                            for _, compiled, _ in routes):
+    return None
+  try:
+    return re.compile(
+        "|".join("(?P<_route_{}>{})".format(i, compiled.pattern)
+                 for i, (_, compiled, _) in enumerate(routes)), flags.pop())
+  except (re.error, AssertionError):
+    # Python 2 raises an AssertionError for more than 100 groups.
+    return None
+
+
 def custom_getter_router(custom_getter_map, name_fn):
   """Creates a custom getter than matches requests to dict of custom getters.
 
@@ -311,6 +431,21 @@ def custom_getter_router(custom_getter_map, name_fn):
   provided to allow processing of the name, such as stripping off a scope prefix
   before matching.
 
+  The patterns are compiled once into a single regular expression with one
+  group per pattern, so that the first matching pattern is found with a single
+  call to `match`, rather than one call per pattern. The regular expression
+  engine still tries the alternatives in order. Matching names are then only
+  checked against the patterns which may also match them, found from their
+  literal prefixes when the router is created. Patterns with different flags
+  or numbered backreferences are matched one by one instead. The matching
+  getters of the most recent names are memoized, since the same names are
+  routed again whenever variables are reused, for example by repeated
+  connections of a module, by the steps of `tf.nn.static_rnn` or by towers.
+
+  Literal patterns which are also matched by other patterns are logged when
+  the router is created; other overlapping patterns are only reported when a
+  variable matches more than one of them.
+
   Args:
     custom_getter_map: Mapping of regular expressions to custom getter
       functions.
@@ -322,11 +457,37 @@ def custom_getter_router(custom_getter_map, name_fn):
 
   Raises:
     TypeError: If an entry in `custom_getter_map` is not a callable function.
+    ValueError: If two keys of `custom_getter_map` are the same regular
+      expression.
   """
-
-  for custom_getter in custom_getter_map.values():
-    if not callable(custom_getter):
-      raise TypeError("Given custom_getter is not callable.")
+  routes = _check_custom_getter_map(custom_getter_map)
+  combined_pattern = _combine_patterns(routes)
+  overlapping_routes = _overlapping_routes(routes)
+  matches_cache = collections.OrderedDict()
+
+  def _find_matches(bare_name):
+    """Returns the list of `(custom_getter, pattern)` matching `bare_name`."""
+    if combined_pattern is None:
+      indices = range(len(routes))
+    else:
+      match = combined_pattern.match(bare_name)
+      if match is None:
+        return []
+      first = int(match.lastgroup[len("_route_"):])
+      # Routes before `first` did not match, as alternatives are tried in order.
+      indices = [first] + [i for i in overlapping_routes[first] if i > first]
+    return [(routes[i][2], routes[i][0]) for i in indices
+            if routes[i][1].match(bare_name) is not None]
+
+  def _cached_matches(bare_name):
+    """Returns `_find_matches(bare_name)`, memoized for recent names."""
+    if bare_name in matches_cache:
+      return matches_cache[bare_name]
+    matches = _find_matches(bare_name)
+    if len(matches_cache) >= _ROUTER_CACHE_SIZE:
+      matches_cache.popitem(last=False)
+    matches_cache[bare_name] = matches
+    return matches
 
   def _custom_getter(getter, name, *args, **kwargs):
     """A custom getter that routes based on pattern matching the variable name.
@@ -345,10 +506,7 @@ def custom_getter_router(custom_getter_map, name_fn):
       KeyError: If more than one pattern matches the variable name.
     """
     bare_name = name_fn(name)
-    matches = [
-        (custom_getter, pattern)
-        for pattern, custom_getter in custom_getter_map.items()
-        if re.match(pattern, bare_name) is not None]
+    matches = _cached_matches(bare_name)
 
     num_matches = len(matches)
 
@@ -604,6 +762,70 @@ def summarize_variables(variables=None):
                   _num_bytes_to_human_readable(total_num_bytes))
 
 
+def _num_bytes(variable):
+  """Returns the size in bytes of `variable`."""
+  return variable.shape.num_elements() * variable.dtype.base_dtype.size
+
+
+def format_shards(variables, join_lines=True):
+  """Takes a collection of variables and formats their partitions as a table.
+
+  Each partitioned variable is listed with its full shape, its number of
+  shards, the sizes of its smallest and largest shards and the devices holding
+  them. Unpartitioned variables are listed as a single shard.
+  """
+  rows = []
+  rows.append(("Variable", "Shape", "Type", "Shards", "Min shard", "Max shard",
+               "Devices"))
+  unsliced_variables, sliced_variables = _get_sliced_variables(variables)
+  shards_by_name = {var.op.name: [var] for var in unsliced_variables}
+  shards_by_name.update(sliced_variables)
+  for name in sorted(shards_by_name):
+    shards = shards_by_name[name]
+    save_slice_info = shards[0]._save_slice_info  # pylint: disable=protected-access
+    if save_slice_info:
+      shape = save_slice_info.full_shape
+    else:
+      shape = shards[0].get_shape().as_list()
+    shape = "x".join(str(dim) for dim in shape)
+    dtype = repr(shards[0].dtype.base_dtype).replace("tf.", "")
+    shard_bytes = [_num_bytes(shard) for shard in shards]
+    devices = ", ".join(sorted(set(shard.device for shard in shards)))
+    rows.append((name, shape, dtype, str(len(shards)),
+                 _num_bytes_to_human_readable(min(shard_bytes)),
+                 _num_bytes_to_human_readable(max(shard_bytes)), devices))
+  return _format_table(rows, join_lines)
+
+
+def summarize_shards(variables=None):
+  """Logs the shard sizes of partitioned variables, and their total per device.
+
+  This is useful to check the partitioners of a model, e.g. as chosen by
+  `snt.custom_getters.auto_partitioner`, before placing it on parameter
+  servers. The summary of `summarize_variables` is logged last.
+
+  Args:
+    variables: iterable of variables; if not provided, then all variables
+      (in the default graph) are summarized.
+  """
+  if variables is None:
+    variables = tf.global_variables() + tf.local_variables()
+  variables = [v for v in variables if v.shape.is_fully_defined()]
+  for row in format_shards(variables, join_lines=False):
+    tf.logging.info(row)
+
+  num_shards_per_device = collections.Counter()
+  num_bytes_per_device = collections.Counter()
+  for var in variables:
+    num_shards_per_device[var.device] += 1
+    num_bytes_per_device[var.device] += _num_bytes(var)
+  for device in sorted(num_bytes_per_device):
+    tf.logging.info("Device %r: %d shards, %s", device,
+                    num_shards_per_device[device],
+                    _num_bytes_to_human_readable(num_bytes_per_device[device]))
+  summarize_variables(variables)
+
+
 def reuse_variables(method):
   """Wraps an arbitrary method so it does variable sharing.
 
@@ -20,6 +20,7 @@ from __future__ import print_function
 
 import functools
 import os
+import re
 import tempfile
 
 # Dependency imports
@@ -474,6 +475,97 @@ class UtilTest(parameterized.TestCase, tf.test.TestCase):
         self.assertEqual(expected, actual_args[0] % actual_args[1:])
   # pylint: enable long lambda warning
 
+  @parameterized.parameters(True, False)
+  def testCustomGetterRouter(self, with_groups):
+    calls = []
+
+    def make_getter(tag):
+      def custom_getter(getter, name, *args, **kwargs):
+        calls.append((tag, name))
+        return getter(name, *args, **kwargs)
+      return custom_getter
+
+    suffix = "(_[0-9]+)?" if with_groups else ""
+    custom_getter_map = {"layer_{}/w{}".format(i, suffix): make_getter(i)
+                         for i in range(100)}
+    router = util.custom_getter_router(
+        custom_getter_map, name_fn=lambda name: name[len("scope/"):])
+
+    # Patterns with distinct literal prefixes are never checked against names
+    # matching other patterns.
+    routes = util._check_custom_getter_map(custom_getter_map)
+    self.assertEqual(util._overlapping_routes(routes), [[]] * 100)
+
+    with tf.variable_scope("scope", custom_getter=router):
+      tf.get_variable("layer_7/w", shape=[1])
+      tf.get_variable("layer_7/b", shape=[1])
+      tf.get_variable("layer_42/w", shape=[1])
+      tf.get_variable("other", shape=[1])
+    with tf.variable_scope("scope", custom_getter=router, reuse=True):
+      tf.get_variable("layer_7/w", shape=[1])
+
+    self.assertEqual(calls, [(7, "scope/layer_7/w"), (42, "scope/layer_42/w"),
+                             (7, "scope/layer_7/w")])
+
+  def testCustomGetterRouterMemoized(self):
+    identity_getter = lambda getter, *args, **kwargs: getter(*args, **kwargs)
+    combined_patterns = []
+    combine_patterns = util._combine_patterns
+
+    def wrapped_combine_patterns(routes):
+      combined_patterns.append(mock.Mock(wraps=combine_patterns(routes)))
+      return combined_patterns[-1]
+
+    with mock.patch.object(util, "_combine_patterns",
+                           wrapped_combine_patterns):
+      router = util.custom_getter_router(
+          {"a": identity_getter, "b.*": identity_getter}, name_fn=lambda n: n)
+    combined_pattern, = combined_patterns
+
+    with mock.patch.object(util, "_ROUTER_CACHE_SIZE", 2):
+      with tf.variable_scope("", custom_getter=router):
+        tf.get_variable("a", shape=[1])
+        tf.get_variable("b_1", shape=[1])
+      with tf.variable_scope("", custom_getter=router, reuse=True):
+        tf.get_variable("a", shape=[1])
+        tf.get_variable("b_1", shape=[1])
+      self.assertEqual(combined_pattern.match.call_count, 2)
+
+      # The least recently added name is evicted.
+      with tf.variable_scope("", custom_getter=router):
+        tf.get_variable("c", shape=[1])
+      with tf.variable_scope("", custom_getter=router, reuse=True):
+        tf.get_variable("b_1", shape=[1])
+        tf.get_variable("a", shape=[1])
+      self.assertEqual(combined_pattern.match.call_count, 4)
+
+  def testCustomGetterRouterAmbiguous(self):
+    identity_getter = lambda getter, *args, **kwargs: getter(*args, **kwargs)
+    with mock.patch.object(tf.logging, "warning") as mocked_logging_warning:
+      router = util.custom_getter_router(
+          {"w": identity_getter, ".*": identity_getter}, name_fn=lambda n: n)
+      self.assertEqual(1, len(mocked_logging_warning.call_args_list))
+
+    with self.assertRaisesRegexp(KeyError, "More than one custom_getter"):
+      with tf.variable_scope("", custom_getter=router):
+        tf.get_variable("w", shape=[1])
+
+    # Overlapping patterns which are not literal are reported when a variable
+    # matches both.
+    router = util.custom_getter_router(
+        {"layer_.*/w": identity_getter, "layer_1/.*": identity_getter},
+        name_fn=lambda n: n)
+    with tf.variable_scope("", custom_getter=router):
+      tf.get_variable("layer_2/w", shape=[1])
+      tf.get_variable("layer_1/b", shape=[1])
+      with self.assertRaisesRegexp(KeyError, "More than one custom_getter"):
+        tf.get_variable("layer_1/w", shape=[1])
+
+    with self.assertRaisesRegexp(ValueError, "more than once"):
+      util.custom_getter_router(
+          {"w": identity_getter, re.compile("w"): identity_getter},
+          name_fn=lambda n: n)
+
 
 class ReuseVarsTest(tf.test.TestCase):
 
@@ -25,7 +25,7 @@ from __future__ import print_function
 # Dependency imports
 import tensorflow as tf
 
-nest = tf.contrib.framework.nest
+from tensorflow.python.util import nest
 
 _DONE_WARN = {}
 
@@ -0,0 +1,400 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Benchmarks graph construction and step time of core Sonnet modules.
+
+Each benchmark builds a module in a fresh graph, connects it to random inputs
+and times both the graph construction and repeated execution of the resulting
+step. Results can be written to a JSON file and compared against a previously
+saved baseline, e.g.:
+
+  python module_benchmarks.py --output_json=/tmp/baseline.json
+  python module_benchmarks.py --baseline_json=/tmp/baseline.json \
+      --benchmarks="LSTM|GRU"
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import json
+import re
+import sys
+import time
+
+# Dependency imports
+import numpy as np
+import sonnet as snt
+from sonnet.python.modules import util
+import tensorflow as tf
+
+from tensorflow.python.util import nest
+
+
+tf.app.flags.DEFINE_string("benchmarks", ".*",
+                           "Regex selecting the benchmarks to run.")
+tf.app.flags.DEFINE_list("sizes", ["small", "medium"],
+                         "Problem sizes to run: small, medium and/or large.")
+tf.app.flags.DEFINE_integer("num_steps", 20, "Number of timed steps.")
+tf.app.flags.DEFINE_integer("num_warmup_steps", 3,
+                            "Number of untimed steps run before timing.")
+tf.app.flags.DEFINE_boolean("compute_gradients", True,
+                            "Whether a step includes the backward pass.")
+tf.app.flags.DEFINE_boolean("cpu_only", True, "Whether to hide all GPUs.")
+tf.app.flags.DEFINE_string("output_json", None,
+                           "Optional file to write the results to.")
+tf.app.flags.DEFINE_string("baseline_json", None,
+                           "Optional results file to compare against.")
+tf.app.flags.DEFINE_float("tolerance", 0.1,
+                          "Relative slowdown reported as a regression.")
+
+FLAGS = tf.app.flags.FLAGS
+
+
+SIZES = {
+    "small": {"batch_size": 16, "hidden_size": 64, "image_size": 16,
+              "channels": 16, "sequence_length": 16},
+    "medium": {"batch_size": 32, "hidden_size": 256, "image_size": 32,
+               "channels": 32, "sequence_length": 32},
+    "large": {"batch_size": 64, "hidden_size": 1024, "image_size": 64,
+              "channels": 64, "sequence_length": 64},
+}
+
+# Fields of `BenchmarkResult` that are compared against a baseline, where
+# larger values are worse.
+_COMPARED_FIELDS = ("build_time_s", "mean_step_s", "peak_memory_bytes")
+
+BenchmarkResult = collections.namedtuple(
+    "BenchmarkResult",
+    ("name", "size", "build_time_s", "mean_step_s", "median_step_s",
+     "examples_per_s", "peak_memory_bytes"))
+
+_BENCHMARKS = collections.OrderedDict()
+
+
+def _register(name):
+  """Registers a function `fn(size) -> outputs` as benchmark `name`."""
+  def decorator(build_fn):
+    _BENCHMARKS[name] = build_fn
+    return build_fn
+  return decorator
+
+
+def _random_input(shape, name="inputs"):
+  """Returns random inputs held in a local variable.
+
+  Holding the inputs in a variable keeps random number generation and feeding
+  out of the timed step.
+
+  Args:
+    shape: Shape of the inputs.
+    name: Name of the variable.
+
+  Returns:
+    A `tf.Variable` of the given shape.
+  """
+  return tf.get_local_variable(
+      name, initializer=np.random.randn(*shape).astype(np.float32))
+
+
+@_register("Linear")
+def _linear(size):
+  inputs = _random_input([size["batch_size"], size["hidden_size"]])
+  return snt.Linear(size["hidden_size"])(inputs)
+
+
+@_register("Conv1D")
+def _conv1d(size):
+  inputs = _random_input(
+      [size["batch_size"], size["sequence_length"], size["channels"]])
+  return snt.Conv1D(size["channels"], kernel_shape=3)(inputs)
+
+
+@_register("CausalConv1D")
+def _causal_conv1d(size):
+  inputs = _random_input(
+      [size["batch_size"], size["sequence_length"], size["channels"]])
+  return snt.CausalConv1D(size["channels"], kernel_shape=3, rate=2)(inputs)
+
+
+def _image_input(size):
+  return _random_input([size["batch_size"], size["image_size"],
+                        size["image_size"], size["channels"]])
+
+
+@_register("Conv2D")
+def _conv2d(size):
+  return snt.Conv2D(size["channels"], kernel_shape=3)(_image_input(size))
+
+
+@_register("Conv2DTranspose")
+def _conv2d_transpose(size):
+  return snt.Conv2DTranspose(size["channels"], kernel_shape=3, stride=2)(
+      _image_input(size))
+
+
+@_register("DepthwiseConv2D")
+def _depthwise_conv2d(size):
+  return snt.DepthwiseConv2D(channel_multiplier=1, kernel_shape=3)(
+      _image_input(size))
+
+
+@_register("SeparableConv2D")
+def _separable_conv2d(size):
+  return snt.SeparableConv2D(size["channels"], channel_multiplier=1,
+                             kernel_shape=3)(_image_input(size))
+
+
+@_register("Conv3D")
+def _conv3d(size):
+  spatial_size = max(size["image_size"] // 4, 4)
+  inputs = _random_input([size["batch_size"], spatial_size, spatial_size,
+                          spatial_size, size["channels"]])
+  return snt.Conv3D(size["channels"], kernel_shape=3)(inputs)
+
+
+def _sequence_input(size):
+  return _random_input([size["batch_size"], size["sequence_length"],
+                        size["hidden_size"]])
+
+
+def _unroll(core, size, dynamic):
+  """Unrolls `core` over a random sequence, statically or dynamically."""
+  inputs = _sequence_input(size)
+  initial_state = core.initial_state(size["batch_size"])
+  if dynamic:
+    outputs, _ = tf.nn.dynamic_rnn(core, inputs, initial_state=initial_state)
+  else:
+    outputs, _ = tf.nn.static_rnn(
+        core, tf.unstack(inputs, axis=1), initial_state=initial_state)
+  return outputs
+
+
+def _register_unrolls(name, make_core):
+  for dynamic in (False, True):
+    benchmark_name = "{}_{}".format(name, "dynamic" if dynamic else "static")
+    _register(benchmark_name)(
+        lambda size, dynamic=dynamic: _unroll(make_core(size), size, dynamic))
+
+
+_register_unrolls("LSTM", lambda size: snt.LSTM(size["hidden_size"]))
+_register_unrolls("GRU", lambda size: snt.GRU(size["hidden_size"]))
+_register_unrolls(
+    "DeepRNN",
+    lambda size: snt.DeepRNN([snt.LSTM(size["hidden_size"]) for _ in range(3)],
+                             skip_connections=False))
+
+
+@_register("BatchNorm")
+def _batch_norm(size):
+  return snt.BatchNorm()(_image_input(size), is_training=True)
+
+
+@_register("BatchNormV2")
+def _batch_norm_v2(size):
+  return snt.BatchNormV2()(_image_input(size), is_training=True)
+
+
+@_register("BatchNormV2_fused")
+def _batch_norm_v2_fused(size):
+  return snt.BatchNormV2(fused=True)(_image_input(size), is_training=True)
+
+
+@_register("LayerNorm")
+def _layer_norm(size):
+  inputs = _random_input([size["batch_size"], size["hidden_size"]])
+  return snt.LayerNorm()(inputs)
+
+
+@_register("AttentiveRead")
+def _attentive_read(size):
+  memory = _random_input(
+      [size["batch_size"], size["sequence_length"], size["hidden_size"]],
+      name="memory")
+  query = _random_input([size["batch_size"], size["hidden_size"]],
+                        name="query")
+  attention_logit_mod = snt.nets.MLP([size["hidden_size"], 1])
+  return snt.AttentiveRead(attention_logit_mod)(memory, query).read
+
+
+@_register("RelationalMemory")
+def _relational_memory(size):
+  core = snt.RelationalMemory(mem_slots=4, head_size=size["hidden_size"] // 4,
+                              num_heads=4)
+  inputs = _random_input([size["batch_size"], size["hidden_size"]])
+  output, _ = core(inputs, core.initial_state(size["batch_size"]))
+  return output
+
+
+@_register("VectorQuantizer")
+def _vector_quantizer(size):
+  inputs = _image_input(size)
+  vq = snt.nets.VectorQuantizer(
+      embedding_dim=size["channels"], num_embeddings=512, commitment_cost=0.25)
+  outputs = vq(inputs, is_training=True)
+  return outputs["quantize"], outputs["loss"]
+
+
+def _peak_memory_bytes(run_metadata):
+  """Returns the sum over allocators of their peak memory usage in a step."""
+  peak_bytes = collections.defaultdict(int)
+  for device_stats in run_metadata.step_stats.dev_stats:
+    for node_stats in device_stats.node_stats:
+      for memory in node_stats.memory:
+        key = (device_stats.device, memory.allocator_name)
+        peak_bytes[key] = max(peak_bytes[key], memory.peak_bytes)
+  return sum(peak_bytes.values())
+
+
+def run_benchmark(name, build_fn, size_name, num_steps=20, num_warmup_steps=3,
+                  compute_gradients=True, config=None):
+  """Runs a single benchmark in a fresh graph.
+
+  Args:
+    name: Name of the benchmark.
+    build_fn: Function taking a dictionary of sizes and returning the (nested)
+        outputs of the benchmarked module.
+    size_name: Key into `SIZES`.
+    num_steps: Number of timed steps.
+    num_warmup_steps: Number of untimed steps run before timing.
+    compute_gradients: Whether a step includes the gradients of the outputs with
+        respect to the trainable variables.
+    config: Optional `tf.ConfigProto` for the session.
+
+  Returns:
+    A `BenchmarkResult`.
+  """
+  size = SIZES[size_name]
+  with tf.Graph().as_default():
+    start_time = time.time()
+    outputs = nest.flatten(build_fn(size))
+    if compute_gradients and tf.trainable_variables():
+      loss = tf.add_n([tf.reduce_sum(output) for output in outputs
+                       if output.dtype.is_floating])
+      outputs.extend(
+          g for g in tf.gradients(loss, tf.trainable_variables())
+          if g is not None)
+    step_op = tf.group(*outputs)
+    build_time_s = time.time() - start_time
+
+    with tf.Session(config=config) as sess:
+      sess.run([tf.global_variables_initializer(),
+                tf.local_variables_initializer()])
+      for _ in range(num_warmup_steps):
+        sess.run(step_op)
+
+      step_times = []
+      for _ in range(num_steps):
+        start_time = time.time()
+        sess.run(step_op)
+        step_times.append(time.time() - start_time)
+
+      run_metadata = tf.RunMetadata()
+      sess.run(step_op,
+               options=tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE),
+               run_metadata=run_metadata)
+
+  mean_step_s = float(np.mean(step_times))
+  return BenchmarkResult(
+      name=name,
+      size=size_name,
+      build_time_s=build_time_s,
+      mean_step_s=mean_step_s,
+      median_step_s=float(np.median(step_times)),
+      examples_per_s=size["batch_size"] / mean_step_s,
+      peak_memory_bytes=_peak_memory_bytes(run_metadata))
+
+
+def compare_to_baseline(results, baseline, tolerance=0.1):
+  """Returns descriptions of the results that regressed against `baseline`.
+
+  Args:
+    results: Iterable of `BenchmarkResult`s.
+    baseline: Iterable of dictionaries with the fields of `BenchmarkResult`,
+        as written by `results_to_json`.
+    tolerance: Relative increase of a compared field above which a result is
+        reported as a regression.
+
+  Returns:
+    A list of strings, one per regressed field.
+  """
+  baseline_by_key = {(b["name"], b["size"]): b for b in baseline}
+  regressions = []
+  for result in results:
+    reference = baseline_by_key.get((result.name, result.size))
+    if reference is None:
+      continue
+    for field in _COMPARED_FIELDS:
+      value = getattr(result, field)
+      reference_value = reference[field]
+      if reference_value > 0 and value > reference_value * (1 + tolerance):
+        regressions.append(
+            "{} ({}): {} went from {:.6g} to {:.6g} ({:+.1%})".format(
+                result.name, result.size, field, reference_value, value,
+                value / reference_value - 1))
+  return regressions
+
+
+def results_to_json(results):
+  """Returns a JSON string holding `results`."""
+  return json.dumps([dict(r._asdict()) for r in results], indent=2,
+                    sort_keys=True)
+
+
+def _format_results(results):
+  rows = [("Benchmark", "Size", "Build (s)", "Step (ms)", "Examples/s",
+           "Peak memory")]
+  for r in results:
+    rows.append((r.name, r.size, "{:.3f}".format(r.build_time_s),
+                 "{:.3f}".format(r.mean_step_s * 1000),
+                 "{:.1f}".format(r.examples_per_s),
+                 util._num_bytes_to_human_readable(r.peak_memory_bytes)))  # pylint: disable=protected-access
+  return util._format_table(rows)  # pylint: disable=protected-access
+
+
+def main(unused_argv):
+  config = tf.ConfigProto(device_count={"GPU": 0}) if FLAGS.cpu_only else None
+  pattern = re.compile(FLAGS.benchmarks)
+
+  results = []
+  for size_name in FLAGS.sizes:
+    for name, build_fn in _BENCHMARKS.items():
+      if not pattern.search(name):
+        continue
+      tf.logging.info("Running %s (%s).", name, size_name)
+      results.append(run_benchmark(
+          name, build_fn, size_name, num_steps=FLAGS.num_steps,
+          num_warmup_steps=FLAGS.num_warmup_steps,
+          compute_gradients=FLAGS.compute_gradients, config=config))
+
+  print(_format_results(results))
+
+  if FLAGS.output_json:
+    with tf.gfile.Open(FLAGS.output_json, "w") as f:
+      f.write(results_to_json(results))
+
+  if FLAGS.baseline_json:
+    with tf.gfile.Open(FLAGS.baseline_json) as f:
+      baseline = json.load(f)
+    regressions = compare_to_baseline(results, baseline, FLAGS.tolerance)
+    for regression in regressions:
+      print("REGRESSION: " + regression)
+    if regressions:
+      sys.exit(1)
+
+
+if __name__ == "__main__":
+  tf.app.run()
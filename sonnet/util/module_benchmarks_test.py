@@ -0,0 +1,65 @@
+# Copyright 2017 The Sonnet Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or  implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ============================================================================
+
+"""Tests for sonnet.util.module_benchmarks."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+
+# Dependency imports
+from absl.testing import parameterized
+from sonnet.util import module_benchmarks
+import tensorflow as tf
+
+
+class ModuleBenchmarksTest(parameterized.TestCase, tf.test.TestCase):
+
+  @parameterized.parameters("Linear", "Conv2D", "LSTM_dynamic", "BatchNormV2")
+  def testRunBenchmark(self, name):
+    result = module_benchmarks.run_benchmark(
+        name, module_benchmarks._BENCHMARKS[name], "small", num_steps=2,
+        num_warmup_steps=1)
+    self.assertEqual(result.name, name)
+    self.assertGreater(result.mean_step_s, 0)
+    self.assertGreater(result.examples_per_s, 0)
+    self.assertGreaterEqual(result.peak_memory_bytes, 0)
+
+  def testCompareToBaseline(self):
+    baseline_result = module_benchmarks.BenchmarkResult(
+        name="Linear", size="small", build_time_s=1.0, mean_step_s=1.0,
+        median_step_s=1.0, examples_per_s=16.0, peak_memory_bytes=100)
+    baseline = json.loads(module_benchmarks.results_to_json([baseline_result]))
+
+    unchanged = baseline_result._replace(mean_step_s=1.05)
+    self.assertEqual(
+        module_benchmarks.compare_to_baseline([unchanged], baseline, 0.1), [])
+
+    slower = baseline_result._replace(mean_step_s=1.5, peak_memory_bytes=200)
+    regressions = module_benchmarks.compare_to_baseline(
+        [slower], baseline, 0.1)
+    self.assertEqual(len(regressions), 2)
+    self.assertIn("mean_step_s", regressions[0])
+    self.assertIn("peak_memory_bytes", regressions[1])
+
+    other_size = slower._replace(size="large")
+    self.assertEqual(
+        module_benchmarks.compare_to_baseline([other_size], baseline), [])
+
+
+if __name__ == "__main__":
+  tf.test.main()